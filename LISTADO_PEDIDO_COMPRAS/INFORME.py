@@ -20,6 +20,8 @@ from email.mime.text import MIMEText
 from email.mime.multipart import MIMEMultipart
 from email.mime.base import MIMEBase
 from pathlib import Path
+
+from src.excel_cache import leer_excel_cacheado
 warnings.filterwarnings('ignore')
 
 # ============================================================================
@@ -233,11 +235,7 @@ def extraer_nombre_seccion(nombre_archivo):
 
 def leer_datos_clasificacion(ruta_archivo):
     """Lee todas las hojas de clasificación del archivo Excel."""
-    excel_file = pd.ExcelFile(ruta_archivo)
-    hojas = {}
-    for hoja in excel_file.sheet_names:
-        hojas[hoja] = pd.read_excel(excel_file, sheet_name=hoja)
-    return hojas
+    return leer_excel_cacheado(ruta_archivo, sheet_name=None)
 
 def obtener_valor(diccionario, clave, default=0):
     """Obtiene un valor de un diccionario o Serie de forma segura."""
@@ -316,7 +314,7 @@ def leer_capital_inmovilizado_stock(df_seccion):
     
     try:
         # Leer stock, excluyendo filas Cabecera (sumatorios)
-        df_stock = pd.read_excel(ruta_stock)
+        df_stock = leer_excel_cacheado(ruta_stock)
         df_stock = df_stock[df_stock['Tipo registro'] != 'Cabecera']
         
         if 'Total' not in df_stock.columns:
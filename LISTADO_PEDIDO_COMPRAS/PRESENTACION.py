@@ -21,6 +21,8 @@ from email.mime.text import MIMEText
 from email.mime.multipart import MIMEMultipart
 from email.mime.base import MIMEBase
 from pathlib import Path
+
+from src.excel_cache import leer_excel_cacheado
 warnings.filterwarnings('ignore')
 
 # ============================================================================
@@ -238,12 +240,10 @@ def leer_datos_clasificacion(ruta_archivo):
     Lee todas las hojas de clasificación del archivo Excel y las combina.
     El archivo de clasificación YA contiene los datos calculados correctamente.
     """
-    excel_file = pd.ExcelFile(ruta_archivo)
     hojas = {}
     df_combinado = None
     
-    for hoja in excel_file.sheet_names:
-        df_hoja = pd.read_excel(excel_file, sheet_name=hoja)
+    for hoja, df_hoja in leer_excel_cacheado(ruta_archivo, sheet_name=None).items():
         hojas[hoja] = df_hoja
         
         # Combinar todas las hojas
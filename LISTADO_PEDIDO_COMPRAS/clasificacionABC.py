@@ -24,6 +24,9 @@ Ejecutar:
     python clasificacionABC.py --P3                          # Procesa período P3 (junio-agosto)
     python clasificacionABC.py --P4                          # Procesa período P4 (septiembre-diciembre)
     python clasificacionABC.py --P2 --seccion vivero         # Procesa solo vivero en período P2
+    python clasificacionABC.py --P3 --workers 4              # Escribe los archivos de las secciones en 4 procesos
+    python clasificacionABC.py --P3 --incremental            # Solo incorpora las filas nuevas desde la última ejecución
+    python clasificacionABC.py --todos-periodos --workers 4  # Procesa P1-P4 leyendo los archivos una sola vez
 
 Los datos se leen de archivos con datos de TODO el año:
 - SPA_compras.xlsx: Datos de compras de todo el año
@@ -40,8 +43,8 @@ import pandas as pd
 import numpy as np
 from datetime import datetime, timedelta
 from collections import defaultdict
-from openpyxl import load_workbook
-from openpyxl.styles import Font, Fill, PatternFill, Border, Side, Alignment
+from openpyxl.styles import Font, Alignment
+from openpyxl.utils import get_column_letter
 import sys
 import argparse
 import warnings
@@ -55,6 +58,14 @@ from email.mime.text import MIMEText
 from email.mime.multipart import MIMEMultipart
 from email.mime.base import MIMEBase
 from pathlib import Path
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, as_completed
+
+from src.excel_cache import leer_excel_cacheado
+from src.escritura_atomica import escribir_atomico
+from src.excel_streaming import (borde_fino, relleno_solido, crear_estilo, crear_libro_streaming,
+                                 crear_hoja_streaming, escribir_fila, rango_hoja)
+from src.clasificador_secciones import determinar_seccion_codigo, asignar_secciones
+from src.codificador_claves import convertir_a_categorias
 warnings.filterwarnings('ignore')
 
 # ============================================================================
@@ -211,6 +222,9 @@ FECHA_FIN = None     # Se configurará según el argumento --P1, --P2, --P3, --P
 DIAS_PERIODO = 0
 PERIODO = "PERIODO"
 
+# Períodos que se procesan con --todos-periodos
+PERIODOS_CLASIFICACION = ['P1', 'P2', 'P3', 'P4']
+
 # ============================================================================
 # CARGA DE CONFIGURACIÓN DESDE JSON
 # ============================================================================
@@ -356,6 +370,66 @@ def configurar_periodo(periodo_seleccionado, config, año_datos=None):
     dias_periodo = (fecha_fin - fecha_inicio).days + 1
     return fecha_inicio, fecha_fin, dias_periodo, "ANUAL", año_datos
 
+def establecer_periodo(configuracion):
+    """
+    Establece las variables globales del período que se va a clasificar.
+    
+    Args:
+        configuracion: Tupla devuelta por configurar_periodo
+    """
+    global FECHA_INICIO, FECHA_FIN, DIAS_PERIODO, PERIODO, AÑO
+    FECHA_INICIO, FECHA_FIN, DIAS_PERIODO, PERIODO, AÑO = configuracion
+
+def filtrar_por_fechas(df, fecha_inicio, fecha_fin):
+    """
+    Selecciona las filas con fecha dentro de un período (extremos incluidos).
+    
+    Args:
+        df: DataFrame con la columna 'Fecha' ya convertida a datetime
+        fecha_inicio: Fecha de inicio del período
+        fecha_fin: Fecha de fin del período
+    
+    Returns:
+        pd.DataFrame: Copia de las filas del período
+    """
+    return df[(df['Fecha'] >= fecha_inicio) & (df['Fecha'] <= fecha_fin)].copy()
+
+def cargar_archivo_stock(periodo):
+    """
+    Carga el archivo de stock de un período (SPA_stock_{periodo}.xlsx).
+    
+    Si no existe se usa el primer archivo de stock disponible; si no hay
+    ninguno el script termina.
+    
+    Args:
+        periodo: Período (P1, P2, P3, P4) o None para el período por defecto
+    
+    Returns:
+        pd.DataFrame: Datos de stock
+    """
+    # Determinar el nombre del archivo de stock según el período
+    if periodo:
+        nombre_stock = f'SPA_stock_{periodo}.xlsx'
+    else:
+        # Si no hay período específico, buscar el archivo más reciente
+        nombre_stock = 'SPA_stock_P1.xlsx'  # Valor por defecto
+    
+    try:
+        stock_df = leer_excel_cacheado(os.path.join(DIRECTORIO_DATA, nombre_stock))
+    except FileNotFoundError:
+        print(f"ADVERTENCIA: No se encontró {nombre_stock}, buscando archivo alternativo...")
+        # Buscar cualquier archivo de stock disponible
+        archivos_stock = [f for f in os.listdir(DIRECTORIO_DATA) if f.startswith('SPA_stock') and f.endswith('.xlsx')]
+        if archivos_stock:
+            nombre_stock = archivos_stock[0]
+            stock_df = leer_excel_cacheado(os.path.join(DIRECTORIO_DATA, nombre_stock))
+        else:
+            print("ERROR: No se encontró ningún archivo de stock")
+            sys.exit(1)
+    
+    print(f"STOCK: {len(stock_df)} registros cargados ({nombre_stock})")
+    return stock_df
+
 def detectar_año_datos(compras_df, ventas_df):
     """
     Detecta automáticamente el año de los datos basándose en las fechas de compras y ventas.
@@ -874,659 +948,1204 @@ def obtener_iva_articulo(codigo_articulo):
     # IVA por defecto si no se encuentra
     return 21
 
+
+def obtener_iva_articulos(codigos):
+    """
+    Obtiene el IVA de una columna de códigos de artículo (versión vectorizada
+    de obtener_iva_articulo).
+    
+    Args:
+        codigos: Series con los códigos de artículo
+    
+    Returns:
+        pd.Series: Porcentaje de IVA de cada artículo (21 por defecto)
+    """
+    codigo_str = codigos.astype(str).str.strip().str.replace(r'\.0$', '', regex=True)
+    
+    # Los que empiezan por 2 se buscan por subfamilia (4 dígitos), el resto por familia (2 dígitos)
+    iva_subfamilia = codigo_str.str[:4].map(IVA_SUBFAMILIA).where(codigo_str.str.len() >= 4)
+    iva_familia = codigo_str.str[:2].map(IVA_FAMILIA)
+    iva = iva_subfamilia.where(codigo_str.str.startswith('2', na=False), iva_familia)
+    
+    return iva.fillna(21)
+
 # ============================================================================
-# FUNCIÓN PARA DETERMINAR LA SECCIÓN DE UN ARTÍCULO
+# COSTE Y BENEFICIO DE LAS VENTAS
 # ============================================================================
 
-def determinar_seccion(codigo_articulo):
+def _columna_numerica(df, columna, valor_nulo):
     """
-    Determina la sección de un artículo según su código.
+    Convierte una columna a número sustituyendo los nulos por un valor.
     
     Args:
-        codigo_articulo: Código del artículo (puede ser string o número)
+        df: DataFrame de ventas
+        columna: Nombre de la columna
+        valor_nulo: Valor que se usa en las filas nulas
     
     Returns:
-        str: Nombre de la sección o None si no se puede clasificar
+        tuple: (Series numérica, máscara de filas con valores no numéricos)
     """
-    if codigo_articulo is None:
-        return None
+    numerica = pd.to_numeric(df[columna], errors='coerce')
+    no_valida = numerica.isna() & df[columna].notna()
+    return numerica.fillna(valor_nulo), no_valida
+
+
+def calcular_coste_ventas(ventas, iva):
+    """
+    Calcula el coste total de cada línea de venta.
     
-    codigo_str = str(codigo_articulo).strip()
+    Si la línea tiene coste unitario se usa directamente. Si no, se estima a
+    partir del PVP sin IVA: /2.3 para artículos con IVA del 10% y /2 para el
+    resto. Las líneas sin datos suficientes o con valores no numéricos
+    tienen coste 0.
     
-    # Eliminar decimales si viene como float
-    if codigo_str.endswith('.0'):
-        codigo_str = codigo_str[:-2]
+    Args:
+        ventas: DataFrame de ventas con Unidades, Importe y Coste (unitario)
+        iva: Series con el IVA de cada línea
     
-    if not codigo_str or codigo_str == 'nan':
-        return None
+    Returns:
+        pd.Series: Coste total de cada línea
+    """
+    unidades, unidades_no_valida = _columna_numerica(ventas, 'Unidades', 1)
+    importe, _ = _columna_numerica(ventas, 'Importe', 0)
+    coste_unitario, coste_no_valido = _columna_numerica(ventas, 'Coste', 0)
     
-    # REGLA CRÍTICA: Filtrar artículos con menos de 10 dígitos
-    # Esta regla tiene prioridad sobre todas las demás
-    if len(codigo_str) < 10:
-        return None
+    con_coste = coste_unitario > 0
+    con_pvp = ~con_coste & (unidades > 0) & (importe > 0)
     
-    # 1. Verificar códigos de mascotas vivos (primero, tienen prioridad)
-    # Los códigos de mascotas vivos son códigos de 4 dígitos (2104, 2204, etc.)
-    #，所以我们需要检查代码的前4位是否在这个列表中
-    if codigo_str.startswith('2') and codigo_str[:4] in CODIGOS_MASCOTAS_VIVO:
-        return 'mascotas_vivo'
+    pvp = importe / unidades.where(con_pvp)
+    coste_estimado = np.where(iva == 10, (pvp / 1.10) / 2.3, (pvp / 1.21) / 2)
     
-    # 2. Sección 2: Mascotas manufacturadas (empieza por 2 y no está en vivos)
-    if codigo_str.startswith('2'):
-        return 'mascotas_manufacturado'
-    
-    # 3. Sección 3: Tierra/Áridos (31 o 32)
-    if codigo_str.startswith('31') or codigo_str.startswith('32'):
-        return 'tierra_aridos'
-    
-    # 4. Sección 3: Fitosanitarios (33-39)
-    if codigo_str.startswith('3'):
-        if len(codigo_str) >= 2:
-            try:
-                segundo_digito = int(codigo_str[1])
-                if 3 <= segundo_digito <= 9:
-                    return 'fitos'
-            except (ValueError, IndexError):
-                pass
-    
-    # 5. Secciones por primer dígito
-    if codigo_str.startswith('1'):
-        return 'interior'
-    elif codigo_str.startswith('4'):
-        return 'utiles_jardin'
-    elif codigo_str.startswith('5'):
-        return 'semillas'
-    elif codigo_str.startswith('6'):
-        return 'deco_interior'
-    elif codigo_str.startswith('7'):
-        return 'maf'
-    elif codigo_str.startswith('8'):
-        return 'vivero'
-    elif codigo_str.startswith('9'):
-        return 'deco_exterior'
+    coste = np.select([con_coste, con_pvp],
+                      [unidades * coste_unitario, unidades * coste_estimado], default=0)
+    no_valida = coste_no_valido | unidades_no_valida
     
-    return None
+    return pd.Series(np.where(no_valida, 0, coste), index=ventas.index)
+
+
+def calcular_beneficio_ventas(ventas, iva):
+    """
+    Calcula el beneficio de cada línea de venta: importe sin IVA menos coste.
+    
+    Args:
+        ventas: DataFrame de ventas con Importe y Coste (total)
+        iva: Series con el IVA de cada línea
+    
+    Returns:
+        pd.Series: Beneficio de cada línea (0 si hay valores no numéricos)
+    """
+    importe, importe_no_valido = _columna_numerica(ventas, 'Importe', 0)
+    coste, coste_no_valido = _columna_numerica(ventas, 'Coste', 0)
+    
+    beneficio = (importe / (1 + iva / 100)) - coste
+    return beneficio.where(~(importe_no_valido | coste_no_valido), 0)
 
 # ============================================================================
-# FUNCIÓN PARA PROCESAR UNA SECCIÓN ESPECÍFICA
+# FUNCIÓN PARA DETERMINAR LA SECCIÓN DE UN ARTÍCULO
 # ============================================================================
 
-def procesar_seccion(compras_df, ventas_df, stock_df, coste_df, nombre_seccion, seccion_info):
+def determinar_seccion(codigo_articulo):
     """
-    Procesa los datos de una sección específica y genera su archivo Excel.
+    Determina la sección de un artículo según su código.
     
     Args:
-        compras_df: DataFrame de compras
-        ventas_df: DataFrame de ventas
-        stock_df: DataFrame de stock
-        coste_df: DataFrame de costes
-        nombre_seccion: Nombre de la sección a procesar
-        seccion_info: Información de la sección (diccionario con descripción)
+        codigo_articulo: Código del artículo (puede ser string o número)
     
     Returns:
-        dict: Estadísticas del procesamiento o None si no hay datos
+        str: Nombre de la sección o None si no se puede clasificar
+    """
+    return determinar_seccion_codigo(codigo_articulo, CODIGOS_MASCOTAS_VIVO, 'tierra_aridos')
+
+# ============================================================================
+# AGREGACIÓN Y MÉTRICAS POR ARTÍCULO
+# ============================================================================
+
+# Columnas que identifican un artículo en compras, ventas y stock
+CLAVE_ARTICULO = ['codigo_str', 'nombre_str', 'talla_str', 'color_str']
+
+# Días de venta media que cubren el stock mínimo y máximo según la rotación de la familia
+FACTOR_STOCK_MINIMO = {7: 3.5, 15: 7.5, 30: 15, 60: 30, 90: 45}
+FACTOR_STOCK_MAXIMO = {7: 10.5, 15: 22.5, 30: 45, 60: 90, 90: 135}
+
+
+def _agregar_columna(sumas, claves, columna, df_origen):
     """
-    print(f"\n{'='*80}")
-    print(f"PROCESANDO SECCIÓN: {nombre_seccion.upper()}")
-    print(f"Descripción: {seccion_info['descripcion']}")
-    print(f"{'='*80}")
+    Alinea una columna agregada con el índice completo de artículos.
     
-    # Filtrar datos por sección
-    def filtrar_por_seccion(df, columna_codigo='codigo_str'):
-        """Filtra un DataFrame para incluir solo artículos de la sección"""
-        if columna_codigo not in df.columns:
-            return df[df[columna_codigo].apply(lambda x: determinar_seccion(x) == nombre_seccion)]
-        
-        # Optimizado: aplicar determinar_seccion solo a códigos únicos
-        codigos_unicos = df[columna_codigo].unique()
-        codigos_seccion = set()
-        for codigo in codigos_unicos:
-            if determinar_seccion(codigo) == nombre_seccion:
-                codigos_seccion.add(codigo)
-        
-        return df[df[columna_codigo].isin(codigos_seccion)]
+    Los artículos sin registros en el origen quedan a 0. Si el origen está
+    vacío la columna es entera (como el 0 que se asignaba artículo a artículo).
     
-    # Crear copias filtradas
-    compras_seccion = filtrar_por_seccion(compras_df.copy(), 'codigo_str')
-    ventas_seccion = filtrar_por_seccion(ventas_df.copy(), 'codigo_str')
-    stock_seccion = filtrar_por_seccion(stock_df.copy(), 'codigo_str')
+    Args:
+        sumas: Series agregada por artículo (None si el origen está vacío)
+        claves: MultiIndex con todos los artículos de la sección
+        columna: Nombre de la columna resultante
+        df_origen: DataFrame del que procede la agregación
     
-    print(f"Datos filtrados:")
-    print(f"  - Compras: {len(compras_seccion)} registros")
-    print(f"  - Ventas: {len(ventas_seccion)} registros")
-    print(f"  - Stock: {len(stock_seccion)} registros")
+    Returns:
+        pd.Series: Columna alineada con claves
+    """
+    if sumas is None or len(df_origen) == 0:
+        return pd.Series(0, index=claves, name=columna, dtype=np.int64)
+    return sumas.reindex(claves, fill_value=0).rename(columna)
+
+
+def agregar_por_articulo(compras_seccion, ventas_seccion, stock_seccion, fecha_fin, dias_periodo):
+    """
+    Agrega compras, ventas y stock por artículo con un groupby por tabla.
     
-    # Si no hay datos en ninguna tabla, avisar y continuar
-    if len(compras_seccion) == 0 and len(ventas_seccion) == 0 and len(stock_seccion) == 0:
-        print(f"  AVISO: No hay datos para la sección '{nombre_seccion}'. Saltando...")
-        return None
+    Cada artículo se identifica por (código, nombre, talla, color). Las tres
+    agregaciones se unen por esa clave (unión de los artículos de las tres
+    tablas, ordenada).
     
-    # =========================================================================
-    # IDENTIFICACIÓN DE ARTÍCULOS ÚNICOS
-    # =========================================================================
+    Args:
+        compras_seccion: DataFrame de compras de la sección
+        ventas_seccion: DataFrame de ventas de la sección
+        stock_seccion: DataFrame de stock de la sección
+        fecha_fin: Fecha de fin del período
+        dias_periodo: Número de días del período
     
-    def crear_clave(row):
-        return (row['codigo_str'], row['nombre_str'], row['talla_str'], row['color_str'])
+    Returns:
+        pd.DataFrame: Una fila por artículo (índice CLAVE_ARTICULO) con las
+            columnas total_compras, unidades_vendidas, importe_ventas,
+            beneficio, coste_ventas, antiguedad_ultima_venta, stock_inicial
+            y precio_coste_stock
+    """
+    claves = pd.MultiIndex.from_frame(
+        pd.concat([df[CLAVE_ARTICULO] for df in (compras_seccion, ventas_seccion, stock_seccion)])
+        .drop_duplicates()
+    ).sort_values()
+    
+    # COMPRAS
+    compras_sumas = None
+    if len(compras_seccion) > 0:
+        compras_sumas = compras_seccion.groupby(CLAVE_ARTICULO, sort=False, dropna=False, observed=True)['Unidades'].sum()
+    
+    # VENTAS
+    ventas_sumas = None
+    ultima_venta = pd.Series(pd.NaT, index=claves)
+    if len(ventas_seccion) > 0:
+        grupos_ventas = ventas_seccion.groupby(CLAVE_ARTICULO, sort=False, dropna=False, observed=True)
+        ventas_sumas = grupos_ventas[['Unidades', 'Importe', 'Beneficio', 'Coste']].sum()
+        ultima_venta = grupos_ventas['Fecha'].max().reindex(claves)
+    
+    # STOCK
+    stock_sumas = None
+    precio_stock = None
+    if len(stock_seccion) > 0:
+        stock_sumas = stock_seccion.groupby(CLAVE_ARTICULO, sort=False, dropna=False, observed=True)['Unidades'].sum()
+        precio_stock = (stock_seccion.drop_duplicates(subset=CLAVE_ARTICULO, keep='first')
+                        .set_index(CLAVE_ARTICULO)['Precio'])
+    
+    antiguedad_ultima_venta = (pd.Timestamp(fecha_fin) - ultima_venta).dt.days
+    antiguedad_ultima_venta = antiguedad_ultima_venta.where(ultima_venta.notna(), dias_periodo)
+    
+    columnas_ventas = {
+        'unidades_vendidas': 'Unidades',
+        'importe_ventas': 'Importe',
+        'beneficio': 'Beneficio',
+        'coste_ventas': 'Coste',
+    }
     
-    articulos_compras = set(compras_seccion.apply(crear_clave, axis=1))
-    articulos_ventas = set(ventas_seccion.apply(crear_clave, axis=1))
-    articulos_stock = set(stock_seccion.apply(crear_clave, axis=1))
+    agregados = pd.concat([
+        _agregar_columna(compras_sumas, claves, 'total_compras', compras_seccion),
+        *[_agregar_columna(ventas_sumas[origen] if ventas_sumas is not None else None,
+                           claves, columna, ventas_seccion)
+          for columna, origen in columnas_ventas.items()],
+        antiguedad_ultima_venta.astype(np.int64).rename('antiguedad_ultima_venta'),
+        _agregar_columna(stock_sumas, claves, 'stock_inicial', stock_seccion),
+        _agregar_columna(precio_stock, claves, 'precio_coste_stock', stock_seccion),
+    ], axis=1)
     
-    articulos_unicos = articulos_compras.union(articulos_ventas).union(articulos_stock)
-    print(f"\nTotal artículos únicos en sección: {len(articulos_unicos)}")
+    return agregados
+
+
+def calcular_antiguedad_fifo(compras_seccion, consumo, fecha_fin, dias_periodo):
+    """
+    Calcula la antigüedad y el origen del stock final por FIFO para varios artículos.
     
-    if len(articulos_unicos) == 0:
-        print(f"  AVISO: No hay artículos únicos en la sección '{nombre_seccion}'. Saltando...")
-        return None
+    Las compras se ordenan una sola vez por artículo y fecha y se acumulan las
+    unidades de cada artículo. El stock final procede de la primera compra en
+    la que el acumulado cubre el consumo del período (o de la última compra si
+    no llega a cubrirlo). Los artículos sin compras conservan el stock inicial.
     
-    # =========================================================================
-    # PROCESAMIENTO DE DATOS POR ARTÍCULO
-    # =========================================================================
+    Args:
+        compras_seccion: DataFrame de compras de la sección
+        consumo: Series de unidades consumidas por artículo (índice CLAVE_ARTICULO)
+        fecha_fin: Fecha de fin del período
+        dias_periodo: Número de días del período
     
-    resultados = []
+    Returns:
+        tuple: (Series de antigüedad en días, Series de origen del stock final),
+            ambas con el índice de consumo
+    """
+    antiguedad = pd.Series(dias_periodo, index=consumo.index, dtype=np.int64)
+    origen = pd.Series('Stock inicial', index=consumo.index, dtype=object)
     
-    for clave in articulos_unicos:
-        codigo, nombre, talla, color = clave
-        
-        # Extraer familia del código
-        codigo_str = str(codigo)
-        if codigo_str.startswith('2'):
-            familia_codigo = codigo_str[:4]  # 4 dígitos para familias de animales
-        else:
-            familia_codigo = codigo_str[:2]  # 2 dígitos para el resto
-        
-        if familia_codigo in ROTACIONES_FAMILIA:
-            nombre_familia, rotacion_familia = ROTACIONES_FAMILIA[familia_codigo]
-        else:
-            nombre_familia = 'OTROS'
-            rotacion_familia = 90
-        
-        # Datos de COMPRAS
-        mask_compra = (compras_seccion['codigo_str'] == codigo) & \
-                      (compras_seccion['nombre_str'] == nombre) & \
-                      (compras_seccion['talla_str'] == talla) & \
-                      (compras_seccion['color_str'] == color)
-        compras_articulo = compras_seccion[mask_compra]
-        total_compras = compras_articulo['Unidades'].sum() if len(compras_articulo) > 0 else 0
-        
-        # Datos de VENTAS
-        mask_venta = (ventas_seccion['codigo_str'] == codigo) & \
-                     (ventas_seccion['nombre_str'] == nombre) & \
-                     (ventas_seccion['talla_str'] == talla) & \
-                     (ventas_seccion['color_str'] == color)
-        ventas_articulo = ventas_seccion[mask_venta]
-        unidades_vendidas = ventas_articulo['Unidades'].sum() if len(ventas_articulo) > 0 else 0
-        importe_ventas = ventas_articulo['Importe'].sum() if len(ventas_articulo) > 0 else 0
-        beneficio = ventas_articulo['Beneficio'].sum() if len(ventas_articulo) > 0 else 0
-        coste_ventas = ventas_articulo['Coste'].sum() if len(ventas_articulo) > 0 else 0
-        
-        # Fecha última venta
-        if len(ventas_articulo) > 0:
-            ultima_venta = ventas_articulo['Fecha'].max()
-            antiguedad_ultima_venta = (FECHA_FIN - ultima_venta).days
-        else:
-            antiguedad_ultima_venta = DIAS_PERIODO
-        
-        # Datos de STOCK
-        mask_stock = (stock_seccion['codigo_str'] == codigo) & \
-                     (stock_seccion['nombre_str'] == nombre) & \
-                     (stock_seccion['talla_str'] == talla) & \
-                     (stock_seccion['color_str'] == color)
-        stock_articulo = stock_seccion[mask_stock]
-        stock_inicial = stock_articulo['Unidades'].sum() if len(stock_articulo) > 0 else 0
-        precio_coste_stock = stock_articulo['Precio'].iloc[0] if len(stock_articulo) > 0 else 0
-        
-        # Métricas
-        stock_disponible_total = stock_inicial + total_compras
-        stock_final = stock_inicial + total_compras - unidades_vendidas
-        
-        # Tasa de Venta
-        if stock_disponible_total > 0:
-            tasa_venta = (unidades_vendidas / stock_disponible_total) * 100
-        else:
-            tasa_venta = 0
-        
-        # Antigüedad Stock
-        if stock_final > 0:
-            if stock_inicial - unidades_vendidas > 0:
-                antiguedad_stock = DIAS_PERIODO
-                origen_stock = 'Stock inicial'
-            else:
-                ventas_acumuladas = 0
-                compras_ordenadas = compras_articulo.sort_values('Fecha')
-                for idx, compra in compras_ordenadas.iterrows():
-                    ventas_acumuladas += compra['Unidades']
-                    if ventas_acumuladas >= (stock_inicial + total_compras - stock_final):
-                        antiguedad_stock = (FECHA_FIN - compra['Fecha']).days
-                        origen_stock = f'Compra {compra["Fecha"].strftime("%d/%m/%Y")}'
-                        break
-                else:
-                    if len(compras_ordenadas) > 0:
-                        ultima_compra = compras_ordenadas.iloc[-1]
-                        antiguedad_stock = (FECHA_FIN - ultima_compra['Fecha']).days
-                        origen_stock = f'Compra {ultima_compra["Fecha"].strftime("%d/%m/%Y")}'
-                    else:
-                        antiguedad_stock = DIAS_PERIODO
-                        origen_stock = 'Stock inicial'
-        else:
-            antiguedad_stock = 0
-            origen_stock = 'Sin stock'
-        
-        # % Rotación Consumida
-        if stock_final > 0 and rotacion_familia > 0:
-            pct_rotacion_consumida = (antiguedad_stock / rotacion_familia) * 100
-        else:
-            pct_rotacion_consumida = 0
-        
-        # Descuento Sugerido
-        if pct_rotacion_consumida <= 65:
-            descuento_sugerido = 0
-        elif pct_rotacion_consumida <= 100:
-            descuento_sugerido = 10
-        elif pct_rotacion_consumida <= 150:
-            descuento_sugerido = 20
-        else:
-            descuento_sugerido = 30
-        
-        # Riesgo de Merma/Inmovilizado
-        es_categoria_d = (unidades_vendidas == 0)
-        
-        if es_categoria_d:
-            if stock_final == 0:
-                riesgo = 'Cero'
-            else:
-                riesgo = 'Crítico'
-        else:
-            if stock_final == 0:
-                riesgo = 'Cero'
-            elif pct_rotacion_consumida <= 65:
-                riesgo = 'Bajo'
-            elif pct_rotacion_consumida <= 100:
-                riesgo = 'Medio'
-            elif pct_rotacion_consumida <= 150:
-                riesgo = 'Alto'
-            else:
-                riesgo = 'Crítico'
-        
-        # Rotación Excedida
-        if antiguedad_ultima_venta > rotacion_familia and stock_final > 0:
-            rotacion_excedida = stock_final
-        else:
-            rotacion_excedida = 0
-        
-        # Clasificación por Stock Final
-        demanda_mensual_promedio = unidades_vendidas / 2
-        if stock_final == 0:
-            nivel_stock = 'Cero'
-        elif stock_final <= demanda_mensual_promedio * 0.5:
-            nivel_stock = 'Bajo'
-        elif stock_final <= demanda_mensual_promedio:
-            nivel_stock = 'Normal'
-        else:
-            nivel_stock = 'Elevado'
-        
-        # Ventas media diaria
-        ventas_media_diaria = unidades_vendidas / DIAS_PERIODO if DIAS_PERIODO > 0 else 0
-        
-        # Stock Mínimo
-        if rotacion_familia == 7:
-            stock_minimo = ventas_media_diaria * 3.5
-        elif rotacion_familia == 15:
-            stock_minimo = ventas_media_diaria * 7.5
-        elif rotacion_familia == 30:
-            stock_minimo = ventas_media_diaria * 15
-        elif rotacion_familia == 60:
-            stock_minimo = ventas_media_diaria * 30
-        elif rotacion_familia == 90:
-            stock_minimo = ventas_media_diaria * 45
-        else:
-            stock_minimo = ventas_media_diaria * 45
-        
-        # Stock Máximo
-        if rotacion_familia == 7:
-            stock_maximo = ventas_media_diaria * 10.5
-        elif rotacion_familia == 15:
-            stock_maximo = ventas_media_diaria * 22.5
-        elif rotacion_familia == 30:
-            stock_maximo = ventas_media_diaria * 45
-        elif rotacion_familia == 60:
-            stock_maximo = ventas_media_diaria * 90
-        elif rotacion_familia == 90:
-            stock_maximo = ventas_media_diaria * 135
-        else:
-            stock_maximo = ventas_media_diaria * 135
-        
-        # Días de cobertura
-        if ventas_media_diaria > 0:
-            dias_cobertura = stock_final / ventas_media_diaria
-        else:
-            dias_cobertura = 0
-        
-        resultados.append({
-            'Artículo': codigo,
-            'Nombre artículo': nombre,
-            'Talla': talla if talla else '',
-            'Color': color if color else '',
-            'Familia': familia_codigo,
-            'Nombre Familia': nombre_familia,
-            'Rotación Familia (días)': rotacion_familia,
-            'Stock Inicial (unidades)': stock_inicial,
-            'Compras Período (unidades)': total_compras,
-            'Ventas (unidades)': unidades_vendidas,
-            'Importe ventas (€)': round(importe_ventas, 2),
-            'Beneficio (importe €)': round(beneficio, 2),
-            'Coste Ventas Real (€)': round(coste_ventas, 2),
-            'Stock Disponible Total': stock_disponible_total,
-            'Tasa de venta (%)': round(tasa_venta, 2),
-            'Rotación excedida (unidades)': rotacion_excedida,
-            'Stock mínimo (unidades)': round(stock_minimo, 1),
-            'Stock máximo (unidades)': round(stock_maximo, 1),
-            'Stock Final (unidades)': stock_final,
-            'Antigüedad Última Venta (días)': antiguedad_ultima_venta,
-            'Antigüedad Stock (días)': antiguedad_stock,
-            '% Rotación Consumido': round(pct_rotacion_consumida, 2),
-            'Descuento Sugerido (%)': descuento_sugerido,
-            'Riesgo de Merma/ inmovilizado': riesgo,
-            'Nivel Stock Final': nivel_stock,
-            'Días de cobertura': round(dias_cobertura, 1),
-            'Origen Stock Final': origen_stock,
-            'Precio Coste Unitario (€)': precio_coste_stock,
-        })
-    
-    df_resultados = pd.DataFrame(resultados)
-    print(f"\nTotal artículos procesados: {len(df_resultados)}")
+    if len(consumo) == 0 or len(compras_seccion) == 0:
+        return antiguedad, origen
     
-    # =========================================================================
-    # CLASIFICACIÓN ABC+D
-    # =========================================================================
+    compras = compras_seccion[CLAVE_ARTICULO + ['Fecha', 'Unidades']].set_index(CLAVE_ARTICULO)
+    compras = compras[compras.index.isin(consumo.index)]
+    if len(compras) == 0:
+        return antiguedad, origen
     
-    df_con_ventas = df_resultados[df_resultados['Coste Ventas Real (€)'] > 0].copy()
-    df_sin_ventas = df_resultados[df_resultados['Coste Ventas Real (€)'] == 0].copy()
+    compras['consumo'] = consumo.reindex(compras.index).to_numpy()
+    compras = compras.reset_index().sort_values(CLAVE_ARTICULO + ['Fecha'], kind='stable')
     
-    print(f"Artículos con ventas: {len(df_con_ventas)}")
-    print(f"Artículos sin ventas: {len(df_sin_ventas)}")
+    # Unidades compradas acumuladas por artículo en orden de fecha
+    acumulado = compras.groupby(CLAVE_ARTICULO, sort=False, dropna=False, observed=True)['Unidades'].cumsum()
+    ultima_compra = ~compras.duplicated(subset=CLAVE_ARTICULO, keep='last')
     
-    if len(df_con_ventas) > 0:
-        df_con_ventas = df_con_ventas.sort_values('Coste Ventas Real (€)', ascending=False)
-        
-        total_coste = df_con_ventas['Coste Ventas Real (€)'].sum()
-        df_con_ventas['% Individual'] = (df_con_ventas['Coste Ventas Real (€)'] / total_coste) * 100
-        df_con_ventas['% Acumulado'] = df_con_ventas['% Individual'].cumsum()
-        
-        def asignar_categoria(pct_acumulado):
-            if pct_acumulado <= 80:
-                return 'A'
-            elif pct_acumulado <= 95:
-                return 'B'
-            else:
-                return 'C'
-        
-        df_con_ventas['Categoria ABC'] = df_con_ventas['% Acumulado'].apply(asignar_categoria)
-        
-        print(f"\n  Categoría A: {len(df_con_ventas[df_con_ventas['Categoria ABC'] == 'A'])} artículos")
-        print(f"  Categoría B: {len(df_con_ventas[df_con_ventas['Categoria ABC'] == 'B'])} artículos")
-        print(f"  Categoría C: {len(df_con_ventas[df_con_ventas['Categoria ABC'] == 'C'])} artículos")
+    # Primera compra que cubre el consumo o, si ninguna lo cubre, la última
+    candidatas = compras[(acumulado >= compras['consumo']) | ultima_compra]
+    fecha_compra = (candidatas.drop_duplicates(subset=CLAVE_ARTICULO, keep='first')
+                    .set_index(CLAVE_ARTICULO)['Fecha'])
     
-    df_sin_ventas['Categoria ABC'] = 'D'
+    antiguedad.loc[fecha_compra.index] = (pd.Timestamp(fecha_fin) - fecha_compra).dt.days
+    origen.loc[fecha_compra.index] = 'Compra ' + fecha_compra.dt.strftime('%d/%m/%Y')
     
-    df_clasificado = pd.concat([df_con_ventas, df_sin_ventas], ignore_index=True)
+    return antiguedad, origen
+
+
+def _entero_si_sin_valores(serie, con_valor):
+    """
+    Devuelve la columna como entera si ninguna fila tiene valor calculado.
     
-    print(f"\n  Categoría D: {len(df_clasificado[df_clasificado['Categoria ABC'] == 'D'])} artículos")
+    Las métricas que valen 0 cuando no aplican eran enteras si no se
+    calculaban para ningún artículo; se conserva ese tipo.
     
-    # =========================================================================
-    # ASIGNACIÓN DE ESCENARIOS
-    # =========================================================================
+    Args:
+        serie: Columna calculada
+        con_valor: Máscara de filas con valor calculado
     
-    def asignar_escenario(row):
-        stock_final = row['Stock Final (unidades)']
-        pct_rotacion = row['% Rotación Consumido']
-        antiguedad_venta = row['Antigüedad Última Venta (días)']
-        rotacion = row['Rotación Familia (días)']
-        categoria = row['Categoria ABC']
-        riesgo = row['Riesgo de Merma/ inmovilizado']
-        nivel_stock = row['Nivel Stock Final']
-        
-        if stock_final == 0:
-            if rotacion > 0:
-                pct_rotacion_venta = (antiguedad_venta / rotacion) * 100
-            else:
-                pct_rotacion_venta = 0
-            
-            if categoria in ['A', 'B']:
-                if pct_rotacion_venta <= 24: return '13A'
-                elif pct_rotacion_venta <= 50: return '13B'
-                elif pct_rotacion_venta <= 100: return '13C'
-                else: return '13D'
-            else:
-                if pct_rotacion_venta <= 24: return '26A'
-                elif pct_rotacion_venta <= 50: return '26B'
-                elif pct_rotacion_venta <= 100: return '26C'
-                else: return '26D'
-        else:
-            if nivel_stock == 'Elevado':
-                if riesgo == 'Crítico': return '1' if categoria in ['A', 'B'] else '14'
-                elif riesgo == 'Alto': return '2' if categoria in ['A', 'B'] else '15'
-                elif riesgo == 'Medio': return '3' if categoria in ['A', 'B'] else '16'
-                else: return '4' if categoria in ['A', 'B'] else '17'
-            elif nivel_stock == 'Normal':
-                if riesgo == 'Crítico': return '5' if categoria in ['A', 'B'] else '18'
-                elif riesgo == 'Alto': return '6' if categoria in ['A', 'B'] else '19'
-                elif riesgo == 'Medio': return '7' if categoria in ['A', 'B'] else '20'
-                else: return '8' if categoria in ['A', 'B'] else '21'
-            else:
-                if riesgo == 'Crítico': return '9' if categoria in ['A', 'B'] else '22'
-                elif riesgo == 'Alto': return '10' if categoria in ['A', 'B'] else '23'
-                elif riesgo == 'Medio': return '11' if categoria in ['A', 'B'] else '24'
-                else: return '12' if categoria in ['A', 'B'] else '25'
+    Returns:
+        pd.Series: Columna con el tipo correspondiente
+    """
+    if not con_valor.any():
+        return serie.astype(np.int64)
+    return serie
+
+
+def calcular_metricas_articulos(agregados, compras_seccion, fecha_fin, dias_periodo):
+    """
+    Calcula las métricas de inventario de cada artículo a partir de sus agregados.
     
-    df_clasificado['Escenario'] = df_clasificado.apply(asignar_escenario, axis=1)
+    Args:
+        agregados: DataFrame devuelto por agregar_por_articulo
+        compras_seccion: DataFrame de compras de la sección (para la antigüedad del stock)
+        fecha_fin: Fecha de fin del período
+        dias_periodo: Número de días del período
     
-    # =========================================================================
-    # ACCIONES SUGERIDAS
-    # =========================================================================
+    Returns:
+        pd.DataFrame: Una fila por artículo con las columnas del informe ABC+D
+    """
+    codigo = pd.Series(agregados.index.get_level_values('codigo_str'), index=agregados.index)
+    
+    # Familia: 4 dígitos para animales (empiezan por 2), 2 dígitos para el resto
+    familia = codigo.str[:2].where(~codigo.str.startswith('2'), codigo.str[:4])
+    nombre_familia = familia.map({k: v[0] for k, v in ROTACIONES_FAMILIA.items()}).fillna('OTROS')
+    rotacion_familia = familia.map({k: v[1] for k, v in ROTACIONES_FAMILIA.items()}).fillna(90).astype(np.int64)
+    
+    stock_inicial = agregados['stock_inicial']
+    total_compras = agregados['total_compras']
+    unidades_vendidas = agregados['unidades_vendidas']
+    antiguedad_ultima_venta = agregados['antiguedad_ultima_venta']
+    
+    # Métricas
+    stock_disponible_total = stock_inicial + total_compras
+    stock_final = stock_inicial + total_compras - unidades_vendidas
+    
+    # Tasa de Venta
+    con_disponible = stock_disponible_total > 0
+    tasa_venta = ((unidades_vendidas / stock_disponible_total.where(con_disponible)) * 100).where(con_disponible, 0)
+    tasa_venta = _entero_si_sin_valores(tasa_venta, con_disponible)
+    
+    # Antigüedad Stock
+    con_stock = stock_final > 0
+    desde_stock_inicial = con_stock & (stock_inicial - unidades_vendidas > 0)
+    desde_compras = con_stock & ~desde_stock_inicial
+    
+    antiguedad_stock = pd.Series(0, index=agregados.index, dtype=np.int64)
+    origen_stock = pd.Series('Sin stock', index=agregados.index, dtype=object)
+    antiguedad_stock[desde_stock_inicial] = dias_periodo
+    origen_stock[desde_stock_inicial] = 'Stock inicial'
+    
+    if desde_compras.any():
+        consumo = (stock_inicial + total_compras - stock_final)[desde_compras]
+        antiguedad_compras, origen_compras = calcular_antiguedad_fifo(
+            compras_seccion, consumo, fecha_fin, dias_periodo)
+        antiguedad_stock.loc[desde_compras] = antiguedad_compras
+        origen_stock.loc[desde_compras] = origen_compras
+    
+    # % Rotación Consumida
+    con_rotacion = con_stock & (rotacion_familia > 0)
+    pct_rotacion_consumida = ((antiguedad_stock / rotacion_familia.where(con_rotacion)) * 100).where(con_rotacion, 0)
+    pct_rotacion_consumida = _entero_si_sin_valores(pct_rotacion_consumida, con_rotacion)
+    
+    # Descuento Sugerido
+    descuento_sugerido = np.select(
+        [pct_rotacion_consumida <= 65, pct_rotacion_consumida <= 100, pct_rotacion_consumida <= 150],
+        [0, 10, 20], default=30)
+    
+    # Riesgo de Merma/Inmovilizado (sin ventas: categoría D)
+    es_categoria_d = unidades_vendidas == 0
+    riesgo = np.select(
+        [stock_final == 0, es_categoria_d,
+         pct_rotacion_consumida <= 65, pct_rotacion_consumida <= 100, pct_rotacion_consumida <= 150],
+        ['Cero', 'Crítico', 'Bajo', 'Medio', 'Alto'], default='Crítico')
+    
+    # Rotación Excedida
+    excedida = (antiguedad_ultima_venta > rotacion_familia) & con_stock
+    rotacion_excedida = _entero_si_sin_valores(stock_final.where(excedida, 0), excedida)
+    
+    # Clasificación por Stock Final
+    demanda_mensual_promedio = unidades_vendidas / 2
+    nivel_stock = np.select(
+        [stock_final == 0, stock_final <= demanda_mensual_promedio * 0.5, stock_final <= demanda_mensual_promedio],
+        ['Cero', 'Bajo', 'Normal'], default='Elevado')
+    
+    # Ventas media diaria
+    ventas_media_diaria = unidades_vendidas / dias_periodo if dias_periodo > 0 else unidades_vendidas * 0
+    
+    # Stock Mínimo y Máximo
+    stock_minimo = ventas_media_diaria * rotacion_familia.map(FACTOR_STOCK_MINIMO).fillna(45)
+    stock_maximo = ventas_media_diaria * rotacion_familia.map(FACTOR_STOCK_MAXIMO).fillna(135)
+    
+    # Días de cobertura
+    con_venta_diaria = ventas_media_diaria > 0
+    dias_cobertura = (stock_final / ventas_media_diaria.where(con_venta_diaria)).where(con_venta_diaria, 0)
+    dias_cobertura = _entero_si_sin_valores(dias_cobertura, con_venta_diaria)
+    
+    return pd.DataFrame({
+        'Artículo': codigo.tolist(),
+        'Nombre artículo': agregados.index.get_level_values('nombre_str').tolist(),
+        'Talla': agregados.index.get_level_values('talla_str').tolist(),
+        'Color': agregados.index.get_level_values('color_str').tolist(),
+        'Familia': familia.tolist(),
+        'Nombre Familia': nombre_familia.tolist(),
+        'Rotación Familia (días)': rotacion_familia.to_numpy(),
+        'Stock Inicial (unidades)': stock_inicial.to_numpy(),
+        'Compras Período (unidades)': total_compras.to_numpy(),
+        'Ventas (unidades)': unidades_vendidas.to_numpy(),
+        'Importe ventas (€)': agregados['importe_ventas'].round(2).to_numpy(),
+        'Beneficio (importe €)': agregados['beneficio'].round(2).to_numpy(),
+        'Coste Ventas Real (€)': agregados['coste_ventas'].round(2).to_numpy(),
+        'Stock Disponible Total': stock_disponible_total.to_numpy(),
+        'Tasa de venta (%)': tasa_venta.round(2).to_numpy(),
+        'Rotación excedida (unidades)': rotacion_excedida.to_numpy(),
+        'Stock mínimo (unidades)': stock_minimo.round(1).to_numpy(),
+        'Stock máximo (unidades)': stock_maximo.round(1).to_numpy(),
+        'Stock Final (unidades)': stock_final.to_numpy(),
+        'Antigüedad Última Venta (días)': antiguedad_ultima_venta.to_numpy(),
+        'Antigüedad Stock (días)': antiguedad_stock.to_numpy(),
+        # round() de Python sobre el valor de cada artículo (como el cálculo original)
+        '% Rotación Consumido': [round(valor, 2) for valor in pct_rotacion_consumida.tolist()],
+        'Descuento Sugerido (%)': descuento_sugerido,
+        'Riesgo de Merma/ inmovilizado': riesgo.tolist(),
+        'Nivel Stock Final': nivel_stock.tolist(),
+        'Días de cobertura': dias_cobertura.round(1).to_numpy(),
+        'Origen Stock Final': origen_stock.tolist(),
+        'Precio Coste Unitario (€)': agregados['precio_coste_stock'].to_numpy(),
+    })
+
+# ============================================================================
+# ESCENARIOS Y ACCIONES SUGERIDAS
+# ============================================================================
+
+# Textos de acción por escenario. Marcadores:
+#   [descuento]      -> Descuento Sugerido (%)
+#   [unidades]       -> stock objetivo de 14 días (mitad del stock mínimo)
+#   [X días]         -> Días de cobertura
+#   [importe]        -> capital liberado al liquidar el stock final
+#   [stock actual]   -> Stock Final (unidades)
+#   [stock objetivo] -> stock final multiplicado por FACTOR_STOCK_OBJETIVO
+TEXTOS_ESCENARIOS = {
+    '1': "DESCUENTO MÁXIMO + REDUCCIÓN COMPRAS: Aplicar descuento [descuento]% inmediato. Reducir compras 50% próxima temporada. Stock objetivo: [unidades] unidades. Prioridad alta.",
+    '2': "DESCUENTO MODERADO + REDUCCIÓN COMPRAS: Aplicar descuento [descuento]% para dinamizar ventas. Reducir compras 35% próxima temporada. Stock objetivo: [unidades] unidades. Monitorear.",
+    '3': "DESCUENTO PREVENTIVO + AJUSTE COMPRAS: Aplicar descuento [descuento]% para anticipar venta. Reducir compras 20% próxima temporada. Mantener bajo observación semanal.",
+    '4': "MANTENER + GESTIÓN ACTIVA: Stock fresco de calidad. Reducir compras 15% próxima temporada. Stock actual suficiente para [X días] días.",
+    '5': "DESCUENTO CORRECTIVO + MONITOREO: Aplicar descuento [descuento]% a stock actual para renovar inventario. Mantener nivel de compras actual.",
+    '6': "DESCUENTO LEVE + OPTIMIZACIÓN: Aplicar descuento [descuento]% para renovar inventario. Reducir compras 15% próxima temporada.",
+    '7': "OPTIMIZAR PREVENTIVO: Aplicar descuento [descuento]% preventivo. Mantener nivel de compras actual. Stock bien gestionado.",
+    '8': "MANTENER ESTRATEGIA ACTUAL: Gestión excelente. Stock óptimo y fresco. Mantener nivel de compras actual. Producto clave del catálogo.",
+    '9': "INVESTIGAR + REDISEÑAR: Analizar causa de baja rotación. Mantener stock mínimo. Implementar acciones de venta. Reducir compras 25%.",
+    '10': "PROMOCIÓN ACTIVA + AJUSTE: Implementar promoción del 15% para estimula demanda. Aumentar visibilidad en punto de venta.",
+    '11': "REPOSICIÓN SELECTIVA: Aumentar compras 15% para evitar ruptura de stock. Aplicar descuento 5% para consolidar demanda.",
+    '12': "AUMENTAR STOCK: Producto de alto interés. Incrementar compras 20% próxima temporada. Stock actual: [stock actual] unidades. Stock objetivo: [stock objetivo] unidades. Maximizar disponibilidad.",
+    '13A': "URGENTE - REPOSICIÓN INMEDIATA: Producto de alta demanda agotado. Recompra prioritaria inmediata. Aumentar compras 40%. Stock objetivo: [stock objetivo] unidades. Evitar futura ruptura.",
+    '13B': "REPOSICIÓN PRIORITARIA: Producto agotado con demanda reciente. Aumentar compras 25%. Stock objetivo: [stock objetivo] unidades. Programar reposición para próxima semana.",
+    '13C': "REPOSICIÓN PROGRAMADA: Stock agotado con rotación moderada. Mantener nivel de compras anterior. Stock objetivo: [unidades] unidades.",
+    '13D': "EVALUAR CONTINUIDAD: Producto agotado con demanda decreciente. Reducir compras 30% próxima temporada. Evaluar continuidad en catálogo.",
+    '14': "LIQUIDACIÓN URGENTE: Aplicar descuento [descuento]% inmediato. Eliminar del catálogo próxima temporada. Capital liberado: [importe]€. Prioridad máxima.",
+    '15': "REDUCCIÓN AGRESIVA: Aplicar descuento [descuento]% inmediato. Reducir compras 70% próxima temporada. Stock objetivo: [unidades] unidades. Riesgo alto de merma.",
+    '16': "DESCUENTO PREVENTIVO: Aplicar descuento [descuento]% para acelerar rotación. Reducir compras 40% próxima temporada. Monitorear evolución semanal.",
+    '17': "MANTENER SIN DESCUENTO: Stock fresco de calidad. Reducir compras 25% próxima temporada. Stock actual suficiente para [X días] días.",
+    '18': "LIQUIDACIÓN PARCIAL: Aplicar descuento [descuento]% a stock actual. Reducir compras 50% próxima temporada. Producto de baja rotación confirmada.",
+    '19': "DESCUENTO MODERADO: Aplicar descuento [descuento]% para renovar inventario. Reducir compras 30% próxima temporada. Stock actual en rango aceptable pero envejecido.",
+    '20': "OPTIMIZAR: Aplicar descuento [descuento]% preventivo. Mantener nivel de compras actual. Stock bien gestionado. Continuar monitoreo.",
+    '21': "MANTENER ESTRATEGIA ACTUAL: Gestión excelente. Stock óptimo y fresco. Mantener nivel de compras. Producto bien equilibrado.",
+    '22': "ELIMINAR DEL CATÁLOGO: Aplicar descuento [descuento]% para liquidar stock residual. NO recomprar. Bajo interés confirmado del cliente.",
+    '23': "LIQUIDAR Y DESCATALOGAR: Aplicar descuento [descuento]% para agotar stock. NO recomprar próxima temporada. Producto sin demanda suficiente.",
+    '24': "COMPRAS CONSERVADORAS: Aplicar descuento [descuento]% al stock actual. Reducir compras 50% próxima temporada. Demanda limitada confirmada.",
+    '25': "AUMENTAR STOCK: Producto de alto interés. Incrementar compras 30% próxima temporada. Stock actual: [stock actual] unidades. Stock objetivo: [stock objetivo] unidades. Alta rotación confirmada.",
+    '26A': "URGENTE - RUPTURA DE STOCK: Producto de alta demanda agotado. Recompra inmediata prioritaria. Aumentar compras 50%. Stock objetivo: [stock objetivo] unidades. Pérdida de ventas estimada.",
+    '26B': "RECOMPRA PRIORITARIA: Producto agotado con demanda reciente. Aumentar compras 30%. Stock objetivo: [stock objetivo] unidades. Monitorear demanda próximas semanas.",
+    '26C': "RECOMPRA MODERADA: Stock agotado con rotación moderada. Mantener nivel de compras anterior. Stock objetivo: [unidades] unidades. Demanda estable.",
+    '26D': "RECOMPRA CONSERVADORA: Producto agotado de baja rotación. Reducir compras 40% próxima temporada. Stock objetivo mínimo: [unidades] unidades.",
+}
+
+# Multiplicador del stock final para el stock objetivo de los escenarios de aumento/reposición
+FACTOR_STOCK_OBJETIVO = {'12': 1.5, '13A': 2, '13B': 1.5, '25': 1.5, '26A': 2, '26B': 1.5}
+
+# Columnas de df_clasificado que necesita cada marcador
+COLUMNAS_MARCADORES = {
+    '[descuento]': ['Descuento Sugerido (%)'],
+    '[unidades]': ['Stock mínimo (unidades)'],
+    '[X días]': ['Días de cobertura'],
+    '[importe]': ['Stock Final (unidades)', 'Precio Coste Unitario (€)'],
+    '[stock actual]': ['Stock Final (unidades)'],
+    '[stock objetivo]': ['Stock Final (unidades)'],
+}
+
+
+def asignar_escenarios(df_clasificado):
+    """
+    Asigna el código de escenario de cada artículo.
     
-    TEXTOS_ESCENARIOS = {
-        '1': "DESCUENTO MÁXIMO + REDUCCIÓN COMPRAS: Aplicar descuento [descuento]% inmediato. Reducir compras 50% próxima temporada. Stock objetivo: [unidades] unidades. Prioridad alta.",
-        '2': "DESCUENTO MODERADO + REDUCCIÓN COMPRAS: Aplicar descuento [descuento]% para dinamizar ventas. Reducir compras 35% próxima temporada. Stock objetivo: [unidades] unidades. Monitorear.",
-        '3': "DESCUENTO PREVENTIVO + AJUSTE COMPRAS: Aplicar descuento [descuento]% para anticipar venta. Reducir compras 20% próxima temporada. Mantener bajo observación semanal.",
-        '4': "MANTENER + GESTIÓN ACTIVA: Stock fresco de calidad. Reducir compras 15% próxima temporada. Stock actual suficiente para [X días] días.",
-        '5': "DESCUENTO CORRECTIVO + MONITOREO: Aplicar descuento [descuento]% a stock actual para renovar inventario. Mantener nivel de compras actual.",
-        '6': "DESCUENTO LEVE + OPTIMIZACIÓN: Aplicar descuento [descuento]% para renovar inventario. Reducir compras 15% próxima temporada.",
-        '7': "OPTIMIZAR PREVENTIVO: Aplicar descuento [descuento]% preventivo. Mantener nivel de compras actual. Stock bien gestionado.",
-        '8': "MANTENER ESTRATEGIA ACTUAL: Gestión excelente. Stock óptimo y fresco. Mantener nivel de compras actual. Producto clave del catálogo.",
-        '9': "INVESTIGAR + REDISEÑAR: Analizar causa de baja rotación. Mantener stock mínimo. Implementar acciones de venta. Reducir compras 25%.",
-        '10': "PROMOCIÓN ACTIVA + AJUSTE: Implementar promoción del 15% para estimula demanda. Aumentar visibilidad en punto de venta.",
-        '11': "REPOSICIÓN SELECTIVA: Aumentar compras 15% para evitar ruptura de stock. Aplicar descuento 5% para consolidar demanda.",
-        '12': "AUMENTAR STOCK: Producto de alto interés. Incrementar compras 20% próxima temporada. Stock actual: [unidades] unidades. Maximizar disponibilidad.",
-        '13A': "URGENTE - REPOSICIÓN INMEDIATA: Producto de alta demanda agotado. Recompra prioritaria inmediata. Aumentar compras 40%. Stock objetivo: [unidades] unidades.",
-        '13B': "REPOSICIÓN PRIORITARIA: Producto agotado con demanda reciente. Aumentar compras 25%. Stock objetivo: [unidades] unidades.",
-        '13C': "REPOSICIÓN PROGRAMADA: Stock agotado con rotación moderada. Mantener nivel de compras anterior. Stock objetivo: [unidades] unidades.",
-        '13D': "EVALUAR CONTINUIDAD: Producto agotado con demanda decreciente. Reducir compras 30% próxima temporada. Evaluar continuidad en catálogo.",
-        '14': "LIQUIDACIÓN URGENTE: Aplicar descuento [descuento]% inmediato. Eliminar del catálogo próxima temporada. Capital liberado: [importe]€. Prioridad máxima.",
-        '15': "REDUCCIÓN AGRESIVA: Aplicar descuento [descuento]% inmediato. Reducir compras 70% próxima temporada. Stock objetivo: [unidades] unidades. Riesgo alto de merma.",
-        '16': "DESCUENTO PREVENTIVO: Aplicar descuento [descuento]% para acelerar rotación. Reducir compras 40% próxima temporada. Monitorear evolución semanal.",
-        '17': "MANTENER SIN DESCUENTO: Stock fresco de calidad. Reducir compras 25% próxima temporada. Stock actual suficiente para [X días] días.",
-        '18': "LIQUIDACIÓN PARCIAL: Aplicar descuento [descuento]% a stock actual. Reducir compras 50% próxima temporada. Producto de baja rotación confirmada.",
-        '19': "DESCUENTO MODERADO: Aplicar descuento [descuento]% para renovar inventario. Reducir compras 30% próxima temporada. Stock actual en rango aceptable pero envejecido.",
-        '20': "OPTIMIZAR: Aplicar descuento [descuento]% preventivo. Mantener nivel de compras actual. Stock bien gestionado. Continuar monitoreo.",
-        '21': "MANTENER ESTRATEGIA ACTUAL: Gestión excelente. Stock óptimo y fresco. Mantener nivel de compras. Producto bien equilibrado.",
-        '22': "ELIMINAR DEL CATÁLOGO: Aplicar descuento [descuento]% para liquidar stock residual. NO recomprar. Bajo interés confirmado del cliente.",
-        '23': "LIQUIDAR Y DESCATALOGAR: Aplicar descuento [descuento]% para agotar stock. NO recomprar próxima temporada. Producto sin demanda suficiente.",
-        '24': "COMPRAS CONSERVADORAS: Aplicar descuento [descuento]% al stock actual. Reducir compras 50% próxima temporada. Demanda limitada confirmada.",
-        '25': "AUMENTAR STOCK: Producto de alto interés. Incrementar compras 30% próxima temporada. Stock actual: [unidades] unidades. Alta rotación confirmada.",
-        '26A': "URGENTE - RUPTURA DE STOCK: Producto de alta demanda agotado. Recompra inmediata prioritaria. Aumentar compras 50%. Stock objetivo: [unidades] unidades.",
-        '26B': "RECOMPRA PRIORITARIA: Producto agotado con demanda reciente. Aumentar compras 30%. Stock objetivo: [unidades] unidades. Monitorear demanda.",
-        '26C': "RECOMPRA MODERADA: Stock agotado con rotación moderada. Mantener nivel de compras anterior. Stock objetivo: [unidades] unidades. Demanda estable.",
-        '26D': "RECOMPRA CONSERVADORA: Producto agotado de baja rotación. Reducir compras 40% próxima temporada. Stock objetivo mínimo: [unidades] unidades.",
-    }
+    Artículos agotados: 13A-13D (categorías A/B) o 26A-26D (C/D) según el
+    porcentaje de la rotación de la familia transcurrido desde la última venta.
+    Artículos con stock: 1-12 (A/B) o 14-25 (C/D) según el nivel de stock
+    final (Elevado/Normal/resto) y el riesgo (Crítico/Alto/Medio/resto).
     
-    def generar_accion_sugerida(row):
-        escenario = row['Escenario']
-        if escenario not in TEXTOS_ESCENARIOS:
-            return "Sin acción asignada"
-        
-        texto = TEXTOS_ESCENARIOS[escenario]
-        descuento = row['Descuento Sugerido (%)']
-        stock_final = row['Stock Final (unidades)']
-        stock_minimo = row['Stock mínimo (unidades)']
-        dias_cobertura = row['Días de cobertura']
-        
-        stock_objetivo_14_dias = max(1, round(stock_minimo * 0.5, 0))
-        stock_objetivo_aumentar = max(1, round(stock_final * 1.5, 0))
-        stock_objetivo_doble = max(1, round(stock_final * 2, 0))
-        capital_liberado = round(stock_final * row['Precio Coste Unitario (€)'] * 0.7, 2)
-        
+    Args:
+        df_clasificado: DataFrame de artículos con la columna 'Categoria ABC'
+    
+    Returns:
+        pd.Series: Código de escenario de cada artículo
+    """
+    stock_final = df_clasificado['Stock Final (unidades)']
+    antiguedad_venta = df_clasificado['Antigüedad Última Venta (días)']
+    rotacion = df_clasificado['Rotación Familia (días)']
+    riesgo = df_clasificado['Riesgo de Merma/ inmovilizado']
+    nivel_stock = df_clasificado['Nivel Stock Final']
+    es_categoria_ab = df_clasificado['Categoria ABC'].isin(['A', 'B']).to_numpy()
+    
+    # Artículos agotados
+    con_rotacion = rotacion > 0
+    pct_rotacion_venta = ((antiguedad_venta / rotacion.where(con_rotacion)) * 100).where(con_rotacion, 0)
+    tramo_venta = np.select(
+        [pct_rotacion_venta <= 24, pct_rotacion_venta <= 50, pct_rotacion_venta <= 100],
+        ['A', 'B', 'C'], default='D')
+    escenario_agotado = np.char.add(np.where(es_categoria_ab, '13', '26'), tramo_venta)
+    
+    # Artículos con stock: 4 escenarios de riesgo por cada nivel de stock
+    fila_nivel = np.select([nivel_stock == 'Elevado', nivel_stock == 'Normal'], [0, 1], default=2)
+    columna_riesgo = np.select([riesgo == 'Crítico', riesgo == 'Alto', riesgo == 'Medio'], [0, 1, 2], default=3)
+    numero_escenario = fila_nivel * 4 + columna_riesgo + np.where(es_categoria_ab, 1, 14)
+    
+    escenario = np.where(stock_final == 0, escenario_agotado, numero_escenario.astype(str))
+    return pd.Series(escenario.tolist(), index=df_clasificado.index)
+
+
+def _texto_accion(escenario, descuento, stock_final, stock_minimo, dias_cobertura, precio_coste):
+    """
+    Genera el texto de acción sugerida de una combinación de valores.
+    
+    Solo se evalúan los valores que usa el texto del escenario; el resto
+    pueden llegar como None.
+    
+    Args:
+        escenario: Código de escenario
+        descuento: Descuento Sugerido (%)
+        stock_final: Stock Final (unidades)
+        stock_minimo: Stock mínimo (unidades)
+        dias_cobertura: Días de cobertura
+        precio_coste: Precio Coste Unitario (€)
+    
+    Returns:
+        str: Texto de la acción sugerida
+    """
+    if escenario not in TEXTOS_ESCENARIOS:
+        return "Sin acción asignada"
+    
+    texto = TEXTOS_ESCENARIOS[escenario]
+    
+    if '[descuento]' in texto:
         texto = texto.replace('[descuento]', str(descuento))
+    if '[unidades]' in texto:
+        stock_objetivo_14_dias = max(1, round(stock_minimo * 0.5, 0))
         texto = texto.replace('[unidades]', str(int(stock_objetivo_14_dias)))
+    if '[X días]' in texto:
         texto = texto.replace('[X días]', str(int(dias_cobertura)))
+    if '[importe]' in texto:
+        capital_liberado = round(stock_final * precio_coste * 0.7, 2)
         texto = texto.replace('[importe]', str(capital_liberado))
-        
-        # Casos especiales
-        if escenario == '12':
-            texto = f"AUMENTAR STOCK: Producto de alto interés. Incrementar compras 20% próxima temporada. Stock actual: {int(stock_final)} unidades. Stock objetivo: {int(stock_objetivo_aumentar)} unidades. Maximizar disponibilidad."
-        elif escenario == '13A':
-            texto = f"URGENTE - REPOSICIÓN INMEDIATA: Producto de alta demanda agotado. Recompra prioritaria inmediata. Aumentar compras 40%. Stock objetivo: {int(stock_objetivo_doble)} unidades. Evitar futura ruptura."
-        elif escenario == '13B':
-            texto = f"REPOSICIÓN PRIORITARIA: Producto agotado con demanda reciente. Aumentar compras 25%. Stock objetivo: {int(stock_objetivo_aumentar)} unidades. Programar reposición para próxima semana."
-        elif escenario == '25':
-            texto = f"AUMENTAR STOCK: Producto de alto interés. Incrementar compras 30% próxima temporada. Stock actual: {int(stock_final)} unidades. Stock objetivo: {int(stock_objetivo_aumentar)} unidades. Alta rotación confirmada."
-        elif escenario == '26A':
-            texto = f"URGENTE - RUPTURA DE STOCK: Producto de alta demanda agotado. Recompra inmediata prioritaria. Aumentar compras 50%. Stock objetivo: {int(stock_objetivo_doble)} unidades. Pérdida de ventas estimada."
-        elif escenario == '26B':
-            texto = f"RECOMPRA PRIORITARIA: Producto agotado con demanda reciente. Aumentar compras 30%. Stock objetivo: {int(stock_objetivo_aumentar)} unidades. Monitorear demanda próximas semanas."
-        
-        return texto
+    if '[stock actual]' in texto:
+        texto = texto.replace('[stock actual]', str(int(stock_final)))
+    if '[stock objetivo]' in texto:
+        stock_objetivo = max(1, round(stock_final * FACTOR_STOCK_OBJETIVO[escenario], 0))
+        texto = texto.replace('[stock objetivo]', str(int(stock_objetivo)))
     
-    df_clasificado['Acción Sugerida'] = df_clasificado.apply(generar_accion_sugerida, axis=1)
+    return texto
+
+
+def generar_acciones_sugeridas(df_clasificado):
+    """
+    Genera la acción sugerida de cada artículo a partir de su escenario.
     
-    # =========================================================================
-    # SEPARACIÓN POR CATEGORÍAS
-    # =========================================================================
+    Los valores que no usa el texto del escenario se descartan, de modo que
+    los textos se generan una sola vez por combinación distinta de escenario
+    y valores, y se asignan después a todos los artículos que la comparten.
     
-    columnas_salida = [
-        'Artículo', 'Nombre artículo', 'Talla', 'Color',
-        'Familia', 'Nombre Familia', 'Rotación Familia (días)',
-        'Ventas (unidades)', 'Importe ventas (€)', 'Beneficio (importe €)',
-        'Tasa de venta (%)', 'Rotación excedida (unidades)',
-        'Stock mínimo (unidades)', 'Stock máximo (unidades)',
-        'Stock Final (unidades)', 'Antigüedad Última Venta (días)',
-        'Antigüedad Stock (días)', '% Rotación Consumido',
-        'Descuento Sugerido (%)', 'Riesgo de Merma/ inmovilizado',
-        'Acción Sugerida', 'Origen Stock Final', 'Escenario'
-    ]
+    Args:
+        df_clasificado: DataFrame de artículos con la columna 'Escenario'
     
-    df_categoria_a = df_clasificado[df_clasificado['Categoria ABC'] == 'A'][columnas_salida].copy()
-    df_categoria_b = df_clasificado[df_clasificado['Categoria ABC'] == 'B'][columnas_salida].copy()
-    df_categoria_c = df_clasificado[df_clasificado['Categoria ABC'] == 'C'][columnas_salida].copy()
-    df_categoria_d = df_clasificado[df_clasificado['Categoria ABC'] == 'D'][columnas_salida].copy()
+    Returns:
+        pd.Series: Texto de la acción sugerida de cada artículo
+    """
+    escenario = df_clasificado['Escenario']
+    entradas = pd.DataFrame({'Escenario': escenario.astype(object)}, index=df_clasificado.index)
+    
+    for columna in ['Descuento Sugerido (%)', 'Stock Final (unidades)', 'Stock mínimo (unidades)',
+                    'Días de cobertura', 'Precio Coste Unitario (€)']:
+        escenarios_columna = [
+            codigo for codigo, texto in TEXTOS_ESCENARIOS.items()
+            if any(marcador in texto and columna in columnas for marcador, columnas in COLUMNAS_MARCADORES.items())
+        ]
+        entradas[columna] = df_clasificado[columna].astype(object).where(escenario.isin(escenarios_columna), None)
     
-    # =========================================================================
-    # GUARDAR ARCHIVO EXCEL
-    # =========================================================================
+    # Número de combinación de cada artículo y primera fila de cada combinación
+    combinacion = entradas.groupby(list(entradas.columns), sort=False, dropna=False).ngroup().to_numpy()
+    _, primeras_filas = np.unique(combinacion, return_index=True)
+    combinaciones = entradas.iloc[primeras_filas]
     
-    nombre_archivo = os.path.join(DIRECTORIO_DATA, f"CLASIFICACION_ABC+D_{nombre_seccion.upper()}_{PERIODO}_{AÑO}.xlsx")
+    textos = np.array([_texto_accion(*valores) for valores in combinaciones.itertuples(index=False)], dtype=object)
+    return pd.Series(textos[combinacion].tolist(), index=df_clasificado.index)
+
+# ============================================================================
+# CLASIFICACIÓN ABC+D
+# ============================================================================
+
+# Columnas del informe de cada categoría
+COLUMNAS_SALIDA = [
+    'Artículo', 'Nombre artículo', 'Talla', 'Color',
+    'Familia', 'Nombre Familia', 'Rotación Familia (días)',
+    'Ventas (unidades)', 'Importe ventas (€)', 'Beneficio (importe €)',
+    'Tasa de venta (%)', 'Rotación excedida (unidades)',
+    'Stock mínimo (unidades)', 'Stock máximo (unidades)',
+    'Stock Final (unidades)', 'Antigüedad Última Venta (días)',
+    'Antigüedad Stock (días)', '% Rotación Consumido',
+    'Descuento Sugerido (%)', 'Riesgo de Merma/ inmovilizado',
+    'Acción Sugerida', 'Origen Stock Final', 'Escenario'
+]
+
+
+def clasificar_abc(df_resultados):
+    """
+    Asigna la categoría ABC+D, el escenario y la acción sugerida de cada artículo.
     
-    with pd.ExcelWriter(nombre_archivo, engine='openpyxl') as writer:
-        df_categoria_a.to_excel(writer, sheet_name='CATEGORIA A – BASICOS', index=False)
-        df_categoria_b.to_excel(writer, sheet_name='CATEGORIA B – COMPLEMENTO', index=False)
-        df_categoria_c.to_excel(writer, sheet_name='CATEGORIA C – BAJO IMPACTO', index=False)
-        df_categoria_d.to_excel(writer, sheet_name='CATEGORIA D – SIN VENTAS', index=False)
+    La clasificación se hace dentro de cada sección (columna 'Sección'): los
+    artículos con ventas se ordenan por coste de ventas y se acumula su peso
+    en el total de la sección (A hasta el 80%, B hasta el 95%, C el resto).
+    Los artículos sin ventas son categoría D.
     
-    print(f"\nArchivo generado: {nombre_archivo}")
+    Args:
+        df_resultados: DataFrame de métricas por artículo con la columna 'Sección'
     
-    # =========================================================================
-    # APLICAR FORMATOS EXCEL
-    # =========================================================================
+    Returns:
+        pd.DataFrame: Artículos clasificados (primero los que tienen ventas, de
+            mayor a menor coste de ventas, y después los que no tienen)
+    """
+    coste_ventas = df_resultados['Coste Ventas Real (€)']
+    df_con_ventas = df_resultados[coste_ventas > 0].sort_values(
+        'Coste Ventas Real (€)', ascending=False, kind='stable')
+    df_sin_ventas = df_resultados[coste_ventas == 0].copy()
     
-    def aplicar_formato_hoja(worksheet, df):
-        worksheet.column_dimensions['A'].width = 18
-        worksheet.column_dimensions['B'].width = 45
-        worksheet.column_dimensions['C'].width = 15
-        worksheet.column_dimensions['D'].width = 15
-        worksheet.column_dimensions['M'].width = 18
-        worksheet.column_dimensions['N'].width = 18
-        worksheet.column_dimensions['S'].width = 22
-        worksheet.column_dimensions['U'].width = 32
-        worksheet.column_dimensions['X'].width = 15
-        
-        columnas_ocultar = ['E', 'F', 'G', 'H', 'I', 'J', 'K', 'L', 'O', 'P', 'Q', 'R', 'V', 'W']
-        for col in columnas_ocultar:
-            worksheet.column_dimensions[col].hidden = True
-        
-        fill_cabecera = PatternFill(start_color=COLOR_CABECERA, end_color=COLOR_CABECERA, fill_type='solid')
-        font_cabecera = Font(color=COLOR_TEXTO_CABECERA, bold=True, size=10)
-        
-        for cell in worksheet[1]:
-            cell.fill = fill_cabecera
-            cell.font = font_cabecera
-            cell.alignment = Alignment(horizontal='center', vertical='center', wrap_text=True)
-        
-        worksheet.row_dimensions[1].height = 45
-        
-        thin_border = Border(
-            left=Side(style='thin'),
-            right=Side(style='thin'),
-            top=Side(style='thin'),
-            bottom=Side(style='thin')
-        )
-        
-        columnas_centradas = ['M', 'N', 'S', 'T']
-        
-        for row_idx, row in enumerate(worksheet.iter_rows(min_row=2), start=2):
-            for col_idx, cell in enumerate(row, start=1):
-                cell.border = thin_border
-                
-                col_letter = chr(64 + col_idx)
-                if col_letter in columnas_centradas:
-                    cell.alignment = Alignment(horizontal='center', vertical='center')
-                elif col_letter in ['A', 'B', 'C', 'D', 'U']:
-                    cell.alignment = Alignment(horizontal='left', vertical='center')
-                
-                if col_letter == 'T' and cell.value:
-                    riesgo = str(cell.value)
-                    if riesgo in COLORES_RIESGO:
-                        cell.fill = PatternFill(start_color=COLORES_RIESGO[riesgo], 
-                                               end_color=COLORES_RIESGO[riesgo], 
-                                               fill_type='solid')
+    if len(df_con_ventas) > 0:
+        por_seccion = df_con_ventas.groupby('Sección', sort=False, observed=True)
+        total_coste = por_seccion['Coste Ventas Real (€)'].transform('sum')
+        df_con_ventas['% Individual'] = (df_con_ventas['Coste Ventas Real (€)'] / total_coste) * 100
+        df_con_ventas['% Acumulado'] = df_con_ventas.groupby('Sección', sort=False, observed=True)['% Individual'].cumsum()
+        df_con_ventas['Categoria ABC'] = np.select(
+            [df_con_ventas['% Acumulado'] <= 80, df_con_ventas['% Acumulado'] <= 95],
+            ['A', 'B'], default='C').tolist()
+    
+    df_sin_ventas['Categoria ABC'] = 'D'
+    
+    df_clasificado = pd.concat([df_con_ventas, df_sin_ventas], ignore_index=True)
+    df_clasificado['Escenario'] = asignar_escenarios(df_clasificado)
+    df_clasificado['Acción Sugerida'] = generar_acciones_sugeridas(df_clasificado)
+    
+    return df_clasificado
+
+# ============================================================================
+# ALMACÉN DE AGREGADOS INCREMENTALES (--incremental)
+# ============================================================================
+
+# El almacén guarda, para un período y año, las ventas ya agregadas por artículo
+# (unidades, importe, beneficio, coste y fecha de última venta) y el libro de
+# compras (fecha y unidades de cada compra, necesario para la antigüedad FIFO).
+# Cada ejecución incremental solo procesa las filas posteriores a la marca de
+# agua (la última fecha ya incorporada) y recalcula la clasificación a partir
+# de los agregados. Si cambian filas ya incorporadas o la tabla de costes, el
+# almacén se reconstruye desde cero.
+DIRECTORIO_AGREGADOS = os.path.join(DIRECTORIO_BASE, 'data', 'agregados_abc')
+VERSION_ALMACEN_AGREGADOS = 3
+
+COLUMNAS_ALMACEN_COMPRAS = ['Fecha', 'Unidades']
+COLUMNAS_ALMACEN_VENTAS = ['Unidades', 'Importe', 'Beneficio', 'Coste', 'Fecha']
+AGREGACION_ALMACEN_VENTAS = {'Unidades': 'sum', 'Importe': 'sum', 'Beneficio': 'sum', 'Coste': 'sum', 'Fecha': 'max'}
+
+
+def ruta_almacen_agregados(periodo, año):
+    """
+    Obtiene la ruta del almacén de agregados de un período.
+
+    Args:
+        periodo: Nombre del período (P1, P2, P3, P4 o el período por defecto)
+        año: Año de los datos
+
+    Returns:
+        str: Ruta del archivo del almacén
+    """
+    return os.path.join(DIRECTORIO_AGREGADOS, f"agregados_{periodo}_{año}.pkl")
+
+
+def cargar_almacen_agregados(ruta, fecha_inicio, fecha_fin):
+    """
+    Carga el almacén de agregados si existe y corresponde a las fechas del período.
+
+    Args:
+        ruta: Ruta del archivo del almacén
+        fecha_inicio: Fecha de inicio del período
+        fecha_fin: Fecha de fin del período
+
+    Returns:
+        dict: Almacén de agregados o None si hay que construirlo desde cero
+    """
+    if not os.path.exists(ruta):
+        return None
+
+    try:
+        almacen = pd.read_pickle(ruta)
+    except Exception as e:
+        print(f"ADVERTENCIA: Almacén de agregados ilegible, se reconstruirá: {ruta} ({e})")
+        return None
+
+    if (almacen.get('version') != VERSION_ALMACEN_AGREGADOS
+            or almacen.get('fecha_inicio') != pd.Timestamp(fecha_inicio)
+            or almacen.get('fecha_fin') != pd.Timestamp(fecha_fin)):
+        print(f"ADVERTENCIA: El almacén de agregados no corresponde al período actual, se reconstruirá")
+        return None
+
+    return almacen
+
+
+def guardar_almacen_agregados(ruta, almacen):
+    """
+    Guarda el almacén de agregados (temporal + fsync + renombrado).
+
+    Args:
+        ruta: Ruta del archivo del almacén
+        almacen: Almacén devuelto por incorporar_filas_nuevas
+    """
+    os.makedirs(os.path.dirname(ruta), exist_ok=True)
+    escribir_atomico(ruta, lambda ruta_temporal: pd.to_pickle(almacen, ruta_temporal))
+
+
+def _huella_filas(df):
+    """
+    Calcula una huella del contenido de las filas, independiente de su orden.
+
+    Args:
+        df: DataFrame de compras o ventas
+
+    Returns:
+        int: Suma de los hashes de las filas (0 si no hay filas)
+    """
+    return int(pd.util.hash_pandas_object(df, index=False).sum())
+
+
+def calcular_marcas_agua(compras_df, ventas_df, coste_df):
+    """
+    Calcula la marca de agua de compras y ventas ya filtradas por período.
+
+    La marca es la última fecha presente, el número de filas hasta esa fecha
+    y la huella de su contenido, que permiten detectar en la siguiente
+    ejecución si se han modificado filas ya incorporadas. De la tabla de
+    costes se guarda solo la huella: el coste de las ventas ya agregadas
+    depende de ella.
+
+    Args:
+        compras_df: DataFrame de compras del período
+        ventas_df: DataFrame de ventas del período
+        coste_df: DataFrame de la tabla de costes (SPA_coste.xlsx)
+
+    Returns:
+        dict: {'compras': {'fecha', 'filas', 'huella'}, 'ventas': {'fecha', 'filas', 'huella'},
+            'coste': {'huella'}}
+    """
+    marcas = {}
+    for origen, df in (('compras', compras_df), ('ventas', ventas_df)):
+        fecha = df['Fecha'].max() if len(df) > 0 else pd.NaT
+        marcas[origen] = {'fecha': fecha, 'filas': len(df), 'huella': _huella_filas(df)}
+    marcas['coste'] = {'huella': _huella_filas(coste_df)}
+    return marcas
+
+
+def almacen_vigente(almacen, compras_df, ventas_df, coste_df):
+    """
+    Comprueba que las filas ya incorporadas al almacén no han cambiado.
+
+    Si el número de filas con fecha anterior o igual a la marca de agua o la
+    huella de su contenido no coinciden (se han añadido, corregido o borrado
+    filas antiguas) los agregados ya no son válidos. Tampoco lo son si ha
+    cambiado la tabla de costes, con la que se calculó el coste y el
+    beneficio de las ventas ya agregadas.
+
+    Args:
+        almacen: Almacén de agregados
+        compras_df: DataFrame de compras del período
+        ventas_df: DataFrame de ventas del período
+        coste_df: DataFrame de la tabla de costes (SPA_coste.xlsx)
+
+    Returns:
+        bool: True si se pueden incorporar solo las filas nuevas
+    """
+    if almacen['marcas']['coste']['huella'] != _huella_filas(coste_df):
+        return False
+    for origen, df in (('compras', compras_df), ('ventas', ventas_df)):
+        marca = almacen['marcas'][origen]
+        hasta_marca = df.iloc[:0] if pd.isna(marca['fecha']) else df[df['Fecha'] <= marca['fecha']]
+        if len(hasta_marca) != marca['filas'] or _huella_filas(hasta_marca) != marca['huella']:
+            return False
+    return True
+
+
+def filas_posteriores(df, marca):
+    """
+    Selecciona las filas posteriores a una marca de agua.
+
+    Args:
+        df: DataFrame de compras o ventas del período
+        marca: Marca de agua del origen ({'fecha', 'filas', 'huella'})
+
+    Returns:
+        pd.DataFrame: Filas con fecha posterior a la marca
+    """
+    if pd.isna(marca['fecha']):
+        return df
+    return df[df['Fecha'] > marca['fecha']]
+
+
+def incorporar_filas_nuevas(almacen, compras_nuevas, ventas_nuevas, marcas, fecha_inicio, fecha_fin):
+    """
+    Incorpora al almacén las compras y ventas nuevas ya normalizadas.
+
+    Las compras se añaden al libro de compras y las ventas se suman a los
+    agregados de cada artículo. El coste de las ventas se calcula con la
+    tabla de costes vigente al incorporarlas; si la tabla cambia,
+    almacen_vigente obliga a reconstruir el almacén.
+
+    Args:
+        almacen: Almacén de agregados (None para construirlo desde cero)
+        compras_nuevas: Compras posteriores a la marca de agua (con CLAVE_ARTICULO)
+        ventas_nuevas: Ventas posteriores a la marca de agua (con CLAVE_ARTICULO)
+        marcas: Marcas de agua de los datos completos del período
+        fecha_inicio: Fecha de inicio del período
+        fecha_fin: Fecha de fin del período
+
+    Returns:
+        dict: Almacén actualizado; 'compras' tiene una fila por compra y
+            'ventas' una fila por artículo
+    """
+    compras = compras_nuevas[CLAVE_ARTICULO + COLUMNAS_ALMACEN_COMPRAS]
+    ventas = ventas_nuevas[CLAVE_ARTICULO + COLUMNAS_ALMACEN_VENTAS]
+    if almacen is not None:
+        compras = pd.concat([almacen['compras'], compras], ignore_index=True)
+        ventas = pd.concat([almacen['ventas'], ventas], ignore_index=True)
+
+    ventas = (ventas.groupby(CLAVE_ARTICULO, sort=False, dropna=False, observed=True)
+              .agg(AGREGACION_ALMACEN_VENTAS).reset_index())
+
+    return {
+        'version': VERSION_ALMACEN_AGREGADOS,
+        'fecha_inicio': pd.Timestamp(fecha_inicio),
+        'fecha_fin': pd.Timestamp(fecha_fin),
+        'marcas': marcas,
+        'compras': compras.reset_index(drop=True),
+        'ventas': ventas,
+    }
+
+
+def actualizar_almacen_incremental(ruta, compras_df, ventas_df, coste_df, preparar_movimientos=None):
+    """
+    Actualiza el almacén de agregados del período actual (--incremental).
+
+    Si el almacén sigue vigente solo se preparan e incorporan las filas
+    posteriores a la marca de agua; si no existe o han cambiado filas ya
+    agregadas o la tabla de costes, se reconstruye con todas las filas.
+    Usa las fechas del período establecido (FECHA_INICIO, FECHA_FIN).
+
+    Args:
+        ruta: Ruta del archivo del almacén
+        compras_df: DataFrame de compras del período, sin preparar
+        ventas_df: DataFrame de ventas del período, sin preparar
+        coste_df: DataFrame de la tabla de costes (SPA_coste.xlsx)
+        preparar_movimientos: Función (compras, ventas) -> (compras, ventas) que
+            calcula el coste, normaliza y filtra las filas que se incorporan
+            (None si ya vienen preparadas)
+
+    Returns:
+        Tuple: (compras, ventas) del almacén actualizado; una fila por compra
+            y una fila de ventas por artículo
+    """
+    almacen = cargar_almacen_agregados(ruta, FECHA_INICIO, FECHA_FIN)
+    if almacen is not None and not almacen_vigente(almacen, compras_df, ventas_df, coste_df):
+        print("ADVERTENCIA: Han cambiado filas ya agregadas o la tabla de costes, "
+              "se reconstruye el almacén de agregados")
+        almacen = None
+    marcas = calcular_marcas_agua(compras_df, ventas_df, coste_df)
+
+    if almacen is None:
+        print(f"MODO INCREMENTAL: Construyendo el almacén de agregados ({ruta})")
+    else:
+        compras_df = filas_posteriores(compras_df, almacen['marcas']['compras'])
+        ventas_df = filas_posteriores(ventas_df, almacen['marcas']['ventas'])
+        print(f"MODO INCREMENTAL: {len(compras_df)} compras y {len(ventas_df)} ventas nuevas")
+
+    if preparar_movimientos is not None:
+        compras_df, ventas_df = preparar_movimientos(compras_df, ventas_df)
+
+    almacen = incorporar_filas_nuevas(almacen, compras_df, ventas_df, marcas, FECHA_INICIO, FECHA_FIN)
+    guardar_almacen_agregados(ruta, almacen)
+    print(f"\nAlmacén de agregados actualizado: {len(almacen['compras'])} compras, "
+          f"{len(almacen['ventas'])} artículos con ventas")
+    return almacen['compras'].copy(), almacen['ventas'].copy()
+
+# ============================================================================
+# FUNCIONES PARA PROCESAR LAS SECCIONES
+# ============================================================================
+
+def procesar_secciones(compras_df, ventas_df, stock_df, secciones_a_procesar, workers=1):
+    """
+    Clasifica varias secciones en una sola pasada y genera un archivo Excel por sección.
+    
+    La sección de cada fila se toma de la columna 'seccion' (se asigna aquí si
+    los DataFrames no la traen). Las métricas y la clasificación se calculan para
+    todos los artículos a la vez y los datos se separan por sección solo al
+    escribir los archivos.
+    
+    Args:
+        compras_df: DataFrame de compras
+        ventas_df: DataFrame de ventas
+        stock_df: DataFrame de stock
+        secciones_a_procesar: Lista de tuplas (nombre de sección, información de la sección)
+        workers: Número máximo de procesos para escribir los archivos
+    
+    Returns:
+        list: Estadísticas de cada sección (None si la sección no tiene datos),
+            en el orden de secciones_a_procesar
+    """
+    nombres_secciones = [nombre for nombre, _ in secciones_a_procesar]
+    
+    if 'seccion' not in compras_df.columns:
+        compras_df, ventas_df, stock_df = [
+            df.assign(seccion=asignar_secciones(df['codigo_str'], CODIGOS_MASCOTAS_VIVO, 'tierra_aridos'))
+            for df in (compras_df, ventas_df, stock_df)
+        ]
+    
+    compras_secciones = compras_df[compras_df['seccion'].isin(nombres_secciones)]
+    ventas_secciones = ventas_df[ventas_df['seccion'].isin(nombres_secciones)]
+    stock_secciones = stock_df[stock_df['seccion'].isin(nombres_secciones)]
+    
+    agregados = agregar_por_articulo(compras_secciones, ventas_secciones, stock_secciones, FECHA_FIN, DIAS_PERIODO)
+    print(f"\nTotal artículos únicos en las secciones: {len(agregados)}")
+    
+    secciones_con_datos = set()
+    clasificado_por_seccion = {}
+    if len(agregados) > 0:
+        df_resultados = calcular_metricas_articulos(agregados, compras_secciones, FECHA_FIN, DIAS_PERIODO)
+        df_resultados['Sección'] = asignar_secciones(df_resultados['Artículo'], CODIGOS_MASCOTAS_VIVO, 'tierra_aridos')
+        secciones_con_datos = set(df_resultados['Sección'])
         
-        worksheet.page_setup.orientation = 'landscape'
-        worksheet.page_setup.margin_left = 0
-        worksheet.page_setup.margin_right = 0
-        worksheet.page_setup.margin_top = 0
-        worksheet.page_setup.margin_bottom = 0
+        df_clasificado = clasificar_abc(df_resultados)
         
-        worksheet.auto_filter.ref = worksheet.dimensions
+        # Separar por sección solo para escribir los archivos
+        clasificado_por_seccion = dict(list(df_clasificado.groupby('Sección', sort=False, observed=True)))
+    filas_compras = compras_secciones['seccion'].value_counts()
+    filas_ventas = ventas_secciones['seccion'].value_counts()
+    filas_stock = stock_secciones['seccion'].value_counts()
+    
+    pendientes = []
+    for nombre_seccion, seccion_info in secciones_a_procesar:
+        print(f"\n{'='*80}")
+        print(f"PROCESANDO SECCIÓN: {nombre_seccion.upper()}")
+        print(f"Descripción: {seccion_info['descripcion']}")
+        print(f"{'='*80}")
         
-        return worksheet
+        print(f"Datos filtrados:")
+        print(f"  - Compras: {filas_compras.get(nombre_seccion, 0)} registros")
+        print(f"  - Ventas: {filas_ventas.get(nombre_seccion, 0)} registros")
+        print(f"  - Stock: {filas_stock.get(nombre_seccion, 0)} registros")
+        
+        if nombre_seccion not in secciones_con_datos:
+            print(f"  AVISO: No hay datos para la sección '{nombre_seccion}'. Saltando...")
+            continue
+        
+        df_clasificado_seccion = clasificado_por_seccion.get(nombre_seccion, df_clasificado.iloc[0:0]).reset_index(drop=True)
+        print(f"\nTotal artículos procesados: {len(df_clasificado_seccion)}")
+        print(f"Artículos con ventas: {(df_clasificado_seccion['Categoria ABC'] != 'D').sum()}")
+        print(f"Artículos sin ventas: {(df_clasificado_seccion['Categoria ABC'] == 'D').sum()}")
+        for categoria in HOJAS_CATEGORIAS:
+            print(f"  Categoría {categoria}: {(df_clasificado_seccion['Categoria ABC'] == categoria).sum()} artículos")
+        
+        nombre_archivo = os.path.join(DIRECTORIO_DATA, f"CLASIFICACION_ABC+D_{nombre_seccion.upper()}_{PERIODO}_{AÑO}.xlsx")
+        pendientes.append((nombre_seccion, df_clasificado_seccion, nombre_archivo))
     
-    wb = load_workbook(nombre_archivo)
+    estadisticas = escribir_y_enviar_clasificaciones(pendientes, workers)
+    return [estadisticas.get(nombre_seccion) for nombre_seccion, _ in secciones_a_procesar]
+
+
+def procesar_seccion(compras_df, ventas_df, stock_df, coste_df, nombre_seccion, seccion_info):
+    """
+    Procesa los datos de una sección específica y genera su archivo Excel.
     
-    for sheet_name in wb.sheetnames:
-        ws = wb[sheet_name]
-        df = pd.read_excel(nombre_archivo, sheet_name=sheet_name)
-        aplicar_formato_hoja(ws, df)
+    Args:
+        compras_df: DataFrame de compras
+        ventas_df: DataFrame de ventas
+        stock_df: DataFrame de stock
+        coste_df: DataFrame de costes
+        nombre_seccion: Nombre de la sección a procesar
+        seccion_info: Información de la sección (diccionario con descripción)
     
-    wb.save(nombre_archivo)
+    Returns:
+        dict: Estadísticas del procesamiento o None si no hay datos
+    """
+    return procesar_secciones(compras_df, ventas_df, stock_df, [(nombre_seccion, seccion_info)])[0]
+
+
+def clasificar_periodo(configuracion, compras_df, ventas_df, stock_df, secciones_a_procesar, workers=1):
+    """
+    Clasifica las secciones indicadas en un período.
     
-    print(f"\nEnviando email al encargado de la sección...")
+    Args:
+        configuracion: Tupla devuelta por configurar_periodo
+        compras_df: DataFrame de compras del período
+        ventas_df: DataFrame de ventas del período
+        stock_df: DataFrame de stock del período
+        secciones_a_procesar: Lista de tuplas (nombre de sección, información de la sección)
+        workers: Número máximo de procesos para escribir los archivos
     
-    # Formatear período para el email
-    periodo_str = f"{FECHA_INICIO.strftime('%d/%m/%Y')} - {FECHA_FIN.strftime('%d/%m/%Y')}"
+    Returns:
+        list: Estadísticas de cada sección (ver procesar_secciones)
+    """
+    establecer_periodo(configuracion)
+    return procesar_secciones(compras_df, ventas_df, stock_df, secciones_a_procesar, workers)
+
+
+def clasificar_periodos(configuraciones, compras_df, ventas_df, stocks, secciones_a_procesar, workers=1):
+    """
+    Clasifica varios períodos a partir de los mismos datos ya cargados y normalizados.
     
-    # Enviar email con el archivo adjunto
-    email_enviado = enviar_email_clasificacion(nombre_seccion, nombre_archivo, periodo_str)
+    Las compras y ventas de cada período se seleccionan con una máscara por
+    fechas sobre los DataFrames compartidos. Con varios períodos y workers > 1
+    cada período se clasifica en un proceso (y escribe sus archivos de forma
+    secuencial); con un solo período workers se usa para escribir los archivos.
     
-    # Retornar estadísticas
-    return {
-        'seccion': nombre_seccion,
-        'archivo': nombre_archivo,
-        'total_articulos': len(df_clasificado),
-        'categoria_a': len(df_categoria_a),
-        'categoria_b': len(df_categoria_b),
-        'categoria_c': len(df_categoria_c),
-        'categoria_d': len(df_categoria_d),
-        'email_enviado': email_enviado,
+    Args:
+        configuraciones: Diccionario {período: tupla devuelta por configurar_periodo}
+        compras_df: DataFrame de compras de todos los períodos
+        ventas_df: DataFrame de ventas de todos los períodos
+        stocks: Diccionario {período: DataFrame de stock del período}
+        secciones_a_procesar: Lista de tuplas (nombre de sección, información de la sección)
+        workers: Número máximo de procesos
+    
+    Returns:
+        dict: Estadísticas de cada sección por período, {período: lista}
+    """
+    argumentos = {
+        periodo: (configuracion,
+                  filtrar_por_fechas(compras_df, configuracion[0], configuracion[1]),
+                  filtrar_por_fechas(ventas_df, configuracion[0], configuracion[1]),
+                  stocks[periodo],
+                  secciones_a_procesar)
+        for periodo, configuracion in configuraciones.items()
     }
+    
+    if workers <= 1 or len(argumentos) == 1:
+        return {periodo: clasificar_periodo(*args, workers) for periodo, args in argumentos.items()}
+    
+    with ProcessPoolExecutor(max_workers=min(workers, len(argumentos))) as executor:
+        futuros = {periodo: executor.submit(clasificar_periodo, *args, 1) for periodo, args in argumentos.items()}
+        return {periodo: futuro.result() for periodo, futuro in futuros.items()}
+
+
+# ============================================================================
+# ESCRITURA Y ENVÍO DE LOS ARCHIVOS DE CLASIFICACIÓN
+# ============================================================================
+
+# Hoja de cada categoría en el archivo de clasificación
+HOJAS_CATEGORIAS = {
+    'A': 'CATEGORIA A – BASICOS',
+    'B': 'CATEGORIA B – COMPLEMENTO',
+    'C': 'CATEGORIA C – BAJO IMPACTO',
+    'D': 'CATEGORIA D – SIN VENTAS',
+}
+
+
+# Formato de las hojas de clasificación (por letra de columna)
+ANCHOS_COLUMNAS_CLASIFICACION = {'A': 18, 'B': 45, 'C': 15, 'D': 15, 'M': 18, 'N': 18, 'S': 22, 'U': 32, 'X': 15}
+COLUMNAS_OCULTAS_CLASIFICACION = ['E', 'F', 'G', 'H', 'I', 'J', 'K', 'L', 'O', 'P', 'Q', 'R', 'V', 'W']
+COLUMNAS_CENTRADAS_CLASIFICACION = ['M', 'N', 'S', 'T']
+COLUMNAS_IZQUIERDA_CLASIFICACION = ['A', 'B', 'C', 'D', 'U']
+COLUMNA_RIESGO_CLASIFICACION = 'T'
+
+
+def crear_estilos_clasificacion():
+    """
+    Crea los estilos con nombre de las hojas de clasificación.
+    
+    Returns:
+        list: Lista de NamedStyle (cabecera, celdas y una por nivel de riesgo)
+    """
+    borde = borde_fino()
+    centrado = Alignment(horizontal='center', vertical='center')
+    
+    estilos = [
+        crear_estilo('abc_cabecera', font=Font(color=COLOR_TEXTO_CABECERA, bold=True, size=10),
+                     fill=relleno_solido(COLOR_CABECERA),
+                     alignment=Alignment(horizontal='center', vertical='center', wrap_text=True)),
+        crear_estilo('abc_celda', border=borde),
+        crear_estilo('abc_centrada', border=borde, alignment=centrado),
+        crear_estilo('abc_izquierda', border=borde, alignment=Alignment(horizontal='left', vertical='center')),
+    ]
+    estilos += [
+        crear_estilo(f'abc_riesgo_{riesgo}', border=borde, alignment=centrado, fill=relleno_solido(color))
+        for riesgo, color in COLORES_RIESGO.items()
+    ]
+    return estilos
+
+
+def escribir_hoja_clasificacion(libro, nombre_hoja, df_categoria):
+    """
+    Escribe con formato la hoja de una categoría en un libro en modo streaming.
+    
+    Args:
+        libro: Libro creado con crear_libro_streaming y crear_estilos_clasificacion
+        nombre_hoja: Nombre de la hoja
+        df_categoria: DataFrame con las columnas COLUMNAS_SALIDA
+    """
+    worksheet = crear_hoja_streaming(libro, nombre_hoja,
+                                     anchos=ANCHOS_COLUMNAS_CLASIFICACION,
+                                     columnas_ocultas=COLUMNAS_OCULTAS_CLASIFICACION,
+                                     altos_filas={1: 45})
+    
+    letras = [get_column_letter(col_idx) for col_idx in range(1, len(df_categoria.columns) + 1)]
+    estilos_fila = [
+        'abc_centrada' if letra in COLUMNAS_CENTRADAS_CLASIFICACION
+        else 'abc_izquierda' if letra in COLUMNAS_IZQUIERDA_CLASIFICACION
+        else 'abc_celda'
+        for letra in letras
+    ]
+    idx_riesgo = letras.index(COLUMNA_RIESGO_CLASIFICACION)
+    
+    escribir_fila(worksheet, list(df_categoria.columns), ['abc_cabecera'] * len(letras))
+    
+    for fila in df_categoria.itertuples(index=False):
+        # Los valores nulos se escriben como celdas vacías (con borde)
+        valores = [None if pd.isna(valor) else valor for valor in fila]
+        estilos = estilos_fila
+        
+        riesgo = valores[idx_riesgo]
+        if riesgo and str(riesgo) in COLORES_RIESGO:
+            estilos = list(estilos_fila)
+            estilos[idx_riesgo] = f'abc_riesgo_{riesgo}'
+        
+        escribir_fila(worksheet, valores, estilos)
+    
+    worksheet.page_setup.orientation = 'landscape'
+    worksheet.page_setup.margin_left = 0
+    worksheet.page_setup.margin_right = 0
+    worksheet.page_setup.margin_top = 0
+    worksheet.page_setup.margin_bottom = 0
+    
+    worksheet.auto_filter.ref = rango_hoja(len(df_categoria) + 1, len(letras))
+
+
+def escribir_clasificacion_seccion(df_clasificado, nombre_archivo):
+    """
+    Escribe el archivo Excel de clasificación de una sección, ya con formato.
+    
+    El libro se escribe en modo streaming (write-only) con los estilos
+    registrados una sola vez, y se guarda una sola vez. Solo usa sus
+    argumentos y las constantes del módulo, para poder ejecutarse en
+    procesos auxiliares.
+    
+    Args:
+        df_clasificado: DataFrame de artículos clasificados de la sección
+        nombre_archivo: Ruta del archivo a generar
+    
+    Returns:
+        dict: Número de artículos total y por categoría
+    """
+    conteos = {'total_articulos': len(df_clasificado)}
+    
+    libro = crear_libro_streaming(crear_estilos_clasificacion())
+    for categoria, nombre_hoja in HOJAS_CATEGORIAS.items():
+        df_categoria = df_clasificado[df_clasificado['Categoria ABC'] == categoria][COLUMNAS_SALIDA]
+        escribir_hoja_clasificacion(libro, nombre_hoja, df_categoria)
+        conteos[f'categoria_{categoria.lower()}'] = len(df_categoria)
+    libro.save(nombre_archivo)
+    
+    return conteos
+
+
+def escribir_y_enviar_clasificaciones(pendientes, workers=1):
+    """
+    Escribe los archivos de clasificación y los envía por email a los encargados.
+    
+    Con workers > 1 los archivos se escriben en paralelo en varios procesos.
+    Los emails se envían en un hilo aparte a medida que cada archivo queda
+    escrito, mientras se escriben los siguientes.
+    
+    Args:
+        pendientes: Lista de tuplas (nombre de sección, DataFrame clasificado, ruta del archivo)
+        workers: Número máximo de procesos de escritura
+    
+    Returns:
+        dict: Estadísticas de cada sección, por nombre de sección
+    """
+    periodo_str = f"{FECHA_INICIO.strftime('%d/%m/%Y')} - {FECHA_FIN.strftime('%d/%m/%Y')}"
+    estadisticas = {}
+    envios = {}
+    
+    def registrar(nombre_seccion, nombre_archivo, conteos):
+        print(f"\nArchivo generado: {nombre_archivo}")
+        print(f"Enviando email al encargado de la sección {nombre_seccion}...")
+        estadisticas[nombre_seccion] = {'seccion': nombre_seccion, 'archivo': nombre_archivo, **conteos}
+        envios[nombre_seccion] = envio_emails.submit(
+            enviar_email_clasificacion, nombre_seccion, nombre_archivo, periodo_str)
+    
+    with ThreadPoolExecutor(max_workers=1) as envio_emails:
+        if workers > 1 and len(pendientes) > 1:
+            with ProcessPoolExecutor(max_workers=min(workers, len(pendientes))) as escritura:
+                futuros = {
+                    escritura.submit(escribir_clasificacion_seccion, df_clasificado, nombre_archivo): (nombre_seccion, nombre_archivo)
+                    for nombre_seccion, df_clasificado, nombre_archivo in pendientes
+                }
+                for futuro in as_completed(futuros):
+                    nombre_seccion, nombre_archivo = futuros[futuro]
+                    registrar(nombre_seccion, nombre_archivo, futuro.result())
+        else:
+            for nombre_seccion, df_clasificado, nombre_archivo in pendientes:
+                registrar(nombre_seccion, nombre_archivo,
+                          escribir_clasificacion_seccion(df_clasificado, nombre_archivo))
+    
+    for nombre_seccion, envio in envios.items():
+        estadisticas[nombre_seccion]['email_enviado'] = envio.result()
+    
+    return estadisticas
 
 # ============================================================================
 # FUNCIÓN PRINCIPAL
@@ -1551,6 +2170,9 @@ Ejemplos de uso:
   python clasificacionABC.py --P4                          # Procesa período P4 (septiembre-diciembre)
   python clasificacionABC.py --P2 --seccion vivero         # Procesa solo vivero en período P2
   python clasificacionABC.py -P1 -s interior               # Procesa solo interior en período P1
+  python clasificacionABC.py --P3 --workers 4              # Escribe los archivos en 4 procesos
+  python clasificacionABC.py --P3 --incremental            # Solo incorpora las filas nuevas
+  python clasificacionABC.py --todos-periodos --workers 4  # Procesa P1-P4 (un proceso por período)
 
 Períodos disponibles:
   P1: 1 enero a 28 de febrero
@@ -1586,6 +2208,12 @@ Secciones disponibles:
         action='store_true',
         help='Procesar período P4 (septiembre - diciembre)'
     )
+    grupo_periodo.add_argument(
+        '--todos-periodos', '--all-periods',
+        dest='todos_periodos',
+        action='store_true',
+        help='Procesar los períodos P1 a P4 leyendo los archivos de entrada una sola vez'
+    )
     
     parser.add_argument(
         '-s', '--seccion',
@@ -1593,6 +2221,20 @@ Secciones disponibles:
         help='Procesar solo una sección específica (modo mono-sección)'
     )
     
+    parser.add_argument(
+        '-w', '--workers',
+        type=int,
+        default=1,
+        help='Procesos para escribir los archivos de las secciones en paralelo, o para '
+             'clasificar los períodos en paralelo con --todos-periodos (default: 1)'
+    )
+    
+    parser.add_argument(
+        '--incremental',
+        action='store_true',
+        help='Incorporar solo las compras y ventas nuevas a los agregados guardados del período'
+    )
+    
     args = parser.parse_args()
     
     # Determinar el período seleccionado
@@ -1606,6 +2248,15 @@ Secciones disponibles:
     elif args.P4:
         periodo_seleccionado = "P4"
     
+    if args.todos_periodos:
+        periodos_a_procesar = list(PERIODOS_CLASIFICACION)
+    else:
+        periodos_a_procesar = [periodo_seleccionado]
+    
+    if args.todos_periodos and args.incremental:
+        print("ERROR: --incremental no se puede combinar con --todos-periodos.")
+        sys.exit(1)
+    
     seccion_especifica = args.seccion.lower() if args.seccion else None
     
     # Validar sección si se especificó
@@ -1618,7 +2269,9 @@ Secciones disponibles:
     print("MOTOR DE CÁLCULO ABC+D PARA GESTIÓN DE INVENTARIOS")
     print("=" * 80)
     
-    if periodo_seleccionado:
+    if args.todos_periodos:
+        print(f"\nMODO: Todos los períodos ({', '.join(periodos_a_procesar)})")
+    elif periodo_seleccionado:
         print(f"\nMODO: Período específico")
         print(f"Período seleccionado: {periodo_seleccionado}")
     else:
@@ -1639,14 +2292,14 @@ Secciones disponibles:
     
     try:
         # Cargar archivos con datos de TODO el año
-        compras_df = pd.read_excel(os.path.join(DIRECTORIO_DATA, 'SPA_compras.xlsx'))
-        ventas_df = pd.read_excel(os.path.join(DIRECTORIO_DATA, 'SPA_ventas.xlsx'))
+        compras_df = leer_excel_cacheado(os.path.join(DIRECTORIO_DATA, 'SPA_compras.xlsx'))
+        ventas_df = leer_excel_cacheado(os.path.join(DIRECTORIO_DATA, 'SPA_ventas.xlsx'))
         # El archivo de stock se cargará después de detectar el año
         # El archivo de costes puede llamarse SPA_Coste.xlsx o SPA_coste.xlsx
         if os.path.exists(os.path.join(DIRECTORIO_DATA, 'SPA_Coste.xlsx')):
-            coste_df = pd.read_excel(os.path.join(DIRECTORIO_DATA, 'SPA_Coste.xlsx'))
+            coste_df = leer_excel_cacheado(os.path.join(DIRECTORIO_DATA, 'SPA_Coste.xlsx'))
         elif os.path.exists(os.path.join(DIRECTORIO_DATA, 'SPA_coste.xlsx')):
-            coste_df = pd.read_excel(os.path.join(DIRECTORIO_DATA, 'SPA_coste.xlsx'))
+            coste_df = leer_excel_cacheado(os.path.join(DIRECTORIO_DATA, 'SPA_coste.xlsx'))
         else:
             raise FileNotFoundError("No se encontró SPA_Coste.xlsx ni SPA_coste.xlsx")
     except FileNotFoundError as e:
@@ -1674,36 +2327,22 @@ Secciones disponibles:
     # CARGAR STOCK Y CONFIGURAR PERÍODO DESPUÉS DE DETECTAR AÑO
     # =========================================================================
     
-    # Determinar el nombre del archivo de stock según el período
-    if periodo_seleccionado:
-        nombre_stock = f'SPA_stock_{periodo_seleccionado}.xlsx'
-    else:
-        # Si no hay período específico, buscar el archivo más reciente
-        nombre_stock = 'SPA_stock_P1.xlsx'  # Valor por defecto
+    # Un archivo de stock por período
+    stocks = {periodo: cargar_archivo_stock(periodo) for periodo in periodos_a_procesar}
     
-    try:
-        stock_df = pd.read_excel(os.path.join(DIRECTORIO_DATA, nombre_stock))
-    except FileNotFoundError:
-        print(f"ADVERTENCIA: No se encontró {nombre_stock}, buscando archivo alternativo...")
-        # Buscar cualquier archivo de stock disponible
-        archivos_stock = [f for f in os.listdir(DIRECTORIO_DATA) if f.startswith('SPA_stock') and f.endswith('.xlsx')]
-        if archivos_stock:
-            nombre_stock = archivos_stock[0]
-            stock_df = pd.read_excel(os.path.join(DIRECTORIO_DATA, nombre_stock))
-        else:
-            print("ERROR: No se encontró ningún archivo de stock")
-            sys.exit(1)
+    # Configurar los períodos usando el año detectado
+    configuraciones = {periodo: configurar_periodo(periodo, CONFIG, año_datos) for periodo in periodos_a_procesar}
+    establecer_periodo(configuraciones[periodos_a_procesar[0]])
     
-    print(f"STOCK: {len(stock_df)} registros cargados ({nombre_stock})")
+    for fecha_inicio, fecha_fin, dias_periodo, nombre_periodo, _ in configuraciones.values():
+        print(f"\nPeríodo de análisis{f' {nombre_periodo}' if args.todos_periodos else ''}:")
+        print(f"   Desde: {fecha_inicio.strftime('%d de %B de %Y')}")
+        print(f"   Hasta: {fecha_fin.strftime('%d de %B de %Y')}")
+        print(f"   Días: {dias_periodo}")
     
-    # Configurar el período usando el año detectado
-    global FECHA_INICIO, FECHA_FIN, DIAS_PERIODO, PERIODO, AÑO
-    FECHA_INICIO, FECHA_FIN, DIAS_PERIODO, PERIODO, AÑO = configurar_periodo(periodo_seleccionado, CONFIG, año_datos)
-    
-    print(f"\nPeríodo de análisis:")
-    print(f"   Desde: {FECHA_INICIO.strftime('%d de %B de %Y')}")
-    print(f"   Hasta: {FECHA_FIN.strftime('%d de %B de %Y')}")
-    print(f"   Días: {DIAS_PERIODO}")
+    # Intervalo que cubre todos los períodos (el propio período si solo hay uno)
+    fecha_inicio_datos = min(configuracion[0] for configuracion in configuraciones.values())
+    fecha_fin_datos = max(configuracion[1] for configuracion in configuraciones.values())
     
     # =========================================================================
     # FILTRAR DATOS POR PERÍODO (SOLO COMPRAS Y VENTAS)
@@ -1719,57 +2358,32 @@ Secciones disponibles:
     
     # Filtrar compras por período
     filas_antes_compras = len(compras_df)
-    compras_df = compras_df[
-        (compras_df['Fecha'] >= FECHA_INICIO) & 
-        (compras_df['Fecha'] <= FECHA_FIN)
-    ].copy()
+    compras_df = filtrar_por_fechas(compras_df, fecha_inicio_datos, fecha_fin_datos)
     filas_despues_compras = len(compras_df)
     print(f"COMPRAS filtradas por período: {filas_antes_compras} → {filas_despues_compras} registros")
-    print(f"   Período: {FECHA_INICIO.strftime('%d/%m/%Y')} - {FECHA_FIN.strftime('%d/%m/%Y')}")
+    print(f"   Período: {fecha_inicio_datos.strftime('%d/%m/%Y')} - {fecha_fin_datos.strftime('%d/%m/%Y')}")
     
     # Filtrar ventas por período
     filas_antes_ventas = len(ventas_df)
-    ventas_df = ventas_df[
-        (ventas_df['Fecha'] >= FECHA_INICIO) & 
-        (ventas_df['Fecha'] <= FECHA_FIN)
-    ].copy()
+    ventas_df = filtrar_por_fechas(ventas_df, fecha_inicio_datos, fecha_fin_datos)
     filas_despues_ventas = len(ventas_df)
     print(f"VENTAS filtradas por período: {filas_antes_ventas} → {filas_despues_ventas} registros")
-    print(f"   Período: {FECHA_INICIO.strftime('%d/%m/%Y')} - {FECHA_FIN.strftime('%d/%m/%Y')}")
+    print(f"   Período: {fecha_inicio_datos.strftime('%d/%m/%Y')} - {fecha_fin_datos.strftime('%d/%m/%Y')}")
     
     if len(compras_df) == 0:
         print("ADVERTENCIA: No hay datos de compras en el período especificado.")
     if len(ventas_df) == 0:
         print("ADVERTENCIA: No hay datos de ventas en el período especificado.")
     
-    # Filtrar filas con Artículo vacío en Compras
-    filas_antes = len(compras_df)
-    compras_df = compras_df[compras_df['Artículo'].notna() & (compras_df['Artículo'] != '')]
-    filas_eliminadas = filas_antes - len(compras_df)
-    if filas_eliminadas > 0:
-        print(f"Eliminadas {filas_eliminadas} filas con artículo vacío en Compras")
-    
     # Rellenar celdas vacías en STOCK
-    filas_vacias_stock = stock_df['Artículo'].isna().sum()
-    if filas_vacias_stock > 0:
-        stock_df['Artículo'] = stock_df['Artículo'].ffill()
-        stock_df['Nombre artículo'] = stock_df['Nombre artículo'].ffill()
-        print(f"STOCK: {len(stock_df)} registros ({filas_vacias_stock} celdas vacías preenchidas)")
-    else:
-        print(f"STOCK: {len(stock_df)} registros")
-    
-    # =========================================================================
-    # PROCESAR DATOS DE VENTAS - Calcular Coste y Beneficio
-    # =========================================================================
-    
-    print("\n" + "=" * 80)
-    print("FASE 1B: CÁLCULO DE COSTE Y BENEFICIO EN VENTAS")
-    print("=" * 80)
-    
-    # Filtrar solo filas de tipo 'Detalle'
-    filas_ventas_total = len(ventas_df)
-    ventas_df = ventas_df[ventas_df['Tipo registro'] == 'Detalle'].copy()
-    print(f"VENTAS: {filas_ventas_total} filas totales → {len(ventas_df)} filas de Detalle")
+    for stock_df in stocks.values():
+        filas_vacias_stock = stock_df['Artículo'].isna().sum()
+        if filas_vacias_stock > 0:
+            stock_df['Artículo'] = stock_df['Artículo'].ffill()
+            stock_df['Nombre artículo'] = stock_df['Nombre artículo'].ffill()
+            print(f"STOCK: {len(stock_df)} registros ({filas_vacias_stock} celdas vacías preenchidas)")
+        else:
+            print(f"STOCK: {len(stock_df)} registros")
     
     # Normalizar claves de unión en Coste
     # Ordenar por fecha de última compra (buscando columna automáticamente)
@@ -1796,94 +2410,11 @@ Secciones disponibles:
         df['Color'] = df['Color'].fillna('').astype(str).str.strip()
         return df
     
-    ventas_normalized = normalize_keys(ventas_df)
     coste_normalized = normalize_keys_coste(coste_df_latest)
     
     # Seleccionar solo las columnas necesarias de coste (ya renombrado a Artículo)
     coste_for_merge = coste_normalized[['Artículo', 'Talla', 'Color', 'Coste']].copy()
     
-    # Merge de ventas con costes
-    ventas_with_costs = pd.merge(
-        ventas_normalized,
-        coste_for_merge,
-        on=['Artículo', 'Talla', 'Color'],
-        how='left'
-    )
-    
-    # Calcular Coste total
-    def calculate_cost(row):
-        try:
-            unidades = row['Unidades'] if pd.notna(row['Unidades']) else 1
-            importe = row['Importe'] if pd.notna(row['Importe']) else 0
-            coste_unitario = row['Coste'] if pd.notna(row['Coste']) else 0
-            
-            if coste_unitario > 0:
-                return unidades * coste_unitario
-            
-            if unidades > 0 and importe > 0:
-                pvp = importe / unidades
-                iva = obtener_iva_articulo(row['Artículo'])
-                
-                if iva == 10:
-                    coste_calculado = (pvp / 1.10) / 2.3
-                else:
-                    coste_calculado = (pvp / 1.21) / 2
-                
-                return unidades * coste_calculado
-            
-            return 0
-        except:
-            return 0
-    
-    ventas_with_costs['Coste'] = ventas_with_costs.apply(calculate_cost, axis=1)
-    
-    # Calcular Beneficio
-    def calculate_beneficio(row):
-        try:
-            importe = row['Importe'] if pd.notna(row['Importe']) else 0
-            coste = row['Coste'] if pd.notna(row['Coste']) else 0
-            iva = obtener_iva_articulo(row['Artículo'])
-            beneficio = (importe / (1 + iva / 100)) - coste
-            return beneficio
-        except:
-            return 0
-    
-    ventas_with_costs['Beneficio'] = ventas_with_costs.apply(calculate_beneficio, axis=1)
-    
-    # Seleccionar solo las columnas necesarias
-    columnas_ventas = ['Vendedor', 'Serie', 'Documento', 'Fecha', 'Factura', 
-                       'Artículo', 'Nombre artículo', 'Talla', 'Color', 
-                       'Unidades', 'Precio', 'Importe', 'Comisión', 'Tipo registro',
-                       'Coste', 'Beneficio']
-    
-    ventas_df = ventas_with_costs[columnas_ventas].copy()
-    
-    # Convertir columnas a tipos numéricos correctos
-    ventas_df['Unidades'] = pd.to_numeric(ventas_df['Unidades'], errors='coerce').fillna(0)
-    ventas_df['Importe'] = pd.to_numeric(ventas_df['Importe'], errors='coerce').fillna(0)
-    ventas_df['Coste'] = pd.to_numeric(ventas_df['Coste'], errors='coerce').fillna(0)
-    ventas_df['Beneficio'] = pd.to_numeric(ventas_df['Beneficio'], errors='coerce').fillna(0)
-    
-    # Resumen del procesamiento
-    ventas_sin_coste = (ventas_with_costs['Coste'] == 0).sum()
-    print(f"VENTAS procesadas: {len(ventas_df)} registros")
-    print(f"  - Con coste encontrado: {len(ventas_df) - ventas_sin_coste}")
-    print(f"  - Sin coste (asignado 0): {ventas_sin_coste}")
-    print(f"\nTotal importe ventas: {ventas_df['Importe'].sum():.2f} €")
-    print(f"Total coste ventas: {ventas_df['Coste'].sum():.2f} €")
-    print(f"Total beneficio: {ventas_df['Beneficio'].sum():.2f} €")
-    
-    # Las fechas ya fueron convertidas y filtradas en FASE 1A
-    # No es necesario convertirlas nuevamente
-    
-    # =========================================================================
-    # NORMALIZACIÓN DE DATOS
-    # =========================================================================
-    
-    print("\n" + "=" * 80)
-    print("FASE 2: NORMALIZACIÓN DE DATOS")
-    print("=" * 80)
-    
     def normalizar_articulo(df):
         df = df.copy()
         
@@ -1901,12 +2432,6 @@ Secciones disponibles:
         df['color_str'] = df['Color'].fillna('').astype(str).str.strip()
         return df
     
-    ventas_df = normalizar_articulo(ventas_df)
-    compras_df = normalizar_articulo(compras_df)
-    stock_df = normalizar_articulo(stock_df)
-    
-    print("Columnas normalizadas creadas para comparación")
-    
     # =========================================================================
     # FILTRAR ARTÍCULOS CON MENOS DE 10 DÍGITOS (REGLA PRIORITARIA)
     # =========================================================================
@@ -1920,34 +2445,132 @@ Secciones disponibles:
             return False
         return len(codigo) >= 10
     
-    compras_filas_antes = len(compras_df)
-    ventas_filas_antes = len(ventas_df)
-    stock_filas_antes = len(stock_df)
+    def preparar_movimientos(compras_df, ventas_df):
+        """Calcula coste y beneficio de las ventas, normaliza y filtra compras y ventas."""
+        # Filtrar filas con Artículo vacío en Compras
+        filas_antes = len(compras_df)
+        compras_df = compras_df[compras_df['Artículo'].notna() & (compras_df['Artículo'] != '')]
+        filas_eliminadas = filas_antes - len(compras_df)
+        if filas_eliminadas > 0:
+            print(f"Eliminadas {filas_eliminadas} filas con artículo vacío en Compras")
+        
+        # =====================================================================
+        # PROCESAR DATOS DE VENTAS - Calcular Coste y Beneficio
+        # =====================================================================
+        
+        print("\n" + "=" * 80)
+        print("FASE 1B: CÁLCULO DE COSTE Y BENEFICIO EN VENTAS")
+        print("=" * 80)
+        
+        # Filtrar solo filas de tipo 'Detalle'
+        filas_ventas_total = len(ventas_df)
+        ventas_df = ventas_df[ventas_df['Tipo registro'] == 'Detalle'].copy()
+        print(f"VENTAS: {filas_ventas_total} filas totales → {len(ventas_df)} filas de Detalle")
+        
+        # Merge de ventas con costes
+        ventas_with_costs = pd.merge(
+            normalize_keys(ventas_df),
+            coste_for_merge,
+            on=['Artículo', 'Talla', 'Color'],
+            how='left'
+        )
+        
+        # Calcular Coste total y Beneficio
+        iva_ventas = obtener_iva_articulos(ventas_with_costs['Artículo'])
+        ventas_with_costs['Coste'] = calcular_coste_ventas(ventas_with_costs, iva_ventas)
+        ventas_with_costs['Beneficio'] = calcular_beneficio_ventas(ventas_with_costs, iva_ventas)
+        
+        # Seleccionar solo las columnas necesarias
+        columnas_ventas = ['Vendedor', 'Serie', 'Documento', 'Fecha', 'Factura',
+                           'Artículo', 'Nombre artículo', 'Talla', 'Color',
+                           'Unidades', 'Precio', 'Importe', 'Comisión', 'Tipo registro',
+                           'Coste', 'Beneficio']
+        
+        ventas_df = ventas_with_costs[columnas_ventas].copy()
+        
+        # Convertir columnas a tipos numéricos correctos
+        ventas_df['Unidades'] = pd.to_numeric(ventas_df['Unidades'], errors='coerce').fillna(0)
+        ventas_df['Importe'] = pd.to_numeric(ventas_df['Importe'], errors='coerce').fillna(0)
+        ventas_df['Coste'] = pd.to_numeric(ventas_df['Coste'], errors='coerce').fillna(0)
+        ventas_df['Beneficio'] = pd.to_numeric(ventas_df['Beneficio'], errors='coerce').fillna(0)
+        
+        # Resumen del procesamiento
+        ventas_sin_coste = (ventas_with_costs['Coste'] == 0).sum()
+        print(f"VENTAS procesadas: {len(ventas_df)} registros")
+        print(f"  - Con coste encontrado: {len(ventas_df) - ventas_sin_coste}")
+        print(f"  - Sin coste (asignado 0): {ventas_sin_coste}")
+        print(f"\nTotal importe ventas: {ventas_df['Importe'].sum():.2f} €")
+        print(f"Total coste ventas: {ventas_df['Coste'].sum():.2f} €")
+        print(f"Total beneficio: {ventas_df['Beneficio'].sum():.2f} €")
+        
+        # Las fechas ya fueron convertidas y filtradas en FASE 1A
+        # No es necesario convertirlas nuevamente
+        
+        # =====================================================================
+        # NORMALIZACIÓN DE DATOS
+        # =====================================================================
+        
+        print("\n" + "=" * 80)
+        print("FASE 2: NORMALIZACIÓN DE DATOS")
+        print("=" * 80)
+        
+        ventas_df = normalizar_articulo(ventas_df)
+        compras_df = normalizar_articulo(compras_df)
+        
+        print("Columnas normalizadas creadas para comparación")
+        
+        compras_filas_antes = len(compras_df)
+        ventas_filas_antes = len(ventas_df)
+        
+        # Filtrar artículos con códigos menores a 10 dígitos
+        # (astype(bool): en un DataFrame vacío apply no devuelve una máscara booleana)
+        compras_df = compras_df[compras_df['codigo_str'].apply(codigo_valido).astype(bool)].copy()
+        ventas_df = ventas_df[ventas_df['codigo_str'].apply(codigo_valido).astype(bool)].copy()
+        
+        print(f"\nFiltrados {compras_filas_antes - len(compras_df)} artículos con menos de 10 dígitos en COMPRAS")
+        print(f"Filtrados {ventas_filas_antes - len(ventas_df)} artículos con menos de 10 dígitos en VENTAS")
+        
+        # Filtrar filas con unidades = 0
+        compras_filas_antes = len(compras_df)
+        ventas_filas_antes = len(ventas_df)
+        
+        compras_df = compras_df[compras_df['Unidades'].notna() & (compras_df['Unidades'] > 0)].copy()
+        ventas_df = ventas_df[ventas_df['Unidades'].notna() & (ventas_df['Unidades'] > 0)].copy()
+        
+        print(f"\nFiltradas {compras_filas_antes - len(compras_df)} filas con 0 unidades en COMPRAS")
+        print(f"Filtradas {ventas_filas_antes - len(ventas_df)} filas con 0 unidades en VENTAS")
+        
+        return compras_df, ventas_df
+    
+    # Modo incremental: preparar solo las filas posteriores a la marca de agua
+    # y sumarlas a los agregados del almacén
+    if args.incremental:
+        compras_df, ventas_df = actualizar_almacen_incremental(
+            ruta_almacen_agregados(PERIODO, AÑO), compras_df, ventas_df, coste_df, preparar_movimientos)
+    else:
+        compras_df, ventas_df = preparar_movimientos(compras_df, ventas_df)
+    
+    # Normalizar y filtrar el stock de cada período con las mismas reglas
+    stocks = {periodo: normalizar_articulo(stock_df) for periodo, stock_df in stocks.items()}
     
-    # Filtrar artículos con códigos menores a 10 dígitos
-    compras_df = compras_df[compras_df['codigo_str'].apply(codigo_valido)].copy()
-    ventas_df = ventas_df[ventas_df['codigo_str'].apply(codigo_valido)].copy()
-    stock_df = stock_df[stock_df['codigo_str'].apply(codigo_valido)].copy()
+    # Etiqueta de cada archivo de stock en los mensajes
+    etiquetas_stock = {periodo: f"STOCK {periodo}" if args.todos_periodos else "STOCK" for periodo in stocks}
     
-    print(f"\nFiltrados {compras_filas_antes - len(compras_df)} artículos con menos de 10 dígitos en COMPRAS")
-    print(f"Filtrados {ventas_filas_antes - len(ventas_df)} artículos con menos de 10 dígitos en VENTAS")
-    print(f"Filtrados {stock_filas_antes - len(stock_df)} artículos con menos de 10 dígitos en STOCK")
+    stock_filas_antes = {periodo: len(stock_df) for periodo, stock_df in stocks.items()}
+    stocks = {periodo: stock_df[stock_df['codigo_str'].apply(codigo_valido).astype(bool)].copy()
+              for periodo, stock_df in stocks.items()}
+    for periodo, stock_df in stocks.items():
+        print(f"Filtrados {stock_filas_antes[periodo] - len(stock_df)} artículos con menos de 10 dígitos en {etiquetas_stock[periodo]}")
     
     # =========================================================================
     # FILTRAR FILAS CON UNIDADES = 0
     # =========================================================================
     
-    compras_filas_antes = len(compras_df)
-    ventas_filas_antes = len(ventas_df)
-    stock_filas_antes = len(stock_df)
-    
-    compras_df = compras_df[compras_df['Unidades'].notna() & (compras_df['Unidades'] > 0)].copy()
-    ventas_df = ventas_df[ventas_df['Unidades'].notna() & (ventas_df['Unidades'] > 0)].copy()
-    stock_df = stock_df[stock_df['Unidades'].notna() & (stock_df['Unidades'] > 0)].copy()
-    
-    print(f"\nFiltradas {compras_filas_antes - len(compras_df)} filas con 0 unidades en COMPRAS")
-    print(f"Filtradas {ventas_filas_antes - len(ventas_df)} filas con 0 unidades en VENTAS")
-    print(f"Filtradas {stock_filas_antes - len(stock_df)} filas con 0 unidades en STOCK")
+    stock_filas_antes = {periodo: len(stock_df) for periodo, stock_df in stocks.items()}
+    stocks = {periodo: stock_df[stock_df['Unidades'].notna() & (stock_df['Unidades'] > 0)].copy()
+              for periodo, stock_df in stocks.items()}
+    for periodo, stock_df in stocks.items():
+        print(f"Filtradas {stock_filas_antes[periodo] - len(stock_df)} filas con 0 unidades en {etiquetas_stock[periodo]}")
     
     # =========================================================================
     # PROCESAR SECCIONES
@@ -1963,23 +2586,29 @@ Secciones disponibles:
     else:
         secciones_a_procesar = list(SECCIONES.items())
     
-    # Procesar cada sección
+    # Asignar la sección de cada fila una sola vez; las columnas de la clave
+    # de artículo pasan a categóricas (un entero por fila en lugar de un str)
+    for df in (compras_df, ventas_df, *stocks.values()):
+        convertir_a_categorias(df, CLAVE_ARTICULO)
+        df['seccion'] = asignar_secciones(df['codigo_str'], CODIGOS_MASCOTAS_VIVO, 'tierra_aridos')
+    
+    # Procesar todas las secciones de cada período en una sola pasada
+    resultados_periodos = clasificar_periodos(configuraciones, compras_df, ventas_df, stocks,
+                                              secciones_a_procesar, args.workers)
+    
     estadisticas = []
     secciones_procesadas = []
     secciones_sin_datos = []
     
-    for nombre_seccion, seccion_info in secciones_a_procesar:
-        resultado = procesar_seccion(
-            compras_df, ventas_df, stock_df, coste_df,
-            nombre_seccion, seccion_info
-        )
-        
-        if resultado:
-            estadisticas.append(resultado)
-            secciones_procesadas.append(nombre_seccion)
-            print(f"\n✓ Sección '{nombre_seccion}' completada: {resultado['archivo']}")
-        else:
-            secciones_sin_datos.append(nombre_seccion)
+    for periodo, resultados in resultados_periodos.items():
+        for (nombre_seccion, seccion_info), resultado in zip(secciones_a_procesar, resultados):
+            nombre = f"{nombre_seccion} ({periodo})" if args.todos_periodos else nombre_seccion
+            if resultado:
+                estadisticas.append(resultado)
+                secciones_procesadas.append(nombre)
+                print(f"\n✓ Sección '{nombre}' completada: {resultado['archivo']}")
+            else:
+                secciones_sin_datos.append(nombre)
     
     # =========================================================================
     # RESUMEN FINAL
@@ -1990,11 +2619,16 @@ Secciones disponibles:
     print("=" * 80)
     
     # Mostrar información del período
-    if periodo_seleccionado:
-        print(f"\nPeríodo procesado: {periodo_seleccionado}")
+    if args.todos_periodos:
+        print(f"\nPeríodos procesados: {', '.join(periodos_a_procesar)}")
+        for fecha_inicio, fecha_fin, dias_periodo, nombre_periodo, _ in configuraciones.values():
+            print(f"Fechas {nombre_periodo}: {fecha_inicio.strftime('%d/%m/%Y')} - {fecha_fin.strftime('%d/%m/%Y')} ({dias_periodo} días)")
     else:
-        print(f"\nPeríodo procesado: AÑO COMPLETO (sin filtro de período)")
-    print(f"Fechas: {FECHA_INICIO.strftime('%d/%m/%Y')} - {FECHA_FIN.strftime('%d/%m/%Y')} ({DIAS_PERIODO} días)")
+        if periodo_seleccionado:
+            print(f"\nPeríodo procesado: {periodo_seleccionado}")
+        else:
+            print(f"\nPeríodo procesado: AÑO COMPLETO (sin filtro de período)")
+        print(f"Fechas: {FECHA_INICIO.strftime('%d/%m/%Y')} - {FECHA_FIN.strftime('%d/%m/%Y')} ({DIAS_PERIODO} días)")
     
     print(f"\nSecciones procesadas: {len(secciones_procesadas)}")
     if secciones_procesadas:
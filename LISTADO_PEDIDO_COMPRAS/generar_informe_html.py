@@ -13,6 +13,8 @@ import numpy as np
 from datetime import datetime
 import os
 import warnings
+
+from src.clasificador_secciones import determinar_seccion_codigo
 warnings.filterwarnings('ignore')
 
 # ============================================
@@ -149,7 +151,7 @@ SECCIONES = {
 def determinar_seccion(codigo_articulo):
     """
     Determina la sección de un artículo según su código.
-    Copiado exactamente de pedido_compras.py
+    Delega en el clasificador compartido (src/clasificador_secciones.py).
     
     Args:
         codigo_articulo: Código del artículo (puede ser string o número)
@@ -157,63 +159,7 @@ def determinar_seccion(codigo_articulo):
     Returns:
         str: Nombre de la sección o None si no se puede clasificar
     """
-    if codigo_articulo is None:
-        return None
-    
-    codigo_str = str(codigo_articulo).strip()
-    
-    # Eliminar decimales si viene como float
-    if codigo_str.endswith('.0'):
-        codigo_str = codigo_str[:-2]
-    
-    if not codigo_str or codigo_str == 'nan':
-        return None
-    
-    # REGLA CRÍTICA: Filtrar artículos con menos de 10 dígitos
-    # Esta regla tiene prioridad sobre todas las demás
-    if len(codigo_str) < 10:
-        return None
-    
-    # 1. Verificar códigos de mascotas vivos (primero, tienen prioridad)
-    # Los códigos de mascotas vivos son códigos de 4 dígitos (2104, 2204, etc.)
-    if codigo_str.startswith('2') and codigo_str[:4] in CODIGOS_MASCOTAS_VIVO:
-        return 'mascotas_vivo'
-    
-    # 2. Sección 2: Mascotas manufacturadas (empieza por 2 y no está en vivos)
-    if codigo_str.startswith('2'):
-        return 'mascotas_manufacturado'
-    
-    # 3. Sección 3: Tierra/Áridos (31 o 32)
-    if codigo_str.startswith('31') or codigo_str.startswith('32'):
-        return 'tierra_aridos'
-    
-    # 4. Sección 3: Fitosanitarios (33-39)
-    if codigo_str.startswith('3'):
-        if len(codigo_str) >= 2:
-            try:
-                segundo_digito = int(codigo_str[1])
-                if 3 <= segundo_digito <= 9:
-                    return 'fitos'
-            except (ValueError, IndexError):
-                pass
-    
-    # 5. Secciones por primer dígito
-    if codigo_str.startswith('1'):
-        return 'interior'
-    elif codigo_str.startswith('4'):
-        return 'utiles_jardin'
-    elif codigo_str.startswith('5'):
-        return 'semillas'
-    elif codigo_str.startswith('6'):
-        return 'deco_interior'
-    elif codigo_str.startswith('7'):
-        return 'maf'
-    elif codigo_str.startswith('8'):
-        return 'vivero'
-    elif codigo_str.startswith('9'):
-        return 'deco_exterior'
-    
-    return None
+    return determinar_seccion_codigo(codigo_articulo, CODIGOS_MASCOTAS_VIVO, 'tierra_aridos')
 
 def obtener_descripcion_seccion(seccion):
     """
@@ -275,11 +221,9 @@ def cargar_datos_seccion(pedido_xlsx, resumen_xlsx):
         top_importe = pd.DataFrame()
         
         try:
-            xl = pd.ExcelFile(pedido_xlsx)
             todos_articulos = []
-            for sheet in xl.sheet_names:
+            for sheet, df in pd.read_excel(pedido_xlsx, sheet_name=None).items():
                 if sheet.startswith('Semana_'):
-                    df = pd.read_excel(pedido_xlsx, sheet_name=sheet)
                     df['Semana'] = int(sheet.split('_')[1])
                     todos_articulos.append(df)
             
@@ -19,6 +19,7 @@ sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
 
 from src.data_loader import DataLoader
 from src.state_manager import StateManager
+from src.historico_stock import HistoricoStock
 from src.forecast_engine import ForecastEngine
 from src.order_generator import OrderGenerator
 from src.scheduler_service import SchedulerService, EstadoEjecucion
@@ -30,6 +31,9 @@ from src.email_service import EmailService, crear_email_service
 
 import pandas as pd
 
+# Logger por defecto (main() lo sustituye por el configurado con configurar_logging)
+logger = logging.getLogger()
+
 def configurar_logging(nivel: int = logging.INFO, log_file: Optional[str] = None) -> logging.Logger:
     formato = logging.Formatter(
         '%(asctime)s - %(levelname)s - %(message)s',
@@ -408,14 +412,432 @@ def agrupar_archivos_por_seccion(
 
     return archivos_por_seccion
 
+def enviar_emails_semana(
+    semana: int,
+    config: Dict[str, Any],
+    archivos_generados: List[str]
+) -> Tuple[Dict[str, Any], Dict[str, Any]]:
+    """
+    Envía los pedidos de una semana a los encargados y el resumen a gestión.
+
+    Args:
+        semana (int): Número de semana
+        config (Dict[str, Any]): Configuración del sistema
+        archivos_generados (List[str]): Archivos generados en la semana
+
+    Returns:
+        Tuple[Dict[str, Any], Dict[str, Any]]: (resultado del envío a los
+            encargados, resultado del envío del resumen de gestión)
+    """
+    resultado_resumen_gestion = {'enviado': False, 'razon': 'no_enviado'}
+    
+    logger.info("\n" + "=" * 60)
+    logger.info("PREPARANDO ENVÍO DE EMAILS")
+    logger.info("=" * 60)
+    
+    # CORRECCIÓN: Usar la función grouping corregida
+    archivos_por_seccion = agrupar_archivos_por_seccion(archivos_generados, config)
+
+    resultado_email, email_service = enviar_emails_pedidos(semana, config, archivos_por_seccion)
+
+    # Enviar resumen a los responsables de gestión (Sandra, Ivan, Pedro)
+    if email_service:
+        logger.info("\n" + "=" * 60)
+        logger.info("PREPARANDO ENVÍO DE RESUMEN A RESPONSABLES DE GESTIÓN")
+        logger.info("=" * 60)
+        
+        # Buscar el archivo de resumen consolidado (excluir archivos antiguos)
+        archivo_resumen = None
+        for archivo in archivos_generados:
+            if archivo and 'RESUMEN' in Path(archivo).name.upper():
+                # Excluir archivos antiguos (que empiezan con número o contienen 'old')
+                nombre = Path(archivo).name
+                if not nombre[0].isdigit() and 'old' not in nombre.lower():
+                    archivo_resumen = archivo
+                    break
+        
+        if archivo_resumen:
+            logger.info(f"Archivo de resumen encontrado: {Path(archivo_resumen).name}")
+            resultado_resumen_gestion = email_service.enviar_resumen_gestion(semana, archivo_resumen)
+        else:
+            logger.warning("No se encontró archivo de resumen consolidado")
+            logger.info("Omitiendo envío de resumen a responsables de gestión")
+    
+    return resultado_email, resultado_resumen_gestion
+
+def _resultado_seccion_vacio(seccion: str) -> Dict[str, Any]:
+    """
+    Crea el resultado inicial del procesamiento de una sección.
+
+    Args:
+        seccion (str): Nombre de la sección
+
+    Returns:
+        Dict[str, Any]: Resultado sin pedidos, archivos ni errores
+    """
+    return {
+        'seccion': seccion,
+        'pedidos_final': None,
+        'pedidos_corregido': None,
+        'datos_semana': None,
+        'nuevo_stock': {},
+        'metricas_correccion': None,
+        'archivos': [],
+        'articulos': 0,
+        'importe': 0.0,
+        'error': None,
+        'traza': None
+    }
+
+def _resultado_error_seccion(seccion: str, error: BaseException) -> Dict[str, Any]:
+    """
+    Crea el resultado de una sección cuyo procesamiento ha fallado.
+
+    Args:
+        seccion (str): Nombre de la sección
+        error (BaseException): Excepción producida
+
+    Returns:
+        Dict[str, Any]: Resultado con el error y su traza
+    """
+    import traceback
+    resultado = _resultado_seccion_vacio(seccion)
+    resultado['error'] = str(error)
+    resultado['traza'] = ''.join(traceback.format_exception(type(error), error, error.__traceback__))
+    return resultado
+
+def procesar_seccion_semana(
+    seccion: str,
+    semana: int,
+    config: Dict[str, Any],
+    datos_seccion: Tuple[Optional[pd.DataFrame], Optional[pd.DataFrame], Optional[pd.DataFrame]],
+    stock_acumulado: Dict[str, int],
+    aplicar_correccion: bool = True,
+    forecast_engine: Optional[ForecastEngine] = None,
+    order_generator: Optional[OrderGenerator] = None
+) -> Dict[str, Any]:
+    """
+    Procesa el pedido de una sección: forecast, stock mínimo, corrección y Excel.
+
+    No modifica stock_acumulado: el stock mínimo nuevo de la sección se
+    devuelve en 'nuevo_stock' para que el llamador lo fusione. Los errores
+    quedan recogidos en el resultado (con lo generado hasta el fallo) para
+    que no afecten al resto de secciones.
+
+    Args:
+        seccion (str): Nombre de la sección
+        semana (int): Número de semana
+        config (Dict[str, Any]): Configuración del sistema
+        datos_seccion (Tuple): (abc_df, ventas_df, costes_df) de la sección
+        stock_acumulado (Dict[str, int]): Stock acumulado por artículo
+        aplicar_correccion (bool): Aplicar la corrección FASE 2
+        forecast_engine (Optional[ForecastEngine]): Motor de forecast (se crea si es None)
+        order_generator (Optional[OrderGenerator]): Generador de pedidos (se crea si es None)
+
+    Returns:
+        Dict[str, Any]: Resultado de la sección (pedidos, archivos, stock nuevo, métricas y error)
+    """
+    logger.info(f"\n{'=' * 50}")
+    logger.info(f"SECCION: {seccion.upper()}")
+    logger.info(f"{'=' * 50}")
+    
+    resultado = _resultado_seccion_vacio(seccion)
+    
+    try:
+        if forecast_engine is None:
+            forecast_engine = ForecastEngine(config)
+        if order_generator is None:
+            order_generator = OrderGenerator(config)
+        
+        abc_df, ventas_df, costes_df = datos_seccion
+        
+        logger.debug(f"[DEBUG] abc_df: {len(abc_df) if abc_df is not None else 0} registros")
+        logger.debug(f"[DEBUG] ventas_df: {len(ventas_df) if ventas_df is not None else 0} registros")
+        logger.debug(f"[DEBUG] costes_df: {len(costes_df) if costes_df is not None else 0} registros")
+        
+        if abc_df is None or ventas_df is None or costes_df is None:
+            logger.error(f"No se pudieron leer los datos para la seccion '{seccion}'")
+            return resultado
+        
+        if 'Semana' not in ventas_df.columns:
+            if 'Fecha' in ventas_df.columns:
+                ventas_df['Fecha'] = pd.to_datetime(ventas_df['Fecha'], errors='coerce')
+                ventas_df['Semana'] = ventas_df['Fecha'].apply(
+                    lambda x: x.isocalendar()[1] if pd.notna(x) else None
+                )
+            else:
+                logger.warning(f"No hay columna 'Fecha' ni 'Semana' en ventas de '{seccion}'")
+                return resultado
+        
+        datos_semana = ventas_df[ventas_df['Semana'] == semana]
+        
+        if len(datos_semana) == 0:
+            logger.warning(f"No hay datos de ventas para la semana {semana} en '{seccion}'")
+            return resultado
+        
+        logger.info(f"Datos de ventas: {len(datos_semana)} registros")
+        
+        parametros_seccion = {
+            'objetivos_semanales': config.get('secciones', {}).get(seccion, {}).get('objetivos_semanales', {}),
+            'objetivo_crecimiento': config.get('parametros', {}).get('objetivo_crecimiento', 0.05),
+            'stock_minimo_porcentaje': config.get('parametros', {}).get('stock_minimo_porcentaje', 0.30),
+            'festivos': config.get('festivos', {})
+        }
+        
+        pedidos = forecast_engine.calcular_pedido_semana(
+            semana, datos_semana, abc_df, costes_df, seccion
+        )
+        
+        if len(pedidos) == 0:
+            logger.warning(f"No se generaron pedidos para '{seccion}'")
+            return resultado
+        
+        pedidos, nuevo_stock, ajustes = forecast_engine.aplicar_stock_minimo(
+            pedidos, semana, stock_acumulado
+        )
+        
+        resultado['nuevo_stock'] = nuevo_stock
+        
+        if aplicar_correccion:
+            pedidos_corregido, metricas = aplicar_correccion_pedido(
+                pedidos.copy(), semana, config,
+                parametros_abc=config.get('parametros', {})
+            )
+            
+            if metricas.get('correccion_aplicada', False):
+                resultado['metricas_correccion'] = metricas
+                
+                archivo_corregido = generar_archivo_pedido_corregido(
+                    pedidos_corregido, semana, seccion, parametros_seccion, config, order_generator
+                )
+                
+                if archivo_corregido:
+                    resultado['archivos'].append(archivo_corregido)
+                    logger.info(f"Archivo corregido: {os.path.basename(archivo_corregido)}")
+                
+                pedidos_final = pedidos_corregido
+                resultado['pedidos_corregido'] = pedidos_corregido
+            else:
+                pedidos_final = pedidos
+                logger.info("Usando pedido teórico (sin corrección)")
+        else:
+            pedidos_final = pedidos
+        
+        archivo = order_generator.generar_archivo_pedido(pedidos_final, semana, seccion, parametros_seccion)
+        
+        if archivo:
+            resultado['archivos'].append(archivo)
+            
+            if 'Pedido_Final' in pedidos_final.columns:
+                pedidos_validos = pedidos_final[pedidos_final['Pedido_Final'] > 0]
+                articulos = len(pedidos_validos)
+                importe = pedidos_validos['Ventas_Objetivo'].sum()
+            else:
+                pedidos_validos = pedidos_final[pedidos_final['Pedido_Corregido_Stock'] > 0]
+                articulos = len(pedidos_validos)
+                importe = pedidos_validos['Ventas_Objetivo'].sum()
+            
+            resultado['articulos'] = articulos
+            resultado['importe'] = importe
+            
+            logger.info(f"Archivo generado: {archivo}")
+            logger.info(f"  Articulos: {articulos}")
+            logger.info(f"  Importe: {importe:.2f}€")
+        else:
+            logger.warning(f"No se generó archivo para '{seccion}'")
+        
+        resultado['pedidos_final'] = pedidos_final
+        resultado['datos_semana'] = datos_semana
+        
+    except Exception as e:
+        error = _resultado_error_seccion(seccion, e)
+        resultado['error'] = error['error']
+        resultado['traza'] = error['traza']
+    
+    return resultado
+
+def _inicializar_worker_seccion(nivel_log: int, log_file: Optional[str]) -> None:
+    """
+    Configura el logging de un proceso del pool de secciones.
+
+    Args:
+        nivel_log (int): Nivel de logging del proceso principal
+        log_file (Optional[str]): Archivo de log del proceso principal
+    """
+    global logger
+    logger = configurar_logging(nivel=nivel_log, log_file=log_file)
+
+def procesar_secciones_en_paralelo(
+    secciones: List[str],
+    semana: int,
+    config: Dict[str, Any],
+    data_loader: DataLoader,
+    stock_acumulado: Dict[str, int],
+    aplicar_correccion: bool,
+    workers: int
+) -> List[Dict[str, Any]]:
+    """
+    Procesa varias secciones en paralelo con un pool de procesos.
+
+    Los datos de entrada se cargan una sola vez en el proceso principal
+    (DataLoader con caché) y cada proceso recibe solo los DataFrames de su
+    sección. Todas las secciones parten del mismo stock acumulado (las
+    claves de artículo no se repiten entre secciones) y los resultados se
+    devuelven en el orden de 'secciones', de modo que la fusión posterior
+    del stock es determinista.
+
+    Args:
+        secciones (List[str]): Secciones a procesar
+        semana (int): Número de semana
+        config (Dict[str, Any]): Configuración del sistema
+        data_loader (DataLoader): Cargador de datos compartido
+        stock_acumulado (Dict[str, int]): Stock acumulado por artículo
+        aplicar_correccion (bool): Aplicar la corrección FASE 2
+        workers (int): Número máximo de procesos
+
+    Returns:
+        List[Dict[str, Any]]: Resultado de cada sección, en el orden de 'secciones'
+    """
+    from concurrent.futures import ProcessPoolExecutor
+    
+    logger.info(f"Procesando {len(secciones)} secciones en paralelo con {workers} procesos")
+    
+    resultados = {}
+    futuros = {}
+    
+    raiz = logging.getLogger()
+    log_file = next((h.baseFilename for h in raiz.handlers if isinstance(h, logging.FileHandler)), None)
+    
+    with ProcessPoolExecutor(
+        max_workers=min(workers, len(secciones)),
+        initializer=_inicializar_worker_seccion,
+        initargs=(raiz.level, log_file)
+    ) as executor:
+        for seccion in secciones:
+            try:
+                datos_seccion = data_loader.leer_datos_seccion(seccion)
+            except Exception as e:
+                resultados[seccion] = _resultado_error_seccion(seccion, e)
+                continue
+            
+            futuros[seccion] = executor.submit(
+                procesar_seccion_semana,
+                seccion, semana, config, datos_seccion, stock_acumulado, aplicar_correccion
+            )
+        
+        for seccion, futuro in futuros.items():
+            try:
+                resultados[seccion] = futuro.result()
+            except Exception as e:
+                resultados[seccion] = _resultado_error_seccion(seccion, e)
+    
+    return [resultados[seccion] for seccion in secciones]
+
+def cargar_stock_semana_anterior(
+    semana: int,
+    state_manager: StateManager,
+    historico_stock: HistoricoStock
+) -> Dict[str, Any]:
+    """
+    Carga el stock acumulado del que parte el cálculo de una semana.
+
+    El cálculo parte del stock acumulado al final de la semana anterior. Si
+    el histórico semanal tiene datos se toma de él, de modo que reprocesar
+    una semana pasada no use el stock de semanas posteriores. Si el año aún
+    no tiene histórico (primera semana del año), se parte del stock final del
+    histórico del año anterior; el stock acumulado del estado solo se usa si
+    tampoco existe.
+
+    Args:
+        semana (int): Semana a procesar
+        state_manager (StateManager): Gestor del estado
+        historico_stock (HistoricoStock): Histórico semanal del stock
+
+    Returns:
+        Dict[str, Any]: Stock acumulado por artículo
+    """
+    if historico_stock.tiene_datos():
+        semanas_registradas = historico_stock.semanas_registradas()
+        if semanas_registradas and semana < semanas_registradas[0]:
+            logger.warning(f"El histórico de stock empieza en la semana {semanas_registradas[0]}: "
+                           f"se usa su stock de partida para la semana {semana}")
+        stock_acumulado = historico_stock.stock_hasta_semana(semana - 1)
+        logger.info(f"Stock acumulado de la semana {semana - 1} cargado del histórico: {len(stock_acumulado)} artículos")
+        return stock_acumulado
+    
+    historico_anterior = HistoricoStock(historico_stock.config, historico_stock.año - 1)
+    if historico_anterior.tiene_datos():
+        stock_acumulado = historico_anterior.stock_hasta_semana(53)
+        logger.info(f"Stock acumulado final de {historico_anterior.año} cargado del histórico: {len(stock_acumulado)} artículos")
+        return stock_acumulado
+    
+    stock_acumulado = state_manager.obtener_stock_acumulado()
+    logger.info(f"Stock acumulado cargado: {len(stock_acumulado)} artículos")
+    return stock_acumulado
+
+def es_semana_stock_mas_reciente(
+    semana: int,
+    año: int,
+    state_manager: StateManager,
+    scheduler: SchedulerService
+) -> bool:
+    """
+    Indica si una semana es posterior o igual a la del stock acumulado del estado.
+
+    El stock acumulado del estado es el de la última semana procesada y se
+    usa como stock de partida cuando no hay histórico. Reprocesar una semana
+    pasada no debe sustituirlo por el stock de esa semana.
+
+    Args:
+        semana (int): Semana procesada
+        año (int): Año de la semana
+        state_manager (StateManager): Gestor del estado
+        scheduler (SchedulerService): Servicio de planificación
+
+    Returns:
+        bool: True si el stock de la semana debe guardarse en el estado
+    """
+    semana_stock = state_manager.obtener_semana_stock_acumulado()
+    if semana_stock is None:
+        ultima = state_manager.obtener_ultima_semana_procesada()
+        if ultima is None:
+            return True
+        semana_stock = (scheduler.calcular_año_semana(ultima), ultima)
+    return (año, semana) >= tuple(semana_stock)
+
 def procesar_pedido_semana(
     semana: int, 
     config: Dict[str, Any], 
     state_manager: StateManager,
     forzar: bool = False,
     aplicar_correccion: bool = True,
-    enviar_email: bool = True
-) -> Tuple[bool, Optional[str], int, float, Dict[str, Any], Dict[str, Any]]:
+    enviar_email: bool = True,
+    workers: int = 1,
+    data_loader: Optional[DataLoader] = None,
+    stock_acumulado: Optional[Dict[str, Any]] = None
+) -> Tuple[bool, Optional[str], int, float, Dict[str, Any], Dict[str, Any], Dict[str, Any], List[str]]:
+    """
+    Genera los pedidos de una semana para todas las secciones activas.
+
+    Args:
+        semana (int): Número de semana
+        config (Dict[str, Any]): Configuración del sistema
+        state_manager (StateManager): Gestor del estado
+        forzar (bool): Semana forzada por argumento
+        aplicar_correccion (bool): Aplicar la corrección FASE 2
+        enviar_email (bool): Enviar los emails al terminar la semana
+        workers (int): Procesos para calcular las secciones en paralelo
+        data_loader (Optional[DataLoader]): Cargador de datos (se crea si es
+            None); reutilizarlo entre semanas evita releer las entradas
+        stock_acumulado (Optional[Dict[str, Any]]): Stock acumulado al final
+            de la semana anterior. Si es None se carga del histórico o del
+            estado; si se indica, se actualiza en el sitio con el stock de la
+            semana para encadenar la siguiente
+
+    Returns:
+        Tuple: (éxito, archivo principal, artículos, importe, métricas de
+            corrección, resultado email, resultado resumen gestión, archivos generados)
+    """
     logger.info("=" * 70)
     logger.info(f"PROCESANDO PEDIDO PARA SEMANA {semana}")
     logger.info("=" * 70)
@@ -425,16 +847,22 @@ def procesar_pedido_semana(
     else:
         logger.info("MODO: Solo FASE 1 (Forecast) - Corrección deshabilitada")
     
-    data_loader = DataLoader(config)
+    if data_loader is None:
+        data_loader = DataLoader(config)
     forecast_engine = ForecastEngine(config)
     order_generator = OrderGenerator(config)
     scheduler = SchedulerService(config)
     
-    fecha_lunes, fecha_domingo, fecha_archivo = scheduler.calcular_fechas_semana_pedido(semana)
+    año = scheduler.calcular_año_semana(semana)
+    fecha_lunes, fecha_domingo, fecha_archivo = scheduler.calcular_fechas_semana_pedido(semana, año)
     logger.info(f"Período de la semana: {fecha_lunes} al {fecha_domingo}")
     
-    stock_acumulado = state_manager.obtener_stock_acumulado()
-    logger.info(f"Stock acumulado cargado: {len(stock_acumulado)} artículos")
+    historico_stock = HistoricoStock(config, año)
+    if stock_acumulado is None:
+        stock_acumulado = cargar_stock_semana_anterior(semana, state_manager, historico_stock)
+    else:
+        logger.info(f"Stock acumulado de la semana {semana - 1} en memoria: {len(stock_acumulado)} artículos")
+    stock_anterior = dict(stock_acumulado)
     
     secciones = config.get('secciones_activas', [])
     pedidos_totales = {}
@@ -446,120 +874,66 @@ def procesar_pedido_semana(
     
     archivos_generados = []
     
-    for seccion in secciones:
-        logger.info(f"\n{'=' * 50}")
-        logger.info(f"SECCION: {seccion.upper()}")
-        logger.info(f"{'=' * 50}")
-        
-        try:
-            abc_df, ventas_df, costes_df = data_loader.leer_datos_seccion(seccion)
-            
-            logger.debug(f"[DEBUG] abc_df: {len(abc_df) if abc_df is not None else 0} registros")
-            logger.debug(f"[DEBUG] ventas_df: {len(ventas_df) if ventas_df is not None else 0} registros")
-            logger.debug(f"[DEBUG] costes_df: {len(costes_df) if costes_df is not None else 0} registros")
-            
-            if abc_df is None or ventas_df is None or costes_df is None:
-                logger.error(f"No se pudieron leer los datos para la seccion '{seccion}'")
-                continue
-            
-            if 'Semana' not in ventas_df.columns:
-                if 'Fecha' in ventas_df.columns:
-                    ventas_df['Fecha'] = pd.to_datetime(ventas_df['Fecha'], errors='coerce')
-                    ventas_df['Semana'] = ventas_df['Fecha'].apply(
-                        lambda x: x.isocalendar()[1] if pd.notna(x) else None
-                    )
-                else:
-                    logger.warning(f"No hay columna 'Fecha' ni 'Semana' en ventas de '{seccion}'")
-                    continue
-            
-            datos_semana = ventas_df[ventas_df['Semana'] == semana]
-            
-            if len(datos_semana) == 0:
-                logger.warning(f"No hay datos de ventas para la semana {semana} en '{seccion}'")
-                continue
-            
-            logger.info(f"Datos de ventas: {len(datos_semana)} registros")
-            
-            parametros_seccion = {
-                'objetivos_semanales': config.get('secciones', {}).get(seccion, {}).get('objetivos_semanales', {}),
-                'objetivo_crecimiento': config.get('parametros', {}).get('objetivo_crecimiento', 0.05),
-                'stock_minimo_porcentaje': config.get('parametros', {}).get('stock_minimo_porcentaje', 0.30),
-                'festivos': config.get('festivos', {})
-            }
-            
-            pedidos = forecast_engine.calcular_pedido_semana(
-                semana, datos_semana, abc_df, costes_df, seccion
-            )
-            
-            if len(pedidos) == 0:
-                logger.warning(f"No se generaron pedidos para '{seccion}'")
+    if workers > 1 and len(secciones) > 1:
+        resultados_secciones = procesar_secciones_en_paralelo(
+            secciones, semana, config, data_loader, stock_acumulado,
+            aplicar_correccion, workers
+        )
+    else:
+        resultados_secciones = []
+        for seccion in secciones:
+            try:
+                datos_seccion = data_loader.leer_datos_seccion(seccion)
+            except Exception as e:
+                resultados_secciones.append(_resultado_error_seccion(seccion, e))
                 continue
             
-            pedidos, nuevo_stock, ajustes = forecast_engine.aplicar_stock_minimo(
-                pedidos, semana, stock_acumulado
+            resultado = procesar_seccion_semana(
+                seccion, semana, config, datos_seccion, stock_acumulado,
+                aplicar_correccion, forecast_engine, order_generator
             )
+            resultados_secciones.append(resultado)
             
-            stock_acumulado.update(nuevo_stock)
-            
-            if aplicar_correccion:
-                pedidos_corregido, metricas = aplicar_correccion_pedido(
-                    pedidos.copy(), semana, config,
-                    parametros_abc=config.get('parametros', {})
-                )
-                
-                if metricas.get('correccion_aplicada', False):
-                    metricas_correccion_total[seccion] = metricas
-                    
-                    archivo_corregido = generar_archivo_pedido_corregido(
-                        pedidos_corregido, semana, seccion, parametros_seccion, config, order_generator
-                    )
-                    
-                    if archivo_corregido:
-                        archivos_generados.append(archivo_corregido)
-                        logger.info(f"Archivo corregido: {os.path.basename(archivo_corregido)}")
-                    
-                    pedidos_final = pedidos_corregido
-                    pedidos_corregidos[seccion] = pedidos_corregido
-                else:
-                    pedidos_final = pedidos
-                    logger.info("Usando pedido teórico (sin corrección)")
-            else:
-                pedidos_final = pedidos
-            
-            archivo = order_generator.generar_archivo_pedido(pedidos_final, semana, seccion, parametros_seccion)
-            
-            if archivo:
-                archivos_generados.append(archivo)
-                
-                if 'Pedido_Final' in pedidos_final.columns:
-                    pedidos_validos = pedidos_final[pedidos_final['Pedido_Final'] > 0]
-                    articulos = len(pedidos_validos)
-                    importe = pedidos_validos['Ventas_Objetivo'].sum()
-                else:
-                    pedidos_validos = pedidos_final[pedidos_final['Pedido_Corregido_Stock'] > 0]
-                    articulos = len(pedidos_validos)
-                    importe = pedidos_validos['Ventas_Objetivo'].sum()
-                
-                articulos_totales += articulos
-                importe_total += importe
-                
-                logger.info(f"Archivo generado: {archivo}")
-                logger.info(f"  Articulos: {articulos}")
-                logger.info(f"  Importe: {importe:.2f}€")
-            else:
-                logger.warning(f"No se generó archivo para '{seccion}'")
-            
-            pedidos_totales[seccion] = pedidos_final
-            datos_semanales[seccion] = datos_semana
-            
-        except Exception as e:
-            logger.error(f"Error procesando seccion '{seccion}': {str(e)}")
-            import traceback
-            logger.error(traceback.format_exc())
-            continue
+            # Las secciones siguientes ven el stock acumulado ya actualizado
+            stock_acumulado.update(resultado['nuevo_stock'])
+    
+    # Combinar los resultados en el orden de las secciones activas.
+    # En modo paralelo es aquí donde se fusiona el stock acumulado de cada
+    # sección (en modo secuencial ya se fusionó y la actualización no cambia nada).
+    for resultado in resultados_secciones:
+        seccion = resultado['seccion']
+        
+        stock_acumulado.update(resultado['nuevo_stock'])
+        archivos_generados.extend(resultado['archivos'])
+        
+        if resultado['metricas_correccion'] is not None:
+            metricas_correccion_total[seccion] = resultado['metricas_correccion']
+        if resultado['pedidos_corregido'] is not None:
+            pedidos_corregidos[seccion] = resultado['pedidos_corregido']
+        
+        if resultado['pedidos_final'] is not None:
+            articulos_totales += resultado['articulos']
+            importe_total += resultado['importe']
+            pedidos_totales[seccion] = resultado['pedidos_final']
+            datos_semanales[seccion] = resultado['datos_semana']
+        
+        if resultado['error']:
+            logger.error(f"Error procesando seccion '{seccion}': {resultado['error']}")
+            if resultado['traza']:
+                logger.error(resultado['traza'])
     
     if stock_acumulado:
-        state_manager.actualizar_stock_acumulado(stock_acumulado)
+        if es_semana_stock_mas_reciente(semana, año, state_manager, scheduler):
+            state_manager.actualizar_stock_acumulado(stock_acumulado, año_semana=(año, semana))
+        else:
+            logger.info(f"Semana {semana} anterior a la del stock acumulado del estado: solo se actualiza el histórico")
+        # El histórico es un archivo aparte del estado: se escribe solo cuando
+        # el estado de la semana se haya guardado (si la ejecución se revierte,
+        # la semana siguiente no debe partir de este stock)
+        stock_semana = dict(stock_acumulado)
+        state_manager.al_confirmar(
+            lambda: historico_stock.guardar_semana(semana, stock_anterior, stock_semana)
+        )
     
     # CORRECCIÓN: Generar archivo de resumen para CADA SECCIÓN y uno consolidado
     if pedidos_totales:
@@ -602,37 +976,7 @@ def procesar_pedido_semana(
     resultado_resumen_gestion = {'enviado': False, 'razon': 'no_enviado'}
     
     if enviar_email and archivos_generados:
-        logger.info("\n" + "=" * 60)
-        logger.info("PREPARANDO ENVÍO DE EMAILS")
-        logger.info("=" * 60)
-        
-        # CORRECCIÓN: Usar la función grouping corregida
-        archivos_por_seccion = agrupar_archivos_por_seccion(archivos_generados, config)
-
-        resultado_email, email_service = enviar_emails_pedidos(semana, config, archivos_por_seccion)
-
-        # Enviar resumen a los responsables de gestión (Sandra, Ivan, Pedro)
-        if email_service:
-            logger.info("\n" + "=" * 60)
-            logger.info("PREPARANDO ENVÍO DE RESUMEN A RESPONSABLES DE GESTIÓN")
-            logger.info("=" * 60)
-            
-            # Buscar el archivo de resumen consolidado (excluir archivos antiguos)
-            archivo_resumen = None
-            for archivo in archivos_generados:
-                if archivo and 'RESUMEN' in Path(archivo).name.upper():
-                    # Excluir archivos antiguos (que empiezan con número o contienen 'old')
-                    nombre = Path(archivo).name
-                    if not nombre[0].isdigit() and 'old' not in nombre.lower():
-                        archivo_resumen = archivo
-                        break
-            
-            if archivo_resumen:
-                logger.info(f"Archivo de resumen encontrado: {Path(archivo_resumen).name}")
-                resultado_resumen_gestion = email_service.enviar_resumen_gestion(semana, archivo_resumen)
-            else:
-                logger.warning("No se encontró archivo de resumen consolidado")
-                logger.info("Omitiendo envío de resumen a responsables de gestión")
+        resultado_email, resultado_resumen_gestion = enviar_emails_semana(semana, config, archivos_generados)
     
     logger.info("\n" + "=" * 70)
     logger.info("RESUMEN DE EJECUCION")
@@ -685,7 +1029,163 @@ def procesar_pedido_semana(
     
     logger.info("=" * 70)
     
-    return len(archivos_generados) > 0, archivo_principal, articulos_totales, importe_total, metricas_correccion_total, resultado_email, resultado_resumen_gestion
+    return len(archivos_generados) > 0, archivo_principal, articulos_totales, importe_total, metricas_correccion_total, resultado_email, resultado_resumen_gestion, archivos_generados
+
+def procesar_semana_en_transaccion(
+    semana: int,
+    config: Dict[str, Any],
+    state_manager: StateManager,
+    forzar: bool = False,
+    aplicar_correccion: bool = True,
+    enviar_email: bool = True,
+    workers: int = 1,
+    data_loader: Optional[DataLoader] = None,
+    stock_acumulado: Optional[Dict[str, Any]] = None
+) -> Tuple[bool, Optional[str], int, float, Dict[str, Any], Dict[str, Any], Dict[str, Any], List[str]]:
+    """
+    Procesa una semana guardando su estado en una única transacción.
+
+    Los emails se envían después de la transacción y solo si el estado se
+    guardó: si la ejecución se interrumpe con una excepción o el guardado
+    falla, no sale ningún pedido hacia los encargados (la siguiente ejecución
+    volverá a calcularlo a partir del stock guardado).
+
+    Args:
+        semana (int): Número de semana
+        config (Dict[str, Any]): Configuración del sistema
+        state_manager (StateManager): Gestor del estado
+        forzar (bool): Semana forzada por argumento
+        aplicar_correccion (bool): Aplicar la corrección FASE 2
+        enviar_email (bool): Enviar los emails tras guardar el estado
+        workers (int): Procesos para calcular las secciones en paralelo
+        data_loader (Optional[DataLoader]): Cargador de datos compartido
+        stock_acumulado (Optional[Dict[str, Any]]): Stock acumulado en memoria
+            (ver procesar_pedido_semana)
+
+    Returns:
+        Tuple: Igual que procesar_pedido_semana; el éxito es False si el
+            estado no se pudo guardar
+    """
+    with state_manager.transaccion():
+        exito, archivo, articulos, importe, metricas_correccion, resultado_email, resultado_resumen_gestion, archivos = procesar_pedido_semana(
+            semana, config, state_manager,
+            forzar=forzar,
+            aplicar_correccion=aplicar_correccion,
+            enviar_email=False,
+            workers=workers,
+            data_loader=data_loader,
+            stock_acumulado=stock_acumulado
+        )
+    
+    if not state_manager.transaccion_guardada:
+        logger.error(f"No se pudo guardar el estado de la semana {semana}: no se envían sus emails")
+        return False, archivo, articulos, importe, metricas_correccion, resultado_email, resultado_resumen_gestion, archivos
+    
+    if enviar_email and archivos:
+        resultado_email, resultado_resumen_gestion = enviar_emails_semana(semana, config, archivos)
+    
+    return exito, archivo, articulos, importe, metricas_correccion, resultado_email, resultado_resumen_gestion, archivos
+
+def procesar_rango_semanas(
+    desde: int,
+    hasta: int,
+    config: Dict[str, Any],
+    state_manager: StateManager,
+    aplicar_correccion: bool = True,
+    enviar_email: bool = True,
+    workers: int = 1
+) -> Dict[int, Dict[str, Any]]:
+    """
+    Procesa en orden las semanas de un rango (recuperación tras una parada o
+    arranque de un año nuevo).
+
+    Las entradas se leen una sola vez (un único DataLoader con caché para
+    todas las semanas) y el stock acumulado pasa en memoria de una semana a
+    la siguiente. Cada semana guarda su estado en su propia transacción. Si
+    una semana falla con una excepción o no se puede guardar su estado, el
+    rango se detiene ahí (las semanas siguientes partirían de un stock sin
+    guardar) y esa semana queda como fallida; las anteriores quedan
+    guardadas. Los emails se envían al final, solo de las semanas guardadas.
+
+    Args:
+        desde (int): Primera semana del rango
+        hasta (int): Última semana del rango (incluida)
+        config (Dict[str, Any]): Configuración del sistema
+        state_manager (StateManager): Gestor del estado
+        aplicar_correccion (bool): Aplicar la corrección FASE 2
+        enviar_email (bool): Enviar los emails al terminar el rango
+        workers (int): Procesos para calcular las secciones en paralelo
+
+    Returns:
+        Dict[int, Dict[str, Any]]: Resultado de cada semana procesada (éxito,
+            archivo, artículos, importe, archivos generados, resultados de
+            email y error); las semanas posteriores a un fallo no aparecen
+    """
+    logger.info("=" * 70)
+    logger.info(f"PROCESANDO SEMANAS {desde} A {hasta}")
+    logger.info("=" * 70)
+    
+    data_loader = DataLoader(config)
+    año = SchedulerService(config).calcular_año_semana(desde)
+    stock_acumulado = cargar_stock_semana_anterior(desde, state_manager, HistoricoStock(config, año))
+    
+    resultados = {}
+    for semana in range(desde, hasta + 1):
+        resultado = {
+            'exito': False,
+            'archivo': None,
+            'articulos': 0,
+            'importe': 0.0,
+            'metricas_correccion': {},
+            'archivos': [],
+            'guardada': False,
+            'error': None,
+            'email': {'exito': False, 'razon': 'no_enviado'},
+            'resumen_gestion': {'enviado': False, 'razon': 'no_enviado'}
+        }
+        resultados[semana] = resultado
+        
+        try:
+            exito, archivo, articulos, importe, metricas_correccion, _, _, archivos = procesar_semana_en_transaccion(
+                semana, config, state_manager,
+                forzar=True,
+                aplicar_correccion=aplicar_correccion,
+                enviar_email=False,
+                workers=workers,
+                data_loader=data_loader,
+                stock_acumulado=stock_acumulado
+            )
+        except Exception as e:
+            import traceback
+            logger.error(f"Error procesando la semana {semana}: {str(e)}")
+            logger.error(traceback.format_exc())
+            resultado['error'] = str(e)
+            break
+        
+        resultado.update({
+            'exito': exito,
+            'archivo': archivo,
+            'articulos': articulos,
+            'importe': importe,
+            'metricas_correccion': metricas_correccion,
+            'archivos': archivos,
+            'guardada': state_manager.transaccion_guardada
+        })
+        if not resultado['guardada']:
+            break
+    
+    if len(resultados) < hasta - desde + 1:
+        logger.error(f"Rango detenido en la semana {max(resultados)}: "
+                     f"semanas {max(resultados) + 1} a {hasta} sin procesar")
+    
+    if enviar_email:
+        for semana, resultado in resultados.items():
+            if resultado['guardada'] and resultado['archivos']:
+                resultado['email'], resultado['resumen_gestion'] = enviar_emails_semana(
+                    semana, config, resultado['archivos']
+                )
+    
+    return resultados
 
 def main():
     parser = argparse.ArgumentParser(
@@ -702,6 +1202,8 @@ Ejemplos de uso:
   python main.py --semana 15 --con-correccion     # FASE 1 + FASE 2 (forzado)
   python main.py --semana 15 --sin-email          # Sin enviar emails
   python main.py --verificar-email                # Verificar configuración de email
+  python main.py --semana 15 --workers 4          # Procesar secciones en paralelo (4 procesos)
+  python main.py --desde 10 --hasta 15            # Procesar las semanas 10 a 15 en orden
         """
     )
     
@@ -715,9 +1217,20 @@ Ejemplos de uso:
     parser.add_argument('--con-correccion', action='store_true', help='Forzar ejecución con corrección FASE 2')
     parser.add_argument('--sin-email', action='store_true', help='No enviar emails después de generar los pedidos')
     parser.add_argument('--verificar-email', action='store_true', help='Verificar la configuración de email y salir')
+    parser.add_argument('--workers', '-w', type=int, default=1, help='Procesos para calcular las secciones en paralelo (default: 1, secuencial)')
+    parser.add_argument('--desde', type=int, help='Primera semana de un rango a procesar en orden (con --hasta)')
+    parser.add_argument('--hasta', type=int, help='Última semana del rango a procesar (con --desde)')
     
     args = parser.parse_args()
     
+    if (args.desde is None) != (args.hasta is None):
+        parser.error('--desde y --hasta deben indicarse juntos')
+    if args.desde is not None:
+        if args.desde > args.hasta:
+            parser.error('--desde no puede ser mayor que --hasta')
+        if args.semana or args.continuo:
+            parser.error('--desde/--hasta no se pueden combinar con --semana ni --continuo')
+    
     nivel_log = logging.DEBUG if args.verbose else logging.INFO
     
     global logger
@@ -776,11 +1289,16 @@ Ejemplos de uso:
     logger.info(f"Envío de emails: {'Sí' if enviar_email else 'No'}")
     
     state_manager = StateManager(config)
-    state_manager.cargar_estado()
+    try:
+        state_manager.cargar_estado()
+    except RuntimeError as e:
+        logger.error(str(e))
+        sys.exit(1)
     
     if args.reset:
         logger.info("Reseteando estado del sistema...")
         state_manager.resetear_estado()
+        HistoricoStock(config).eliminar()
         logger.info("Estado reseteado correctamente.")
         sys.exit(0)
     
@@ -802,6 +1320,36 @@ Ejemplos de uso:
     scheduler = SchedulerService(config)
     ultima_procesada = state_manager.obtener_ultima_semana_procesada()
     
+    if args.desde is not None:
+        resultados = procesar_rango_semanas(
+            args.desde, args.hasta, config, state_manager,
+            aplicar_correccion=aplicar_correccion,
+            enviar_email=enviar_email,
+            workers=args.workers
+        )
+        
+        logger.info("\n" + "=" * 70)
+        logger.info(f"RESUMEN DE LAS SEMANAS {args.desde} A {args.hasta}")
+        logger.info("=" * 70)
+        for semana, resultado in resultados.items():
+            if resultado['exito']:
+                logger.info(f"  Semana {semana}: {resultado['articulos']} artículos, {resultado['importe']:.2f}€")
+            elif resultado['error']:
+                logger.error(f"  Semana {semana}: error ({resultado['error']}), estado no guardado")
+            else:
+                logger.warning(f"  Semana {semana}: no se generó el pedido")
+            if resultado['email'].get('exito'):
+                logger.info(f"    Emails enviados a encargados: {resultado['email'].get('emails_enviados', 0)}")
+        
+        semanas_fallidas = [semana for semana, resultado in resultados.items() if not resultado['exito']]
+        semanas_sin_procesar = list(range(max(resultados) + 1, args.hasta + 1))
+        if semanas_sin_procesar:
+            logger.warning(f"  Semanas sin procesar: {semanas_sin_procesar} (usar --desde {semanas_sin_procesar[0] - 1} para continuar)")
+        if semanas_fallidas or semanas_sin_procesar:
+            logger.error(f"\nERROR: No se pudo generar el pedido de las semanas {semanas_fallidas + semanas_sin_procesar}")
+            sys.exit(1)
+        sys.exit(0)
+    
     if args.semana:
         semana = args.semana
         logger.info(f"Semana forzada por argumento: {semana}")
@@ -854,11 +1402,15 @@ Ejemplos de uso:
         logger.info("Use --semana para forzar el reprocesamiento.")
         sys.exit(0)
     
-    exito, archivo, articulos, importe, metricas_correccion, resultado_email, resultado_resumen_gestion = procesar_pedido_semana(
-        semana, config, state_manager, 
+    # Todos los cambios de estado de la ejecución se guardan juntos al final
+    # (o ninguno si la ejecución se interrumpe con una excepción)
+    # y los emails se envían solo después de guardarlos
+    exito, archivo, articulos, importe, metricas_correccion, resultado_email, resultado_resumen_gestion, _ = procesar_semana_en_transaccion(
+        semana, config, state_manager,
         forzar=args.semana is not None,
         aplicar_correccion=aplicar_correccion,
-        enviar_email=enviar_email
+        enviar_email=enviar_email,
+        workers=args.workers
     )
     
     if exito:
@@ -0,0 +1,200 @@
+#!/usr/bin/env python3
+"""
+Módulo ClasificadorSecciones - Asignación de sección a partir del código de artículo
+
+Este módulo centraliza la regla que asigna cada artículo a su sección según
+los prefijos de su código. La comparten el sistema de pedidos (DataLoader),
+la clasificación ABC+D (clasificacionABC.py) y el informe HTML
+(generar_informe_html.py).
+
+Proporciona dos variantes con el mismo resultado:
+    - determinar_seccion_codigo: clasifica un único código
+    - asignar_secciones: clasifica una columna completa de forma vectorizada
+      y devuelve una columna categórica 'Seccion'
+
+Autor: Sistema de Pedidos Vivero V2
+Fecha: 2026-02-14
+"""
+
+import logging
+from typing import Optional, List, Any, Iterable
+
+import numpy as np
+import pandas as pd
+
+# Configuración del logger
+logger = logging.getLogger(__name__)
+
+# Códigos de animales vivos por defecto (prefijos de 4 dígitos de la sección 2)
+CODIGOS_MASCOTAS_VIVO = ['2104', '2204', '2305', '2405', '2504', '2606', '2705', '2707', '2708', '2805', '2806', '2906']
+
+# Nombre de la sección de tierras y áridos en el sistema de pedidos.
+# La clasificación ABC+D y el informe HTML usan 'tierra_aridos'.
+SECCION_TIERRAS = 'tierras_aridos'
+
+# Secciones asignadas por el primer dígito del código
+SECCIONES_POR_PRIMER_DIGITO = {
+    '1': 'interior',
+    '4': 'utiles_jardin',
+    '5': 'semillas',
+    '6': 'deco_interior',
+    '7': 'maf',
+    '8': 'vivero',
+    '9': 'deco_exterior',
+}
+
+# Longitud mínima de un código de artículo válido
+LONGITUD_MINIMA_CODIGO = 10
+
+
+def obtener_categorias_secciones(seccion_tierras: str = SECCION_TIERRAS) -> List[str]:
+    """
+    Devuelve la lista ordenada de secciones posibles.
+
+    Args:
+        seccion_tierras (str): Nombre a usar para la sección de tierras y áridos
+
+    Returns:
+        List[str]: Nombres de sección (categorías de la columna 'Seccion')
+    """
+    return (['mascotas_vivo', 'mascotas_manufacturado', seccion_tierras, 'fitos'] +
+            list(SECCIONES_POR_PRIMER_DIGITO.values()))
+
+
+def _normalizar_codigo(codigo_articulo: Any) -> Optional[str]:
+    """
+    Convierte un código de artículo en texto comparable.
+
+    Args:
+        codigo_articulo (Any): Código del artículo (puede ser string o número)
+
+    Returns:
+        Optional[str]: Código normalizado o None si está vacío
+    """
+    if codigo_articulo is None:
+        return None
+
+    codigo_str = str(codigo_articulo).strip()
+
+    # Eliminar decimales si viene como float
+    if codigo_str.endswith('.0'):
+        codigo_str = codigo_str[:-2]
+
+    if not codigo_str or codigo_str == 'nan':
+        return None
+
+    return codigo_str
+
+
+def determinar_seccion_codigo(codigo_articulo: Any,
+                              codigos_mascotas_vivo: Optional[Iterable[str]] = None,
+                              seccion_tierras: str = SECCION_TIERRAS) -> Optional[str]:
+    """
+    Determina la sección de un artículo según su código.
+
+    Args:
+        codigo_articulo (Any): Código del artículo (puede ser string o número)
+        codigos_mascotas_vivo (Optional[Iterable[str]]): Prefijos de 4 dígitos de
+            animales vivos (por defecto CODIGOS_MASCOTAS_VIVO)
+        seccion_tierras (str): Nombre a usar para la sección de tierras y áridos
+
+    Returns:
+        Optional[str]: Nombre de la sección o None si no se puede clasificar
+    """
+    if codigos_mascotas_vivo is None:
+        codigos_mascotas_vivo = CODIGOS_MASCOTAS_VIVO
+    prefijos_vivo = {str(prefijo) for prefijo in codigos_mascotas_vivo}
+
+    codigo_str = _normalizar_codigo(codigo_articulo)
+
+    # REGLA CRÍTICA: Filtrar artículos con menos de 10 dígitos
+    if codigo_str is None or len(codigo_str) < LONGITUD_MINIMA_CODIGO:
+        return None
+
+    # 1. Códigos de mascotas vivos (primero, tienen prioridad)
+    if codigo_str.startswith('2') and codigo_str[:4] in prefijos_vivo:
+        return 'mascotas_vivo'
+
+    # 2. Mascotas manufacturadas (empieza por 2 y no está en vivos)
+    if codigo_str.startswith('2'):
+        return 'mascotas_manufacturado'
+
+    # 3. Tierra/Áridos (31 o 32)
+    if codigo_str.startswith('31') or codigo_str.startswith('32'):
+        return seccion_tierras
+
+    # 4. Fitosanitarios (33-39)
+    if codigo_str.startswith('3') and codigo_str[1] in '3456789':
+        return 'fitos'
+
+    # 5. Secciones por primer dígito
+    return SECCIONES_POR_PRIMER_DIGITO.get(codigo_str[0])
+
+
+def asignar_secciones(codigos: pd.Series,
+                      codigos_mascotas_vivo: Optional[Iterable[str]] = None,
+                      seccion_tierras: str = SECCION_TIERRAS) -> pd.Series:
+    """
+    Clasifica una columna completa de códigos de artículo en secciones.
+
+    Aplica las mismas reglas que determinar_seccion_codigo mediante operaciones
+    de prefijo sobre la columna. Cada código distinto se clasifica una sola vez
+    y el resultado se expande al resto de filas.
+
+    Args:
+        codigos (pd.Series): Columna con los códigos de artículo
+        codigos_mascotas_vivo (Optional[Iterable[str]]): Prefijos de 4 dígitos de
+            animales vivos (por defecto CODIGOS_MASCOTAS_VIVO)
+        seccion_tierras (str): Nombre a usar para la sección de tierras y áridos
+
+    Returns:
+        pd.Series: Columna categórica 'Seccion' alineada con 'codigos'
+            (NaN para los códigos que no pertenecen a ninguna sección)
+    """
+    if codigos_mascotas_vivo is None:
+        codigos_mascotas_vivo = CODIGOS_MASCOTAS_VIVO
+    prefijos_vivo = {str(prefijo) for prefijo in codigos_mascotas_vivo}
+
+    categorias = obtener_categorias_secciones(seccion_tierras)
+
+    # Clasificar solo los valores distintos (los nulos quedan con índice -1)
+    indices, unicos = pd.factorize(codigos)
+
+    codigo_str = pd.Series(np.asarray(unicos, dtype=object)).astype(str).str.strip()
+    codigo_str = codigo_str.str.replace(r'\.0\Z', '', regex=True)
+
+    valido = (codigo_str.str.len() >= LONGITUD_MINIMA_CODIGO) & (codigo_str != 'nan')
+    primer_digito = codigo_str.str[:1]
+    es_dos = valido & (primer_digito == '2')
+
+    condiciones = [
+        es_dos & codigo_str.str[:4].isin(prefijos_vivo),
+        es_dos,
+        valido & codigo_str.str[:2].isin(['31', '32']),
+        valido & (primer_digito == '3') & codigo_str.str[1:2].isin(list('3456789')),
+    ]
+    opciones = ['mascotas_vivo', 'mascotas_manufacturado', seccion_tierras, 'fitos']
+
+    por_primer_digito = primer_digito.map(SECCIONES_POR_PRIMER_DIGITO).where(valido)
+    secciones_unicas = np.select(condiciones, opciones, default=None)
+    secciones_unicas = np.where(secciones_unicas == None,  # noqa: E711
+                                por_primer_digito.to_numpy(dtype=object), secciones_unicas)
+
+    # Expandir a todas las filas (-1 corresponde a códigos nulos)
+    secciones_unicas = np.append(secciones_unicas, None)
+    valores = secciones_unicas[indices]
+
+    return pd.Series(pd.Categorical(valores, categories=categorias),
+                     index=codigos.index, name='Seccion')
+
+
+if __name__ == "__main__":
+    # Ejemplo de uso
+    print("ClasificadorSecciones - Asignación de secciones por código")
+    print("=" * 50)
+
+    ejemplo = pd.Series(['1234567890', '2104000001', '2200000001', '3100000001',
+                         '3500000001', 8000000001.0, '123', None])
+    resultado = asignar_secciones(ejemplo)
+    for codigo, seccion in zip(ejemplo, resultado):
+        print(f"  {str(codigo):>15} -> {seccion}")
@@ -0,0 +1,138 @@
+#!/usr/bin/env python3
+"""
+Módulo CodificadorClaves - Codificación compacta de las claves de artículo
+
+Este módulo agrupa las utilidades para identificar artículos sin construir
+columnas de texto concatenadas del tipo 'Codigo|Talla|Color'. Lo comparten el
+DataLoader, el ForecastEngine, el CorrectionDataLoader y la clasificación
+ABC+D (clasificacionABC.py).
+
+Proporciona:
+    - convertir_a_categorias: convierte columnas de texto repetitivas (código,
+      nombre, talla, color, proveedor, sección, categoría) a columnas
+      categóricas, que ocupan un entero por fila en lugar de un objeto str
+    - CodificadorClaves: asigna un identificador entero a cada combinación
+      de valores de clave de una tabla de referencia; las uniones y búsquedas
+      de otras tablas en ella se hacen por ese identificador
+
+Cada combinación de valores es una clave distinta, sin separadores: dos
+artículos solo comparten identificador si coinciden en todas las columnas
+(un valor vacío o NaN solo coincide con otro valor vacío o NaN en la misma
+columna).
+
+Autor: Sistema de Pedidos Vivero V2
+Fecha: 2026-02-24
+"""
+
+import logging
+from typing import Iterable, List, Sequence
+
+import numpy as np
+import pandas as pd
+
+# Configuración del logger
+logger = logging.getLogger(__name__)
+
+
+# ============================================================================
+# COLUMNAS CATEGÓRICAS
+# ============================================================================
+
+def convertir_a_categorias(df: pd.DataFrame, columnas: Iterable[str]) -> pd.DataFrame:
+    """
+    Convierte a categóricas las columnas indicadas que existan en el DataFrame.
+
+    Las categorías quedan ordenadas, de modo que ordenar o agrupar por una
+    columna convertida da el mismo orden que con la columna de texto.
+
+    Args:
+        df (pd.DataFrame): DataFrame a convertir (se modifica en el sitio)
+        columnas (Iterable[str]): Nombres de las columnas a convertir
+
+    Returns:
+        pd.DataFrame: El mismo DataFrame, con las columnas convertidas
+    """
+    for columna in columnas:
+        if columna in df.columns and not isinstance(df[columna].dtype, pd.CategoricalDtype):
+            df[columna] = df[columna].astype('category')
+    return df
+
+
+# ============================================================================
+# IDENTIFICADORES ENTEROS DE CLAVE
+# ============================================================================
+
+class CodificadorClaves:
+    """
+    Asigna identificadores enteros a las claves de una tabla de referencia.
+
+    Cada columna de la clave se factoriza una sola vez y la combinación de
+    los códigos de sus columnas identifica la clave completa. Las demás
+    tablas se buscan con buscar(), que devuelve el identificador de la
+    referencia (-1 para las claves que no están en ella).
+
+    Attributes:
+        ids (np.ndarray): Identificador de cada fila de la tabla de referencia
+            (0, 1, 2... por orden de primera aparición)
+    """
+
+    def __init__(self, columnas: Sequence[Iterable]):
+        """
+        Registra las claves de la tabla de referencia.
+
+        Args:
+            columnas (Sequence[Iterable]): Columnas de la clave (misma longitud)
+        """
+        codigos = []
+        self._niveles: List[pd.Index] = []
+        for columna in columnas:
+            codigos_columna, valores = pd.factorize(columna, use_na_sentinel=False)
+            codigos.append(codigos_columna)
+            self._niveles.append(pd.Index(valores))
+
+        self._bases = tuple(max(len(nivel), 1) for nivel in self._niveles)
+        self._usar_indice_multiple = False
+        try:
+            combinadas = np.ravel_multi_index(codigos, self._bases)
+        except ValueError:
+            # Demasiadas combinaciones para un entero de 64 bits
+            self._usar_indice_multiple = True
+            combinadas = pd.MultiIndex.from_arrays(codigos)
+
+        self.ids, claves = pd.factorize(combinadas)
+        self._claves = pd.Index(claves)
+
+    def __len__(self) -> int:
+        """Número de claves distintas de la tabla de referencia."""
+        return len(self._claves)
+
+    def buscar(self, columnas: Sequence[Iterable]) -> np.ndarray:
+        """
+        Obtiene el identificador de cada fila en la tabla de referencia.
+
+        Args:
+            columnas (Sequence[Iterable]): Columnas de la clave, en el mismo
+                orden que las de la referencia
+
+        Returns:
+            np.ndarray: Identificador entero de cada fila (-1 si la clave no
+                está en la referencia)
+        """
+        codigos = []
+        for nivel, columna in zip(self._niveles, columnas):
+            codigos_columna = nivel.get_indexer(columna)
+            # get_indexer no hace coincidir None con NaN: los nulos se asignan aparte
+            if nivel.hasnans:
+                codigos_columna[np.asarray(pd.isna(columna))] = np.flatnonzero(nivel.isna())[0]
+            codigos.append(codigos_columna)
+        desconocidas = np.logical_or.reduce([codigos_columna < 0 for codigos_columna in codigos])
+        codigos = [np.where(desconocidas, 0, codigos_columna) for codigos_columna in codigos]
+
+        if self._usar_indice_multiple:
+            combinadas = pd.MultiIndex.from_arrays(codigos)
+        else:
+            combinadas = np.ravel_multi_index(codigos, self._bases)
+
+        ids = self._claves.get_indexer(combinadas).astype(np.int64)
+        ids[desconocidas] = -1
+        return ids
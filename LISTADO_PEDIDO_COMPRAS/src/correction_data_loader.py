@@ -23,6 +23,8 @@ import unicodedata
 from typing import Optional, Dict, List, Tuple, Any
 from datetime import datetime
 from src.data_loader import DataLoader
+from src.codificador_claves import CodificadorClaves
+from src.excel_cache import leer_excel_cacheado
 
 # Configuración del logger
 logger = logging.getLogger(__name__)
@@ -116,9 +118,9 @@ class CorrectionDataLoader:
             logger.info(f"Leyendo archivo de corrección: {ruta_archivo}")
             
             if hoja:
-                df = pd.read_excel(ruta_archivo, sheet_name=hoja)
+                df = leer_excel_cacheado(ruta_archivo, sheet_name=hoja)
             else:
-                df = pd.read_excel(ruta_archivo, sheet_name=None)
+                df = leer_excel_cacheado(ruta_archivo, sheet_name=None)
             
             logger.info(f"Archivo leído exitosamente: {len(df) if isinstance(df, pd.DataFrame) else len(df)} hojas")
             return df
@@ -313,40 +315,31 @@ class CorrectionDataLoader:
         
         df = pedido_teorico.copy()
         
-        # Preparar claves de unión normalizadas
-        df['_clave'] = (
-            df.get('Codigo_Articulo', df.get('Código artículo', df.get('Codigo', ''))).astype(str) + '|' +
-            df.get('Talla', '').astype(str) + '|' +
+        # Identificador entero de cada clave (Codigo, Talla, Color) del pedido
+        codificador = CodificadorClaves([
+            df.get('Codigo_Articulo', df.get('Código artículo', df.get('Codigo', ''))).astype(str),
+            df.get('Talla', '').astype(str),
             df.get('Color', '').astype(str)
-        )
+        ])
         
         # Fusionar stock actual
         if datos_correccion['stock'] is not None:
-            stock_df = datos_correccion['stock'].copy()
-            stock_df['_clave'] = (
-                stock_df.get('Codigo_Articulo', '').astype(str) + '|' +
-                stock_df.get('Talla', '').astype(str) + '|' +
-                stock_df.get('Color', '').astype(str)
-            )
+            stock_df = datos_correccion['stock']
             
-            # Seleccionar columnas relevantes
-            cols_stock = ['_clave', 'Stock_Fisico']
-            cols_disponibles = [c for c in cols_stock if c in stock_df.columns]
-            stock_df = stock_df[cols_disponibles]
-            
-            # Agrupar por clave (si hay duplicados)
-            stock_df = stock_df.groupby('_clave').agg({
-                'Stock_Fisico': 'sum' if 'Stock_Fisico' in stock_df.columns else 'first'
-            }).reset_index()
-            
-            df = df.merge(stock_df, on='_clave', how='left')
-            
-            # Rellenar NaN con 0
-            if 'Stock_Fisico' in df.columns:
-                df['Stock_Fisico'] = df['Stock_Fisico'].fillna(0)
-        
-        # Limpiar columna de clave temporal
-        df.drop(columns=['_clave'], inplace=True, errors='ignore')
+            if 'Stock_Fisico' in stock_df.columns:
+                ids_stock = codificador.buscar([
+                    stock_df.get('Codigo_Articulo', '').astype(str),
+                    stock_df.get('Talla', '').astype(str),
+                    stock_df.get('Color', '').astype(str)
+                ])
+                
+                # Agrupar por identificador (si hay duplicados); las filas de
+                # stock sin artículo en el pedido quedan con identificador -1
+                stock_por_id = stock_df['Stock_Fisico'].groupby(ids_stock).sum()
+                
+                # Rellenar NaN con 0
+                df = df.reset_index(drop=True)
+                df['Stock_Fisico'] = stock_por_id.reindex(codificador.ids).fillna(0).to_numpy()
         
         # Añadir columna de stock faltante con valor por defecto
         if 'Stock_Fisico' not in df.columns:
@@ -30,6 +30,80 @@ from enum import Enum
 logger = logging.getLogger(__name__)
 
 
+# Niveles de cada comparación de la matriz de escenarios OPCIONES.
+# El orden (mayor, igual, menor) coincide con el índice que devuelve
+# CorrectionEngine._comparar_niveles.
+NIVELES_VENTAS = ('SUPERIOR', 'IGUAL', 'INFERIOR')
+NIVELES_COMPRAS = ('EXCESO', 'IGUAL', 'DEFECTO')
+NIVELES_STOCK = ('EXCEDENTE', 'OPTIMO', 'DEFICIT')
+
+# Códigos de escenario posibles (27), en el orden ventas -> compras -> stock
+CODIGOS_ESCENARIOS = [
+    f"{ventas[:3]}_{compras[:3]}_{stock[:3]}"
+    for ventas in NIVELES_VENTAS
+    for compras in NIVELES_COMPRAS
+    for stock in NIVELES_STOCK
+]
+
+# Descripción de cada escenario (ventas_vs_objetivo, compras_vs_sugerido, stock_vs_minimo)
+ESCENARIOS_DESCRIPTIVOS = {
+    ('SUPERIOR', 'EXCESO', 'DEFICIT'):
+        'Ventas altas y exceso de compras generaron déficit de stock',
+    ('SUPERIOR', 'EXCESO', 'OPTIMO'):
+        'Ventas altas compensaron exceso de compras',
+    ('SUPERIOR', 'EXCESO', 'EXCEDENTE'):
+        'Exceso de compras con ventas altas pero aún hay excedente',
+    ('SUPERIOR', 'IGUAL', 'DEFICIT'):
+        'Ventas altas sin compras adicionales generaron déficit',
+    ('SUPERIOR', 'IGUAL', 'OPTIMO'):
+        'Ventas altas compensaron exactamente las compras',
+    ('SUPERIOR', 'IGUAL', 'EXCEDENTE'):
+        'Ventas altas pero no suficientes para compensar compras',
+    ('SUPERIOR', 'DEFECTO', 'DEFICIT'):
+        'Ventas altas con pocas compras: déficit crítico',
+    ('SUPERIOR', 'DEFECTO', 'OPTIMO'):
+        'Ventas altas pero compras justas mantienen stock óptimo',
+    ('SUPERIOR', 'DEFECTO', 'EXCEDENTE'):
+        '即使购买不足，高销量仍有剩余库存',
+    ('IGUAL', 'EXCESO', 'DEFICIT'):
+        '购买过多但销量持平导致库存不足',
+    ('IGUAL', 'EXCESO', 'OPTIMO'):
+        '购买过多但销量正好抵消',
+    ('IGUAL', 'EXCESO', 'EXCEDENTE'):
+        '购买过多且销量持平导致库存过剩',
+    ('IGUAL', 'IGUAL', 'DEFICIT'):
+        '销售和购买相同但库存不足',
+    ('IGUAL', 'IGUAL', 'OPTIMO'):
+        '销售和购买完美匹配，库存最佳',
+    ('IGUAL', 'IGUAL', 'EXCEDENTE'):
+        '销售和购买相同但库存过剩',
+    ('IGUAL', 'DEFECTO', 'DEFICIT'):
+        '购买不足导致库存不足',
+    ('IGUAL', 'DEFECTO', 'OPTIMO'):
+        '购买不足但销量正好保持库存',
+    ('IGUAL', 'DEFECTO', 'EXCEDENTE'):
+        '购买不足但仍有库存过剩',
+    ('INFERIOR', 'EXCESO', 'DEFICIT'):
+        '销量低且购买过多但库存仍不足',
+    ('INFERIOR', 'EXCESO', 'OPTIMO'):
+        '销量低但购买过多正好维持库存',
+    ('INFERIOR', 'EXCESO', 'EXCEDENTE'):
+        '销量低且购买过多导致库存过剩',
+    ('INFERIOR', 'IGUAL', 'DEFICIT'):
+        '销量低且购买未增加导致库存不足',
+    ('INFERIOR', 'IGUAL', 'OPTIMO'):
+        '销量低但购买正好维持库存',
+    ('INFERIOR', 'IGUAL', 'EXCEDENTE'):
+        '销量低且购买未增加导致库存过剩',
+    ('INFERIOR', 'DEFECTO', 'DEFICIT'):
+        '销量低且购买不足导致库存严重不足',
+    ('INFERIOR', 'DEFECTO', 'OPTIMO'):
+        '销量低且购买不足但库存仍最佳',
+    ('INFERIOR', 'DEFECTO', 'EXCEDENTE'):
+        '销量低且购买不足但仍有库存过剩',
+}
+
+
 class CategoriaABC(Enum):
     """Enumeración de categorías ABC."""
     A = "A"
@@ -266,70 +340,13 @@ class CorrectionEngine:
             escenario['tipo_correccion'] = 'RECUPERAR_DEFICIT'
         
         # Generar descripción
-        escenarios_descriptivos = {
-            ('SUPERIOR', 'EXCESO', 'DEFICIT'): 
-                'Ventas altas y exceso de compras generaron déficit de stock',
-            ('SUPERIOR', 'EXCESO', 'OPTIMO'):
-                'Ventas altas compensaron exceso de compras',
-            ('SUPERIOR', 'EXCESO', 'EXCEDENTE'):
-                'Exceso de compras con ventas altas pero aún hay excedente',
-            ('SUPERIOR', 'IGUAL', 'DEFICIT'):
-                'Ventas altas sin compras adicionales generaron déficit',
-            ('SUPERIOR', 'IGUAL', 'OPTIMO'):
-                'Ventas altas compensaron exactamente las compras',
-            ('SUPERIOR', 'IGUAL', 'EXCEDENTE'):
-                'Ventas altas pero no suficientes para compensar compras',
-            ('SUPERIOR', 'DEFECTO', 'DEFICIT'):
-                'Ventas altas con pocas compras: déficit crítico',
-            ('SUPERIOR', 'DEFECTO', 'OPTIMO'):
-                'Ventas altas pero compras justas mantienen stock óptimo',
-            ('SUPERIOR', 'DEFECTO', 'EXCEDENTE'):
-                '即使购买不足，高销量仍有剩余库存',
-            ('IGUAL', 'EXCESO', 'DEFICIT'):
-                '购买过多但销量持平导致库存不足',
-            ('IGUAL', 'EXCESO', 'OPTIMO'):
-                '购买过多但销量正好抵消',
-            ('IGUAL', 'EXCESO', 'EXCEDENTE'):
-                '购买过多且销量持平导致库存过剩',
-            ('IGUAL', 'IGUAL', 'DEFICIT'):
-                '销售和购买相同但库存不足',
-            ('IGUAL', 'IGUAL', 'OPTIMO'):
-                '销售和购买完美匹配，库存最佳',
-            ('IGUAL', 'IGUAL', 'EXCEDENTE'):
-                '销售和购买相同但库存过剩',
-            ('IGUAL', 'DEFECTO', 'DEFICIT'):
-                '购买不足导致库存不足',
-            ('IGUAL', 'DEFECTO', 'OPTIMO'):
-                '购买不足但销量正好保持库存',
-            ('IGUAL', 'DEFECTO', 'EXCEDENTE'):
-                '购买不足但仍有库存过剩',
-            ('INFERIOR', 'EXCESO', 'DEFICIT'):
-                '销量低且购买过多但库存仍不足',
-            ('INFERIOR', 'EXCESO', 'OPTIMO'):
-                '销量低但购买过多正好维持库存',
-            ('INFERIOR', 'EXCESO', 'EXCEDENTE'):
-                '销量低且购买过多导致库存过剩',
-            ('INFERIOR', 'IGUAL', 'DEFICIT'):
-                '销量低且购买未增加导致库存不足',
-            ('INFERIOR', 'IGUAL', 'OPTIMO'):
-                '销量低但购买正好维持库存',
-            ('INFERIOR', 'IGUAL', 'EXCEDENTE'):
-                '销量低且购买未增加导致库存过剩',
-            ('INFERIOR', 'DEFECTO', 'DEFICIT'):
-                '销量低且购买不足导致库存严重不足',
-            ('INFERIOR', 'DEFECTO', 'OPTIMO'):
-                '销量低且购买不足但库存仍最佳',
-            ('INFERIOR', 'DEFECTO', 'EXCEDENTE'):
-                '销量低且购买不足但仍有库存过剩',
-        }
-        
         clave = (
             escenario['ventas_vs_objetivo'],
             escenario['compras_vs_sugerido'],
             escenario['stock_vs_minimo']
         )
         
-        escenario['descripcion'] = escenarios_descriptivos.get(
+        escenario['descripcion'] = ESCENARIOS_DESCRIPTIVOS.get(
             clave, 
             f"Escenario: {escenario['codigo']}"
         )
@@ -381,62 +398,50 @@ class CorrectionEngine:
         # Calcular stock mínimo si no existe
         if columna_stock_minimo not in df.columns:
             logger.debug("Calculando stock mínimo por categoría ABC...")
-            df[columna_stock_minimo] = df.apply(
-                lambda row: self.obtener_stock_minimo(
-                    row.get(columna_categoria, 'C'),
-                    row.get(columna_ventas_objetivo, 0),
-                    row.get(columna_pedido, 0)
-                ),
-                axis=1
+            df[columna_stock_minimo] = self._calcular_stock_minimo_columna(
+                self._columna_o_defecto(df, columna_categoria, 'C'),
+                self._columna_o_defecto(df, columna_ventas_objetivo, 0),
+                df[columna_pedido]
             )
         
         # Rellenar NaN en columnas numéricas
         df[columna_stock_minimo] = df[columna_stock_minimo].fillna(0)
         df[columna_stock_real] = df[columna_stock_real].fillna(0)
         
-        # Calcular diferencia de stock
-        df['Diferencia_Stock'] = df.apply(
-            lambda row: self.calcular_diferencia_stock(
-                row[columna_stock_minimo],
-                row[columna_stock_real]
-            ),
-            axis=1
-        )
+        pedido = df[columna_pedido]
+        stock_minimo = df[columna_stock_minimo]
+        stock_real = df[columna_stock_real]
         
-        # Aplicar fórmula de corrección
-        df['Pedido_Corregido'] = df.apply(
-            lambda row: self.aplicar_formula_correccion(
-                row[columna_pedido],
-                row[columna_stock_minimo],
-                row[columna_stock_real]
-            ),
-            axis=1
-        )
+        # Calcular diferencia de stock
+        df['Diferencia_Stock'] = stock_minimo - stock_real
+        
+        # Aplicar fórmula de corrección: max(0, Pedido_Generado + Diferencia_Stock)
+        pedido_corregido = pedido + (stock_minimo - stock_real)
+        if not self.config.permitir_pedidos_negativos:
+            positivo = pedido_corregido > 0
+            pedido_corregido = pedido_corregido.where(positivo, 0)
+            # max(0, x) devuelve el entero 0: si ninguna fila es positiva la
+            # columna resultante es entera, igual que con el cálculo fila a fila
+            if not positivo.any():
+                pedido_corregido = pedido_corregido.astype(np.int64)
+        df['Pedido_Corregido'] = pedido_corregido
         
         # Detectar escenario para cada artículo
-        df['Escenario'] = df.apply(
-            lambda row: self.detectar_escenario(
-                pedido_generado=row[columna_pedido],
-                stock_minimo=row[columna_stock_minimo],
-                stock_real=row[columna_stock_real],
-                ventas_reales=row.get(columna_ventas_reales, 0),
-                ventas_objetivo=row.get(columna_ventas_objetivo, 0),
-                compras_reales=row.get(columna_compras_reales, 0),
-                compras_sugeridas=row.get(columna_compras_sugeridas, row[columna_pedido])
-            )['codigo'],
-            axis=1
+        df['Escenario'] = self._detectar_escenarios_columna(
+            stock_minimo,
+            stock_real,
+            self._columna_o_defecto(df, columna_ventas_reales, 0),
+            self._columna_o_defecto(df, columna_ventas_objetivo, 0),
+            self._columna_o_defecto(df, columna_compras_reales, 0),
+            self._columna_o_defecto(df, columna_compras_sugeridas, pedido)
         )
         
         # Añadir columna de razón de corrección
-        df['Razon_Correccion'] = df.apply(
-            lambda row: self._generar_razon_correccion(
-                row[columna_stock_minimo],
-                row[columna_stock_real],
-                row['Diferencia_Stock'],
-                row['Pedido_Corregido'],
-                row[columna_pedido]
-            ),
-            axis=1
+        df['Razon_Correccion'] = self._generar_razon_correccion_columna(
+            stock_minimo,
+            stock_real,
+            df['Pedido_Corregido'],
+            pedido
         )
         
         # ================================================================
@@ -516,6 +521,164 @@ class CorrectionEngine:
             deficit = stock_minimo - stock_real
             return f"Aumentar {deficit:.0f} unidades (recuperar stock mínimo)"
     
+    # ========================================================================
+    # CÁLCULO POR COLUMNAS
+    # ========================================================================
+    
+    @staticmethod
+    def _columna_o_defecto(df: pd.DataFrame, columna: str, defecto: Any) -> pd.Series:
+        """
+        Devuelve una columna del DataFrame o un valor por defecto para todas las filas.
+        
+        Args:
+            df (pd.DataFrame): DataFrame de pedidos
+            columna (str): Nombre de la columna
+            defecto (Any): Valor escalar o Series a usar si la columna no existe
+        
+        Returns:
+            pd.Series: Valores de la columna alineados con df
+        """
+        if columna in df.columns:
+            return df[columna]
+        if isinstance(defecto, pd.Series):
+            return defecto
+        return pd.Series(defecto, index=df.index)
+    
+    @staticmethod
+    def _comparar_niveles(valor: pd.Series, referencia: pd.Series) -> np.ndarray:
+        """
+        Compara dos columnas en tres niveles: 0 (mayor), 1 (igual) y 2 (menor).
+        
+        Las comparaciones con valores nulos se consideran iguales, como en
+        detectar_escenario.
+        
+        Args:
+            valor (pd.Series): Valor a comparar
+            referencia (pd.Series): Valor de referencia
+        
+        Returns:
+            np.ndarray: Índice del nivel de cada fila
+        """
+        valor = valor.to_numpy()
+        referencia = referencia.to_numpy()
+        return np.select([valor > referencia, valor < referencia], [0, 2], default=1)
+    
+    def _calcular_stock_minimo_columna(
+        self,
+        categoria: pd.Series,
+        ventas_promedio: pd.Series,
+        pedido_generado: pd.Series
+    ) -> pd.Series:
+        """
+        Calcula el stock mínimo de todas las filas (equivalente a obtener_stock_minimo).
+        
+        Args:
+            categoria (pd.Series): Categoría ABC de cada artículo
+            ventas_promedio (pd.Series): Ventas promedio semanales
+            pedido_generado (pd.Series): Pedido generado en FASE 1
+        
+        Returns:
+            pd.Series: Stock mínimo objetivo de cada fila
+        """
+        politica = self.config.politica_stock_minimo
+        
+        # Política de semanas de cobertura (categorías sin peso configurado)
+        semanas_cobertura = categoria.astype(object).str.upper().map(politica)
+        semanas_cobertura = semanas_cobertura.fillna(politica.get('C', 0.5)).astype(float)
+        
+        stock_minimo = pd.Series(
+            np.where(ventas_promedio > 0,
+                     ventas_promedio * semanas_cobertura,
+                     pedido_generado * semanas_cobertura),
+            index=categoria.index
+        )
+        
+        # Configuración ABC específica con peso por categoría
+        if 'pesos_categoria' in self.abc_config:
+            pesos = self.abc_config['pesos_categoria']
+            con_peso = categoria.isin(list(pesos))
+            if con_peso.any():
+                peso = categoria.map(pesos)
+                cobertura = categoria.map(lambda c: politica.get(c, 0))
+                stock_minimo = stock_minimo.where(~con_peso, pedido_generado * peso * cobertura)
+        
+        return stock_minimo
+    
+    def _detectar_escenarios_columna(
+        self,
+        stock_minimo: pd.Series,
+        stock_real: pd.Series,
+        ventas_reales: pd.Series,
+        ventas_objetivo: pd.Series,
+        compras_reales: pd.Series,
+        compras_sugeridas: pd.Series
+    ) -> pd.Series:
+        """
+        Obtiene el código de escenario de todas las filas (equivalente a detectar_escenario).
+        
+        Cada comparación se resuelve con np.select en tres niveles y el código
+        se toma de CODIGOS_ESCENARIOS a través de una columna categórica.
+        
+        Args:
+            stock_minimo (pd.Series): Stock mínimo objetivo
+            stock_real (pd.Series): Stock real actual
+            ventas_reales (pd.Series): Ventas reales de la semana
+            ventas_objetivo (pd.Series): Ventas objetivo de la semana
+            compras_reales (pd.Series): Compras recibidas en la semana
+            compras_sugeridas (pd.Series): Compras que debían llegar según FASE 1
+        
+        Returns:
+            pd.Series: Código de escenario de cada fila
+        """
+        codigos = (
+            9 * self._comparar_niveles(ventas_reales, ventas_objetivo) +
+            3 * self._comparar_niveles(compras_reales, compras_sugeridas) +
+            self._comparar_niveles(stock_real, stock_minimo)
+        )
+        
+        escenarios = pd.Categorical.from_codes(codigos, categories=CODIGOS_ESCENARIOS)
+        
+        return pd.Series(np.asarray(escenarios).tolist(), index=stock_minimo.index, dtype=str)
+    
+    def _generar_razon_correccion_columna(
+        self,
+        stock_minimo: pd.Series,
+        stock_real: pd.Series,
+        pedido_corregido: pd.Series,
+        pedido_original: pd.Series
+    ) -> pd.Series:
+        """
+        Genera la razón de corrección de todas las filas (equivalente a _generar_razon_correccion).
+        
+        Solo se formatea el texto de las filas que incluyen una cantidad.
+        
+        Args:
+            stock_minimo (pd.Series): Stock mínimo objetivo
+            stock_real (pd.Series): Stock real actual
+            pedido_corregido (pd.Series): Pedido resultante
+            pedido_original (pd.Series): Pedido original de FASE 1
+        
+        Returns:
+            pd.Series: Descripción de la corrección aplicada
+        """
+        corregido = (pedido_corregido != pedido_original).to_numpy()
+        excedente = corregido & (stock_real > stock_minimo).to_numpy()
+        optimo = corregido & (stock_real == stock_minimo).to_numpy()
+        deficit = corregido & ~(stock_real >= stock_minimo).to_numpy()
+        
+        razones = np.full(len(stock_minimo), "Sin corrección necesaria", dtype=object)
+        razones[optimo] = "Mantener pedido (stock óptimo)"
+        razones[excedente] = [
+            f"Reducir {exceso:.0f} unidades (stock excedente)"
+            for exceso in (stock_real - stock_minimo)[excedente]
+        ]
+        razones[deficit] = [
+            f"Aumentar {faltante:.0f} unidades (recuperar stock mínimo)"
+            for faltante in (stock_minimo - stock_real)[deficit]
+        ]
+        
+        return pd.Series(razones.tolist(), index=stock_minimo.index, dtype=str)
+    
     def aplicar_correccion_tendencia_ventas(
         self,
         df: pd.DataFrame,
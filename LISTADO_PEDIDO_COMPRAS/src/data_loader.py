@@ -20,6 +20,10 @@ import unicodedata
 from typing import Optional, Dict, List, Tuple, Any
 from datetime import datetime
 
+from src.excel_cache import leer_excel_cacheado
+from src.clasificador_secciones import determinar_seccion_codigo, asignar_secciones
+from src.codificador_claves import convertir_a_categorias
+
 # Configuración del logger
 logger = logging.getLogger(__name__)
 
@@ -50,6 +54,10 @@ class DataLoader:
         self.secciones = config.get('secciones_activas', [])
         self.codigos_mascotas = config.get('codigos_mascotas_vivo', [])
         
+        # Caché de datos de la ejecución: evita parsear los mismos libros Excel
+        # una vez por sección. Clave -> (ruta, firma del archivo, datos)
+        self._cache: Dict[str, Tuple[str, Tuple[float, int], Any]] = {}
+        
         logger.info("DataLoader inicializado correctamente")
     
     def normalizar_texto(self, texto: Any) -> str:
@@ -124,61 +132,7 @@ class DataLoader:
         Returns:
             Optional[str]: Nombre de la sección o None si no se puede clasificar
         """
-        if codigo_articulo is None:
-            return None
-        
-        codigo_str = str(codigo_articulo).strip()
-        
-        # Eliminar decimales si viene como float
-        if codigo_str.endswith('.0'):
-            codigo_str = codigo_str[:-2]
-        
-        if not codigo_str or codigo_str == 'nan':
-            return None
-        
-        # REGLA CRÍTICA: Filtrar artículos con menos de 10 dígitos
-        if len(codigo_str) < 10:
-            return None
-        
-        # 1. Verificar códigos de mascotas vivos (primero, tienen prioridad)
-        if codigo_str.startswith('2') and codigo_str[:4] in self.codigos_mascotas:
-            return 'mascotas_vivo'
-        
-        # 2. Sección 2: Mascotas manufacturadas (empieza por 2 y no está en vivos)
-        if codigo_str.startswith('2'):
-            return 'mascotas_manufacturado'
-        
-        # 3. Sección 3: Tierra/Áridos (31 o 32)
-        if codigo_str.startswith('31') or codigo_str.startswith('32'):
-            return 'tierras_aridos'
-        
-        # 4. Sección 3: Fitosanitarios (33-39)
-        if codigo_str.startswith('3'):
-            if len(codigo_str) >= 2:
-                try:
-                    segundo_digito = int(codigo_str[1])
-                    if 3 <= segundo_digito <= 9:
-                        return 'fitos'
-                except (ValueError, IndexError):
-                    pass
-        
-        # 5. Secciones por primer dígito
-        if codigo_str.startswith('1'):
-            return 'interior'
-        elif codigo_str.startswith('4'):
-            return 'utiles_jardin'
-        elif codigo_str.startswith('5'):
-            return 'semillas'
-        elif codigo_str.startswith('6'):
-            return 'deco_interior'
-        elif codigo_str.startswith('7'):
-            return 'maf'
-        elif codigo_str.startswith('8'):
-            return 'vivero'
-        elif codigo_str.startswith('9'):
-            return 'deco_exterior'
-        
-        return None
+        return determinar_seccion_codigo(codigo_articulo, self.codigos_mascotas)
     
     def obtener_directorio_entrada(self) -> str:
         """
@@ -212,6 +166,73 @@ class DataLoader:
         
         return salida
     
+    # ========================================================================
+    # CACHÉ DE DATOS DE LA EJECUCIÓN
+    # ========================================================================
+    
+    def _firma_archivo(self, ruta_archivo: str) -> Optional[Tuple[float, int]]:
+        """
+        Obtiene la firma (fecha de modificación, tamaño) de un archivo.
+        
+        Args:
+            ruta_archivo (str): Ruta del archivo
+        
+        Returns:
+            Optional[Tuple[float, int]]: (mtime, tamaño) o None si no existe
+        """
+        try:
+            estado = os.stat(ruta_archivo)
+            return (estado.st_mtime, estado.st_size)
+        except OSError:
+            return None
+    
+    def _obtener_de_cache(self, clave: str, ruta_archivo: str) -> Optional[Any]:
+        """
+        Devuelve los datos cacheados si el archivo no ha cambiado desde su lectura.
+        
+        Si la fecha de modificación o el tamaño del archivo han cambiado, la
+        entrada se invalida y se devuelve None para forzar una nueva lectura.
+        
+        Args:
+            clave (str): Identificador de los datos en la caché
+            ruta_archivo (str): Ruta del archivo de origen
+        
+        Returns:
+            Optional[Any]: Datos cacheados o None si no hay entrada válida
+        """
+        entrada = self._cache.get(clave)
+        if entrada is None:
+            return None
+        
+        ruta_cacheada, firma_cacheada, datos = entrada
+        if ruta_cacheada != ruta_archivo or firma_cacheada != self._firma_archivo(ruta_archivo):
+            logger.info(f"Archivo modificado, invalidando caché: {ruta_archivo}")
+            del self._cache[clave]
+            return None
+        
+        logger.debug(f"Usando datos cacheados de: {ruta_archivo}")
+        return datos
+    
+    def _guardar_en_cache(self, clave: str, ruta_archivo: str, datos: Any) -> None:
+        """
+        Guarda datos en la caché asociándolos a la firma actual del archivo.
+        
+        Args:
+            clave (str): Identificador de los datos en la caché
+            ruta_archivo (str): Ruta del archivo de origen
+            datos (Any): Datos a cachear
+        """
+        firma = self._firma_archivo(ruta_archivo)
+        if firma is not None:
+            self._cache[clave] = (ruta_archivo, firma, datos)
+    
+    def limpiar_cache(self) -> None:
+        """
+        Vacía la caché de datos de la ejecución.
+        """
+        self._cache.clear()
+        logger.debug("Caché de datos vaciada")
+    
     def leer_excel(self, ruta_archivo: str, hoja: Optional[str] = None) -> Optional[pd.DataFrame]:
         """
         Lee un archivo Excel y devuelve un DataFrame.
@@ -231,9 +252,9 @@ class DataLoader:
             logger.info(f"Leyendo archivo: {ruta_archivo}")
             
             if hoja:
-                df = pd.read_excel(ruta_archivo, sheet_name=hoja)
+                df = leer_excel_cacheado(ruta_archivo, sheet_name=hoja)
             else:
-                df = pd.read_excel(ruta_archivo, sheet_name=None)
+                df = leer_excel_cacheado(ruta_archivo, sheet_name=None)
             
             logger.info(f"Archivo leído exitosamente: {len(df) if isinstance(df, pd.DataFrame) else len(df)} hojas")
             return df
@@ -252,9 +273,38 @@ class DataLoader:
         Returns:
             Optional[pd.DataFrame]: DataFrame con las ventas procesadas o None
         """
-        dir_entrada = self.obtener_directorio_entrada()
-        nombre_archivo = self.archivos.get('ventas', 'SPA_ventas.xlsx')
-        ruta_archivo = os.path.join(dir_entrada, nombre_archivo)
+        df = self._leer_ventas_cacheado()
+        return df.copy() if df is not None else None
+    
+    def _ruta_entrada(self, clave_archivo: str, nombre_defecto: str) -> str:
+        """
+        Construye la ruta de un archivo de entrada configurado.
+        
+        Args:
+            clave_archivo (str): Clave del archivo en 'archivos_entrada'
+            nombre_defecto (str): Nombre a usar si no está configurado
+        
+        Returns:
+            str: Ruta completa del archivo
+        """
+        nombre_archivo = self.archivos.get(clave_archivo, nombre_defecto)
+        return os.path.join(self.obtener_directorio_entrada(), nombre_archivo)
+    
+    def _leer_ventas_cacheado(self) -> Optional[pd.DataFrame]:
+        """
+        Devuelve las ventas procesadas, leyendo el archivo solo la primera vez.
+        
+        El DataFrame devuelto es compartido por toda la ejecución y no debe
+        modificarse; los métodos públicos entregan copias o vistas filtradas.
+        
+        Returns:
+            Optional[pd.DataFrame]: DataFrame con las ventas procesadas o None
+        """
+        ruta_archivo = self._ruta_entrada('ventas', 'SPA_ventas.xlsx')
+        
+        df = self._obtener_de_cache('ventas', ruta_archivo)
+        if df is not None:
+            return df
         
         df = self.leer_excel(ruta_archivo)
         
@@ -304,7 +354,34 @@ class DataLoader:
         if 'Nombre artículo' in df.columns:
             df['Nombre'] = df['Nombre artículo'].astype(str).str.strip()
         
+        # Columnas de artículo como categóricas (se repiten en miles de filas)
+        convertir_a_categorias(df, ['Codigo', 'Nombre', 'Talla', 'Color'])
+        
         logger.info(f"Ventas cargadas: {len(df)} registros")
+        self._guardar_en_cache('ventas', ruta_archivo, df)
+        return df
+    
+    def _leer_ventas_con_seccion(self) -> Optional[pd.DataFrame]:
+        """
+        Devuelve las ventas con la columna 'Seccion' calculada una única vez.
+        
+        Returns:
+            Optional[pd.DataFrame]: DataFrame compartido de ventas con sección o None
+        """
+        ruta_archivo = self._ruta_entrada('ventas', 'SPA_ventas.xlsx')
+        
+        df = self._obtener_de_cache('ventas_seccion', ruta_archivo)
+        if df is not None:
+            return df
+        
+        ventas_df = self._leer_ventas_cacheado()
+        if ventas_df is None:
+            return None
+        
+        df = ventas_df.copy()
+        df['Seccion'] = asignar_secciones(df['Codigo'], self.codigos_mascotas)
+        
+        self._guardar_en_cache('ventas_seccion', ruta_archivo, df)
         return df
     
     def leer_coste(self) -> Optional[pd.DataFrame]:
@@ -317,9 +394,21 @@ class DataLoader:
         Returns:
             Optional[pd.DataFrame]: DataFrame con los costes o None si hay error
         """
-        dir_entrada = self.obtener_directorio_entrada()
-        nombre_archivo = self.archivos.get('coste', 'SPA_coste.xlsx')
-        ruta_archivo = os.path.join(dir_entrada, nombre_archivo)
+        df = self._leer_coste_cacheado()
+        return df.copy() if df is not None else None
+    
+    def _leer_coste_cacheado(self) -> Optional[pd.DataFrame]:
+        """
+        Devuelve los costes procesados, leyendo el archivo solo la primera vez.
+        
+        Returns:
+            Optional[pd.DataFrame]: DataFrame compartido de costes o None
+        """
+        ruta_archivo = self._ruta_entrada('coste', 'SPA_coste.xlsx')
+        
+        df = self._obtener_de_cache('coste', ruta_archivo)
+        if df is not None:
+            return df
 
         df = self.leer_excel(ruta_archivo)
 
@@ -345,7 +434,7 @@ class DataLoader:
                 break
         
         if columna_codigo is None:
-            logger.error(f"No se encontró columna de código en {nombre_archivo}. Columnas disponibles: {list(df.columns)}")
+            logger.error(f"No se encontró columna de código en {os.path.basename(ruta_archivo)}. Columnas disponibles: {list(df.columns)}")
             return None
         
         logger.debug(f"Usando columna '{columna_codigo}' como código de artículo")
@@ -359,12 +448,12 @@ class DataLoader:
                 logger.warning(f"Columna '{col}' no encontrada, inicializando con valores vacíos")
                 df[col] = ''
 
-        # Crear clave única para matching
-        df['Clave'] = (df['Codigo'] + '|' +
-                      df['Talla'].astype(str).str.strip() + '|' +
-                      df['Color'].astype(str).str.strip())
+        # Las búsquedas por (Codigo, Talla, Color) usan CodificadorClaves,
+        # sin columna de clave concatenada
+        convertir_a_categorias(df, [col for col in df.columns if self.normalizar_texto(col) == 'nombre proveedor'])
 
         logger.info(f"Costes cargados: {len(df)} registros")
+        self._guardar_en_cache('coste', ruta_archivo, df)
         return df
     
     def buscar_archivo_abc_seccion(self, seccion: str) -> Optional[str]:
@@ -482,11 +571,9 @@ class DataLoader:
         # Concatenar todas las categorías
         df_resultado = pd.concat(df_completo, ignore_index=True)
         
-        # Crear clave única para matching
-        df_resultado['Clave'] = (df_resultado['Artículo'].astype(str).str.strip() + '|' + 
-                                df_resultado['Nombre artículo'].astype(str).str.strip() + '|' + 
-                                df_resultado['Talla'].astype(str).str.strip() + '|' + 
-                                df_resultado['Color'].astype(str).str.strip())
+        # Las búsquedas por (Artículo, Nombre, Talla, Color) usan CodificadorClaves,
+        # sin columna de clave concatenada
+        convertir_a_categorias(df_resultado, ['Nombre artículo', 'Categoria', 'Acción Sugerida'])
         
         logger.info(f"Clasificación ABC cargada para '{seccion}': {len(df_resultado)} registros")
         return df_resultado
@@ -520,7 +607,7 @@ class DataLoader:
         
         # Leer ventas
         logger.debug(f"[DEBUG] Intentando leer archivo de ventas...")
-        ventas_df = self.leer_ventas()
+        ventas_df = self._leer_ventas_con_seccion()
         
         logger.debug(f"[DEBUG] Ventas leído: {len(ventas_df) if ventas_df is not None else 0} registros")
         if ventas_df is not None:
@@ -534,8 +621,9 @@ class DataLoader:
         logger.debug(f"[DEBUG] Filtrando ventas por sección: {seccion}")
         
         # DEBUG: Mostrar distribución de secciones antes de filtrar
-        ventas_df['Seccion'] = ventas_df['Codigo'].apply(self.determinar_seccion)
+        # (la columna 'Seccion' se calcula una sola vez por ejecución)
         secciones_encontradas = ventas_df['Seccion'].value_counts()
+        secciones_encontradas = secciones_encontradas[secciones_encontradas > 0]
         logger.debug(f"[DEBUG] Distribución de secciones antes de filtrar:")
         for sec, count in secciones_encontradas.items():
             logger.debug(f"  {sec}: {count} registros")
@@ -569,114 +657,6 @@ class DataLoader:
         logger.info(f"  Costes: {len(costes_df)} registros")
         
         return abc_df, ventas_df, costes_df
-    
-    def buscar_info_articulo(self, codigo: Any, nombre: Any, talla: Any, color: Any, 
-                             abc_df: pd.DataFrame, coste_df: pd.DataFrame) -> Dict[str, Any]:
-        """
-        Busca información de un artículo en ABC y en costes.
-        
-        Args:
-            codigo (Any): Código del artículo
-            nombre (Any): Nombre del artículo
-            talla (Any): Talla del artículo
-            color (Any): Color del artículo
-            abc_df (pd.DataFrame): DataFrame de clasificación ABC
-            coste_df (pd.DataFrame): DataFrame de costes
-        
-        Returns:
-            Dict: Diccionario con la información encontrada del artículo
-        """
-        clave = f"{str(codigo).strip()}|{str(nombre).strip()}|{str(talla).strip()}|{str(color).strip()}"
-        
-        # Buscar en ABC+D
-        accion_raw = None
-        categoria = 'C'
-        descuento_sugerido = 0
-        
-        match = abc_df[abc_df['Clave'] == clave]
-        
-        if len(match) > 0:
-            accion_raw = match.iloc[0].get('Acción Sugerida')
-            categoria = match.iloc[0].get('Categoria', 'C')
-            descuento_sugerido = match.iloc[0].get('Descuento Sugerido (%)', 0)
-        else:
-            # Buscar solo por código
-            match2 = abc_df[abc_df['Artículo'].astype(str) == str(codigo)]
-            if len(match2) > 0:
-                match3 = match2[(match2['Talla'].astype(str) == str(talla)) & 
-                               (match2['Color'].fillna('').astype(str) == str(color))]
-                if len(match3) > 0:
-                    accion_raw = match3.iloc[0].get('Acción Sugerida')
-                    categoria = match3.iloc[0].get('Categoria', 'C')
-                    descuento_sugerido = match3.iloc[0].get('Descuento Sugerido (%)', 0)
-                else:
-                    accion_raw = match2.iloc[0].get('Acción Sugerida')
-                    categoria = match2.iloc[0].get('Categoria', 'C')
-                    descuento_sugerido = match2.iloc[0].get('Descuento Sugerido (%)', 0)
-        
-        # Buscar PVP, Coste y Proveedor
-        clave_coste = f"{str(codigo).strip()}|{str(talla).strip()}|{str(color).strip()}"
-        match_coste = coste_df[coste_df['Clave'] == clave_coste]
-        
-        pvp = 0
-        coste = 0
-        proveedor = ''
-        
-        if len(match_coste) > 0:
-            pvp = match_coste.iloc[0].get('Tarifa10', 0)
-            coste = match_coste.iloc[0].get('Coste', 0)
-            
-            # Buscar nombre del proveedor
-            for col in match_coste.columns:
-                if self.normalizar_texto(col) == 'nombre proveedor':
-                    proveedor = match_coste.iloc[0][col]
-                    break
-            
-            if pd.isna(proveedor):
-                proveedor = ''
-            
-            # Calcular PVP por defecto si es 0
-            if pvp == 0 or pd.isna(pvp):
-                pvp = coste * 2.5
-            
-            # Calcular coste por defecto si es 0
-            if coste == 0 or pd.isna(coste):
-                coste = pvp / 2.5
-        
-        # BÚSQUEDA INDEPENDIENTE DE PROVEEDOR (igual que el script original):
-        # Si no se encontró proveedor en la primera búsqueda, buscar solo por código
-        # Esto es independiente del resto de columnas y no afecta a PVP ni Coste
-        if proveedor == '' or pd.isna(proveedor):
-            # Buscar todos los artículos con el mismo código
-            match_proveedor = coste_df[coste_df['Codigo'].astype(str) == str(codigo).strip()]
-            if len(match_proveedor) > 0:
-                # Buscar la columna del proveedor
-                columnas_normalizadas = [self.normalizar_texto(col) for col in match_proveedor.columns]
-                nombre_proveedor_normalizado = self.normalizar_texto('Nombre proveedor')
-                idx_proveedor = None
-                for i, col_norm in enumerate(columnas_normalizadas):
-                    if nombre_proveedor_normalizado == col_norm:
-                        idx_proveedor = i
-                        break
-                
-                # Buscar un registro que tenga proveedor válido
-                for idx, row in match_proveedor.iterrows():
-                    if idx_proveedor is not None:
-                        prov = row.iloc[idx_proveedor]
-                    else:
-                        prov = ''
-                    if pd.notna(prov) and prov != '':
-                        proveedor = prov
-                        break
-        
-        return {
-            'accion_raw': accion_raw,
-            'categoria': categoria,
-            'descuento_sugerido': descuento_sugerido,
-            'pvp': pvp,
-            'coste': coste,
-            'proveedor': proveedor
-        }
 
 
 # Funciones de utilidad para uso directo
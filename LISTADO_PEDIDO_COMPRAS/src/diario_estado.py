@@ -0,0 +1,232 @@
+#!/usr/bin/env python3
+"""
+Módulo DiarioEstado - Diario de cambios y escritura atómica del estado JSON
+
+Este módulo implementa la persistencia a prueba de interrupciones del backend
+'json' del StateManager:
+
+    - escribir_json_atomico: escribe un archivo JSON completo con
+      src/escritura_atomica.py (archivo temporal sincronizado en disco y
+      renombrado); el archivo anterior nunca queda a medio escribir
+    - DiarioEstado: diario de solo añadir (una línea JSON por entrada) con los
+      cambios del estado desde la última instantánea; cada entrada se
+      sincroniza en disco antes de darse por guardada
+
+El state.json es la instantánea; los cambios posteriores se añaden al diario
+y, cada cierto número de entradas, se compactan en una nueva instantánea.
+Al cargar, se aplica la instantánea y después las entradas del diario con
+número de secuencia posterior (informacion_sistema.secuencia_diario de la
+instantánea). Una línea incompleta (interrupción durante la escritura) se
+descarta.
+
+Los cambios se describen como tuplas (tipo, datos), con los mismos tipos que
+registra el StateManager:
+    - ('stock', {clave: stock}): artículos del stock acumulado modificados
+    - ('ejecucion', registro): nueva fila del histórico de ejecuciones
+    - ('pedido', registro): nuevo pedido generado
+    - ('error', registro): nuevo error pendiente
+
+Autor: Sistema de Pedidos Vivero V2
+Fecha: 2026-02-26
+"""
+
+import os
+import json
+import logging
+from typing import Any, Dict, Iterable, List, Sequence, Tuple
+
+from src.escritura_atomica import escribir_atomico, sincronizar_directorio
+
+# Configuración del logger
+logger = logging.getLogger(__name__)
+
+# Secciones pequeñas del estado que se guardan completas con cada cambio
+SECCIONES_METADATOS = ['informacion_sistema', 'configuracion_actual', 'metricas', 'notas']
+
+# Extensión del diario, junto al archivo de estado (state.json.diario)
+EXTENSION_DIARIO = '.diario'
+
+
+# ============================================================================
+# ESCRITURA ATÓMICA
+# ============================================================================
+
+def escribir_json_atomico(ruta: str, datos: Any) -> None:
+    """
+    Escribe un archivo JSON de forma atómica (temporal + fsync + renombrado).
+
+    Args:
+        ruta (str): Ruta del archivo de destino
+        datos (Any): Datos serializables en JSON
+    """
+    def escribir(ruta_temporal: str) -> None:
+        with open(ruta_temporal, 'w', encoding='utf-8') as f:
+            json.dump(datos, f, indent=4, ensure_ascii=False)
+
+    escribir_atomico(ruta, escribir)
+
+
+# ============================================================================
+# DIARIO DE CAMBIOS
+# ============================================================================
+
+class DiarioEstado:
+    """
+    Diario de solo añadir con los cambios del estado posteriores a la instantánea.
+
+    Cada entrada es un diccionario con su número de 'secuencia', la lista de
+    'cambios' (tipo, datos) y las secciones pequeñas del estado ('metadatos')
+    tal como quedaron tras los cambios.
+
+    Attributes:
+        ruta (str): Ruta del archivo de diario
+    """
+
+    def __init__(self, ruta_estado: str):
+        """
+        Inicializa el diario de un archivo de estado.
+
+        Args:
+            ruta_estado (str): Ruta del state.json; el diario se guarda junto a
+                él con la extensión EXTENSION_DIARIO (se crea al añadir la
+                primera entrada)
+        """
+        self.ruta = ruta_estado + EXTENSION_DIARIO
+
+    def leer(self) -> List[Dict[str, Any]]:
+        """
+        Lee las entradas completas del diario.
+
+        Las líneas que no se puedan interpretar (escritura interrumpida) se
+        descartan; el resto de entradas se devuelven en orden.
+
+        Returns:
+            List[Dict[str, Any]]: Entradas del diario
+        """
+        if not os.path.exists(self.ruta):
+            return []
+
+        with open(self.ruta, 'r', encoding='utf-8') as f:
+            lineas = f.read().splitlines()
+
+        entradas = []
+        for numero, linea in enumerate(lineas, start=1):
+            if not linea.strip():
+                continue
+            try:
+                entradas.append(json.loads(linea))
+            except json.JSONDecodeError:
+                logger.warning(f"Descartada la entrada incompleta de la línea {numero} del diario: {self.ruta}")
+        return entradas
+
+    def añadir(self, entrada: Dict[str, Any]) -> None:
+        """
+        Añade una entrada al diario y la sincroniza en disco.
+
+        Args:
+            entrada (Dict[str, Any]): Entrada serializable en JSON
+        """
+        nuevo = not os.path.exists(self.ruta)
+        linea = json.dumps(entrada, ensure_ascii=False, default=str) + '\n'
+
+        # Si una escritura anterior quedó interrumpida a mitad de línea, la
+        # nueva entrada empieza en su propia línea
+        if not nuevo and os.path.getsize(self.ruta) > 0:
+            with open(self.ruta, 'rb') as f:
+                f.seek(-1, os.SEEK_END)
+                if f.read(1) != b'\n':
+                    linea = '\n' + linea
+
+        with open(self.ruta, 'a', encoding='utf-8') as f:
+            f.write(linea)
+            f.flush()
+            os.fsync(f.fileno())
+        if nuevo:
+            sincronizar_directorio(os.path.dirname(self.ruta))
+
+    def vaciar(self) -> None:
+        """
+        Elimina el diario (tras compactar sus entradas en una instantánea).
+        """
+        if os.path.exists(self.ruta):
+            os.remove(self.ruta)
+            sincronizar_directorio(os.path.dirname(self.ruta))
+
+
+# ============================================================================
+# RECONSTRUCCIÓN DEL ESTADO
+# ============================================================================
+
+def aplicar_cambios_estado(estado: Dict[str, Any], cambios: Iterable[Sequence]) -> None:
+    """
+    Aplica al estado en memoria una lista de cambios (tipo, datos).
+
+    Args:
+        estado (Dict[str, Any]): Estado a modificar (se modifica en el sitio)
+        cambios (Iterable[Sequence]): Cambios (tipo, datos)
+    """
+    for tipo, datos in cambios:
+        if tipo == 'stock':
+            estado.setdefault('stock_acumulado', {}).update(datos)
+        elif tipo == 'ejecucion':
+            estado.setdefault('historico_ejecuciones', []).append(datos)
+        elif tipo == 'pedido':
+            estado.setdefault('pedidos_generados', []).append(datos)
+        elif tipo == 'error':
+            estado.setdefault('errores_pendientes', []).append(datos)
+        else:
+            raise ValueError(f"Tipo de cambio de estado desconocido: {tipo}")
+
+
+def crear_entrada_diario(estado: Dict[str, Any], secuencia: int, cambios: List) -> Dict[str, Any]:
+    """
+    Construye la entrada de diario de un conjunto de cambios.
+
+    Args:
+        estado (Dict[str, Any]): Estado en memoria (ya con los cambios aplicados)
+        secuencia (int): Número de secuencia de la entrada
+        cambios (List): Cambios (tipo, datos)
+
+    Returns:
+        Dict[str, Any]: Entrada con la secuencia, los cambios y los metadatos
+            (informacion_sistema.secuencia_diario ya igual a la secuencia)
+    """
+    metadatos = {seccion: estado.get(seccion, {}) for seccion in SECCIONES_METADATOS}
+    metadatos['informacion_sistema'] = {**metadatos['informacion_sistema'], 'secuencia_diario': secuencia}
+    return {
+        'secuencia': secuencia,
+        'cambios': [[tipo, datos] for tipo, datos in cambios],
+        'metadatos': metadatos
+    }
+
+
+def cargar_estado_json(ruta: str) -> Tuple[Dict[str, Any], int]:
+    """
+    Carga la instantánea state.json y le aplica las entradas pendientes del diario.
+
+    Args:
+        ruta (str): Ruta del state.json
+
+    Returns:
+        Tuple[Dict[str, Any], int]: (estado reconstruido, número de entradas
+            del diario aplicadas)
+
+    Raises:
+        json.JSONDecodeError: Si la instantánea no es un JSON válido
+    """
+    with open(ruta, 'r', encoding='utf-8') as f:
+        estado = json.load(f)
+
+    secuencia = estado.get('informacion_sistema', {}).get('secuencia_diario', 0)
+    aplicadas = 0
+    for entrada in DiarioEstado(ruta).leer():
+        if entrada['secuencia'] <= secuencia:
+            continue
+        aplicar_cambios_estado(estado, entrada['cambios'])
+        estado.update(entrada['metadatos'])
+        secuencia = entrada['secuencia']
+        aplicadas += 1
+
+    if aplicadas:
+        logger.info(f"Aplicadas {aplicadas} entradas del diario de estado")
+    return estado, aplicadas
@@ -0,0 +1,62 @@
+#!/usr/bin/env python3
+"""
+Módulo EscrituraAtomica - Escritura de archivos a prueba de interrupciones
+
+Este módulo reúne la escritura atómica que usan el estado, el histórico de
+stock, la caché de Excel y el almacén de agregados de la clasificación ABC:
+el contenido se escribe en un archivo temporal, se sincroniza en disco
+(fsync) y se coloca en su ruta final con un renombrado atómico. Un corte de
+luz o una interrupción nunca deja el archivo de destino a medio escribir:
+queda la versión anterior o la nueva completa.
+
+El archivo temporal lleva el PID del proceso, de modo que varios procesos
+pueden escribir el mismo destino a la vez sin pisarse.
+
+Autor: Sistema de Pedidos Vivero V2
+Fecha: 2026-03-02
+"""
+
+import os
+from typing import Callable
+
+
+def sincronizar_directorio(directorio: str) -> None:
+    """
+    Sincroniza en disco la entrada de directorio (renombrados y creaciones).
+
+    En sistemas que no permiten abrir directorios (Windows) no hace nada.
+
+    Args:
+        directorio (str): Ruta del directorio
+    """
+    try:
+        descriptor = os.open(directorio or '.', os.O_RDONLY)
+    except OSError:
+        return
+    try:
+        os.fsync(descriptor)
+    except OSError:
+        pass
+    finally:
+        os.close(descriptor)
+
+
+def escribir_atomico(ruta_destino: str, escritor: Callable[[str], None]) -> None:
+    """
+    Escribe un archivo de forma atómica (temporal + fsync + renombrado).
+
+    Args:
+        ruta_destino (str): Ruta final del archivo
+        escritor (Callable[[str], None]): Función que recibe la ruta temporal
+            y escribe el contenido completo
+    """
+    ruta_temporal = f"{ruta_destino}.{os.getpid()}.tmp"
+    try:
+        escritor(ruta_temporal)
+        with open(ruta_temporal, 'rb+') as f:
+            os.fsync(f.fileno())
+        os.replace(ruta_temporal, ruta_destino)
+    finally:
+        if os.path.exists(ruta_temporal):
+            os.remove(ruta_temporal)
+    sincronizar_directorio(os.path.dirname(ruta_destino))
@@ -0,0 +1,313 @@
+#!/usr/bin/env python3
+"""
+Módulo EstadoSQLite - Almacenamiento del estado del sistema en SQLite
+
+Este módulo implementa el backend SQLite del StateManager (rutas.backend_estado
+= 'sqlite' en config.json). En lugar de reescribir todo el state.json en cada
+cambio, cada tipo de dato del estado vive en su propia tabla y cada cambio se
+escribe en una transacción con solo las filas afectadas:
+
+    - stock_acumulado: una fila por artículo (upsert por clave)
+    - ejecuciones: histórico de ejecuciones (una fila por ejecución)
+    - pedidos_generados: archivos de pedido generados
+    - errores: errores pendientes
+    - metadatos: secciones pequeñas del estado (informacion_sistema,
+      configuracion_actual, metricas, notas) como JSON
+
+Los cambios se describen como tuplas (tipo, datos), con los mismos tipos que
+registra el StateManager: 'stock', 'ejecucion', 'pedido' y 'error'.
+
+Incluye el migrador de un state.json existente a la base de datos, que el
+StateManager usa automáticamente la primera vez que arranca con este backend.
+
+Autor: Sistema de Pedidos Vivero V2
+Fecha: 2026-02-25
+"""
+
+import os
+import json
+import sqlite3
+import logging
+from contextlib import closing
+from typing import Any, Dict, Iterable, List, Tuple
+
+from src.diario_estado import SECCIONES_METADATOS, cargar_estado_json
+
+# Configuración del logger
+logger = logging.getLogger(__name__)
+
+# Versión del esquema (PRAGMA user_version)
+VERSION_ESQUEMA = 1
+
+ESQUEMA = """
+CREATE TABLE IF NOT EXISTS metadatos (
+    seccion TEXT PRIMARY KEY,
+    valor TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS stock_acumulado (
+    clave TEXT PRIMARY KEY,
+    stock
+);
+CREATE TABLE IF NOT EXISTS ejecuciones (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    semana INTEGER,
+    fecha_ejecucion TEXT,
+    archivo_generado TEXT,
+    num_articulos INTEGER,
+    importe REAL,
+    exitosa INTEGER,
+    notas TEXT
+);
+CREATE TABLE IF NOT EXISTS pedidos_generados (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    semana INTEGER,
+    archivo TEXT,
+    fecha TEXT,
+    importe REAL
+);
+CREATE TABLE IF NOT EXISTS errores (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    timestamp TEXT,
+    tipo TEXT,
+    mensaje TEXT,
+    detalles TEXT,
+    procesado INTEGER
+);
+CREATE INDEX IF NOT EXISTS idx_ejecuciones_semana ON ejecuciones (semana);
+CREATE INDEX IF NOT EXISTS idx_pedidos_semana ON pedidos_generados (semana);
+"""
+
+COLUMNAS_EJECUCIONES = ['semana', 'fecha_ejecucion', 'archivo_generado', 'num_articulos',
+                        'importe', 'exitosa', 'notas']
+COLUMNAS_PEDIDOS = ['semana', 'archivo', 'fecha', 'importe']
+COLUMNAS_ERRORES = ['timestamp', 'tipo', 'mensaje', 'detalles', 'procesado']
+
+
+# ============================================================================
+# CONVERSIÓN ENTRE REGISTROS Y FILAS
+# ============================================================================
+
+def _fila_ejecucion(registro: Dict[str, Any]) -> Tuple:
+    """Convierte un registro del histórico de ejecuciones en una fila."""
+    return (registro.get('semana'), registro.get('fecha_ejecucion'), registro.get('archivo_generado'),
+            registro.get('num_articulos'), registro.get('importe'), int(bool(registro.get('exitosa'))),
+            registro.get('notas'))
+
+
+def _fila_pedido(pedido: Dict[str, Any]) -> Tuple:
+    """Convierte un registro de pedido generado en una fila."""
+    return tuple(pedido.get(columna) for columna in COLUMNAS_PEDIDOS)
+
+
+def _fila_error(error: Dict[str, Any]) -> Tuple:
+    """Convierte un error pendiente en una fila (los detalles se guardan como JSON)."""
+    return (error.get('timestamp'), error.get('tipo'), error.get('mensaje'),
+            json.dumps(error.get('detalles', ''), ensure_ascii=False, default=str),
+            int(bool(error.get('procesado', False))))
+
+
+def _consulta_insercion(tabla: str, columnas: List[str]) -> str:
+    """Construye la sentencia INSERT de una tabla de registros."""
+    return f"INSERT INTO {tabla} ({', '.join(columnas)}) VALUES ({', '.join('?' * len(columnas))})"
+
+
+# ============================================================================
+# ALMACÉN DE ESTADO
+# ============================================================================
+
+class AlmacenEstadoSQLite:
+    """
+    Base de datos SQLite con el estado persistente del sistema.
+
+    Cada operación abre su propia conexión y escribe dentro de una única
+    transacción: o se aplican todos los cambios o ninguno.
+
+    Attributes:
+        ruta (str): Ruta al archivo de la base de datos
+    """
+
+    def __init__(self, ruta: str):
+        """
+        Inicializa el almacén.
+
+        Args:
+            ruta (str): Ruta al archivo de la base de datos (se crea al escribir)
+        """
+        self.ruta = ruta
+
+    def existe(self) -> bool:
+        """
+        Indica si la base de datos ya existe.
+
+        Returns:
+            bool: True si el archivo de la base de datos existe
+        """
+        return os.path.exists(self.ruta)
+
+    def _conectar(self) -> sqlite3.Connection:
+        """
+        Abre una conexión creando el esquema si la base de datos es nueva.
+
+        Returns:
+            sqlite3.Connection: Conexión abierta
+        """
+        directorio = os.path.dirname(self.ruta)
+        if directorio:
+            os.makedirs(directorio, exist_ok=True)
+
+        conexion = sqlite3.connect(self.ruta)
+        version = conexion.execute("PRAGMA user_version").fetchone()[0]
+        if version == 0:
+            conexion.executescript(ESQUEMA)
+            conexion.execute(f"PRAGMA user_version = {VERSION_ESQUEMA}")
+        return conexion
+
+    def cargar(self) -> Dict[str, Any]:
+        """
+        Lee el estado completo con la misma estructura que state.json.
+
+        Returns:
+            Dict[str, Any]: Diccionario con el estado
+        """
+        with closing(self._conectar()) as conexion:
+            metadatos = {seccion: json.loads(valor) for seccion, valor
+                         in conexion.execute("SELECT seccion, valor FROM metadatos")}
+
+            stock = dict(conexion.execute("SELECT clave, stock FROM stock_acumulado ORDER BY rowid"))
+
+            ejecuciones = []
+            for fila in conexion.execute(f"SELECT {', '.join(COLUMNAS_EJECUCIONES)} FROM ejecuciones ORDER BY id"):
+                registro = dict(zip(COLUMNAS_EJECUCIONES, fila))
+                registro['exitosa'] = bool(registro['exitosa'])
+                ejecuciones.append(registro)
+
+            pedidos = [dict(zip(COLUMNAS_PEDIDOS, fila)) for fila in
+                       conexion.execute(f"SELECT {', '.join(COLUMNAS_PEDIDOS)} FROM pedidos_generados ORDER BY id")]
+
+            errores = []
+            for fila in conexion.execute(f"SELECT {', '.join(COLUMNAS_ERRORES)} FROM errores ORDER BY id"):
+                error = dict(zip(COLUMNAS_ERRORES, fila))
+                error['detalles'] = json.loads(error['detalles'])
+                error['procesado'] = bool(error['procesado'])
+                errores.append(error)
+
+        return {
+            'informacion_sistema': metadatos.get('informacion_sistema', {}),
+            'configuracion_actual': metadatos.get('configuracion_actual', {}),
+            'stock_acumulado': stock,
+            'historico_ejecuciones': ejecuciones,
+            'pedidos_generados': pedidos,
+            'metricas': metadatos.get('metricas', {}),
+            'errores_pendientes': errores,
+            'notas': metadatos.get('notas', {})
+        }
+
+    def _guardar_metadatos(self, conexion: sqlite3.Connection, estado: Dict[str, Any]) -> None:
+        """Escribe las secciones pequeñas del estado en la tabla metadatos."""
+        conexion.executemany(
+            "INSERT INTO metadatos (seccion, valor) VALUES (?, ?) "
+            "ON CONFLICT(seccion) DO UPDATE SET valor = excluded.valor",
+            [(seccion, json.dumps(estado.get(seccion, {}), ensure_ascii=False, default=str))
+             for seccion in SECCIONES_METADATOS]
+        )
+
+    def aplicar_cambios(self, estado: Dict[str, Any], cambios: Iterable[Tuple[str, Any]]) -> None:
+        """
+        Escribe un conjunto de cambios en una sola transacción.
+
+        Además de los cambios, se reescriben las secciones de metadatos con
+        los valores actuales del estado (métricas, última semana procesada...).
+
+        Args:
+            estado (Dict[str, Any]): Estado en memoria (ya con los cambios aplicados)
+            cambios (Iterable[Tuple[str, Any]]): Cambios (tipo, datos):
+                - ('stock', {clave: stock}): upsert de artículos
+                - ('ejecucion', registro): nueva fila del histórico
+                - ('pedido', registro): nuevo pedido generado
+                - ('error', registro): nuevo error pendiente
+        """
+        with closing(self._conectar()) as conexion, conexion:
+            for tipo, datos in cambios:
+                if tipo == 'stock':
+                    conexion.executemany(
+                        "INSERT INTO stock_acumulado (clave, stock) VALUES (?, ?) "
+                        "ON CONFLICT(clave) DO UPDATE SET stock = excluded.stock",
+                        datos.items()
+                    )
+                elif tipo == 'ejecucion':
+                    conexion.execute(_consulta_insercion('ejecuciones', COLUMNAS_EJECUCIONES),
+                                     _fila_ejecucion(datos))
+                elif tipo == 'pedido':
+                    conexion.execute(_consulta_insercion('pedidos_generados', COLUMNAS_PEDIDOS),
+                                     _fila_pedido(datos))
+                elif tipo == 'error':
+                    conexion.execute(_consulta_insercion('errores', COLUMNAS_ERRORES),
+                                     _fila_error(datos))
+                else:
+                    raise ValueError(f"Tipo de cambio de estado desconocido: {tipo}")
+
+            self._guardar_metadatos(conexion, estado)
+
+    def guardar_completo(self, estado: Dict[str, Any]) -> None:
+        """
+        Reemplaza todo el contenido de la base de datos por el estado indicado.
+
+        Se usa al crear o resetear el estado y al migrar desde state.json.
+
+        Args:
+            estado (Dict[str, Any]): Estado completo
+        """
+        with closing(self._conectar()) as conexion, conexion:
+            for tabla in ('metadatos', 'stock_acumulado', 'ejecuciones', 'pedidos_generados', 'errores'):
+                conexion.execute(f"DELETE FROM {tabla}")
+
+            conexion.executemany("INSERT INTO stock_acumulado (clave, stock) VALUES (?, ?)",
+                                 estado.get('stock_acumulado', {}).items())
+            conexion.executemany(_consulta_insercion('ejecuciones', COLUMNAS_EJECUCIONES),
+                                 [_fila_ejecucion(r) for r in estado.get('historico_ejecuciones', [])])
+            conexion.executemany(_consulta_insercion('pedidos_generados', COLUMNAS_PEDIDOS),
+                                 [_fila_pedido(p) for p in estado.get('pedidos_generados', [])])
+            conexion.executemany(_consulta_insercion('errores', COLUMNAS_ERRORES),
+                                 [_fila_error(e) for e in estado.get('errores_pendientes', [])])
+
+            self._guardar_metadatos(conexion, estado)
+
+
+# ============================================================================
+# MIGRACIÓN DESDE STATE.JSON
+# ============================================================================
+
+def migrar_estado_json(ruta_json: str, ruta_sqlite: str) -> Dict[str, Any]:
+    """
+    Copia el contenido de un state.json a una base de datos SQLite.
+
+    Se migra el estado completo: la instantánea y las entradas pendientes de
+    su diario. El archivo JSON no se modifica; la base de datos se reemplaza
+    por completo.
+
+    Args:
+        ruta_json (str): Ruta del state.json existente
+        ruta_sqlite (str): Ruta de la base de datos de destino
+
+    Returns:
+        Dict[str, Any]: Estado migrado
+    """
+    estado, _ = cargar_estado_json(ruta_json)
+
+    AlmacenEstadoSQLite(ruta_sqlite).guardar_completo(estado)
+
+    logger.info(f"Estado migrado de {ruta_json} a {ruta_sqlite}: "
+                f"{len(estado.get('stock_acumulado', {}))} artículos, "
+                f"{len(estado.get('historico_ejecuciones', []))} ejecuciones")
+    return estado
+
+
+if __name__ == "__main__":
+    # Migración manual: python -m src.estado_sqlite [state.json] [state.sqlite]
+    import sys
+
+    logging.basicConfig(level=logging.INFO)
+
+    origen = sys.argv[1] if len(sys.argv) > 1 else os.path.join('data', 'state.json')
+    destino = sys.argv[2] if len(sys.argv) > 2 else os.path.splitext(origen)[0] + '.sqlite'
+    migrar_estado_json(origen, destino)
@@ -0,0 +1,370 @@
+#!/usr/bin/env python3
+"""
+Módulo ExcelCache - Capa compartida de ingesta de archivos Excel
+
+Este módulo evita parsear repetidamente con openpyxl los mismos libros Excel
+(SPA_*.xlsx, CLASIFICACION_ABC+D_*.xlsx) desde los distintos scripts del
+sistema. La primera lectura de cada hoja se convierte a un archivo binario
+en un directorio de caché junto al directorio de datos; las lecturas
+posteriores se sirven desde ese archivo.
+
+Las entradas de la caché se identifican por el hash del contenido del libro,
+la hoja y los parámetros de lectura, por lo que un archivo modificado genera
+automáticamente una nueva entrada y las antiguas se eliminan.
+
+Formato de la caché:
+    - Feather (columnar) si pyarrow está instalado
+    - Pickle de pandas en caso contrario, o si la hoja no es representable
+      en Feather (columnas con tipos mezclados)
+
+Autor: Sistema de Pedidos Vivero V2
+Fecha: 2026-02-14
+"""
+
+import os
+import re
+import json
+import glob
+import hashlib
+import logging
+from typing import Optional, Dict, List, Union
+
+import numpy as np
+import pandas as pd
+
+from src.escritura_atomica import escribir_atomico
+
+# Configuración del logger
+logger = logging.getLogger(__name__)
+
+try:
+    import pyarrow  # noqa: F401
+    PYARROW_DISPONIBLE = True
+except ImportError:
+    PYARROW_DISPONIBLE = False
+
+# Nombre del directorio de caché (hermano del directorio del archivo leído)
+NOMBRE_DIRECTORIO_CACHE = 'cache_excel'
+
+# Tamaño del bloque de lectura para el cálculo del hash
+TAMANO_BLOQUE_HASH = 1024 * 1024
+
+
+# ============================================================================
+# FUNCIONES AUXILIARES
+# ============================================================================
+
+def calcular_hash_archivo(ruta_archivo: str) -> str:
+    """
+    Calcula el hash SHA-1 del contenido de un archivo.
+
+    Args:
+        ruta_archivo (str): Ruta del archivo
+
+    Returns:
+        str: Hash hexadecimal del contenido
+    """
+    sha1 = hashlib.sha1()
+    with open(ruta_archivo, 'rb') as f:
+        for bloque in iter(lambda: f.read(TAMANO_BLOQUE_HASH), b''):
+            sha1.update(bloque)
+    return sha1.hexdigest()
+
+
+def obtener_directorio_cache(ruta_archivo: str) -> str:
+    """
+    Obtiene el directorio de caché para un archivo de datos.
+
+    Para un archivo en 'data/input/' la caché se sitúa en 'data/cache_excel/'.
+
+    Args:
+        ruta_archivo (str): Ruta del archivo Excel
+
+    Returns:
+        str: Ruta del directorio de caché
+    """
+    directorio_archivo = os.path.dirname(os.path.abspath(ruta_archivo))
+    return os.path.join(os.path.dirname(directorio_archivo), NOMBRE_DIRECTORIO_CACHE)
+
+
+def _nombre_seguro(texto: str) -> str:
+    """
+    Convierte un texto en un fragmento válido para nombres de archivo.
+
+    Args:
+        texto (str): Texto original (nombre de hoja, parámetros...)
+
+    Returns:
+        str: Texto sin caracteres problemáticos y con sufijo único
+    """
+    limpio = re.sub(r'[^\w-]+', '_', texto)[:40]
+    sufijo = hashlib.sha1(texto.encode('utf-8')).hexdigest()[:8]
+    return f"{limpio}_{sufijo}"
+
+
+def _prefijo_archivo(ruta_archivo: str) -> str:
+    """
+    Obtiene el nombre del archivo sin extensión, apto para nombres de caché.
+
+    Args:
+        ruta_archivo (str): Ruta del archivo
+
+    Returns:
+        str: Nombre base del archivo
+    """
+    return re.sub(r'[^\w+-]+', '_', os.path.splitext(os.path.basename(ruta_archivo))[0])
+
+
+# ============================================================================
+# CLASE PRINCIPAL
+# ============================================================================
+
+class ExcelCache:
+    """
+    Caché binaria de hojas Excel indexada por hash de contenido y hoja.
+
+    Attributes:
+        ruta_archivo (str): Ruta del libro Excel de origen
+        directorio_cache (str): Directorio donde se guardan las hojas convertidas
+        hash_archivo (str): Hash del contenido del libro
+        prefijo (str): Nombre base de las entradas de caché del libro
+    """
+
+    def __init__(self, ruta_archivo: str, directorio_cache: Optional[str] = None):
+        """
+        Inicializa la caché para un libro Excel concreto.
+
+        Args:
+            ruta_archivo (str): Ruta del libro Excel
+            directorio_cache (Optional[str]): Directorio de caché (por defecto,
+                'cache_excel' junto al directorio del archivo)
+
+        Raises:
+            FileNotFoundError: Si el archivo no existe
+        """
+        self.ruta_archivo = ruta_archivo
+        self.directorio_cache = directorio_cache or obtener_directorio_cache(ruta_archivo)
+        self.hash_archivo = calcular_hash_archivo(ruta_archivo)
+        self.prefijo = _prefijo_archivo(ruta_archivo)
+
+    def _ruta_base(self, hoja: Union[str, int], parametros: str) -> str:
+        """
+        Construye la ruta (sin extensión) de la entrada de caché de una hoja.
+
+        Args:
+            hoja (Union[str, int]): Nombre o índice de la hoja
+            parametros (str): Representación de los parámetros de lectura
+
+        Returns:
+            str: Ruta base de la entrada
+        """
+        identificador = _nombre_seguro(f"{hoja!r}|{parametros}")
+        nombre = f"{self.prefijo}__{self.hash_archivo[:16]}__{identificador}"
+        return os.path.join(self.directorio_cache, nombre)
+
+    def _ruta_indice_hojas(self) -> str:
+        """
+        Obtiene la ruta del índice con los nombres de hoja del libro.
+
+        Returns:
+            str: Ruta del archivo JSON con la lista de hojas
+        """
+        nombre = f"{self.prefijo}__{self.hash_archivo[:16]}__hojas.json"
+        return os.path.join(self.directorio_cache, nombre)
+
+    def _leer_entrada(self, ruta_base: str) -> Optional[pd.DataFrame]:
+        """
+        Lee una hoja convertida de la caché, si existe.
+
+        Args:
+            ruta_base (str): Ruta base de la entrada (sin extensión)
+
+        Returns:
+            Optional[pd.DataFrame]: Hoja cacheada o None si no existe
+        """
+        try:
+            if PYARROW_DISPONIBLE and os.path.exists(ruta_base + '.feather'):
+                df = pd.read_feather(ruta_base + '.feather')
+                # Feather devuelve None en columnas de texto; se restaura NaN
+                # para que el resultado sea igual al de pd.read_excel
+                for columna in df.columns[df.dtypes == object]:
+                    df[columna] = df[columna].where(df[columna].notna(), np.nan)
+                return df
+            if os.path.exists(ruta_base + '.pkl'):
+                return pd.read_pickle(ruta_base + '.pkl')
+        except Exception as e:
+            logger.warning(f"Entrada de caché ilegible, se regenerará: {ruta_base} ({str(e)})")
+        return None
+
+    def _guardar_entrada(self, ruta_base: str, df: pd.DataFrame) -> None:
+        """
+        Guarda una hoja en la caché, en Feather si es posible o en Pickle.
+
+        Args:
+            ruta_base (str): Ruta base de la entrada (sin extensión)
+            df (pd.DataFrame): Hoja leída del libro Excel
+        """
+        os.makedirs(self.directorio_cache, exist_ok=True)
+
+        if PYARROW_DISPONIBLE:
+            try:
+                escribir_atomico(ruta_base + '.feather', lambda ruta: df.to_feather(ruta))
+                return
+            except Exception as e:
+                logger.debug(f"Hoja no representable en Feather, usando Pickle: {str(e)}")
+
+        escribir_atomico(ruta_base + '.pkl', lambda ruta: df.to_pickle(ruta))
+
+    def _eliminar_versiones_antiguas(self) -> None:
+        """
+        Elimina las entradas de caché de versiones anteriores del mismo libro.
+        """
+        patron = os.path.join(self.directorio_cache, f"{glob.escape(self.prefijo)}__*")
+        for ruta in glob.glob(patron):
+            partes = os.path.basename(ruta).split('__')
+            if len(partes) >= 2 and partes[1] != self.hash_archivo[:16]:
+                try:
+                    os.remove(ruta)
+                except OSError:
+                    pass
+
+    def obtener_hojas(self) -> List[str]:
+        """
+        Obtiene los nombres de las hojas del libro en su orden original.
+
+        Returns:
+            List[str]: Nombres de las hojas
+        """
+        ruta_indice = self._ruta_indice_hojas()
+        if os.path.exists(ruta_indice):
+            try:
+                with open(ruta_indice, 'r', encoding='utf-8') as f:
+                    return json.load(f)
+            except (OSError, ValueError):
+                pass
+
+        with pd.ExcelFile(self.ruta_archivo) as excel_file:
+            hojas = list(excel_file.sheet_names)
+
+        os.makedirs(self.directorio_cache, exist_ok=True)
+
+        def escribir_indice(ruta):
+            with open(ruta, 'w', encoding='utf-8') as f:
+                json.dump(hojas, f, ensure_ascii=False)
+
+        escribir_atomico(ruta_indice, escribir_indice)
+        return hojas
+
+    def leer_hoja(self, hoja: Union[str, int] = 0, **kwargs) -> pd.DataFrame:
+        """
+        Lee una hoja del libro, desde la caché si ya fue convertida.
+
+        Args:
+            hoja (Union[str, int]): Nombre o índice de la hoja
+            **kwargs: Parámetros adicionales para pd.read_excel
+
+        Returns:
+            pd.DataFrame: Datos de la hoja
+        """
+        # Un índice se resuelve al nombre de la hoja: una sola entrada por hoja
+        if isinstance(hoja, int):
+            hojas = self.obtener_hojas()
+            if 0 <= hoja < len(hojas):
+                hoja = hojas[hoja]
+
+        parametros = repr(sorted(kwargs.items()))
+        ruta_base = self._ruta_base(hoja, parametros)
+
+        df = self._leer_entrada(ruta_base)
+        if df is not None:
+            logger.debug(f"Hoja '{hoja}' servida desde caché: {self.ruta_archivo}")
+            return df
+
+        logger.debug(f"Convirtiendo hoja '{hoja}' a caché: {self.ruta_archivo}")
+        df = pd.read_excel(self.ruta_archivo, sheet_name=hoja, **kwargs)
+
+        try:
+            self._eliminar_versiones_antiguas()
+            self._guardar_entrada(ruta_base, df)
+        except Exception as e:
+            logger.warning(f"No se pudo guardar la caché de {self.ruta_archivo}: {str(e)}")
+
+        return df
+
+
+# ============================================================================
+# API PÚBLICA
+# ============================================================================
+
+def leer_excel_cacheado(
+    ruta_archivo: str,
+    sheet_name: Union[str, int, None] = 0,
+    directorio_cache: Optional[str] = None,
+    **kwargs
+) -> Union[pd.DataFrame, Dict[str, pd.DataFrame]]:
+    """
+    Sustituto de pd.read_excel que sirve las hojas desde la caché binaria.
+
+    Mantiene la semántica de pd.read_excel respecto a 'sheet_name': un nombre
+    o índice devuelve un DataFrame y None devuelve un diccionario ordenado
+    con todas las hojas. Si la caché no puede usarse, se lee directamente
+    el archivo Excel.
+
+    Args:
+        ruta_archivo (str): Ruta del libro Excel
+        sheet_name (Union[str, int, None]): Hoja a leer (None para todas)
+        directorio_cache (Optional[str]): Directorio de caché alternativo
+        **kwargs: Parámetros adicionales para pd.read_excel (skiprows, ...)
+
+    Returns:
+        Union[pd.DataFrame, Dict[str, pd.DataFrame]]: Hoja o diccionario de hojas
+
+    Raises:
+        FileNotFoundError: Si el archivo no existe
+    """
+    if not os.path.exists(ruta_archivo):
+        raise FileNotFoundError(f"No such file or directory: '{ruta_archivo}'")
+
+    try:
+        cache = ExcelCache(ruta_archivo, directorio_cache)
+
+        if sheet_name is None:
+            return {hoja: cache.leer_hoja(hoja, **kwargs) for hoja in cache.obtener_hojas()}
+
+        return cache.leer_hoja(sheet_name, **kwargs)
+
+    except OSError as e:
+        logger.warning(f"Caché de Excel no disponible ({str(e)}), leyendo directamente: {ruta_archivo}")
+        return pd.read_excel(ruta_archivo, sheet_name=sheet_name, **kwargs)
+
+
+def limpiar_cache_excel(directorio_cache: str) -> int:
+    """
+    Elimina todas las entradas de un directorio de caché.
+
+    Args:
+        directorio_cache (str): Directorio de caché a vaciar
+
+    Returns:
+        int: Número de archivos eliminados
+    """
+    eliminados = 0
+    for ruta in glob.glob(os.path.join(directorio_cache, '*')):
+        try:
+            os.remove(ruta)
+            eliminados += 1
+        except OSError:
+            pass
+
+    logger.info(f"Caché de Excel vaciada: {eliminados} archivos eliminados")
+    return eliminados
+
+
+if __name__ == "__main__":
+    # Ejemplo de uso
+    print("ExcelCache - Capa compartida de ingesta de archivos Excel")
+    print("=" * 50)
+
+    logging.basicConfig(level=logging.DEBUG)
+    print(f"pyarrow disponible: {PYARROW_DISPONIBLE}")
+    print("Uso: leer_excel_cacheado('data/input/SPA_coste.xlsx')")
@@ -0,0 +1,189 @@
+#!/usr/bin/env python3
+"""
+Módulo ExcelStreaming - Escritura de libros Excel en modo streaming
+
+Este módulo agrupa las utilidades para generar los archivos Excel de salida
+(pedidos y clasificación ABC+D) con openpyxl en modo write-only: cada fila
+se envía al archivo en cuanto se añade, de modo que no se mantiene en memoria
+un objeto Cell por valor y el consumo de memoria no crece con el número de
+filas.
+
+Los estilos se registran una sola vez en el libro como estilos con nombre
+(NamedStyle); cada celda solo referencia el nombre de su estilo, en lugar de
+crear sus propios objetos Border/Alignment/Font.
+
+Restricciones del modo write-only:
+    - Las anchuras de columna, las columnas ocultas y las alturas de fila
+      deben definirse antes de escribir las filas
+    - Las celdas combinadas y el autofiltro deben definirse antes de guardar
+    - Las filas se escriben en orden y no se pueden modificar después
+
+Autor: Sistema de Pedidos Vivero V2
+Fecha: 2026-02-21
+"""
+
+import logging
+from copy import copy
+from typing import Any, Dict, Iterable, List, Optional, Sequence
+
+from openpyxl import Workbook
+from openpyxl.cell import WriteOnlyCell
+from openpyxl.styles import Alignment, Border, Font, NamedStyle, PatternFill, Side
+from openpyxl.styles.fonts import DEFAULT_FONT
+from openpyxl.utils import get_column_letter
+
+# Configuración del logger
+logger = logging.getLogger(__name__)
+
+
+# ============================================================================
+# ESTILOS
+# ============================================================================
+
+def borde_fino(color: Optional[str] = None) -> Border:
+    """
+    Crea un borde fino en los cuatro lados de la celda.
+
+    Args:
+        color (Optional[str]): Color del borde (None para el color por defecto)
+
+    Returns:
+        Border: Borde fino
+    """
+    return Border(
+        left=Side(style='thin', color=color),
+        right=Side(style='thin', color=color),
+        top=Side(style='thin', color=color),
+        bottom=Side(style='thin', color=color)
+    )
+
+
+def relleno_solido(color: str) -> PatternFill:
+    """
+    Crea un relleno sólido del color indicado.
+
+    Args:
+        color (str): Color en formato RGB hexadecimal (por ejemplo '008000')
+
+    Returns:
+        PatternFill: Relleno sólido
+    """
+    return PatternFill(start_color=color, end_color=color, fill_type='solid')
+
+
+def crear_estilo(nombre: str, font: Optional[Font] = None, fill: Optional[PatternFill] = None,
+                 border: Optional[Border] = None, alignment: Optional[Alignment] = None,
+                 number_format: Optional[str] = None) -> NamedStyle:
+    """
+    Crea un estilo con nombre con los atributos indicados.
+
+    Los atributos no indicados conservan el valor por defecto de una celda
+    sin formato (la fuente por defecto del libro, sin borde ni relleno).
+
+    Args:
+        nombre (str): Nombre del estilo (único dentro del libro)
+        font (Optional[Font]): Fuente
+        fill (Optional[PatternFill]): Relleno
+        border (Optional[Border]): Borde
+        alignment (Optional[Alignment]): Alineación
+        number_format (Optional[str]): Formato numérico
+
+    Returns:
+        NamedStyle: Estilo con nombre
+    """
+    estilo = NamedStyle(name=nombre, font=font if font is not None else copy(DEFAULT_FONT))
+    if fill is not None:
+        estilo.fill = fill
+    if border is not None:
+        estilo.border = border
+    if alignment is not None:
+        estilo.alignment = alignment
+    if number_format is not None:
+        estilo.number_format = number_format
+    return estilo
+
+
+# ============================================================================
+# LIBROS Y HOJAS
+# ============================================================================
+
+def crear_libro_streaming(estilos: Iterable[NamedStyle]) -> Workbook:
+    """
+    Crea un libro en modo write-only con los estilos con nombre registrados.
+
+    Args:
+        estilos (Iterable[NamedStyle]): Estilos que usarán las celdas del libro
+
+    Returns:
+        Workbook: Libro sin hojas, listo para crear hojas con crear_hoja_streaming
+    """
+    libro = Workbook(write_only=True)
+    for estilo in estilos:
+        libro.add_named_style(estilo)
+    return libro
+
+
+def crear_hoja_streaming(libro: Workbook, titulo: str,
+                         anchos: Optional[Dict[str, float]] = None,
+                         columnas_ocultas: Optional[Sequence[str]] = None,
+                         altos_filas: Optional[Dict[int, float]] = None):
+    """
+    Crea una hoja en un libro write-only con sus dimensiones ya definidas.
+
+    Args:
+        libro (Workbook): Libro creado con crear_libro_streaming
+        titulo (str): Nombre de la hoja
+        anchos (Optional[Dict[str, float]]): Anchura por letra de columna
+        columnas_ocultas (Optional[Sequence[str]]): Letras de las columnas ocultas
+        altos_filas (Optional[Dict[int, float]]): Altura por número de fila
+
+    Returns:
+        WriteOnlyWorksheet: Hoja en la que añadir filas con escribir_fila
+    """
+    hoja = libro.create_sheet(title=titulo)
+
+    for letra, ancho in (anchos or {}).items():
+        hoja.column_dimensions[letra].width = ancho
+
+    for letra in columnas_ocultas or []:
+        hoja.column_dimensions[letra].hidden = True
+
+    for fila, alto in (altos_filas or {}).items():
+        hoja.row_dimensions[fila].height = alto
+
+    return hoja
+
+
+def escribir_fila(hoja, valores: Sequence[Any], estilos: Sequence[Optional[str]]) -> None:
+    """
+    Añade una fila a una hoja write-only aplicando a cada celda su estilo con nombre.
+
+    Args:
+        hoja (WriteOnlyWorksheet): Hoja creada con crear_hoja_streaming
+        valores (Sequence[Any]): Valores de la fila (None para una celda vacía)
+        estilos (Sequence[Optional[str]]): Nombre del estilo de cada celda
+            (None para una celda sin estilo)
+    """
+    fila: List[Any] = []
+    for valor, estilo in zip(valores, estilos):
+        if estilo is None:
+            fila.append(valor)
+        else:
+            celda = WriteOnlyCell(hoja, value=valor)
+            celda.style = estilo
+            fila.append(celda)
+    hoja.append(fila)
+
+
+def rango_hoja(num_filas: int, num_columnas: int) -> str:
+    """
+    Obtiene el rango que ocupa una tabla escrita desde la celda A1.
+
+    Args:
+        num_filas (int): Número de filas (incluida la cabecera)
+        num_columnas (int): Número de columnas
+
+    Returns:
+        str: Rango en formato 'A1:W37'
+    """
+    return f"A1:{get_column_letter(max(num_columnas, 1))}{max(num_filas, 1)}"
@@ -15,13 +15,114 @@ import pandas as pd
 import numpy as np
 import logging
 import re
+import unicodedata
+from functools import lru_cache
 from typing import Optional, Dict, List, Any, Tuple
 from datetime import datetime, date
 
+from src.codificador_claves import CodificadorClaves
+
 # Configuración del logger
 logger = logging.getLogger(__name__)
 
 
+# ============================================================================
+# RESOLUCIÓN DE FACTORES DE COMPRA A PARTIR DE LA ACCIÓN SUGERIDA
+# ============================================================================
+
+# Patrones de la 'Acción Sugerida' en orden de prioridad: si un texto contiene
+# varios, se aplica el primero de la lista. None indica el descuento genérico
+# "aplicar descuento X%", cuyo factor es 1 - X/100.
+PATRONES_FACTOR_COMPRA: List[Tuple[str, Optional[float]]] = [
+    # Eliminar del catálogo
+    ('eliminar del catalogo', 0.0),
+    # Reducción de compras
+    ('reducir compras 70%', 0.50),
+    ('reducir compras 50%', 0.50),
+    ('reducir compras 40%', 0.60),
+    ('reducir compras 35%', 0.65),
+    ('reducir compras 30%', 0.65),
+    ('reducir compras 25%', 0.75),
+    ('reducir compras 20%', 0.80),
+    ('reducir compras 15%', 0.85),
+    ('aplicar descuento 20%', 0.80),
+    ('implementar promocion del 15%', 0.85),
+    # Descuento genérico (extraer porcentaje)
+    (r'aplicar descuento\s*(?P<porcentaje>\d+[.,]?\d*)%', None),
+    # Mantener compras (0% cambio)
+    ('mantener el nivel de compras actual', 1.0),
+    ('mantener nivel de compras', 1.0),
+    ('mantener nivel de compras anterior', 1.0),
+    # Aumento de compras
+    ('aumentar compras 50%', 1.50),
+    ('aumentar compras 40%', 1.40),
+    ('incrementar compras 30%', 1.30),
+    ('aumentar compras 30%', 1.30),
+    ('aumentar compras 25%', 1.25),
+    ('incrementar compras 20%', 1.20),
+    ('aumentar compras 15%', 1.15),
+]
+
+
+def _compilar_patrones_factor(patrones: List[Tuple[str, Optional[float]]]) -> 're.Pattern':
+    """
+    Compila todos los patrones en una única expresión regular.
+    
+    Cada patrón es una alternativa con nombre 'p<prioridad>' dentro de un
+    lookahead, de modo que una sola pasada encuentra todos los patrones
+    presentes en el texto, incluidos los solapados.
+    
+    Args:
+        patrones (List[Tuple[str, Optional[float]]]): Patrones en orden de prioridad
+    
+    Returns:
+        re.Pattern: Expresión regular compilada
+    """
+    alternativas = []
+    for prioridad, (patron, factor) in enumerate(patrones):
+        expresion = patron if factor is None else re.escape(patron)
+        alternativas.append(f'(?P<p{prioridad}>{expresion})')
+    return re.compile('(?=(?:' + '|'.join(alternativas) + '))')
+
+
+_REGEX_FACTOR_COMPRA = _compilar_patrones_factor(PATRONES_FACTOR_COMPRA)
+
+
+@lru_cache(maxsize=1024)
+def _resolver_factor_compra(accion_texto: str) -> float:
+    """
+    Resuelve el factor de compra de un texto de acción (memorizado por texto).
+    
+    Args:
+        accion_texto (str): Texto de la acción sugerida
+    
+    Returns:
+        float: Factor de compra (1.0 si no coincide ningún patrón)
+    """
+    # Normalizar: minúsculas y sin acentos
+    accion = unicodedata.normalize('NFD', accion_texto.lower())
+    accion = ''.join(c for c in accion if unicodedata.category(c) != 'Mn').strip()
+    
+    mejor_prioridad = None
+    porcentaje = None
+    for match in _REGEX_FACTOR_COMPRA.finditer(accion):
+        # En cada posición gana la alternativa de mayor prioridad
+        prioridad = int(match.lastgroup[1:])
+        if mejor_prioridad is None or prioridad < mejor_prioridad:
+            mejor_prioridad = prioridad
+            porcentaje = match.group('porcentaje')
+        if mejor_prioridad == 0:
+            break
+    
+    if mejor_prioridad is None:
+        return 1.0
+    
+    factor = PATRONES_FACTOR_COMPRA[mejor_prioridad][1]
+    if factor is None:
+        return 1.0 - (float(porcentaje.replace(',', '.')) / 100.0)
+    return factor
+
+
 class ForecastEngine:
     """
     Motor de cálculo para la generación de pedidos de compra.
@@ -63,6 +164,7 @@ class ForecastEngine:
         
         El factor determina si se debe mantener, aumentar, reducir o eliminar
         las compras de un artículo según la estrategia comercial definida.
+        Los patrones reconocidos y su prioridad están en PATRONES_FACTOR_COMPRA.
         
         Args:
             accion_texto (Any): Texto de la acción sugerida desde ABC+D
@@ -73,78 +175,48 @@ class ForecastEngine:
         if pd.isna(accion_texto):
             return 1.0
         
-        accion = str(accion_texto).lower()
-        
-        # Eliminar acentos para comparación
-        accion_normalizada = self._normalizar(accion)
-        
-        # ============================================
-        # CASO ELIMINAR: Eliminar del catálogo
-        # ============================================
-        if 'eliminar del catalogo' in accion_normalizada:
-            return 0.0
-        
-        # ============================================
-        # CASOS DE REDUCCIÓN DE COMPRAS
-        # ============================================
-        reducciones = {
-            'reducir compras 70%': 0.50,
-            'reducir compras 50%': 0.50,
-            'reducir compras 40%': 0.60,
-            'reducir compras 35%': 0.65,
-            'reducir compras 30%': 0.65,
-            'reducir compras 25%': 0.75,
-            'reducir compras 20%': 0.80,
-            'reducir compras 15%': 0.85,
-            'aplicar descuento 20%': 0.80,
-            'implementar promocion del 15%': 0.85,
-        }
+        return _resolver_factor_compra(str(accion_texto))
+    
+    def calcular_factores_compra(self, acciones: pd.Series) -> pd.Series:
+        """
+        Calcula el factor de compra de una columna completa de acciones sugeridas.
         
-        for patron, factor in reducciones.items():
-            if patron in accion_normalizada:
-                return factor
-        
-        # Aplicar descuento genérico (extraer porcentaje)
-        if 'aplicar descuento' in accion_normalizada:
-            match = re.search(r'aplicar descuento\s*(\d+[.,]?\d*)%', accion_normalizada)
-            if match:
-                porcentaje = float(match.group(1).replace(',', '.'))
-                return 1.0 - (porcentaje / 100.0)
-        
-        # ============================================
-        # CASOS DE MANTENER COMPRAS (0% cambio)
-        # ============================================
-        mantener_patrones = [
-            'mantener el nivel de compras actual',
-            'mantener nivel de compras',
-            'mantener nivel de compras anterior'
-        ]
-        
-        for patron in mantener_patrones:
-            if patron in accion_normalizada:
-                return 1.0
-        
-        # ============================================
-        # CASOS DE AUMENTO DE COMPRAS
-        # ============================================
-        aumentos = {
-            'aumentar compras 50%': 1.50,
-            'aumentar compras 40%': 1.40,
-            'incrementar compras 30%': 1.30,
-            'aumentar compras 30%': 1.30,
-            'aumentar compras 25%': 1.25,
-            'incrementar compras 20%': 1.20,
-            'aumentar compras 15%': 1.15,
-        }
+        Cada texto distinto se resuelve una única vez con calcular_factor_compra
+        y el resultado se expande al resto de filas.
         
-        for patron, factor in aumentos.items():
-            if patron in accion_normalizada:
-                return factor
+        Args:
+            acciones (pd.Series): Columna 'Acción Sugerida' de los artículos
         
-        # ============================================
-        # CASO POR DEFECTO: Mantener compras
-        # ============================================
-        return 1.0
+        Returns:
+            pd.Series: Factor de compra por artículo, alineado con 'acciones'
+        """
+        codigos, unicos = pd.factorize(acciones)
+        factores_unicos = np.array([self.calcular_factor_compra(texto) for texto in unicos] + [1.0],
+                                   dtype=float)
+        return pd.Series(factores_unicos[codigos], index=acciones.index, dtype=float)
+    
+    def _describir_factores(self, factores: pd.Series) -> pd.Series:
+        """
+        Genera el texto de acción aplicada (ELIMINAR, REDUCIR x%, ...) de cada factor.
+        
+        Args:
+            factores (pd.Series): Factores de compra por artículo
+        
+        Returns:
+            pd.Series: Texto de la acción aplicada, alineado con 'factores'
+        """
+        def describir(factor_compra: float) -> str:
+            if factor_compra == 0:
+                return 'ELIMINAR'
+            elif factor_compra < 1:
+                return f'REDUCIR {int((1-factor_compra)*100)}%'
+            elif factor_compra > 1:
+                return f'AUMENTAR {int((factor_compra-1)*100)}%'
+            return 'MANTENER'
+        
+        codigos, unicos = pd.factorize(factores)
+        textos_unicos = np.array([describir(factor) for factor in unicos] + ['MANTENER'], dtype=object)
+        return pd.Series(textos_unicos[codigos], index=factores.index)
     
     def _normalizar(self, texto: str) -> str:
         """
@@ -156,7 +228,6 @@ class ForecastEngine:
         Returns:
             str: Texto normalizado
         """
-        import unicodedata
         texto = texto.lower()
         texto = unicodedata.normalize('NFD', texto)
         texto = ''.join(c for c in texto if unicodedata.category(c) != 'Mn')
@@ -244,58 +315,38 @@ class ForecastEngine:
         logger.info(f"Calculando pedido para semana {semana} ({len(datos_semana)} registros)")
         
         # Agrupar por artículo
-        ventas_articulo = datos_semana.groupby(['Codigo', 'Nombre', 'Talla', 'Color']).agg({
+        ventas_articulo = datos_semana.groupby(['Codigo', 'Nombre', 'Talla', 'Color'], observed=True).agg({
             'Unidades': 'sum',
             'Importe': 'sum'
         }).reset_index()
         
         ventas_articulo.columns = ['Codigo', 'Nombre', 'Talla', 'Color', 'Unidades_Base', 'Importe_Base']
         
-        # PASO 1: Aplicar lógica individualizada basada en "Acción Sugerida"
-        pedidos = []
+        # Enriquecer todos los artículos con ABC+D y costes mediante el índice
+        indice_articulos = self._construir_indice_articulos(abc_df, costes_df)
+        info_articulos = self._enriquecer_articulos(ventas_articulo, indice_articulos)
         
-        for idx, row in ventas_articulo.iterrows():
-            # Buscar información del artículo en ABC y costes
-            info_articulo = self._buscar_info_articulo(
-                row['Codigo'], row['Nombre'], row['Talla'], row['Color'],
-                abc_df, costes_df
-            )
-            
-            unidades_base = row['Unidades_Base']
-            
-            # Calcular factor de compra individualizado
-            factor_compra = self.calcular_factor_compra(info_articulo['accion_raw'])
-            
+        # PASO 1: Aplicar lógica individualizada basada en "Acción Sugerida"
+        factor_compra = self.calcular_factores_compra(info_articulos['accion_raw'])
+        
+        pedidos_df = pd.DataFrame({
+            'Codigo_Articulo': ventas_articulo['Codigo'],
+            'Nombre_Articulo': ventas_articulo['Nombre'],
+            'Talla': ventas_articulo['Talla'],
+            'Color': ventas_articulo['Color'],
+            'Seccion': seccion,
+            'Unidades_Base': ventas_articulo['Unidades_Base'],
             # Aplicar el factor a las unidades base
-            unidades_abc = unidades_base * factor_compra
-            
-            # Determinar texto de acción aplicada para referencia
-            if factor_compra == 0:
-                accion_aplicada = 'ELIMINAR'
-            elif factor_compra < 1:
-                accion_aplicada = f'REDUCIR {int((1-factor_compra)*100)}%'
-            elif factor_compra > 1:
-                accion_aplicada = f'AUMENTAR {int((factor_compra-1)*100)}%'
-            else:
-                accion_aplicada = 'MANTENER'
-            
-            pedidos.append({
-                'Codigo_Articulo': row['Codigo'],
-                'Nombre_Articulo': row['Nombre'],
-                'Talla': row['Talla'],
-                'Color': row['Color'],
-                'Seccion': seccion,
-                'Unidades_Base': unidades_base,
-                'Unidades_ABC': unidades_abc,
-                'PVP': info_articulo['pvp'],
-                'Coste_Pedido': info_articulo['coste'],
-                'Proveedor': info_articulo['proveedor'],
-                'Categoria': info_articulo['categoria'],
-                'Accion_Aplicada': accion_aplicada,
-                'Peso_Categoria': self.pesos_categoria.get(info_articulo['categoria'], 0)
-            })
-        
-        pedidos_df = pd.DataFrame(pedidos)
+            'Unidades_ABC': ventas_articulo['Unidades_Base'] * factor_compra,
+            'PVP': info_articulos['pvp'].astype(float),
+            'Coste_Pedido': info_articulos['coste'].astype(float),
+            # Reconstruir desde valores para que pandas infiera el tipo de texto
+            'Proveedor': pd.Series(info_articulos['proveedor'].tolist(), index=info_articulos.index),
+            'Categoria': pd.Series(info_articulos['categoria'].tolist(), index=info_articulos.index),
+            # Texto de acción aplicada para referencia
+            'Accion_Aplicada': self._describir_factores(factor_compra),
+            'Peso_Categoria': info_articulos['categoria'].map(self.pesos_categoria).fillna(0)
+        })
         
         # Calcular ventas preliminares
         pedidos_df['Ventas_Preliminares'] = pedidos_df['Unidades_ABC'] * pedidos_df['PVP']
@@ -326,9 +377,10 @@ class ForecastEngine:
         pedidos_df['Unidades_Escaladas'] = pedidos_df['Unidades_ABC'] * factor_escalado
         
         # Usar np.ceil para calcular unidades con redondeo hacia arriba
-        pedidos_df['Unidades_Finales'] = pedidos_df['Unidades_Escaladas'].apply(
-            lambda x: int(np.ceil(x)) if x > 0 else 0
-        )
+        unidades_escaladas = pedidos_df['Unidades_Escaladas'].to_numpy(dtype=float)
+        pedidos_df['Unidades_Finales'] = np.where(
+            unidades_escaladas > 0, np.ceil(unidades_escaladas), 0
+        ).astype(np.int64)
         
         # Calcular ventas preliminares con las unidades ceiling
         pedidos_df['Ventas_Preliminares'] = pedidos_df['Unidades_Finales'] * pedidos_df['PVP']
@@ -348,20 +400,14 @@ class ForecastEngine:
         if delta > 0:
             pedidos_df = pedidos_df.sort_values('PVP', ascending=True)
             
-            reduction_needed = delta
-            for idx in pedidos_df.index:
-                if reduction_needed <= 0:
-                    break
-                current_units = pedidos_df.at[idx, 'Unidades_Finales']
-                if current_units > 0:
-                    pvp = pedidos_df.at[idx, 'PVP']
-                    if pvp <= reduction_needed:
-                        pedidos_df.at[idx, 'Unidades_Finales'] = current_units - 1
-                        reduction_needed -= pvp
-            
-            pedidos_df['Ventas_Objetivo'] = (pedidos_df['Unidades_Finales'] * pedidos_df['PVP']).round(2)
-        else:
-            pedidos_df['Ventas_Objetivo'] = (pedidos_df['Unidades_Finales'] * pedidos_df['PVP']).round(2)
+            pedidos_df['Unidades_Finales'] = self._reducir_exceso_ventas(
+                pedidos_df['Unidades_Finales'].to_numpy(),
+                pedidos_df['PVP'].to_numpy(dtype=float),
+                delta,
+                multiunidad=self.parametros.get('reduccion_multiunidad', False)
+            )
+        
+        pedidos_df['Ventas_Objetivo'] = (pedidos_df['Unidades_Finales'] * pedidos_df['PVP']).round(2)
         
         # Calcular Beneficio Objetivo
         pedidos_df['Beneficio_Objetivo'] = (
@@ -380,6 +426,63 @@ class ForecastEngine:
         
         return pedidos_df
     
+    def _reducir_exceso_ventas(self, unidades: np.ndarray, pvp: np.ndarray,
+                               delta: float, multiunidad: bool = False) -> np.ndarray:
+        """
+        Reduce unidades de los artículos más baratos hasta absorber el exceso de ventas.
+        
+        Los arrays deben venir ordenados por PVP ascendente. En el modo por
+        defecto se retira como máximo una unidad por artículo: se recorre la
+        lista restando el PVP de cada artículo con unidades mientras quede
+        exceso y el PVP no lo supere. Como el PVP es creciente, el primer
+        artículo que no cabe cierra la reducción, por lo que el resultado es
+        el prefijo de artículos elegibles cuyo exceso restante (calculado con
+        resta acumulada, en el mismo orden que el recorrido original) lo admite.
+        
+        En modo multiunidad se pueden retirar varias unidades del mismo
+        artículo: se vacían por completo los artículos más baratos mientras
+        quepan y del primero que no cabe entero se retiran las unidades que
+        quepan. En este modo se ignoran los artículos sin PVP positivo.
+        
+        Args:
+            unidades (np.ndarray): Unidades finales ordenadas por PVP ascendente
+            pvp (np.ndarray): PVP de cada artículo en el mismo orden
+            delta (float): Exceso de ventas a absorber (€)
+            multiunidad (bool): Permitir retirar más de una unidad por artículo
+        
+        Returns:
+            np.ndarray: Unidades finales tras la reducción
+        """
+        unidades = unidades.copy()
+        
+        if multiunidad:
+            elegibles = np.flatnonzero((unidades > 0) & (pvp > 0))
+            importe = unidades[elegibles] * pvp[elegibles]
+            restante = np.subtract.accumulate(np.concatenate(([delta], importe)))[:-1]
+            
+            completos = np.logical_and.accumulate(importe <= restante)
+            unidades[elegibles[completos]] = 0
+            
+            # Retirada parcial del primer artículo que no cabe completo
+            pendientes = np.flatnonzero(~completos)
+            if len(pendientes) > 0:
+                posicion = pendientes[0]
+                retirar = int(np.floor(restante[posicion] / pvp[elegibles[posicion]]))
+                if retirar * pvp[elegibles[posicion]] > restante[posicion]:
+                    retirar -= 1
+                unidades[elegibles[posicion]] -= max(retirar, 0)
+        else:
+            elegibles = np.flatnonzero(unidades > 0)
+            precios = pvp[elegibles]
+            restante = np.subtract.accumulate(np.concatenate(([delta], precios)))[:-1]
+            
+            reducir = np.logical_and.accumulate((restante > 0) & (precios <= restante))
+            unidades[elegibles[reducir]] -= 1
+        
+        logger.debug(f"[DEBUG] Reducción de exceso: {int(np.sum(unidades))} unidades tras ajustar delta {delta:.2f}€")
+        
+        return unidades
+    
     def aplicar_stock_minimo(self, pedidos_df: pd.DataFrame, semana: int,
                               stock_acumulado_dict: Dict[str, int],
                               stock_real_dict: Dict[str, int] = None,
@@ -412,168 +515,266 @@ class ForecastEngine:
         if ventas_objetivo_dict is None:
             ventas_objetivo_dict = {}
         
-        nuevo_stock_acumulado = {}
-        ajustes_articulo = {}
-        
-        for idx, row in pedidos_df.iterrows():
-            codigo = row['Codigo_Articulo']
-            talla = row['Talla']
-            color = row['Color']
-            
-            clave_articulo = f"{codigo}|{talla}|{color}"
-            
-            # Calcular stock mínimo individual basado en unidades finales
-            stock_minimo = int(np.ceil(row['Unidades_Finales'] * stock_minimo_porcentaje))
-            
-            stock_acumulado_anterior = stock_acumulado_dict.get(clave_articulo, 0)
-            diferencia_stock = stock_minimo - stock_acumulado_anterior
-            
-            # ================================================================
-            # FASE 2 - CORRECCIÓN 1: Corrección por Desviación de Stock
-            # Objetivo: Mantener siempre el stock mínimo configurado
-            # Fórmula: Pedido_Corregido_Stock = max(0, Unidades_Finales + (Stock_Mínimo - Stock_Real))
-            # ================================================================
-            stock_real = stock_real_dict.get(clave_articulo, 0)
-            pedido_corregido_stock = max(0, row['Unidades_Finales'] + (stock_minimo - stock_real))
-            
-            # ================================================================
-            # FASE 2 - CORRECCIÓN 2: Corrección por Tendencia de Ventas
-            # Objetivo: Detectar si hay una tendencia de aumento de ventas
-            # Lógica: Si se consumió parte del stock mínimo (ventas > objetivo),
-            #         incrementar el pedido预防 futuras tendencias al alza
-            # Fórmula: Tendencia_Consumo = max(0, Ventas_Reales - Ventas_Objetivo)
-            # ================================================================
-            ventas_reales = ventas_reales_dict.get(clave_articulo, 0)
-            ventas_objetivo = ventas_objetivo_dict.get(clave_articulo, 0)
-            
-            # Calcular cuánto se consumió del stock mínimo (ventas por encima del objetivo)
-            tendencia_consumo = max(0, ventas_reales - ventas_objetivo)
-            
-            # Pedido final = Corrección Stock + Corrección Tendencia
-            pedido_final = pedido_corregido_stock + tendencia_consumo
-            # ================================================================
-            
-            pedidos_df.at[idx, 'Stock_Minimo_Objetivo'] = stock_minimo
-            pedidos_df.at[idx, 'Diferencia_Stock'] = diferencia_stock
-            # Columnas de corrección FASE 2
-            pedidos_df.at[idx, 'Pedido_Corregido_Stock'] = pedido_corregido_stock
-            pedidos_df.at[idx, 'Ventas_Reales'] = ventas_reales
-            pedidos_df.at[idx, 'Tendencia_Consumo'] = tendencia_consumo
-            pedidos_df.at[idx, 'Pedido_Final'] = pedido_final
-            
-            nuevo_stock_acumulado[clave_articulo] = stock_minimo
-            ajustes_articulo[clave_articulo] = diferencia_stock
+        # Clave de artículo de cada fila (mismo formato que el estado guardado)
+        claves = pd.Series([
+            f"{codigo}|{talla}|{color}"
+            for codigo, talla, color in zip(pedidos_df['Codigo_Articulo'],
+                                            pedidos_df['Talla'],
+                                            pedidos_df['Color'])
+        ], index=pedidos_df.index, dtype=object)
+        
+        unidades_finales = pedidos_df['Unidades_Finales']
+        
+        # Calcular stock mínimo individual basado en unidades finales
+        stock_minimo = np.ceil(unidades_finales * stock_minimo_porcentaje).astype(np.int64)
+        
+        stock_acumulado_anterior = self._valores_por_clave(claves, stock_acumulado_dict)
+        diferencia_stock = stock_minimo - stock_acumulado_anterior
+        
+        # ================================================================
+        # FASE 2 - CORRECCIÓN 1: Corrección por Desviación de Stock
+        # Objetivo: Mantener siempre el stock mínimo configurado
+        # Fórmula: Pedido_Corregido_Stock = max(0, Unidades_Finales + (Stock_Mínimo - Stock_Real))
+        # ================================================================
+        stock_real = self._valores_por_clave(claves, stock_real_dict)
+        pedido_corregido_stock = unidades_finales + (stock_minimo - stock_real)
+        pedido_corregido_stock = pedido_corregido_stock.where(pedido_corregido_stock > 0, 0)
+        
+        # ================================================================
+        # FASE 2 - CORRECCIÓN 2: Corrección por Tendencia de Ventas
+        # Objetivo: Detectar si hay una tendencia de aumento de ventas
+        # Lógica: Si se consumió parte del stock mínimo (ventas > objetivo),
+        #         incrementar el pedido预防 futuras tendencias al alza
+        # Fórmula: Tendencia_Consumo = max(0, Ventas_Reales - Ventas_Objetivo)
+        # ================================================================
+        ventas_reales = self._valores_por_clave(claves, ventas_reales_dict)
+        ventas_objetivo = self._valores_por_clave(claves, ventas_objetivo_dict)
+        
+        # Calcular cuánto se consumió del stock mínimo (ventas por encima del objetivo)
+        tendencia_consumo = ventas_reales - ventas_objetivo
+        tendencia_consumo = tendencia_consumo.where(tendencia_consumo > 0, 0)
+        
+        # Pedido final = Corrección Stock + Corrección Tendencia
+        pedido_final = pedido_corregido_stock + tendencia_consumo
+        # ================================================================
+        
+        pedidos_df['Stock_Minimo_Objetivo'] = stock_minimo.astype(float)
+        pedidos_df['Diferencia_Stock'] = diferencia_stock.astype(float)
+        # Columnas de corrección FASE 2
+        pedidos_df['Pedido_Corregido_Stock'] = pedido_corregido_stock.astype(float)
+        pedidos_df['Ventas_Reales'] = ventas_reales.astype(float)
+        pedidos_df['Tendencia_Consumo'] = tendencia_consumo.astype(float)
+        pedidos_df['Pedido_Final'] = pedido_final.astype(float)
+        
+        # Diccionarios de estado con valores nativos de Python (serializables a JSON)
+        nuevo_stock_acumulado = dict(zip(claves, stock_minimo.tolist()))
+        ajustes_articulo = dict(zip(claves, diferencia_stock.tolist()))
         
         return pedidos_df, nuevo_stock_acumulado, ajustes_articulo
     
-    def _buscar_info_articulo(self, codigo: Any, nombre: Any, talla: Any, color: Any,
-                               abc_df: pd.DataFrame, coste_df: pd.DataFrame) -> Dict[str, Any]:
+    def _valores_por_clave(self, claves: pd.Series, diccionario: Dict[str, Any]) -> pd.Series:
         """
-        Busca la información del artículo en ABC+D y Coste.
+        Obtiene el valor de cada clave de artículo en un diccionario de estado.
+        
+        Equivale a diccionario.get(clave, 0) fila a fila, pero resuelve toda la
+        columna de una vez. Si todos los valores del diccionario son enteros el
+        resultado conserva el tipo entero.
         
         Args:
-            codigo (Any): Código del artículo
-            nombre (Any): Nombre del artículo
-            talla (Any): Talla del artículo
-            color (Any): Color del artículo
-            abc_df (pd.DataFrame): DataFrame de clasificación ABC
-            coste_df (pd.DataFrame): DataFrame de costes
+            claves (pd.Series): Claves 'Codigo|Talla|Color' de cada fila
+            diccionario (Dict[str, Any]): Valores por clave de artículo
         
         Returns:
-            Dict: Información del artículo encontrada
+            pd.Series: Valor de cada fila (0 si la clave no está en el diccionario)
         """
-        clave = f"{str(codigo).strip()}|{str(nombre).strip()}|{str(talla).strip()}|{str(color).strip()}"
-        
-        # Buscar en ABC+D
-        accion_raw = None
-        categoria = 'C'
-        descuento_sugerido = 0
+        valores = pd.Series(diccionario, dtype=None if diccionario else np.int64)
         
-        match = abc_df[abc_df['Clave'] == clave]
+        return pd.Series(valores.reindex(claves.tolist(), fill_value=0).to_numpy(),
+                         index=claves.index)
+    
+    # ========================================================================
+    # ÍNDICE DE ARTÍCULOS (ABC+D Y COSTES)
+    # ========================================================================
+    
+    def _construir_indice_articulos(self, abc_df: pd.DataFrame,
+                                    coste_df: pd.DataFrame) -> Dict[str, Any]:
+        """
+        Construye, una vez por sección, las tablas de búsqueda de artículos.
+        
+        Cada tabla está indexada por una de las claves de búsqueda y conserva
+        el primer registro de cada clave. La búsqueda (_enriquecer_articulos)
+        usa, por orden de precedencia, la clave exacta del artículo, después
+        código + talla + color y por último solo el código. Las claves
+        compuestas se indexan por el identificador entero de un CodificadorClaves:
+        
+        - abc_clave: clave completa (Artículo, Nombre, Talla, Color) de ABC+D
+        - abc_codigo_talla_color: (Artículo, Talla, Color) de ABC+D
+        - abc_codigo: solo Artículo de ABC+D
+        - coste_clave: clave (Codigo, Talla, Color) de costes, con PVP y coste
+          ya corregidos y el proveedor de la propia fila
+        - proveedor_codigo: primer proveedor válido de cada código en costes
+        - codificador_*: codificadores de las claves compuestas
         
-        if len(match) > 0:
-            accion_raw = match.iloc[0].get('Acción Sugerida')
-            categoria = match.iloc[0].get('Categoria', 'C')
-            descuento_sugerido = match.iloc[0].get('Descuento Sugerido (%)', 0)
-        else:
-            # Buscar solo por código
-            match2 = abc_df[abc_df['Artículo'].astype(str) == str(codigo)]
-            if len(match2) > 0:
-                match3 = match2[(match2['Talla'].astype(str) == str(talla)) & 
-                               (match2['Color'].fillna('').astype(str) == str(color))]
-                if len(match3) > 0:
-                    accion_raw = match3.iloc[0].get('Acción Sugerida')
-                    categoria = match3.iloc[0].get('Categoria', 'C')
-                    descuento_sugerido = match3.iloc[0].get('Descuento Sugerido (%)', 0)
-                else:
-                    accion_raw = match2.iloc[0].get('Acción Sugerida')
-                    categoria = match2.iloc[0].get('Categoria', 'C')
-                    descuento_sugerido = match2.iloc[0].get('Descuento Sugerido (%)', 0)
-        
-        # Buscar PVP, Coste y Proveedor
-        clave_coste = f"{str(codigo).strip()}|{str(talla).strip()}|{str(color).strip()}"
-        match_coste = coste_df[coste_df['Clave'] == clave_coste]
-        
-        pvp = 0
-        coste = 0
-        proveedor = ''
-        
-        if len(match_coste) > 0:
-            pvp = match_coste.iloc[0].get('Tarifa10', 0)
-            coste = match_coste.iloc[0].get('Coste', 0)
-            
-            # Buscar nombre del proveedor
-            for col in match_coste.columns:
-                col_norm = col.lower().replace('á', 'a').replace('é', 'e').replace('í', 'i').replace('ó', 'o').replace('ú', 'u')
-                if 'nombre' in col_norm and 'proveedor' in col_norm:
-                    proveedor = match_coste.iloc[0][col]
-                    break
-            
-            if pd.isna(proveedor):
-                proveedor = ''
-            
-            # Calcular PVP por defecto si es 0
-            if pvp == 0 or pd.isna(pvp):
-                pvp = coste * 2.5
-            
-            # Calcular coste por defecto si es 0
-            if coste == 0 or pd.isna(coste):
-                coste = pvp / 2.5
-        
-        # BÚSQUEDA INDEPENDIENTE DE PROVEEDOR (igual que el script original):
-        # Si no se encontró proveedor en la primera búsqueda, buscar solo por código
-        # Esto es independiente del resto de columnas y no afecta a PVP ni Coste
-        if proveedor == '' or pd.isna(proveedor):
-            # Buscar todos los artículos con el mismo código
-            match_proveedor = coste_df[coste_df['Codigo'].astype(str) == str(codigo).strip()]
-            if len(match_proveedor) > 0:
-                # Buscar la columna del proveedor
-                columnas_normalizadas = [self._normalizar(col) for col in match_proveedor.columns]
-                nombre_proveedor_normalizado = self._normalizar('Nombre proveedor')
-                idx_proveedor = None
-                for i, col_norm in enumerate(columnas_normalizadas):
-                    if nombre_proveedor_normalizado == col_norm:
-                        idx_proveedor = i
-                        break
-                
-                # Buscar un registro que tenga proveedor válido
-                for idx, row in match_proveedor.iterrows():
-                    if idx_proveedor is not None:
-                        prov = row.iloc[idx_proveedor]
-                    else:
-                        prov = ''
-                    if pd.notna(prov) and prov != '':
-                        proveedor = prov
-                        break
+        Args:
+            abc_df (pd.DataFrame): DataFrame de clasificación ABC
+            coste_df (pd.DataFrame): DataFrame de costes
         
-        return {
-            'accion_raw': accion_raw,
-            'categoria': categoria,
-            'descuento_sugerido': descuento_sugerido,
+        Returns:
+            Dict[str, Any]: Tablas de búsqueda indexadas por clave
+        """
+        indice = {}
+        
+        # --- ABC+D ---
+        info_abc = pd.DataFrame({
+            'accion_raw': abc_df['Acción Sugerida'] if 'Acción Sugerida' in abc_df.columns else None,
+            'categoria': abc_df['Categoria'] if 'Categoria' in abc_df.columns else 'C',
+            'descuento_sugerido': (abc_df['Descuento Sugerido (%)']
+                                   if 'Descuento Sugerido (%)' in abc_df.columns else 0),
+        }, index=abc_df.index)
+        
+        codigo_abc = abc_df['Artículo'].astype(str)
+        
+        indice['codificador_abc'] = CodificadorClaves([
+            codigo_abc.str.strip(),
+            abc_df['Nombre artículo'].astype(str).str.strip(),
+            abc_df['Talla'].astype(str).str.strip(),
+            abc_df['Color'].astype(str).str.strip()
+        ])
+        indice['abc_clave'] = info_abc.set_index(indice['codificador_abc'].ids)
+        indice['abc_clave'] = indice['abc_clave'][~indice['abc_clave'].index.duplicated(keep='first')]
+        
+        indice['codificador_abc_talla_color'] = CodificadorClaves([
+            codigo_abc,
+            abc_df['Talla'].astype(str),
+            abc_df['Color'].fillna('').astype(str)
+        ])
+        indice['abc_codigo_talla_color'] = info_abc.set_index(indice['codificador_abc_talla_color'].ids)
+        indice['abc_codigo_talla_color'] = indice['abc_codigo_talla_color'][
+            ~indice['abc_codigo_talla_color'].index.duplicated(keep='first')]
+        
+        indice['abc_codigo'] = info_abc.set_index(codigo_abc)
+        indice['abc_codigo'] = indice['abc_codigo'][~indice['abc_codigo'].index.duplicated(keep='first')]
+        
+        # --- Costes ---
+        pvp = coste_df['Tarifa10'] if 'Tarifa10' in coste_df.columns else pd.Series(0, index=coste_df.index)
+        coste = coste_df['Coste'] if 'Coste' in coste_df.columns else pd.Series(0, index=coste_df.index)
+        
+        # Columna de proveedor de la búsqueda principal
+        proveedor = pd.Series('', index=coste_df.index, dtype=object)
+        for col in coste_df.columns:
+            col_norm = str(col).lower().replace('á', 'a').replace('é', 'e').replace('í', 'i').replace('ó', 'o').replace('ú', 'u')
+            if 'nombre' in col_norm and 'proveedor' in col_norm:
+                proveedor = coste_df[col].astype(object).where(coste_df[col].notna(), '')
+                break
+        
+        # PVP por defecto si es 0 y coste por defecto si es 0
+        pvp = pvp.where(~((pvp == 0) | pvp.isna()), coste * 2.5)
+        coste = coste.where(~((coste == 0) | coste.isna()), pvp / 2.5)
+        
+        indice['codificador_coste'] = CodificadorClaves([
+            coste_df['Codigo'].astype(str).str.strip(),
+            coste_df['Talla'].astype(str).str.strip(),
+            coste_df['Color'].astype(str).str.strip()
+        ])
+        info_coste = pd.DataFrame({
             'pvp': pvp,
             'coste': coste,
             'proveedor': proveedor
-        }
+        }).set_index(indice['codificador_coste'].ids)
+        indice['coste_clave'] = info_coste[~info_coste.index.duplicated(keep='first')]
+        
+        # Proveedor alternativo por código (primer registro con proveedor válido)
+        columna_proveedor = None
+        nombre_proveedor_normalizado = self._normalizar('Nombre proveedor')
+        for col in coste_df.columns:
+            if self._normalizar(col) == nombre_proveedor_normalizado:
+                columna_proveedor = col
+                break
+        
+        if columna_proveedor is not None:
+            proveedores = pd.Series(coste_df[columna_proveedor].values,
+                                    index=coste_df['Codigo'].astype(str))
+            proveedores = proveedores[proveedores.notna() & (proveedores != '')]
+            indice['proveedor_codigo'] = proveedores[~proveedores.index.duplicated(keep='first')]
+        else:
+            indice['proveedor_codigo'] = pd.Series(dtype=object)
+        
+        return indice
+    
+    def _enriquecer_articulos(self, ventas_articulo: pd.DataFrame,
+                              indice: Dict[str, Any]) -> pd.DataFrame:
+        """
+        Obtiene la información ABC+D y de costes de todos los artículos a la vez.
+        
+        Precedencia de la búsqueda (siempre el primer registro de cada clave):
+        1. ABC+D por clave exacta (Artículo, Nombre, Talla, Color); si no
+           existe, por código + talla + color; si tampoco, solo por código.
+           Sin ningún registro: sin acción, categoría 'C' y descuento 0
+        2. PVP, coste y proveedor por clave (Codigo, Talla, Color); un PVP a 0
+           se sustituye por coste × 2,5 y un coste a 0 por PVP / 2,5
+        3. Si no hay proveedor, el primer proveedor válido del mismo código
+        
+        Args:
+            ventas_articulo (pd.DataFrame): Ventas agrupadas por Codigo, Nombre, Talla y Color
+            indice (Dict[str, Any]): Tablas de búsqueda de _construir_indice_articulos
+        
+        Returns:
+            pd.DataFrame: Columnas accion_raw, categoria, descuento_sugerido, pvp,
+                coste y proveedor alineadas con ventas_articulo
+        """
+        codigo = ventas_articulo['Codigo'].astype(str)
+        talla = ventas_articulo['Talla'].astype(str)
+        color = ventas_articulo['Color'].astype(str)
+        nombre = ventas_articulo['Nombre'].astype(str)
+        
+        # --- ABC+D: clave completa, después código + talla + color, después código ---
+        clave = indice['codificador_abc'].buscar([
+            codigo.str.strip(), nombre.str.strip(), talla.str.strip(), color.str.strip()])
+        
+        info = indice['abc_clave'].reindex(clave)
+        info.index = ventas_articulo.index
+        encontrado = pd.Series(clave >= 0, index=ventas_articulo.index)
+        
+        clave_talla_color = indice['codificador_abc_talla_color'].buscar([codigo, talla, color])
+        por_talla_color = indice['abc_codigo_talla_color'].reindex(clave_talla_color)
+        por_talla_color.index = ventas_articulo.index
+        con_talla_color = pd.Series(clave_talla_color >= 0, index=ventas_articulo.index)
+        
+        por_codigo = indice['abc_codigo'].reindex(codigo.values)
+        por_codigo.index = ventas_articulo.index
+        con_codigo = pd.Series(codigo.isin(indice['abc_codigo'].index).values, index=ventas_articulo.index)
+        
+        usar_talla_color = ~encontrado & con_talla_color
+        usar_codigo = ~encontrado & ~con_talla_color & con_codigo
+        
+        info = info.astype(object)
+        info.loc[usar_talla_color] = por_talla_color.loc[usar_talla_color].astype(object)
+        info.loc[usar_codigo] = por_codigo.loc[usar_codigo].astype(object)
+        
+        sin_abc = ~encontrado & ~con_codigo
+        info.loc[sin_abc, 'accion_raw'] = None
+        info.loc[sin_abc, 'categoria'] = 'C'
+        info.loc[sin_abc, 'descuento_sugerido'] = 0
+        
+        # --- Costes ---
+        clave_coste = indice['codificador_coste'].buscar([codigo.str.strip(), talla.str.strip(), color.str.strip()])
+        info_coste = indice['coste_clave'].reindex(clave_coste)
+        info_coste.index = ventas_articulo.index
+        
+        con_coste = pd.Series(clave_coste >= 0, index=ventas_articulo.index)
+        info['pvp'] = info_coste['pvp'].where(con_coste, 0)
+        info['coste'] = info_coste['coste'].where(con_coste, 0)
+        proveedor = info_coste['proveedor'].astype(object).where(con_coste, '')
+        
+        # Búsqueda independiente de proveedor solo por código
+        sin_proveedor = proveedor == ''
+        if sin_proveedor.any():
+            alternativo = codigo.str.strip().map(indice['proveedor_codigo'])
+            proveedor = proveedor.where(~(sin_proveedor & alternativo.notna()), alternativo)
+        
+        info['proveedor'] = proveedor
+        
+        return info
     
     def generar_resumen_pedido(self, pedidos_df: pd.DataFrame, semana: int,
                                 datos_originales: pd.DataFrame, seccion: str) -> Dict[str, Any]:
@@ -0,0 +1,234 @@
+#!/usr/bin/env python3
+"""
+Módulo HistoricoStock - Versiones semanales del stock acumulado
+
+Este módulo guarda, para cada semana procesada, los artículos cuyo stock
+acumulado cambió respecto a la semana anterior. Con ello se puede obtener el
+stock acumulado exacto al final de cualquier semana, de modo que reprocesar
+la semana N (--semana N) parte del stock de la semana N-1 y no del último
+stock guardado, sin tener que repetir todas las semanas desde un --reset.
+
+Formato: un archivo columnar por año en el directorio del histórico
+(rutas.directorio_historico_stock), con una fila por artículo modificado:
+
+    - semana: semana en la que cambió el stock (0 = stock de partida, el que
+      había al registrar la primera semana del año)
+    - clave: clave 'Codigo|Talla|Color' del artículo (categórica)
+    - stock: nuevo stock acumulado del artículo
+
+Se guarda en Feather si pyarrow está instalado y en Pickle en caso contrario,
+siempre con escritura atómica (src/escritura_atomica.py). Si el archivo del
+año existe pero no se puede leer, se lanza un error en lugar de tratarlo como
+vacío: guardar una semana sobre él borraría todas las anteriores.
+
+Autor: Sistema de Pedidos Vivero V2
+Fecha: 2026-02-27
+"""
+
+import os
+import glob
+import logging
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+import pandas as pd
+
+from src.escritura_atomica import escribir_atomico
+from src.excel_cache import PYARROW_DISPONIBLE
+
+# Configuración del logger
+logger = logging.getLogger(__name__)
+
+COLUMNAS_HISTORICO = ['semana', 'clave', 'stock']
+
+
+class HistoricoStock:
+    """
+    Histórico del stock acumulado por semana, guardado como diferencias.
+
+    El stock al final de la semana N es el último valor de cada artículo entre
+    las filas de las semanas 0..N.
+
+    Attributes:
+        config (dict): Configuración del sistema
+        directorio (str): Directorio de los archivos del histórico
+        año (int): Año del histórico
+    """
+
+    def __init__(self, config: dict, año: Optional[int] = None):
+        """
+        Inicializa el histórico del año indicado.
+
+        Args:
+            config (dict): Configuración del sistema
+            año (Optional[int]): Año (usa el actual si no se especifica)
+        """
+        rutas = config.get('rutas', {})
+        directorio = rutas.get('directorio_historico_stock', './data/historico_stock')
+        if not os.path.isabs(directorio):
+            directorio = os.path.join(rutas.get('directorio_base', '.'), directorio)
+
+        self.config = config
+        self.directorio = directorio
+        self.año = año if año is not None else datetime.now().year
+        self._tabla = None
+
+    def _ruta_base(self) -> str:
+        """
+        Obtiene la ruta del archivo del año, sin extensión.
+
+        Returns:
+            str: Ruta base del archivo
+        """
+        return os.path.join(self.directorio, f"stock_{self.año}")
+
+    def _leer(self) -> pd.DataFrame:
+        """
+        Lee el histórico del año (una sola vez por instancia).
+
+        Returns:
+            pd.DataFrame: Filas del histórico ordenadas por semana (vacío si no existe)
+
+        Raises:
+            RuntimeError: Si el archivo del año existe pero no se puede leer
+        """
+        if self._tabla is not None:
+            return self._tabla
+
+        ruta_base = self._ruta_base()
+        tabla = None
+        ruta = None
+        try:
+            if PYARROW_DISPONIBLE and os.path.exists(ruta_base + '.feather'):
+                ruta = ruta_base + '.feather'
+                tabla = pd.read_feather(ruta)
+            elif os.path.exists(ruta_base + '.pkl'):
+                ruta = ruta_base + '.pkl'
+                tabla = pd.read_pickle(ruta)
+        except Exception as e:
+            logger.error(f"Histórico de stock ilegible: {ruta} ({str(e)})")
+            raise RuntimeError(
+                f"Histórico de stock ilegible en {ruta} ({type(e).__name__}: {e}). "
+                f"El archivo no se ha modificado; corríjalo o restáurelo antes de volver a ejecutar."
+            ) from e
+
+        if tabla is None:
+            tabla = pd.DataFrame({
+                'semana': pd.Series(dtype=np.int16),
+                'clave': pd.Series(dtype='category'),
+                'stock': pd.Series(dtype=np.float64)
+            })
+
+        self._tabla = tabla
+        return tabla
+
+    def _escribir(self, tabla: pd.DataFrame) -> None:
+        """
+        Guarda el histórico del año (temporal + fsync + renombrado).
+
+        Args:
+            tabla (pd.DataFrame): Filas del histórico ordenadas por semana
+        """
+        os.makedirs(self.directorio, exist_ok=True)
+        if PYARROW_DISPONIBLE:
+            escribir_atomico(self._ruta_base() + '.feather', lambda ruta: tabla.to_feather(ruta))
+        else:
+            escribir_atomico(self._ruta_base() + '.pkl', lambda ruta: tabla.to_pickle(ruta))
+
+        self._tabla = tabla
+
+    def semanas_registradas(self) -> List[int]:
+        """
+        Obtiene las semanas guardadas en el histórico.
+
+        Returns:
+            List[int]: Semanas con stock registrado, en orden (sin la semana 0)
+        """
+        semanas = self._leer()['semana']
+        return sorted(int(semana) for semana in semanas.unique() if semana > 0)
+
+    def tiene_datos(self) -> bool:
+        """
+        Indica si el histórico del año tiene alguna semana registrada.
+
+        Returns:
+            bool: True si hay stock registrado
+        """
+        return len(self._leer()) > 0
+
+    def stock_hasta_semana(self, semana: int) -> Dict[str, Any]:
+        """
+        Obtiene el stock acumulado al final de una semana.
+
+        Args:
+            semana (int): Semana (0 para el stock de partida del histórico)
+
+        Returns:
+            Dict[str, Any]: Diccionario con clave artículo -> stock
+        """
+        tabla = self._leer()
+        ultimas = tabla[tabla['semana'] <= semana].drop_duplicates('clave', keep='last')
+
+        stocks = [int(valor) if valor.is_integer() else valor for valor in ultimas['stock'].tolist()]
+        return dict(zip(ultimas['clave'].astype(str).tolist(), stocks))
+
+    def guardar_semana(self, semana: int, stock_anterior: Dict[str, Any],
+                       stock_semana: Dict[str, Any]) -> int:
+        """
+        Registra el stock acumulado al final de una semana.
+
+        Solo se guardan los artículos cuyo stock difiere del de la semana
+        anterior. Si la semana ya estaba registrada (reproceso) se reemplaza;
+        las semanas posteriores conservan sus propios cambios. La primera vez,
+        el stock anterior se guarda completo como stock de partida (semana 0).
+
+        Args:
+            semana (int): Semana procesada
+            stock_anterior (Dict[str, Any]): Stock acumulado al final de la
+                semana anterior (del que partió el cálculo)
+            stock_semana (Dict[str, Any]): Stock acumulado al final de la semana
+
+        Returns:
+            int: Número de artículos con stock modificado en la semana
+        """
+        tabla = self._leer()
+
+        partes = [tabla[tabla['semana'] != semana]]
+        if tabla.empty and stock_anterior:
+            partes.append(pd.DataFrame({
+                'semana': np.int16(0),
+                'clave': list(stock_anterior.keys()),
+                'stock': np.asarray(list(stock_anterior.values()), dtype=np.float64)
+            }))
+
+        modificados = {
+            clave: stock for clave, stock in stock_semana.items()
+            if clave not in stock_anterior or stock_anterior[clave] != stock
+        }
+        partes.append(pd.DataFrame({
+            'semana': np.int16(semana),
+            'clave': list(modificados.keys()),
+            'stock': np.asarray(list(modificados.values()), dtype=np.float64)
+        }))
+
+        nueva = pd.concat([parte.astype({'clave': str}) for parte in partes], ignore_index=True)
+        nueva = nueva.sort_values('semana', kind='stable', ignore_index=True)
+        nueva = nueva.astype({'semana': np.int16, 'clave': 'category', 'stock': np.float64})
+        self._escribir(nueva)
+
+        logger.info(f"Histórico de stock: semana {semana} registrada con {len(modificados)} artículos modificados")
+        return len(modificados)
+
+    def eliminar(self) -> int:
+        """
+        Elimina los archivos del histórico de todos los años.
+
+        Returns:
+            int: Número de archivos eliminados
+        """
+        archivos = glob.glob(os.path.join(glob.escape(self.directorio), 'stock_*'))
+        for archivo in archivos:
+            os.remove(archivo)
+        self._tabla = None
+        return len(archivos)
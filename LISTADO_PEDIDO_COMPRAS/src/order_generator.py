@@ -20,6 +20,8 @@ from openpyxl import Workbook
 from openpyxl.styles import Font, PatternFill, Border, Side, Alignment
 from openpyxl.utils.dataframe import dataframe_to_rows
 
+from src.excel_streaming import crear_estilo, crear_libro_streaming, crear_hoja_streaming, escribir_fila
+
 # Configuración del logger
 logger = logging.getLogger(__name__)
 
@@ -62,6 +64,35 @@ class OrderGenerator:
         
         logger.info("OrderGenerator inicializado correctamente")
     
+    def _crear_estilos_pedido(self) -> list:
+        """
+        Crea los estilos con nombre del archivo de pedido.
+        
+        Se crean para cada libro, ya que openpyxl asocia cada estilo con
+        nombre al libro en el que se registra.
+        
+        Returns:
+            list: Lista de NamedStyle
+        """
+        return [
+            crear_estilo('pedido_cabecera', font=self.HEADER_FONT, fill=self.HEADER_FILL,
+                         border=self.THIN_BLACK_BORDER,
+                         alignment=Alignment(horizontal='center', vertical='center', wrap_text=True)),
+            crear_estilo('pedido_celda', border=self.THIN_BLACK_BORDER),
+            crear_estilo('pedido_importe', border=self.THIN_BLACK_BORDER, number_format='#,##0.00'),
+            crear_estilo('pedido_unidades', border=self.THIN_BLACK_BORDER, number_format='#,##0'),
+            crear_estilo('pedido_proveedor', border=self.THIN_BLACK_BORDER,
+                         alignment=Alignment(horizontal='left', vertical='center')),
+            crear_estilo('pedido_titulo_resumen', font=Font(bold=True, size=12, color="FFFFFF"),
+                         fill=self.HEADER_FILL,
+                         alignment=Alignment(horizontal='center', vertical='center')),
+            crear_estilo('pedido_etiqueta_resumen', font=Font(bold=True, size=10),
+                         border=self.THIN_BLACK_BORDER,
+                         alignment=Alignment(horizontal='left', vertical='center')),
+            crear_estilo('pedido_valor_resumen', border=self.THIN_BLACK_BORDER,
+                         alignment=Alignment(horizontal='center', vertical='center')),
+        ]
+    
     def obtener_directorio_salida(self) -> str:
         """
         Obtiene el directorio de salida configurado.
@@ -161,11 +192,6 @@ class OrderGenerator:
         logger.info(f"Generando archivo: {ruta_completa}")
         
         try:
-            # Crear workbook
-            wb = Workbook()
-            ws = wb.active
-            ws.title = f"Semana_{semana}"
-            
             # Definir anchuras de columna
             COLUMN_WIDTHS = {
                 'A': 11.25,  # Código artículo
@@ -233,56 +259,48 @@ class OrderGenerator:
                 'Pedido_Final': 'Pedido Final'
             }
             
+            COLUMNAS_IMPORTE = ['PVP', 'Coste Pedido', 'Ventas Objetivo', 'Beneficio Objetivo']
+            COLUMNAS_UNIDADES = ['Unidades Calculadas', 'Stock Mínimo Objetivo',
+                                 'Diferencia Stock',
+                                 'Pedido Corregido Stock', 'Ventas Reales',
+                                 'Tendencia Consumo', 'Pedido Final']
+            
+            # Crear workbook en modo streaming con los estilos registrados una vez
+            wb = crear_libro_streaming(self._crear_estilos_pedido())
+            ws = crear_hoja_streaming(wb, f"Semana_{semana}", anchos=COLUMN_WIDTHS)
+            
+            # Fila resumen: las celdas combinadas se declaran antes de guardar
+            summary_row = len(pedidos_filtrados) + 3
+            ws.merged_cells.add(f'B{summary_row}:C{summary_row}')
+            
             # Escribir cabeceras
-            for col_idx, header in enumerate(COLUMN_HEADERS, 1):
-                cell = ws.cell(row=1, column=col_idx, value=header)
-                cell.fill = self.HEADER_FILL
-                cell.font = self.HEADER_FONT
-                cell.alignment = Alignment(horizontal='center', vertical='center', wrap_text=True)
-                cell.border = self.THIN_BLACK_BORDER
+            escribir_fila(ws, COLUMN_HEADERS, ['pedido_cabecera'] * len(COLUMN_HEADERS))
             
             # Renombrar y reordenar columnas
             pedidos_renamed = pedidos_filtrados.rename(columns=COLUMN_MAPPING)
             pedidos_renamed = pedidos_renamed[COLUMN_HEADERS]
             
             # Escribir datos
-            for r_idx, row in enumerate(dataframe_to_rows(pedidos_renamed, index=False, header=False), 2):
-                for c_idx, value in enumerate(row, 1):
-                    cell = ws.cell(row=r_idx, column=c_idx, value=value)
-                    cell.border = self.THIN_BLACK_BORDER
-                    
-                    header_name = COLUMN_HEADERS[c_idx - 1]
+            for row in dataframe_to_rows(pedidos_renamed, index=False, header=False):
+                estilos = []
+                for c_idx, value in enumerate(row):
+                    header_name = COLUMN_HEADERS[c_idx]
                     
-                    if header_name in ['PVP', 'Coste Pedido', 'Ventas Objetivo', 'Beneficio Objetivo']:
+                    if header_name in COLUMNAS_IMPORTE:
                         if isinstance(value, (int, float)):
-                            cell.value = round(value, 2)
-                        cell.number_format = '#,##0.00'
-                        
-                    elif header_name in ['Unidades Calculadas', 'Stock Mínimo Objetivo',
-                                         'Diferencia Stock', 
-                                         'Pedido Corregido Stock', 'Ventas Reales', 
-                                         'Tendencia Consumo', 'Pedido Final']:
-                        if isinstance(value, (int, float)):
-                            cell.number_format = '#,##0'
+                            row[c_idx] = round(value, 2)
+                        estilos.append('pedido_importe')
+                    
+                    elif header_name in COLUMNAS_UNIDADES and isinstance(value, (int, float)):
+                        estilos.append('pedido_unidades')
                     
                     elif header_name == 'Proveedor':
-                        cell.alignment = Alignment(horizontal='left', vertical='center')
-            
-            # Aplicar anchuras de columna
-            for col_letter, width in COLUMN_WIDTHS.items():
-                ws.column_dimensions[col_letter].width = width
-            
-            # Añadir métricas de resumen
-            summary_row = len(pedidos_filtrados) + 3
-            
-            # Fusionar celdas para el título
-            ws.merge_cells(f'B{summary_row}:C{summary_row}')
-            
-            # Título del resumen
-            title_cell = ws.cell(row=summary_row, column=2, value="METRICAS DE RESUMEN")
-            title_cell.font = Font(bold=True, size=12, color="FFFFFF")
-            title_cell.fill = self.HEADER_FILL
-            title_cell.alignment = Alignment(horizontal='center', vertical='center')
+                        estilos.append('pedido_proveedor')
+                    
+                    else:
+                        estilos.append('pedido_celda')
+                
+                escribir_fila(ws, row, estilos)
             
             # Métricas
             metricas_labels = [
@@ -300,17 +318,14 @@ class OrderGenerator:
                 ("Total_Ajuste_Stock:", int(pedidos_filtrados['Diferencia_Stock'].sum()))
             ]
             
-            for i, (label, value) in enumerate(metricas_labels):
-                # Columna B (etiquetas)
-                cell_label = ws.cell(row=summary_row + 1 + i, column=2, value=label)
-                cell_label.font = Font(bold=True, size=10)
-                cell_label.border = self.THIN_BLACK_BORDER
-                cell_label.alignment = Alignment(horizontal='left', vertical='center')
-                
-                # Columna C (valores)
-                cell_value = ws.cell(row=summary_row + 1 + i, column=3, value=value)
-                cell_value.border = self.THIN_BLACK_BORDER
-                cell_value.alignment = Alignment(horizontal='center', vertical='center')
+            # Añadir métricas de resumen (fila en blanco + título + métricas)
+            ws.append([])
+            escribir_fila(ws, [None, "METRICAS DE RESUMEN"], [None, 'pedido_titulo_resumen'])
+            
+            for label, value in metricas_labels:
+                # Columna B (etiquetas), columna C (valores)
+                escribir_fila(ws, [None, label, value],
+                              [None, 'pedido_etiqueta_resumen', 'pedido_valor_resumen'])
             
             # Guardar archivo
             wb.save(ruta_completa)
@@ -13,7 +13,7 @@ Fecha: 2026-01-31
 
 import logging
 import os
-from datetime import datetime, timedelta
+from datetime import date, datetime, timedelta
 from typing import Optional, Dict, Any, Tuple
 from enum import Enum
 
@@ -217,6 +217,40 @@ class SchedulerService:
         
         return semana_siguiente, f"Semana a procesar: {semana_siguiente}"
     
+    def calcular_año_semana(self, semana: int, fecha: Optional[date] = None) -> int:
+        """
+        Calcula el año (ISO) al que pertenece una semana a procesar.
+        
+        Las semanas se identifican solo por su número, así que se toma la
+        ocurrencia más reciente de la semana que no sea posterior a la semana
+        siguiente a la fecha (la del pedido que se prepara). Así, reprocesar la
+        semana 52 a principios de enero usa el año anterior, y la semana 1
+        procesada en la última semana del año es la del año siguiente.
+        
+        Args:
+            semana (int): Número de semana ISO
+            fecha (Optional[date]): Fecha de referencia (hoy si no se especifica)
+        
+        Returns:
+            int: Año ISO de la semana
+        """
+        if fecha is None:
+            fecha = datetime.now().date()
+        
+        limite = fecha + timedelta(weeks=1)
+        año_actual = fecha.isocalendar()[0]
+        
+        for año in range(año_actual + 1, año_actual - 3, -1):
+            try:
+                lunes = date.fromisocalendar(año, semana, 1)
+            except ValueError:
+                # El año no tiene esa semana (semana 53)
+                continue
+            if lunes <= limite:
+                return año
+        
+        return año_actual
+    
     def calcular_fechas_semana_pedido(self, semana: int, año: Optional[int] = None) -> Tuple[str, str, str]:
         """
         Calcula las fechas relevantes para el pedido de una semana.
@@ -232,8 +266,6 @@ class SchedulerService:
             año = datetime.now().year
         
         # Calcular fechas de la semana
-        from datetime import date, timedelta
-        
         # Obtener el jueves de la semana (día central de la semana ISO)
         fecha_base = date(año, 1, 4)  # 4 de enero siempre está en la semana 1 del año ISO
         delta = timedelta(weeks=semana - 1)
@@ -7,18 +7,36 @@ el estado del sistema entre diferentes ejecuciones del script. Almacena informac
 sobre qué semanas han sido procesadas, el stock acumulado por artículo, y métricas
 acumuladas de ejecución.
 
+El backend de almacenamiento se elige con rutas.backend_estado en config.json:
+    - 'json' (por defecto): el archivo state.json como instantánea, escrita de
+      forma atómica, más un diario de solo añadir (state.json.diario) con los
+      cambios posteriores (src/diario_estado.py); el diario se compacta en una
+      nueva instantánea cada rutas.entradas_compactacion_diario entradas
+    - 'sqlite': una base de datos SQLite (src/estado_sqlite.py) en la que cada
+      cambio escribe solo las filas afectadas; la primera vez se migra
+      automáticamente el state.json existente
+
+Los cambios hechos dentro de StateManager.transaccion() se acumulan en memoria
+y se guardan de una sola vez al terminar el bloque (o se descartan si el
+bloque termina con una excepción). Las escrituras fuera del estado que deben
+ir a la par con él se registran con StateManager.al_confirmar().
+
 Autor: Sistema de Pedidos Vivero V2
 Fecha: 2026-01-31
 """
 
-import json
 import os
 import logging
 import copy
+from contextlib import contextmanager
 from datetime import datetime
-from typing import Optional, Dict, List, Any, Tuple
+from typing import Optional, Dict, List, Any, Tuple, Iterator, Callable
 from pathlib import Path
 
+from src.diario_estado import (DiarioEstado, cargar_estado_json, crear_entrada_diario,
+                               escribir_json_atomico)
+from src.estado_sqlite import AlmacenEstadoSQLite, migrar_estado_json
+
 # Configuración del logger
 logger = logging.getLogger(__name__)
 
@@ -35,7 +53,15 @@ class StateManager:
     Attributes:
         config (dict): Configuración del sistema
         ruta_archivo (str): Ruta al archivo de estado
+        backend (str): Backend de almacenamiento ('json' o 'sqlite')
+        almacen_sqlite (Optional[AlmacenEstadoSQLite]): Base de datos del
+            backend 'sqlite' (None con el backend 'json')
+        diario (DiarioEstado): Diario de cambios del backend 'json'
+        entradas_compactacion (int): Entradas del diario que provocan su
+            compactación en una nueva instantánea
         estado (dict): Diccionario con el estado actual cargado
+        transaccion_guardada (bool): Si la última transacción terminada
+            guardó sus cambios
     """
     
     def __init__(self, config: dict):
@@ -48,20 +74,46 @@ class StateManager:
         self.config = config
         self.rutas = config.get('rutas', {})
         self.ruta_archivo = self._obtener_ruta_estado()
+        self.backend = self.rutas.get('backend_estado', 'json')
+        self.almacen_sqlite = None
+        self.diario = DiarioEstado(self.ruta_archivo)
+        self.entradas_compactacion = self.rutas.get('entradas_compactacion_diario', 50)
+        self._entradas_diario = 0
         self.estado = None
         
-        logger.info(f"StateManager inicializado. Archivo de estado: {self.ruta_archivo}")
+        # Cambios acumulados por transaccion() (None fuera de una transacción)
+        self._cambios_transaccion = None
+        self._guardado_pendiente = False
+        self._guardado_completo_pendiente = False
+        self._acciones_confirmacion = []
+        # Resultado del guardado de la última transacción terminada
+        self.transaccion_guardada = False
+        
+        if self.backend == 'sqlite':
+            self.almacen_sqlite = AlmacenEstadoSQLite(
+                self._obtener_ruta_estado(self.rutas.get('archivo_estado_sqlite', 'state.sqlite'))
+            )
+            logger.info(f"StateManager inicializado. Base de datos de estado: {self.almacen_sqlite.ruta}")
+        elif self.backend == 'json':
+            logger.info(f"StateManager inicializado. Archivo de estado: {self.ruta_archivo}")
+        else:
+            raise ValueError(f"Backend de estado no soportado: {self.backend} (usar 'json' o 'sqlite')")
     
-    def _obtener_ruta_estado(self) -> str:
+    def _obtener_ruta_estado(self, archivo: Optional[str] = None) -> str:
         """
-        Obtiene la ruta completa del archivo de estado.
+        Obtiene la ruta completa de un archivo del directorio de estado.
+        
+        Args:
+            archivo (Optional[str]): Nombre del archivo (por defecto el
+                'archivo_estado' de la configuración)
         
         Returns:
-            str: Ruta absoluta al archivo state.json
+            str: Ruta al archivo dentro del directorio de estado
         """
         base = self.rutas.get('directorio_base', '.')
         dir_estado = self.rutas.get('directorio_estado', './data')
-        archivo = self.rutas.get('archivo_estado', 'state.json')
+        if archivo is None:
+            archivo = self.rutas.get('archivo_estado', 'state.json')
         
         # Si es ruta relativa, combinar con base
         if not os.path.isabs(dir_estado):
@@ -73,12 +125,21 @@ class StateManager:
         """
         Carga el estado desde el archivo JSON.
         
-        Si el archivo no existe, crea uno nuevo con la estructura inicial.
-        Si existe pero está corrupto, intenta recuperarlo o crea uno nuevo.
+        Al contenido de state.json se le aplican los cambios pendientes de su
+        diario. Si el archivo no existe, crea uno nuevo con la estructura
+        inicial. Si existe pero no se puede cargar, no lo modifica y lanza
+        una excepción: el stock acumulado y el histórico no se sustituyen
+        por un estado vacío.
         
         Returns:
             Dict[str, Any]: Diccionario con el estado cargado
+        
+        Raises:
+            RuntimeError: Si el estado existe pero no se puede cargar
         """
+        if self.almacen_sqlite is not None:
+            return self._cargar_estado_sqlite()
+        
         logger.info(f"Cargando estado desde: {self.ruta_archivo}")
         
         # Verificar si el archivo existe
@@ -89,20 +150,72 @@ class StateManager:
             return self.estado
         
         try:
-            with open(self.ruta_archivo, 'r', encoding='utf-8') as f:
-                self.estado = json.load(f)
+            self.estado, self._entradas_diario = cargar_estado_json(self.ruta_archivo)
+        except Exception as e:
+            raise self._error_estado_ilegible(self.ruta_archivo, e) from e
+        
+        logger.info("Estado cargado correctamente")
+        return self.estado
+    
+    def _cargar_estado_sqlite(self) -> Dict[str, Any]:
+        """
+        Carga el estado desde la base de datos SQLite.
+        
+        Si la base de datos no existe todavía, migra el state.json existente
+        o, si tampoco existe, crea el estado inicial.
+        
+        Returns:
+            Dict[str, Any]: Diccionario con el estado cargado
+        
+        Raises:
+            RuntimeError: Si la base de datos no se puede cargar o el
+                state.json existente no se puede migrar
+        """
+        logger.info(f"Cargando estado desde: {self.almacen_sqlite.ruta}")
+        
+        if not self.almacen_sqlite.existe():
+            if os.path.exists(self.ruta_archivo):
+                logger.info(f"Migrando estado de {self.ruta_archivo} a SQLite...")
+                try:
+                    self.estado = migrar_estado_json(self.ruta_archivo, self.almacen_sqlite.ruta)
+                except Exception as e:
+                    raise self._error_estado_ilegible(self.ruta_archivo, e) from e
+                return self.estado
             
-            logger.info("Estado cargado correctamente")
+            logger.warning(f"Base de datos de estado no encontrada. Creando nueva: {self.almacen_sqlite.ruta}")
+            self.estado = self._crear_estado_inicial()
+            self.guardar_estado()
             return self.estado
-            
-        except json.JSONDecodeError as e:
-            logger.error(f"Error al parsear estado JSON: {str(e)}")
-            logger.warning("Intentando recuperar estado anterior...")
-            return self._recuperar_estado()
         
+        try:
+            self.estado = self.almacen_sqlite.cargar()
         except Exception as e:
-            logger.error(f"Error inesperado al cargar estado: {str(e)}")
-            return self._crear_estado_inicial()
+            raise self._error_estado_ilegible(self.almacen_sqlite.ruta, e) from e
+        
+        logger.info("Estado cargado correctamente")
+        return self.estado
+    
+    @staticmethod
+    def _error_estado_ilegible(ruta: str, error: Exception) -> RuntimeError:
+        """
+        Construye el error de un estado existente que no se puede cargar.
+        
+        El archivo no se aparta ni se sustituye: un estado nuevo perdería el
+        stock acumulado y el histórico. Debe revisarse y corregirse a mano
+        antes de volver a ejecutar.
+        
+        Args:
+            ruta (str): Ruta del estado ilegible
+            error (Exception): Error producido al cargarlo
+        
+        Returns:
+            RuntimeError: Error a lanzar
+        """
+        logger.error(f"No se pudo cargar el estado de {ruta}: {str(error)}")
+        return RuntimeError(
+            f"Estado ilegible en {ruta} ({type(error).__name__}: {error}). "
+            f"El archivo no se ha modificado; corríjalo a mano antes de volver a ejecutar."
+        )
     
     def _crear_estado_inicial(self) -> Dict[str, Any]:
         """
@@ -149,65 +262,169 @@ class StateManager:
             }
         }
     
-    def _recuperar_estado(self) -> Dict[str, Any]:
+    def guardar_estado(self) -> bool:
         """
-        Intenta recuperar el estado desde un backup o crea uno nuevo.
+        Guarda el estado actual en el archivo JSON.
+        
+        El archivo se escribe de forma atómica (archivo temporal sincronizado
+        en disco y renombrado) y sustituye a su diario, que se vacía. Con el
+        backend 'sqlite' reemplaza el contenido de la base de datos.
         
         Returns:
-            Dict[str, Any]: Estado recuperado o nuevo
+            bool: True si se guardó correctamente, False si hubo error
         """
-        # Buscar backup
-        backup_path = self.ruta_archivo + '.backup'
+        if self.estado is None:
+            logger.error("No hay estado para guardar")
+            return False
+        
+        # Dentro de una transacción se guarda al terminar el bloque
+        if self._cambios_transaccion is not None:
+            self._guardado_completo_pendiente = True
+            return True
         
-        if os.path.exists(backup_path):
+        if self.almacen_sqlite is not None:
             try:
-                with open(backup_path, 'r', encoding='utf-8') as f:
-                    estado_recuperado = json.load(f)
-                logger.info(f"Estado recuperado desde backup: {backup_path}")
-                return estado_recuperado
+                self.almacen_sqlite.guardar_completo(self.estado)
+                logger.info("Estado guardado correctamente")
+                return True
             except Exception as e:
-                logger.error(f"Error al leer backup: {str(e)}")
+                logger.error(f"Error al guardar estado: {str(e)}")
+                return False
         
-        # Si no hay backup válido, crear nuevo estado
-        logger.warning("No se pudo recuperar el estado. Creando nuevo estado.")
-        return self._crear_estado_inicial()
+        try:
+            # Guardar la nueva instantánea y descartar el diario ya incluido en ella
+            escribir_json_atomico(self.ruta_archivo, self.estado)
+            self.diario.vaciar()
+            self._entradas_diario = 0
+            
+            logger.info("Estado guardado correctamente")
+            return True
+            
+        except Exception as e:
+            logger.error(f"Error al guardar estado: {str(e)}")
+            return False
     
-    def guardar_estado(self) -> bool:
+    def _guardar_cambios(self, cambios: List[Tuple[str, Any]]) -> bool:
         """
-        Guarda el estado actual en el archivo JSON.
+        Persiste los cambios ya aplicados al estado en memoria.
         
-        Antes de guardar, crea una copia de seguridad del archivo anterior.
+        Con el backend 'sqlite' solo se escriben las filas de los cambios
+        (y los metadatos); con el backend 'json' se añaden al diario, que se
+        compacta en una nueva instantánea al llegar a entradas_compactacion.
+        
+        Args:
+            cambios (List[Tuple[str, Any]]): Cambios (tipo, datos) con los tipos
+                de AlmacenEstadoSQLite.aplicar_cambios
         
         Returns:
             bool: True si se guardó correctamente, False si hubo error
         """
-        if self.estado is None:
-            logger.error("No hay estado para guardar")
-            return False
+        # Dentro de una transacción se guarda al terminar el bloque
+        if self._cambios_transaccion is not None:
+            self._cambios_transaccion.extend(cambios)
+            self._guardado_pendiente = True
+            return True
         
         try:
-            # Crear backup del archivo anterior
-            if os.path.exists(self.ruta_archivo):
-                backup_path = self.ruta_archivo + '.backup'
-                try:
-                    with open(self.ruta_archivo, 'r', encoding='utf-8') as f:
-                        contenido_actual = f.read()
-                    with open(backup_path, 'w', encoding='utf-8') as f:
-                        f.write(contenido_actual)
-                except Exception as e:
-                    logger.warning(f"No se pudo crear backup: {str(e)}")
-            
-            # Guardar nuevo estado
-            with open(self.ruta_archivo, 'w', encoding='utf-8') as f:
-                json.dump(self.estado, f, indent=4, ensure_ascii=False)
+            if self.almacen_sqlite is not None:
+                self.almacen_sqlite.aplicar_cambios(self.estado, cambios)
+            else:
+                informacion = self.estado.setdefault('informacion_sistema', {})
+                # El contador solo avanza si la entrada llegó al diario
+                secuencia = informacion.get('secuencia_diario', 0) + 1
+                self.diario.añadir(crear_entrada_diario(self.estado, secuencia, cambios))
+                informacion['secuencia_diario'] = secuencia
+                self._entradas_diario += 1
+                
+                if self._entradas_diario >= self.entradas_compactacion:
+                    logger.info(f"Compactando diario de estado ({self._entradas_diario} entradas)")
+                    return self.guardar_estado()
             
             logger.info("Estado guardado correctamente")
             return True
-            
         except Exception as e:
             logger.error(f"Error al guardar estado: {str(e)}")
             return False
     
+    @contextmanager
+    def transaccion(self) -> Iterator['StateManager']:
+        """
+        Agrupa los cambios del estado de un bloque en un único guardado.
+        
+        Dentro del bloque, los métodos que modifican el estado actualizan solo
+        la copia en memoria. Al terminar el bloque todos sus cambios se guardan
+        de una vez (una única entrada del diario o una única transacción
+        SQLite); si el bloque lanza una excepción, el estado en memoria vuelve
+        al de antes del bloque y no se guarda nada. Una transacción dentro de
+        otra forma parte de la exterior. Al terminar, transaccion_guardada
+        indica si los cambios se guardaron.
+        
+        Ejemplo:
+            with state_manager.transaccion():
+                state_manager.actualizar_stock_acumulado(stock)
+                state_manager.registrar_ejecucion(...)
+        
+        Yields:
+            StateManager: El propio gestor de estado
+        """
+        if self._cambios_transaccion is not None:
+            yield self
+            return
+        
+        if self.estado is None:
+            self.cargar_estado()
+        
+        estado_inicial = copy.deepcopy(self.estado)
+        self._cambios_transaccion = []
+        self._guardado_pendiente = False
+        self._guardado_completo_pendiente = False
+        self._acciones_confirmacion = []
+        self.transaccion_guardada = False
+        
+        try:
+            yield self
+        except BaseException:
+            self.estado = estado_inicial
+            self._cambios_transaccion = None
+            self._acciones_confirmacion = []
+            logger.warning("Transacción de estado revertida: no se guarda ningún cambio")
+            raise
+        
+        cambios = self._cambios_transaccion
+        acciones = self._acciones_confirmacion
+        self._cambios_transaccion = None
+        self._acciones_confirmacion = []
+        
+        guardado = True
+        if self._guardado_completo_pendiente:
+            guardado = self.guardar_estado()
+        elif self._guardado_pendiente:
+            guardado = self._guardar_cambios(cambios)
+        
+        self.transaccion_guardada = guardado
+        if not guardado:
+            logger.error("No se guardó la transacción de estado: se omiten sus acciones posteriores")
+            return
+        for accion in acciones:
+            accion()
+    
+    def al_confirmar(self, accion: Callable[[], Any]) -> None:
+        """
+        Ejecuta una acción cuando se guarden los cambios de la transacción en curso.
+        
+        Sirve para escrituras fuera del estado (por ejemplo, el histórico
+        semanal del stock) que deben ir a la par con él: si la transacción se
+        revierte o no se puede guardar, la acción no se ejecuta. Fuera de una
+        transacción la acción se ejecuta inmediatamente.
+        
+        Args:
+            accion (Callable[[], Any]): Función sin argumentos a ejecutar
+        """
+        if self._cambios_transaccion is not None:
+            self._acciones_confirmacion.append(accion)
+        else:
+            accion()
+    
     def obtener_ultima_semana_procesada(self) -> Optional[int]:
         """
         Obtiene el número de la última semana procesada.
@@ -236,11 +453,13 @@ class StateManager:
         self.estado['informacion_sistema']['ultima_semana_procesada'] = semana
         self.estado['informacion_sistema']['ultima_actualizacion'] = datetime.now().isoformat()
         
-        return self.guardar_estado()
+        return self._guardar_cambios([])
     
     def obtener_stock_acumulado(self) -> Dict[str, int]:
         """
-        Obtiene el diccionario de stock acumulado por artículo.
+        Obtiene una copia del diccionario de stock acumulado por artículo.
+        
+        Los cambios en la copia se guardan con actualizar_stock_acumulado.
         
         Returns:
             Dict[str, int]: Diccionario con clave artículo -> stock
@@ -248,14 +467,31 @@ class StateManager:
         if self.estado is None:
             self.cargar_estado()
         
-        return self.estado.get('stock_acumulado', {})
+        return dict(self.estado.get('stock_acumulado', {}))
+    
+    def obtener_semana_stock_acumulado(self) -> Optional[Tuple[int, int]]:
+        """
+        Obtiene la semana a cuyo final corresponde el stock acumulado guardado.
+        
+        Returns:
+            Optional[Tuple[int, int]]: (año, semana), o None si el estado no
+                la registra (estados anteriores a este campo)
+        """
+        if self.estado is None:
+            self.cargar_estado()
+        
+        semana_stock = self.estado.get('informacion_sistema', {}).get('semana_stock_acumulado')
+        return tuple(semana_stock) if semana_stock else None
     
-    def actualizar_stock_acumulado(self, articulos_actualizados: Dict[str, int]) -> bool:
+    def actualizar_stock_acumulado(self, articulos_actualizados: Dict[str, int],
+                                   año_semana: Optional[Tuple[int, int]] = None) -> bool:
         """
         Actualiza el stock acumulado con los valores proporcionados.
         
         Args:
             articulos_actualizados (Dict[str, int]): Diccionario de artículos actualizados
+            año_semana (Optional[Tuple[int, int]]): (año, semana) a cuyo final
+                corresponde el stock; se registra para obtener_semana_stock_acumulado
         
         Returns:
             bool: True si se actualizó correctamente
@@ -263,11 +499,20 @@ class StateManager:
         if self.estado is None:
             self.cargar_estado()
         
+        if año_semana is not None:
+            self.estado['informacion_sistema']['semana_stock_acumulado'] = list(año_semana)
+        
         stock_actual = self.estado.get('stock_acumulado', {})
-        stock_actual.update(articulos_actualizados)
+        
+        # Solo se persisten los artículos nuevos o con un stock distinto
+        modificados = {
+            clave: stock for clave, stock in articulos_actualizados.items()
+            if clave not in stock_actual or stock_actual[clave] != stock
+        }
+        stock_actual.update(modificados)
         self.estado['stock_acumulado'] = stock_actual
         
-        return self.guardar_estado()
+        return self._guardar_cambios([('stock', modificados)])
     
     def registrar_ejecucion(self, semana: int, archivo_generado: str, 
                             articulos: int, importe: float, exitosa: bool,
@@ -327,7 +572,7 @@ class StateManager:
         pedidos.append(pedido)
         self.estado['pedidos_generados'] = pedidos
         
-        return self.guardar_estado()
+        return self._guardar_cambios([('ejecucion', registro), ('pedido', pedido)])
     
     def obtener_pedidos_por_semana(self, semana: int) -> List[Dict[str, Any]]:
         """
@@ -400,7 +645,7 @@ class StateManager:
         errores.append(error_registro)
         self.estado['errores_pendientes'] = errores
         
-        return self.guardar_estado()
+        return self._guardar_cambios([('error', error_registro)])
     
     def limpiar_errores_procesados(self) -> bool:
         """
@@ -0,0 +1,681 @@
+#!/usr/bin/env python3
+"""
+Script de verificación: Cálculos de clasificacionABC.py
+
+Verificar, con tablas pequeñas y fijas, que cada cálculo da lo mismo que su referencia:
+
+- Agregación: agregar_por_articulo = máscaras por artículo
+- FIFO: calcular_antiguedad_fifo, con devoluciones = recorrido de las compras
+- Escenarios: escenarios, acciones, IVA, coste y beneficio = fila a fila
+- Secciones: procesar_secciones en una pasada = sección a sección
+- Escritura en paralelo: workers > 1 = secuencial (archivos, estadísticas, email)
+- Streaming: libros write-only leídos de nuevo (test_excel_streaming.py)
+- Almacén incremental: sumar filas nuevas = reconstruir; se rehace si cambian filas o costes
+- Todos los períodos: clasificar_periodos (workers 1 y 2) = período a período
+
+Autor: Sistema de Pedidos Vivero V2
+Fecha: 2026-02-25
+"""
+
+import sys
+import tempfile
+import numpy as np
+import pandas as pd
+from pathlib import Path
+from unittest import mock
+
+# Añadir la raíz del proyecto al path
+sys.path.insert(0, str(Path(__file__).parent))
+
+import clasificacionABC
+from clasificacionABC import (CLAVE_ARTICULO, calcular_marcas_agua, almacen_vigente,
+                              actualizar_almacen_incremental, agregar_por_articulo,
+                              calcular_antiguedad_fifo, asignar_escenarios,
+                              generar_acciones_sugeridas, TEXTOS_ESCENARIOS,
+                              obtener_iva_articulo, obtener_iva_articulos,
+                              calcular_coste_ventas, calcular_beneficio_ventas)
+
+
+FECHA_INICIO = pd.Timestamp('2025-03-01')
+FECHA_FIN = pd.Timestamp('2025-05-31')
+
+
+def movimientos_prueba():
+    """Compras y ventas de tres artículos repartidas por el período."""
+    articulos = [('1000000001', 'Ficus', 'M', 'VERDE'),
+                 ('8000000001', 'Olivo', '', ''),
+                 ('9000000001', 'Maceta', 'G', 'ROJO')]
+    fechas = pd.date_range('2025-03-03', periods=10, freq='7D')
+
+    compras, ventas = [], []
+    for i, fecha in enumerate(fechas):
+        codigo, nombre, talla, color = articulos[i % 3]
+        clave = {'codigo_str': codigo, 'nombre_str': nombre, 'talla_str': talla, 'color_str': color}
+        compras.append({**clave, 'Fecha': fecha, 'Unidades': 10 + i})
+        for j in range(2):
+            unidades = 1 + i + j
+            ventas.append({**clave, 'Fecha': fecha + pd.Timedelta(days=j), 'Unidades': unidades,
+                           'Importe': unidades * 4.5, 'Beneficio': unidades * 1.5, 'Coste': unidades * 3.0})
+    return pd.DataFrame(compras), pd.DataFrame(ventas)
+
+
+def coste_prueba():
+    """Tabla de costes de los artículos de movimientos_prueba."""
+    return pd.DataFrame({'Artículo': [1000000001, 8000000001, 9000000001],
+                         'Talla': ['M', None, 'G'], 'Color': ['VERDE', None, 'ROJO'],
+                         'Coste': [3.0, 12.0, 0.8]})
+
+
+def ejecucion_incremental(ruta, compras_df, ventas_df, coste_df=None):
+    """
+    Ejecuta actualizar_almacen_incremental (paso --incremental de main()) en el período de prueba.
+
+    Returns:
+        Tuple: (almacén guardado, True si se prepararon todas las filas, es decir, si se reconstruyó)
+    """
+    if coste_df is None:
+        coste_df = coste_prueba()
+    preparadas = []
+
+    def preparar_movimientos(compras, ventas):
+        preparadas.append((len(compras), len(ventas)))
+        return compras, ventas
+
+    with mock.patch.multiple(clasificacionABC, FECHA_INICIO=FECHA_INICIO, FECHA_FIN=FECHA_FIN):
+        compras, ventas = actualizar_almacen_incremental(ruta, compras_df, ventas_df, coste_df,
+                                                         preparar_movimientos)
+    almacen = pd.read_pickle(ruta)
+    pd.testing.assert_frame_equal(compras, almacen['compras'])
+    pd.testing.assert_frame_equal(ventas, almacen['ventas'])
+    return almacen, preparadas == [(len(compras_df), len(ventas_df))]
+
+
+def comprobar_almacen_igual(almacen, esperado):
+    """Compara dos almacenes sin depender del orden de sus filas."""
+    for tabla, orden in (('compras', CLAVE_ARTICULO + ['Fecha']), ('ventas', CLAVE_ARTICULO)):
+        pd.testing.assert_frame_equal(
+            almacen[tabla].sort_values(orden).reset_index(drop=True),
+            esperado[tabla].sort_values(orden).reset_index(drop=True)
+        )
+    assert almacen['marcas'] == esperado['marcas']
+
+
+def test_almacen_incremental_igual_a_completo():
+    """Período truncado + filas restantes = almacén construido con todas las filas."""
+    compras, ventas = movimientos_prueba()
+    corte = pd.Timestamp('2025-04-10')
+
+    with tempfile.TemporaryDirectory() as directorio:
+        ruta = str(Path(directorio) / 'agregados.pkl')
+        _, reconstruido = ejecucion_incremental(ruta, compras[compras['Fecha'] <= corte],
+                                                ventas[ventas['Fecha'] <= corte])
+        assert reconstruido
+        almacen, reconstruido = ejecucion_incremental(ruta, compras, ventas)
+        assert not reconstruido
+
+        completo, _ = ejecucion_incremental(str(Path(directorio) / 'completo.pkl'), compras, ventas)
+    comprobar_almacen_igual(almacen, completo)
+
+
+def test_almacen_sin_filas_nuevas():
+    """Repetir la ejecución sin filas nuevas no cambia los agregados."""
+    compras, ventas = movimientos_prueba()
+    with tempfile.TemporaryDirectory() as directorio:
+        ruta = str(Path(directorio) / 'agregados.pkl')
+        almacen, _ = ejecucion_incremental(ruta, compras, ventas)
+        repetido, reconstruido = ejecucion_incremental(ruta, compras, ventas)
+    assert not reconstruido
+    comprobar_almacen_igual(repetido, almacen)
+
+
+def test_fila_antigua_modificada_reconstruye():
+    """Si cambia una fila anterior a la marca de agua el almacén se reconstruye."""
+    compras, ventas = movimientos_prueba()
+    corte = pd.Timestamp('2025-04-10')
+    ventas_truncadas = ventas[ventas['Fecha'] <= corte]
+
+    # Corrección de unidades de una venta ya agregada (mismo número de filas)
+    ventas_corregidas = ventas.copy()
+    ventas_corregidas.loc[0, ['Unidades', 'Importe']] = [7, 31.5]
+
+    with tempfile.TemporaryDirectory() as directorio:
+        ruta = str(Path(directorio) / 'agregados.pkl')
+        almacen, _ = ejecucion_incremental(ruta, compras[compras['Fecha'] <= corte], ventas_truncadas)
+        assert not almacen_vigente(almacen, compras, ventas_corregidas, coste_prueba())
+        actualizado, reconstruido = ejecucion_incremental(ruta, compras, ventas_corregidas)
+        assert reconstruido
+        completo, _ = ejecucion_incremental(str(Path(directorio) / 'completo.pkl'),
+                                            compras, ventas_corregidas)
+    comprobar_almacen_igual(actualizado, completo)
+
+    # Venta antigua borrada
+    assert not almacen_vigente(almacen, compras, ventas.drop(index=1), coste_prueba())
+
+    # Compra antigua añadida con una fecha ya incorporada
+    compra_tardia = compras.iloc[[0]].assign(Unidades=3)
+    compras_tardias = pd.concat([compras, compra_tardia], ignore_index=True)
+    assert not almacen_vigente(almacen, compras_tardias, ventas, coste_prueba())
+
+    # Solo filas posteriores a la marca: el almacén sigue vigente
+    assert almacen_vigente(almacen, compras, ventas, coste_prueba())
+
+
+def test_coste_modificado_reconstruye():
+    """Si cambia la tabla de costes el almacén se reconstruye."""
+    compras, ventas = movimientos_prueba()
+    coste_nuevo = coste_prueba()
+    coste_nuevo.loc[1, 'Coste'] = 13.5
+
+    with tempfile.TemporaryDirectory() as directorio:
+        ruta = str(Path(directorio) / 'agregados.pkl')
+        almacen, _ = ejecucion_incremental(ruta, compras, ventas)
+        assert almacen_vigente(almacen, compras, ventas, coste_prueba())
+        assert not almacen_vigente(almacen, compras, ventas, coste_nuevo)
+        actualizado, reconstruido = ejecucion_incremental(ruta, compras, ventas, coste_nuevo)
+    assert reconstruido
+    assert actualizado['marcas'] == calcular_marcas_agua(compras, ventas, coste_nuevo)
+
+
+def stock_prueba():
+    """Stock inicial con un artículo repetido, uno sin movimientos y uno ausente."""
+    return pd.DataFrame({
+        'codigo_str': ['1000000001', '1000000001', '9000000001', '9000000002'],
+        'nombre_str': ['Ficus', 'Ficus', 'Maceta', 'Plato'],
+        'talla_str': ['M', 'M', 'G', 'P'],
+        'color_str': ['VERDE', 'VERDE', 'ROJO', 'BLANCO'],
+        'Unidades': [4, 2, 7, 3],
+        'Precio': [2.5, 2.75, 1.2, 0.8],
+    })
+
+
+def agregados_por_mascaras(compras_df, ventas_df, stock_df, fecha_fin, dias_periodo):
+    """Agregados de referencia, filtrando cada artículo con máscaras booleanas."""
+    def filas_articulo(df, clave):
+        mascara = np.ones(len(df), dtype=bool)
+        for columna, valor in zip(CLAVE_ARTICULO, clave):
+            mascara &= (df[columna] == valor).to_numpy()
+        return df[mascara]
+
+    claves = set()
+    for df in (compras_df, ventas_df, stock_df):
+        claves.update(df[CLAVE_ARTICULO].itertuples(index=False, name=None))
+
+    filas = []
+    for clave in sorted(claves):
+        compras = filas_articulo(compras_df, clave)
+        ventas = filas_articulo(ventas_df, clave)
+        stock = filas_articulo(stock_df, clave)
+        filas.append({
+            'total_compras': compras['Unidades'].sum() if len(compras) > 0 else 0,
+            'unidades_vendidas': ventas['Unidades'].sum() if len(ventas) > 0 else 0,
+            'importe_ventas': ventas['Importe'].sum() if len(ventas) > 0 else 0,
+            'beneficio': ventas['Beneficio'].sum() if len(ventas) > 0 else 0,
+            'coste_ventas': ventas['Coste'].sum() if len(ventas) > 0 else 0,
+            'antiguedad_ultima_venta': ((fecha_fin - ventas['Fecha'].max()).days
+                                        if len(ventas) > 0 else dias_periodo),
+            'stock_inicial': stock['Unidades'].sum() if len(stock) > 0 else 0,
+            'precio_coste_stock': stock['Precio'].iloc[0] if len(stock) > 0 else 0,
+        })
+    return pd.DataFrame(filas, index=pd.MultiIndex.from_tuples(sorted(claves), names=CLAVE_ARTICULO))
+
+
+def test_agregados_igual_a_mascaras():
+    """agregar_por_articulo = filtrar cada artículo con máscaras."""
+    compras, ventas = movimientos_prueba()
+    stock = stock_prueba()
+    dias_periodo = (FECHA_FIN - FECHA_INICIO).days
+
+    # Artículo solo en compras
+    compras = pd.concat([compras, compras.iloc[[0]].assign(codigo_str='1000000002', nombre_str='Palmera')],
+                        ignore_index=True)
+
+    for compras_caso, ventas_caso, stock_caso in ((compras, ventas, stock),
+                                                  (compras, ventas.iloc[:0], stock),
+                                                  (compras, ventas, stock.iloc[:0])):
+        agregados = agregar_por_articulo(compras_caso, ventas_caso, stock_caso, FECHA_FIN, dias_periodo)
+        esperado = agregados_por_mascaras(compras_caso, ventas_caso, stock_caso, FECHA_FIN, dias_periodo)
+        pd.testing.assert_frame_equal(agregados, esperado, check_dtype=False)
+
+
+def antiguedad_recorriendo_compras(compras_articulo, consumo, fecha_fin, dias_periodo):
+    """Antigüedad de referencia de un artículo, recorriendo sus compras por fecha."""
+    acumulado = 0
+    compras_ordenadas = compras_articulo.sort_values('Fecha', kind='stable')
+    for _, compra in compras_ordenadas.iterrows():
+        acumulado += compra['Unidades']
+        if acumulado >= consumo:
+            return (fecha_fin - compra['Fecha']).days, f'Compra {compra["Fecha"].strftime("%d/%m/%Y")}'
+    if len(compras_ordenadas) > 0:
+        ultima = compras_ordenadas.iloc[-1]
+        return (fecha_fin - ultima['Fecha']).days, f'Compra {ultima["Fecha"].strftime("%d/%m/%Y")}'
+    return dias_periodo, 'Stock inicial'
+
+
+def test_antiguedad_fifo_igual_a_recorrido():
+    """calcular_antiguedad_fifo = recorrido de las compras, con devoluciones."""
+    dias_periodo = (FECHA_FIN - FECHA_INICIO).days
+    articulos = {
+        # Compras desordenadas que cubren el consumo en la segunda fecha
+        ('1000000001', 'Ficus', 'M', 'VERDE'): [('2025-04-07', 5), ('2025-03-03', 4), ('2025-05-05', 6)],
+        # Devolución que baja el acumulado después de cubrir el consumo
+        ('1000000002', 'Palmera', 'G', 'VERDE'): [('2025-03-10', 8), ('2025-03-17', -5), ('2025-04-14', 6)],
+        # Devolución antes de cubrirlo: el acumulado no es monótono
+        ('1000000003', 'Kentia', 'G', 'VERDE'): [('2025-03-10', 3), ('2025-03-24', -2), ('2025-04-21', 4),
+                                                  ('2025-05-12', 2)],
+        # Nunca cubre el consumo: última compra
+        ('1000000004', 'Cactus', 'P', 'VERDE'): [('2025-03-05', 2), ('2025-04-02', -1), ('2025-03-20', 1)],
+        # Devolución el mismo día que la compra
+        ('1000000005', 'Aloe', 'P', 'VERDE'): [('2025-04-01', 5), ('2025-04-01', -3), ('2025-05-01', 4)],
+        # Compras de un artículo sin consumo que calcular
+        ('9000000001', 'Maceta', 'G', 'ROJO'): [('2025-03-03', 10)],
+    }
+    consumos = {
+        ('1000000001', 'Ficus', 'M', 'VERDE'): 7,
+        ('1000000002', 'Palmera', 'G', 'VERDE'): 6,
+        ('1000000003', 'Kentia', 'G', 'VERDE'): 4,
+        ('1000000004', 'Cactus', 'P', 'VERDE'): 5,
+        ('1000000005', 'Aloe', 'P', 'VERDE'): 3,
+        # Artículo sin compras: conserva el stock inicial
+        ('8000000001', 'Olivo', 'U', 'VERDE'): 2,
+    }
+    compras = pd.DataFrame([
+        dict(zip(CLAVE_ARTICULO, clave), Fecha=pd.Timestamp(fecha), Unidades=unidades)
+        for clave, lineas in articulos.items() for fecha, unidades in lineas
+    ])
+    consumo = pd.Series(list(consumos.values()),
+                        index=pd.MultiIndex.from_tuples(list(consumos), names=CLAVE_ARTICULO))
+
+    antiguedad, origen = calcular_antiguedad_fifo(compras, consumo, FECHA_FIN, dias_periodo)
+
+    for clave, consumo_articulo in consumos.items():
+        compras_articulo = compras[compras[CLAVE_ARTICULO].apply(tuple, axis=1) == clave]
+        esperado = antiguedad_recorriendo_compras(compras_articulo, consumo_articulo, FECHA_FIN, dias_periodo)
+        assert (antiguedad[clave], origen[clave]) == esperado, clave
+    assert origen[('1000000002', 'Palmera', 'G', 'VERDE')] == 'Compra 10/03/2025'
+    assert origen[('1000000003', 'Kentia', 'G', 'VERDE')] == 'Compra 21/04/2025'
+    assert origen[('8000000001', 'Olivo', 'U', 'VERDE')] == 'Stock inicial'
+    assert list(antiguedad.index) == list(consumo.index)
+
+
+def escenario_fila_a_fila(fila):
+    """Escenario de referencia de un artículo, con la cadena de condiciones original."""
+    ab = fila['Categoria ABC'] in ['A', 'B']
+    if fila['Stock Final (unidades)'] == 0:
+        rotacion = fila['Rotación Familia (días)']
+        pct = (fila['Antigüedad Última Venta (días)'] / rotacion) * 100 if rotacion > 0 else 0
+        tramo = 'A' if pct <= 24 else 'B' if pct <= 50 else 'C' if pct <= 100 else 'D'
+        return ('13' if ab else '26') + tramo
+    fila_nivel = {'Elevado': 0, 'Normal': 1}.get(fila['Nivel Stock Final'], 2)
+    columna_riesgo = {'Crítico': 0, 'Alto': 1, 'Medio': 2}.get(fila['Riesgo de Merma/ inmovilizado'], 3)
+    return str(fila_nivel * 4 + columna_riesgo + (1 if ab else 14))
+
+
+def accion_fila_a_fila(fila):
+    """Acción sugerida de referencia, sustituyendo todos los marcadores de cada fila."""
+    escenario = fila['Escenario']
+    if escenario not in TEXTOS_ESCENARIOS:
+        return "Sin acción asignada"
+    stock_final = fila['Stock Final (unidades)']
+    factor = {'12': 1.5, '13A': 2, '13B': 1.5, '25': 1.5, '26A': 2, '26B': 1.5}.get(escenario, 1)
+    sustituciones = {
+        '[descuento]': str(fila['Descuento Sugerido (%)']),
+        '[unidades]': str(int(max(1, round(fila['Stock mínimo (unidades)'] * 0.5, 0)))),
+        '[X días]': str(int(fila['Días de cobertura'])),
+        '[importe]': str(round(stock_final * fila['Precio Coste Unitario (€)'] * 0.7, 2)),
+        '[stock actual]': str(int(stock_final)),
+        '[stock objetivo]': str(int(max(1, round(stock_final * factor, 0)))),
+    }
+    texto = TEXTOS_ESCENARIOS[escenario]
+    for marcador, valor in sustituciones.items():
+        texto = texto.replace(marcador, valor)
+    return texto
+
+
+def articulos_clasificados():
+    """Una fila por cada rama de la asignación de escenarios, con valores repetidos."""
+    filas = []
+    for categoria in ['A', 'B', 'C', 'D']:
+        # Agotados: tramos del porcentaje de rotación transcurrido y rotación 0
+        for antiguedad, rotacion in [(7, 30), (15, 30), (30, 30), (31, 30), (100, 0)]:
+            filas.append({'Categoria ABC': categoria, 'Stock Final (unidades)': 0,
+                          'Antigüedad Última Venta (días)': antiguedad, 'Rotación Familia (días)': rotacion,
+                          'Nivel Stock Final': 'Cero', 'Riesgo de Merma/ inmovilizado': 'Cero'})
+        # Con stock: cada nivel de stock final con cada riesgo
+        for nivel in ['Elevado', 'Normal', 'Bajo']:
+            for riesgo in ['Crítico', 'Alto', 'Medio', 'Bajo']:
+                filas.append({'Categoria ABC': categoria, 'Stock Final (unidades)': 12,
+                              'Antigüedad Última Venta (días)': 40, 'Rotación Familia (días)': 30,
+                              'Nivel Stock Final': nivel, 'Riesgo de Merma/ inmovilizado': riesgo})
+    df = pd.DataFrame(filas)
+    n = len(df)
+    df['Descuento Sugerido (%)'] = np.resize([0, 10, 20, 30], n)
+    df['Stock mínimo (unidades)'] = np.resize([0.0, 3.5, 7.5, 15.0, 3.5], n)
+    df['Días de cobertura'] = np.resize([0, 14, 45, 14, 90, 7], n)
+    df['Precio Coste Unitario (€)'] = np.resize([1.2, 2.75, 0.0], n)
+    df['Stock Final (unidades)'] = df['Stock Final (unidades)'] + np.resize([0, 0, 3], n) * (df['Stock Final (unidades)'] > 0)
+    df.index = range(100, 100 + n)
+    return df
+
+
+def test_escenarios_y_acciones_igual_a_fila_a_fila():
+    """asignar_escenarios y generar_acciones_sugeridas = asignación fila a fila."""
+    df = articulos_clasificados()
+
+    escenarios = asignar_escenarios(df)
+    esperado = df.apply(escenario_fila_a_fila, axis=1)
+    pd.testing.assert_series_equal(escenarios, esperado, check_dtype=False)
+    assert set(escenarios) == set(TEXTOS_ESCENARIOS)
+
+    df['Escenario'] = escenarios
+    df.loc[df.index[-1], 'Escenario'] = '99'
+    acciones = generar_acciones_sugeridas(df)
+    pd.testing.assert_series_equal(acciones, df.apply(accion_fila_a_fila, axis=1), check_dtype=False)
+    assert acciones.iloc[-1] == "Sin acción asignada"
+
+
+CODIGOS_IVA = ['1100000001', '3100000001', '2101000001', '2102000001', '2999000001', '9900000001',
+               ' 1200000001 ', '1500000001.0', 1100000002, 3200000002.0, '21', '2', '', None, np.nan]
+
+
+def test_iva_igual_a_obtener_iva_articulo():
+    """obtener_iva_articulos = obtener_iva_articulo código a código."""
+    codigos = pd.Series(CODIGOS_IVA, index=range(50, 50 + len(CODIGOS_IVA)), dtype=object)
+
+    iva = obtener_iva_articulos(codigos)
+
+    esperado = pd.Series([obtener_iva_articulo(codigo) for codigo in CODIGOS_IVA], index=codigos.index)
+    pd.testing.assert_series_equal(iva, esperado, check_dtype=False)
+    assert set(iva) == {10, 21}
+
+
+def coste_linea(fila):
+    """Coste de referencia de una línea de venta, con el cálculo línea a línea original."""
+    try:
+        unidades = fila['Unidades'] if pd.notna(fila['Unidades']) else 1
+        importe = fila['Importe'] if pd.notna(fila['Importe']) else 0
+        coste_unitario = fila['Coste'] if pd.notna(fila['Coste']) else 0
+        if coste_unitario > 0:
+            return unidades * coste_unitario
+        if unidades > 0 and importe > 0:
+            pvp = importe / unidades
+            if obtener_iva_articulo(fila['Artículo']) == 10:
+                return unidades * ((pvp / 1.10) / 2.3)
+            return unidades * ((pvp / 1.21) / 2)
+        return 0
+    except TypeError:
+        return 0
+
+
+def beneficio_linea(fila):
+    """Beneficio de referencia de una línea de venta, con el cálculo línea a línea original."""
+    try:
+        importe = fila['Importe'] if pd.notna(fila['Importe']) else 0
+        coste = fila['Coste'] if pd.notna(fila['Coste']) else 0
+        return (importe / (1 + obtener_iva_articulo(fila['Artículo']) / 100)) - coste
+    except TypeError:
+        return 0
+
+
+def test_coste_y_beneficio_igual_a_linea_a_linea():
+    """calcular_coste_ventas y calcular_beneficio_ventas = cálculo línea a línea."""
+    ventas = pd.DataFrame({
+        'Artículo': ['1100000001', '3100000001', '2101000001', '1100000001', '3100000001',
+                     '1100000001', '3100000001', '1100000001', '3100000001', '9900000001', '1100000001'],
+        # Coste unitario, PVP con IVA 10/21, unidades nulas, sin unidades o importe,
+        # devoluciones y valores no numéricos
+        'Unidades': [3, 2, 4, np.nan, 0, 2, -1, 'x', 2, 5, 1],
+        'Importe': [9.0, 24.2, 11.0, 5.5, 10.0, 0.0, -12.1, 8.0, 'x', np.nan, 4.4],
+        'Coste': [1.5, 0.0, np.nan, np.nan, 0.0, 0.0, np.nan, 0.0, 2.0, 0.0, 'abc'],
+    }, index=range(10, 21))
+
+    iva = obtener_iva_articulos(ventas['Artículo'])
+    coste = calcular_coste_ventas(ventas, iva)
+    esperado = ventas.apply(coste_linea, axis=1)
+    np.testing.assert_allclose(coste.to_numpy(dtype=float), esperado.to_numpy(dtype=float))
+    assert list(coste.index) == list(ventas.index)
+
+    ventas['Coste'] = coste
+    beneficio = calcular_beneficio_ventas(ventas, iva)
+    esperado = ventas.apply(beneficio_linea, axis=1)
+    np.testing.assert_allclose(beneficio.to_numpy(dtype=float), esperado.to_numpy(dtype=float))
+
+
+SECCIONES_PRUEBA = ['interior', 'maf', 'vivero', 'semillas']
+
+
+def movimientos_secciones():
+    """
+    Compras, ventas y stock de varias secciones.
+
+    Incluye artículos de las secciones interior, maf y vivero con ventas de
+    distinto peso (categorías A, B, C y D), ninguno de semillas y uno de
+    deco_exterior, que no se procesa.
+    """
+    rng = np.random.default_rng(3)
+    articulos = [(f"{prefijo}00000000{i}", f"Artículo {prefijo}{i}", 'U', 'VERDE')
+                 for prefijo in ['1', '7', '8'] for i in range(1, 7)] + [('9000000001', 'Jardinera', 'G', 'ROJO')]
+    fechas = pd.date_range('2025-03-03', FECHA_FIN, freq='6D')
+
+    compras, ventas, stock = [], [], []
+    for n, articulo in enumerate(articulos):
+        clave = dict(zip(CLAVE_ARTICULO, articulo))
+        for fecha in fechas[n % 4::4]:
+            compras.append({**clave, 'Fecha': fecha, 'Unidades': int(rng.integers(5, 20))})
+        if n % 6 != 5:
+            for fecha in fechas[n % 3::3][:n % 6 + 1]:
+                unidades = int(rng.integers(1, 4)) * (6 - n % 6)
+                coste = unidades * (1.0 + n % 5)
+                ventas.append({**clave, 'Fecha': fecha, 'Unidades': unidades, 'Importe': coste * 2.5,
+                               'Beneficio': coste * 1.5, 'Coste': coste})
+        stock.append({**clave, 'Unidades': n % 4, 'Precio': 1.0 + n % 5})
+    return pd.DataFrame(compras), pd.DataFrame(ventas), pd.DataFrame(stock)
+
+
+def clasificar_capturando(directorio, procesar):
+    """
+    Ejecuta una clasificación guardando el DataFrame que se escribe de cada sección.
+
+    Returns:
+        Tuple: (resultado de procesar, dict sección -> DataFrame escrito)
+    """
+    escritos = {}
+    escribir = clasificacionABC.escribir_clasificacion_seccion
+
+    def escribir_capturando(df_clasificado, nombre_archivo):
+        escritos[Path(nombre_archivo).name] = df_clasificado
+        return escribir(df_clasificado, nombre_archivo)
+
+    with mock.patch.multiple(clasificacionABC, create=True, FECHA_INICIO=FECHA_INICIO, FECHA_FIN=FECHA_FIN,
+                             DIAS_PERIODO=(FECHA_FIN - FECHA_INICIO).days, PERIODO='P1', AÑO=2025,
+                             DIRECTORIO_DATA=directorio,
+                             escribir_clasificacion_seccion=escribir_capturando,
+                             enviar_email_clasificacion=mock.Mock(return_value=False)):
+        return procesar(), escritos
+
+
+def test_una_pasada_igual_a_por_seccion():
+    """procesar_secciones con todas las secciones = procesar_seccion sección a sección."""
+    compras, ventas, stock = movimientos_secciones()
+    secciones = [(nombre, clasificacionABC.SECCIONES[nombre]) for nombre in SECCIONES_PRUEBA]
+
+    with tempfile.TemporaryDirectory() as directorio:
+        estadisticas, escritos = clasificar_capturando(
+            directorio, lambda: clasificacionABC.procesar_secciones(compras, ventas, stock, secciones))
+        por_seccion, escritos_por_seccion = clasificar_capturando(directorio, lambda: [
+            clasificacionABC.procesar_seccion(compras, ventas, stock, None, nombre, info)
+            for nombre, info in secciones
+        ])
+
+    assert estadisticas == por_seccion
+    assert estadisticas[-1] is None and all(estadisticas[:-1])
+    assert sorted(escritos) == sorted(escritos_por_seccion) and len(escritos) == 3
+    for nombre_archivo, df_clasificado in escritos.items():
+        pd.testing.assert_frame_equal(df_clasificado, escritos_por_seccion[nombre_archivo])
+        assert set(df_clasificado['Categoria ABC']) == {'A', 'B', 'C', 'D'}
+
+
+def clasificar_con_workers(directorio, secciones, workers):
+    """
+    Clasifica las secciones de prueba escribiendo los archivos con workers procesos.
+
+    El envío de emails se sustituye por un Mock que devuelve True salvo para
+    'maf', de modo que cada sección tiene un resultado de envío reconocible.
+
+    Returns:
+        Tuple: (estadísticas, Mock del envío, dict archivo -> hojas leídas)
+    """
+    compras, ventas, stock = movimientos_secciones()
+    enviar = mock.Mock(side_effect=lambda nombre_seccion, nombre_archivo, periodo: nombre_seccion != 'maf')
+    with mock.patch.multiple(clasificacionABC, create=True, FECHA_INICIO=FECHA_INICIO, FECHA_FIN=FECHA_FIN,
+                             DIAS_PERIODO=(FECHA_FIN - FECHA_INICIO).days, PERIODO='P1', AÑO=2025,
+                             DIRECTORIO_DATA=directorio, enviar_email_clasificacion=enviar):
+        estadisticas = clasificacionABC.procesar_secciones(compras, ventas, stock, secciones, workers)
+    libros = {archivo.name: pd.read_excel(archivo, sheet_name=None) for archivo in Path(directorio).glob('*.xlsx')}
+    return estadisticas, enviar, libros
+
+
+def test_escritura_en_paralelo_igual_a_secuencial():
+    """Con workers=2 se escriben los mismos archivos, estadísticas y envíos que con workers=1."""
+    secciones = [(nombre, clasificacionABC.SECCIONES[nombre]) for nombre in SECCIONES_PRUEBA]
+
+    with tempfile.TemporaryDirectory() as dir_uno, tempfile.TemporaryDirectory() as dir_varios, \
+         mock.patch.object(clasificacionABC, 'ProcessPoolExecutor',
+                           wraps=clasificacionABC.ProcessPoolExecutor) as en_procesos:
+        estadisticas_uno, enviar_uno, libros_uno = clasificar_con_workers(dir_uno, secciones, 1)
+        assert not en_procesos.called
+        estadisticas_varios, enviar_varios, libros_varios = clasificar_con_workers(dir_varios, secciones, 2)
+        assert en_procesos.called
+
+    def sin_directorio(estadisticas):
+        return [None if e is None else {**e, 'archivo': Path(e['archivo']).name} for e in estadisticas]
+
+    assert sin_directorio(estadisticas_varios) == sin_directorio(estadisticas_uno)
+    assert estadisticas_uno[-1] is None and all(estadisticas_uno[:-1])
+    assert [e['email_enviado'] for e in estadisticas_varios[:-1]] == [True, False, True]
+
+    # Un envío por archivo escrito, con la sección y el archivo de cada uno
+    for enviar, estadisticas in ((enviar_uno, estadisticas_uno), (enviar_varios, estadisticas_varios)):
+        assert sorted(c.args[:2] for c in enviar.call_args_list) == \
+            sorted((e['seccion'], e['archivo']) for e in estadisticas if e)
+
+    assert libros_varios.keys() == libros_uno.keys() and len(libros_uno) == 3
+    for nombre, hojas in libros_uno.items():
+        assert hojas.keys() == libros_varios[nombre].keys()
+        for hoja, df in hojas.items():
+            pd.testing.assert_frame_equal(df, libros_varios[nombre][hoja])
+
+
+PERIODOS_PRUEBA = ['P1', 'P2', 'P3', 'P4']
+
+
+def movimientos_periodos():
+    """
+    Compras, ventas y un stock por período para los cuatro períodos de 2025.
+
+    Los movimientos de movimientos_secciones (marzo a mayo) se desplazan a
+    cada período con unidades distintas, de modo que cada período tiene su
+    propia clasificación.
+    """
+    compras, ventas, stock = movimientos_secciones()
+    desplazamientos = {'P1': -59, 'P2': 0, 'P3': 92, 'P4': 184}
+    partes_compras, partes_ventas, stocks = [], [], {}
+    for n, (periodo, dias) in enumerate(desplazamientos.items()):
+        partes_compras.append(compras.assign(Fecha=compras['Fecha'] + pd.Timedelta(days=dias),
+                                             Unidades=compras['Unidades'] + n))
+        partes_ventas.append(ventas.assign(Fecha=ventas['Fecha'] + pd.Timedelta(days=dias),
+                                           Unidades=ventas['Unidades'] * (n + 1)))
+        stocks[periodo] = stock.assign(Unidades=(stock['Unidades'] + n) % 5)
+    return (pd.concat(partes_compras, ignore_index=True), pd.concat(partes_ventas, ignore_index=True), stocks)
+
+
+def clasificar_periodos_en(directorio, procesar):
+    """
+    Ejecuta una clasificación de períodos escribiendo en un directorio.
+
+    Returns:
+        Tuple: (resultado de procesar, dict archivo -> hojas leídas)
+    """
+    with mock.patch.multiple(clasificacionABC, create=True, FECHA_INICIO=None, FECHA_FIN=None,
+                             DIAS_PERIODO=None, PERIODO=None, AÑO=None, DIRECTORIO_DATA=directorio,
+                             enviar_email_clasificacion=mock.Mock(return_value=True)):
+        resultado = procesar()
+    libros = {archivo.name: pd.read_excel(archivo, sheet_name=None) for archivo in Path(directorio).glob('*.xlsx')}
+    return resultado, libros
+
+
+def test_todos_periodos_igual_a_uno_a_uno():
+    """clasificar_periodos (workers=1 y workers=2) = cada período procesado por separado."""
+    compras, ventas, stocks = movimientos_periodos()
+    secciones = [(nombre, clasificacionABC.SECCIONES[nombre]) for nombre in SECCIONES_PRUEBA]
+    configuraciones = {periodo: clasificacionABC.configurar_periodo(periodo, clasificacionABC.CONFIG, 2025)
+                       for periodo in PERIODOS_PRUEBA}
+    assert [configuracion[3] for configuracion in configuraciones.values()] == PERIODOS_PRUEBA
+
+    def uno_a_uno():
+        # Lo que hace main() con --P1 ... --P4: filtrar las fechas del período y clasificarlo
+        resultados = {}
+        for periodo, configuracion in configuraciones.items():
+            clasificacionABC.establecer_periodo(configuracion)
+            resultados[periodo] = clasificacionABC.procesar_secciones(
+                clasificacionABC.filtrar_por_fechas(compras, configuracion[0], configuracion[1]),
+                clasificacionABC.filtrar_por_fechas(ventas, configuracion[0], configuracion[1]),
+                stocks[periodo], secciones)
+        return resultados
+
+    def sin_directorio(resultados):
+        return {periodo: [None if e is None else {**e, 'archivo': Path(e['archivo']).name} for e in estadisticas]
+                for periodo, estadisticas in resultados.items()}
+
+    with tempfile.TemporaryDirectory() as directorio:
+        esperado, libros_esperados = clasificar_periodos_en(directorio, uno_a_uno)
+    esperado = sin_directorio(esperado)
+    assert list(esperado) == PERIODOS_PRUEBA
+    assert len(libros_esperados) == 3 * len(PERIODOS_PRUEBA)
+
+    for workers in (1, 2):
+        with tempfile.TemporaryDirectory() as directorio, \
+             mock.patch.object(clasificacionABC, 'ProcessPoolExecutor',
+                               wraps=clasificacionABC.ProcessPoolExecutor) as en_procesos:
+            resultados, libros = clasificar_periodos_en(directorio, lambda: clasificacionABC.clasificar_periodos(
+                configuraciones, compras, ventas, stocks, secciones, workers))
+        assert en_procesos.called == (workers > 1)
+
+        assert sin_directorio(resultados) == esperado
+        assert libros.keys() == libros_esperados.keys()
+        for nombre, hojas in libros_esperados.items():
+            assert hojas.keys() == libros[nombre].keys()
+            for hoja, df in hojas.items():
+                pd.testing.assert_frame_equal(df, libros[nombre][hoja])
+
+
+def main():
+    """Ejecuta todas las pruebas."""
+    pruebas = [
+        ("Almacén incremental = almacén completo", test_almacen_incremental_igual_a_completo),
+        ("Almacén sin filas nuevas", test_almacen_sin_filas_nuevas),
+        ("Fila antigua modificada reconstruye", test_fila_antigua_modificada_reconstruye),
+        ("Tabla de costes modificada reconstruye", test_coste_modificado_reconstruye),
+        ("Agregados por artículo = máscaras", test_agregados_igual_a_mascaras),
+        ("Antigüedad FIFO = recorrido de compras", test_antiguedad_fifo_igual_a_recorrido),
+        ("Escenarios y acciones = fila a fila", test_escenarios_y_acciones_igual_a_fila_a_fila),
+        ("IVA = obtener_iva_articulo", test_iva_igual_a_obtener_iva_articulo),
+        ("Coste y beneficio = línea a línea", test_coste_y_beneficio_igual_a_linea_a_linea),
+        ("Una pasada = sección a sección", test_una_pasada_igual_a_por_seccion),
+        ("Escritura con workers=2 = secuencial", test_escritura_en_paralelo_igual_a_secuencial),
+        ("Todos los períodos = uno a uno", test_todos_periodos_igual_a_uno_a_uno),
+    ]
+
+    todas_pasaron = True
+    for nombre, prueba in pruebas:
+        try:
+            prueba()
+            print(f"  {nombre}: ✓ PASÓ")
+        except AssertionError:
+            print(f"  {nombre}: ✗ FALLÓ")
+            todas_pasaron = False
+
+    return 0 if todas_pasaron else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
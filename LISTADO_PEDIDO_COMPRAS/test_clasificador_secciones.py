@@ -0,0 +1,125 @@
+#!/usr/bin/env python3
+"""
+Script de verificación: Clasificador de secciones compartido
+
+Verificar que la clasificación vectorizada de una columna de códigos
+(asignar_secciones) produce exactamente el mismo resultado que la
+clasificación código a código (determinar_seccion_codigo), incluyendo
+los casos límite: códigos cortos, nulos, floats y mascotas vivas.
+
+Autor: Sistema de Pedidos Vivero V2
+Fecha: 2026-02-14
+"""
+
+import sys
+import pandas as pd
+import numpy as np
+from pathlib import Path
+
+# Añadir src al path
+sys.path.insert(0, str(Path(__file__).parent / 'src'))
+
+from clasificador_secciones import asignar_secciones, determinar_seccion_codigo
+
+
+CODIGOS_PRUEBA = [
+    '1000000001',      # interior
+    '2104000001',      # mascotas vivo (prefijo de la lista)
+    '2200000001',      # mascotas manufacturado
+    '3100000001',      # tierras/áridos
+    '3200000001',      # tierras/áridos
+    '3000000001',      # 30: sin sección
+    '3500000001',      # fitos
+    '3A00000001',      # segundo carácter no numérico: sin sección
+    '4000000001',      # útiles de jardín
+    8000000001.0,      # float con '.0' -> vivero
+    9000000001,        # entero -> deco exterior
+    ' 6000000001 ',    # espacios -> deco interior
+    '0000000001',      # primer dígito 0: sin sección
+    '123',             # menos de 10 dígitos
+    '',                # vacío
+    'nan',             # texto 'nan'
+    None,              # nulo
+    np.nan,            # NaN
+]
+
+
+def test_clasificacion_vectorizada_igual_a_escalar():
+    """
+    Verificar que asignar_secciones coincide con determinar_seccion_codigo
+    """
+    print("=" * 80)
+    print("Verificar clasificación vectorizada frente a clasificación por código")
+    print("=" * 80)
+
+    codigos = pd.Series(CODIGOS_PRUEBA, dtype=object)
+    resultado = asignar_secciones(codigos)
+
+    todos_correctos = True
+    for codigo, seccion in zip(codigos, resultado):
+        esperado = determinar_seccion_codigo(codigo)
+        obtenido = None if pd.isna(seccion) else seccion
+        correcto = esperado == obtenido
+        todos_correctos = todos_correctos and correcto
+        estado = "✓" if correcto else "✗"
+        print(f"  {estado} {str(codigo):>15} -> {str(obtenido):<25} (esperado: {esperado})")
+
+    assert todos_correctos
+    assert isinstance(resultado.dtype, pd.CategoricalDtype)
+    assert resultado.index.equals(codigos.index)
+
+
+def test_nombre_seccion_tierras():
+    """
+    Verificar que el nombre de la sección de tierras es configurable
+    """
+    codigos = pd.Series(['3100000001', '3200000001'])
+
+    assert list(asignar_secciones(codigos)) == ['tierras_aridos', 'tierras_aridos']
+    assert list(asignar_secciones(codigos, seccion_tierras='tierra_aridos')) == ['tierra_aridos', 'tierra_aridos']
+
+
+def test_codigos_mascotas_configurables():
+    """
+    Verificar que se respetan los prefijos de mascotas vivas recibidos
+    """
+    codigos = pd.Series(['2104000001', '2999000001'])
+
+    resultado = asignar_secciones(codigos, codigos_mascotas_vivo=['2999'])
+    assert list(resultado) == ['mascotas_manufacturado', 'mascotas_vivo']
+
+
+def test_codigos_mascotas_enteros():
+    """
+    Verificar que los prefijos de mascotas vivas leídos como números se comparan como texto
+    """
+    codigos = pd.Series(['2104000001', '2999000001', 2999000002])
+    esperado = ['mascotas_manufacturado', 'mascotas_vivo', 'mascotas_vivo']
+
+    assert list(asignar_secciones(codigos, codigos_mascotas_vivo=[2999])) == esperado
+    assert [determinar_seccion_codigo(codigo, [2999]) for codigo in codigos] == esperado
+
+
+def main():
+    """Ejecuta todas las pruebas."""
+    pruebas = [
+        ("Clasificación vectorizada = escalar", test_clasificacion_vectorizada_igual_a_escalar),
+        ("Nombre de sección de tierras", test_nombre_seccion_tierras),
+        ("Prefijos de mascotas vivas", test_codigos_mascotas_configurables),
+        ("Prefijos de mascotas vivas numéricos", test_codigos_mascotas_enteros),
+    ]
+
+    todas_pasaron = True
+    for nombre, prueba in pruebas:
+        try:
+            prueba()
+            print(f"  {nombre}: ✓ PASÓ")
+        except AssertionError:
+            print(f"  {nombre}: ✗ FALLÓ")
+            todas_pasaron = False
+
+    return 0 if todas_pasaron else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,157 @@
+#!/usr/bin/env python3
+"""
+Script de verificación: Identificadores enteros de CodificadorClaves
+
+Verificar, con tablas pequeñas y fijas, que CodificadorClaves numera las
+claves de la referencia por orden de primera aparición y que buscar()
+devuelve el mismo identificador que un diccionario de tuplas, con -1 para
+las claves que no están en la referencia (también cuando cada valor existe
+por separado), con valores nulos, columnas categóricas y con el índice
+múltiple que se usa cuando hay demasiadas combinaciones.
+
+Autor: Sistema de Pedidos Vivero V2
+Fecha: 2026-02-25
+"""
+
+import sys
+import numpy as np
+import pandas as pd
+from pathlib import Path
+
+# Añadir la raíz del proyecto al path
+sys.path.insert(0, str(Path(__file__).parent))
+
+from src.codificador_claves import CodificadorClaves
+
+
+NULO = object()
+
+
+def clave_tupla(valores):
+    """Clave de diccionario de una fila, con un único valor para None y NaN."""
+    return tuple(NULO if pd.isna(valor) else valor for valor in valores)
+
+
+def ids_diccionario(referencia, busqueda):
+    """
+    Identificadores de referencia con un diccionario de tuplas.
+
+    Returns:
+        Tuple: (ids de la referencia, ids de la búsqueda con -1 si no existe)
+    """
+    ids = {}
+    ids_referencia = [ids.setdefault(clave_tupla(fila), len(ids)) for fila in zip(*referencia)]
+    ids_busqueda = [ids.get(clave_tupla(fila), -1) for fila in zip(*busqueda)]
+    return np.array(ids_referencia, dtype=np.int64), np.array(ids_busqueda, dtype=np.int64)
+
+
+def series(columnas):
+    """Convierte listas de valores en columnas de texto como las de los DataFrames."""
+    return [pd.Series(columna, dtype=object) for columna in columnas]
+
+
+def comprobar_igual_a_diccionario(referencia, busqueda):
+    """Compara CodificadorClaves con el diccionario de tuplas."""
+    codificador = CodificadorClaves(referencia)
+    esperado_referencia, esperado_busqueda = ids_diccionario(referencia, busqueda)
+
+    np.testing.assert_array_equal(codificador.ids, esperado_referencia)
+    np.testing.assert_array_equal(codificador.buscar(busqueda), esperado_busqueda)
+    assert len(codificador) == len(set(esperado_referencia))
+    return codificador
+
+
+REFERENCIA = [
+    ['8000000001', '8000000001', '8000000002', '8000000001', '8000000003', '8000000002', '8000000004'],
+    ['G', 'M', 'U', 'G', None, 'U', np.nan],
+    ['VERDE', 'VERDE', 'BLANCO', 'VERDE', 'ROJO', 'ROJO', ''],
+]
+
+BUSQUEDA = [
+    # Claves existentes, repetidas y en otro orden
+    ['8000000002', '8000000001', '8000000001', '8000000003', '8000000004',
+     # Código y talla existentes, combinación inexistente
+     '8000000002', '8000000003',
+     # Valores que no están en la referencia
+     '9000000001', '8000000001', '8000000001',
+     # Nulos: None y NaN coinciden entre sí, pero no con el texto vacío
+     '8000000003', '8000000004', '8000000004'],
+    ['U', 'G', 'M', np.nan, None,
+     'G', 'U',
+     'G', 'XL', 'G',
+     None, np.nan, ''],
+    ['BLANCO', 'VERDE', 'VERDE', 'ROJO', '',
+     'BLANCO', 'ROJO',
+     'VERDE', 'VERDE', 'AZUL',
+     'ROJO', '', ''],
+]
+
+
+def test_buscar_igual_a_diccionario():
+    """buscar() = diccionario de tuplas, con -1 para las claves que faltan."""
+    codificador = comprobar_igual_a_diccionario(series(REFERENCIA), series(BUSQUEDA))
+
+    ids = codificador.buscar(series(BUSQUEDA))
+    assert ids.dtype == np.int64
+    assert ids.tolist() == [2, 0, 1, 3, 5, -1, -1, -1, -1, -1, 3, 5, -1]
+
+
+def test_columnas_categoricas_y_numericas():
+    """Mismos identificadores con columnas categóricas, numéricas y Series."""
+    referencia = [pd.Series(REFERENCIA[0], dtype='category'),
+                  pd.Series(REFERENCIA[1], dtype='category'),
+                  pd.Series(REFERENCIA[2])]
+    busqueda = [pd.Series(BUSQUEDA[0], dtype='category'), pd.Series(BUSQUEDA[1], dtype=object),
+                pd.Series(BUSQUEDA[2], dtype='category')]
+    comprobar_igual_a_diccionario(referencia, busqueda)
+
+    referencia = [pd.Series([8000000001, 8000000002, 8000000001]), pd.Series([1.5, 2.0, 2.5])]
+    busqueda = [pd.Series([8000000001, 8000000001, 8000000002]), pd.Series([2.5, 2.0, 2.0])]
+    comprobar_igual_a_diccionario(referencia, busqueda)
+
+
+def test_busqueda_vacia_y_referencia_vacia():
+    """Búsquedas sin filas y referencia sin claves."""
+    codificador = CodificadorClaves(series(REFERENCIA))
+    assert len(codificador.buscar(series([[], [], []]))) == 0
+
+    vacio = CodificadorClaves(series([[], []]))
+    assert len(vacio) == 0
+    np.testing.assert_array_equal(vacio.buscar(series([['8000000001'], ['G']])), [-1])
+
+
+def test_indice_multiple_igual_a_diccionario():
+    """Con demasiadas combinaciones para un entero se usa el índice múltiple."""
+    rng = np.random.default_rng(5)
+    n = 10000
+    referencia = [np.arange(n) + 10 * columna for columna in range(5)]
+    referencia = [np.concatenate([columna, columna[:50]]) for columna in referencia]
+    busqueda = [np.concatenate([columna[rng.permutation(n)[:200]], columna[:3] + 1]) for columna in referencia]
+
+    codificador = comprobar_igual_a_diccionario(referencia, busqueda)
+    assert codificador._usar_indice_multiple
+
+
+def main():
+    """Ejecuta todas las pruebas."""
+    pruebas = [
+        ("buscar() = diccionario de tuplas", test_buscar_igual_a_diccionario),
+        ("Columnas categóricas y numéricas", test_columnas_categoricas_y_numericas),
+        ("Búsqueda y referencia vacías", test_busqueda_vacia_y_referencia_vacia),
+        ("Índice múltiple = diccionario", test_indice_multiple_igual_a_diccionario),
+    ]
+
+    todas_pasaron = True
+    for nombre, prueba in pruebas:
+        try:
+            prueba()
+            print(f"  {nombre}: ✓ PASÓ")
+        except AssertionError:
+            print(f"  {nombre}: ✗ FALLÓ")
+            todas_pasaron = False
+
+    return 0 if todas_pasaron else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
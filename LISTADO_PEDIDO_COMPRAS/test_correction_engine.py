@@ -0,0 +1,189 @@
+#!/usr/bin/env python3
+"""
+Script de verificación: Corrección por columnas del CorrectionEngine
+
+Verificar, con tablas pequeñas y fijas, que la corrección calculada por
+columnas (aplicar_correccion_dataframe, con np.select para los escenarios)
+es igual a la que se obtenía fila a fila con obtener_stock_minimo,
+aplicar_formula_correccion, detectar_escenario y _generar_razon_correccion.
+
+Autor: Sistema de Pedidos Vivero V2
+Fecha: 2026-02-25
+"""
+
+import sys
+import itertools
+import numpy as np
+import pandas as pd
+from pathlib import Path
+
+# Añadir la raíz del proyecto al path
+sys.path.insert(0, str(Path(__file__).parent))
+
+from src.correction_engine import CorrectionEngine, ConfiguracionCorreccion, CODIGOS_ESCENARIOS
+
+
+COLUMNAS_CORRECCION = ['Stock_Minimo_Objetivo', 'Diferencia_Stock', 'Pedido_Corregido',
+                       'Escenario', 'Razon_Correccion', 'Pedido_Final']
+
+
+def correccion_fila_a_fila(engine, df):
+    """
+    Corrección de referencia, aplicando los métodos de una fila a cada artículo.
+
+    Usa los nombres de columna por defecto de aplicar_correccion_dataframe.
+
+    Returns:
+        pd.DataFrame: Columnas de corrección de cada fila
+    """
+    filas = []
+    for fila in df.to_dict('records'):
+        pedido = fila.get('Pedido_Corregido_Stock', 0)
+        stock_real = fila.get('Stock_Fisico', 0)
+        stock_real = 0 if pd.isna(stock_real) else stock_real
+        if 'Stock_Minimo_Objetivo' in fila:
+            stock_minimo = fila['Stock_Minimo_Objetivo']
+        else:
+            stock_minimo = engine.obtener_stock_minimo(fila.get('Categoria', 'C'),
+                                                       fila.get('Ventas_Objetivo', 0), pedido)
+        stock_minimo = 0 if pd.isna(stock_minimo) else stock_minimo
+
+        diferencia = engine.calcular_diferencia_stock(stock_minimo, stock_real)
+        corregido = engine.aplicar_formula_correccion(pedido, stock_minimo, stock_real)
+        escenario = engine.detectar_escenario(
+            pedido_generado=pedido,
+            stock_minimo=stock_minimo,
+            stock_real=stock_real,
+            ventas_reales=fila.get('Unidades_Vendidas', 0),
+            ventas_objetivo=fila.get('Ventas_Objetivo', 0),
+            compras_reales=fila.get('Unidades_Recibidas', 0),
+            compras_sugeridas=fila.get('Pedido_Corregido_Stock', pedido)
+        )['codigo']
+        razon = engine._generar_razon_correccion(stock_minimo, stock_real, diferencia, corregido, pedido)
+        filas.append({'Stock_Minimo_Objetivo': stock_minimo, 'Diferencia_Stock': diferencia,
+                      'Pedido_Corregido': corregido, 'Escenario': escenario,
+                      'Razon_Correccion': razon, 'Pedido_Final': corregido})
+    return pd.DataFrame(filas, index=df.index)
+
+
+def comprobar_igual_a_fila_a_fila(engine, df):
+    """Compara aplicar_correccion_dataframe con la corrección fila a fila."""
+    resultado = engine.aplicar_correccion_dataframe(df)
+    esperado = correccion_fila_a_fila(engine, df)
+
+    # La tendencia de ventas se suma después al pedido corregido y al final
+    incremento = resultado.get('Incremento_Tendencia', 0)
+    corregido = resultado.assign(Pedido_Corregido=resultado['Pedido_Corregido'] - incremento,
+                                 Pedido_Final=resultado['Pedido_Final'] - incremento)
+
+    for columna in COLUMNAS_CORRECCION:
+        if columna in ('Escenario', 'Razon_Correccion'):
+            assert corregido[columna].tolist() == esperado[columna].tolist(), columna
+        else:
+            np.testing.assert_allclose(corregido[columna].to_numpy(dtype=float),
+                                       esperado[columna].to_numpy(dtype=float), err_msg=columna)
+    return resultado
+
+
+def tabla_escenarios():
+    """
+    Una fila por combinación de niveles de ventas, compras y stock (27 escenarios).
+
+    Cada valor real toma 3, 5 o 7 frente a una referencia de 5 para obtener
+    los niveles menor, igual y mayor.
+    """
+    filas = []
+    for ventas, compras, stock in itertools.product([3, 5, 7], repeat=3):
+        filas.append({'Pedido_Corregido_Stock': 5, 'Stock_Minimo_Objetivo': 5.0, 'Stock_Fisico': stock,
+                      'Unidades_Vendidas': ventas, 'Ventas_Objetivo': 5, 'Unidades_Recibidas': compras})
+    return pd.DataFrame(filas)
+
+
+def test_escenarios_igual_a_fila_a_fila():
+    """Los 27 escenarios de np.select coinciden con detectar_escenario."""
+    engine = CorrectionEngine()
+    df = tabla_escenarios()
+
+    resultado = comprobar_igual_a_fila_a_fila(engine, df)
+    assert sorted(resultado['Escenario']) == sorted(CODIGOS_ESCENARIOS)
+    assert resultado['Incremento_Tendencia'].gt(0).any()
+
+
+def test_stock_minimo_calculado_igual_a_fila_a_fila():
+    """Sin columna de stock mínimo, se calcula por categoría como obtener_stock_minimo."""
+    df = pd.DataFrame({
+        'Pedido_Corregido_Stock': [10, 4, 0, 7, 3, 6, 2],
+        'Stock_Fisico': [3.0, np.nan, 2.0, 12.0, 0.0, 9.0, 1.0],
+        'Categoria': ['A', 'b', 'C', 'D', 'X', 'A', 'B'],
+        'Ventas_Objetivo': [6.0, 0.0, 4.0, 2.0, 0.0, -1.0, 3.0],
+        'Unidades_Vendidas': [8, 1, 4, 0, 2, 5, 3],
+    }, index=range(20, 27))
+
+    comprobar_igual_a_fila_a_fila(CorrectionEngine(), df)
+
+    # Con pesos por categoría (las categorías sin peso usan la cobertura)
+    engine = CorrectionEngine(config_abc={'pesos_categoria': {'A': 0.8, 'B': 0.5}})
+    comprobar_igual_a_fila_a_fila(engine, df)
+
+
+def test_columnas_ausentes_y_negativos():
+    """Columnas de ventas/compras ausentes y pedidos negativos permitidos."""
+    df = pd.DataFrame({
+        'Pedido_Corregido_Stock': [5, 0, 2, 8],
+        'Stock_Minimo_Objetivo': [2.0, np.nan, 6.0, 1.5],
+        'Stock_Fisico': [9.0, 4.0, 6.0, 0.0],
+    })
+    resultado = comprobar_igual_a_fila_a_fila(CorrectionEngine(), df)
+    assert resultado['Pedido_Corregido'].min() >= 0
+
+    # Ninguna fila positiva: la columna es entera, como max(0, x) fila a fila
+    sin_pedido = pd.DataFrame({'Pedido_Corregido_Stock': [1, 0], 'Stock_Minimo_Objetivo': [0.0, 1.0],
+                               'Stock_Fisico': [5.0, 3.0]})
+    resultado = comprobar_igual_a_fila_a_fila(CorrectionEngine(), sin_pedido)
+    assert resultado['Pedido_Corregido'].tolist() == [0, 0]
+
+    engine = CorrectionEngine(configuracion=ConfiguracionCorreccion(permitir_pedidos_negativos=True))
+    resultado = comprobar_igual_a_fila_a_fila(engine, df)
+    assert resultado['Pedido_Corregido'].min() < 0
+
+
+def test_tabla_aleatoria_igual_a_fila_a_fila():
+    """Tabla pseudoaleatoria fija con valores repetidos para forzar igualdades."""
+    rng = np.random.default_rng(11)
+    n = 60
+    df = pd.DataFrame({
+        'Pedido_Corregido_Stock': rng.integers(0, 6, n),
+        'Stock_Fisico': rng.integers(0, 6, n).astype(float),
+        'Categoria': rng.choice(['A', 'B', 'C', 'D'], n),
+        'Unidades_Vendidas': rng.integers(0, 6, n),
+        'Ventas_Objetivo': rng.integers(0, 6, n).astype(float),
+        'Unidades_Recibidas': rng.integers(0, 6, n),
+    })
+    df.loc[::7, 'Stock_Fisico'] = np.nan
+
+    comprobar_igual_a_fila_a_fila(CorrectionEngine(), df)
+
+
+def main():
+    """Ejecuta todas las pruebas."""
+    pruebas = [
+        ("Escenarios = fila a fila", test_escenarios_igual_a_fila_a_fila),
+        ("Stock mínimo calculado = fila a fila", test_stock_minimo_calculado_igual_a_fila_a_fila),
+        ("Columnas ausentes y negativos", test_columnas_ausentes_y_negativos),
+        ("Tabla aleatoria = fila a fila", test_tabla_aleatoria_igual_a_fila_a_fila),
+    ]
+
+    todas_pasaron = True
+    for nombre, prueba in pruebas:
+        try:
+            prueba()
+            print(f"  {nombre}: ✓ PASÓ")
+        except AssertionError:
+            print(f"  {nombre}: ✗ FALLÓ")
+            todas_pasaron = False
+
+    return 0 if todas_pasaron else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,152 @@
+#!/usr/bin/env python3
+"""
+Script de verificación: Caché binaria de los Excel de entrada
+
+Verificar que una hoja servida desde la caché (leer_excel_cacheado) es igual
+a la leída con pd.read_excel, que reescribir el libro invalida sus entradas
+que leer una segunda hoja no elimina la entrada de la primera y que una
+hoja leída por índice o por nombre comparte la misma entrada.
+
+Autor: Sistema de Pedidos Vivero V2
+Fecha: 2026-02-25
+"""
+
+import os
+import sys
+import tempfile
+import numpy as np
+import pandas as pd
+from pathlib import Path
+from unittest import mock
+
+# Añadir la raíz del proyecto al path
+sys.path.insert(0, str(Path(__file__).parent))
+
+from src import excel_cache
+from src.excel_cache import ExcelCache, leer_excel_cacheado
+
+
+def escribir_libro(ruta: str, unidades: list) -> None:
+    """Escribe un libro de prueba con una hoja de ventas y otra de costes."""
+    ventas = pd.DataFrame({
+        'Artículo': [1000000001, 8000000001, 9000000001],
+        'Nombre artículo': ['Ficus', 'Olivo', None],
+        'Talla': ['M', np.nan, 'G'],
+        'Fecha': pd.to_datetime(['2025-03-03', '2025-03-04', '2025-03-05']),
+        'Unidades': unidades,
+        'Importe': [4.5, 25.0, 7.25],
+    })
+    costes = pd.DataFrame({'Codigo': ['1000000001', '8000000001'], 'Coste': [1.8, 10.0]})
+    with pd.ExcelWriter(ruta) as writer:
+        ventas.to_excel(writer, sheet_name='Ventas por vendedor', index=False)
+        costes.to_excel(writer, sheet_name='Costes', index=False)
+
+
+def sin_leer_excel():
+    """Hace fallar cualquier lectura del libro que no venga de la caché."""
+    return mock.patch.object(excel_cache.pd, 'read_excel',
+                             side_effect=AssertionError('lectura fuera de la caché'))
+
+
+def test_acierto_igual_a_read_excel():
+    """Una hoja servida desde la caché es igual a la de pd.read_excel."""
+    with tempfile.TemporaryDirectory() as directorio:
+        ruta = os.path.join(directorio, 'input', 'SPA_ventas.xlsx')
+        os.makedirs(os.path.dirname(ruta))
+        escribir_libro(ruta, [3, 1, 2])
+
+        esperado = pd.read_excel(ruta, sheet_name=None)
+        primera = leer_excel_cacheado(ruta, sheet_name=None)
+        assert os.listdir(os.path.join(directorio, 'cache_excel'))
+
+        with sin_leer_excel():
+            cacheado = leer_excel_cacheado(ruta, sheet_name=None)
+            hoja = leer_excel_cacheado(ruta, sheet_name='Costes')
+
+        assert list(cacheado) == list(esperado)
+        for nombre, df in esperado.items():
+            pd.testing.assert_frame_equal(primera[nombre], df)
+            pd.testing.assert_frame_equal(cacheado[nombre], df)
+        pd.testing.assert_frame_equal(hoja, esperado['Costes'])
+
+
+def test_reescritura_invalida_entrada():
+    """Reescribir el libro sirve los datos nuevos y elimina las entradas antiguas."""
+    with tempfile.TemporaryDirectory() as directorio:
+        ruta = os.path.join(directorio, 'input', 'SPA_ventas.xlsx')
+        os.makedirs(os.path.dirname(ruta))
+        directorio_cache = os.path.join(directorio, 'cache_excel')
+
+        escribir_libro(ruta, [3, 1, 2])
+        leer_excel_cacheado(ruta)
+        entradas_antiguas = set(os.listdir(directorio_cache))
+
+        escribir_libro(ruta, [5, 0, 9])
+        nuevo = leer_excel_cacheado(ruta)
+
+        assert nuevo['Unidades'].tolist() == [5, 0, 9]
+        pd.testing.assert_frame_equal(nuevo, pd.read_excel(ruta))
+        entradas = set(os.listdir(directorio_cache))
+        assert entradas and not entradas & entradas_antiguas
+        hash_nuevo = ExcelCache(ruta).hash_archivo[:16]
+        assert all(f"__{hash_nuevo}__" in entrada for entrada in entradas)
+
+
+def test_segunda_hoja_no_elimina_primera():
+    """Leer una segunda hoja conserva la entrada de la primera."""
+    with tempfile.TemporaryDirectory() as directorio:
+        ruta = os.path.join(directorio, 'input', 'SPA_ventas.xlsx')
+        os.makedirs(os.path.dirname(ruta))
+        escribir_libro(ruta, [3, 1, 2])
+
+        ventas = leer_excel_cacheado(ruta, sheet_name='Ventas por vendedor')
+        costes = leer_excel_cacheado(ruta, sheet_name='Costes')
+
+        with sin_leer_excel():
+            pd.testing.assert_frame_equal(leer_excel_cacheado(ruta, sheet_name='Ventas por vendedor'), ventas)
+            pd.testing.assert_frame_equal(leer_excel_cacheado(ruta, sheet_name='Costes'), costes)
+
+
+def test_indice_y_nombre_misma_entrada():
+    """Leer una hoja por índice y por nombre usa una sola entrada de caché."""
+    with tempfile.TemporaryDirectory() as directorio:
+        ruta = os.path.join(directorio, 'input', 'SPA_ventas.xlsx')
+        os.makedirs(os.path.dirname(ruta))
+        escribir_libro(ruta, [3, 1, 2])
+
+        por_indice = leer_excel_cacheado(ruta, sheet_name=1)
+        with sin_leer_excel():
+            por_nombre = leer_excel_cacheado(ruta, sheet_name='Costes')
+        pd.testing.assert_frame_equal(por_nombre, por_indice)
+
+        leer_excel_cacheado(ruta)
+        with sin_leer_excel():
+            leer_excel_cacheado(ruta, sheet_name=None)
+        entradas = [entrada for entrada in os.listdir(os.path.join(directorio, 'cache_excel'))
+                    if not entrada.endswith('__hojas.json')]
+        assert len(entradas) == 2
+
+
+def main():
+    """Ejecuta todas las pruebas."""
+    pruebas = [
+        ("Acierto de caché = pd.read_excel", test_acierto_igual_a_read_excel),
+        ("Reescritura invalida la entrada", test_reescritura_invalida_entrada),
+        ("Segunda hoja no elimina la primera", test_segunda_hoja_no_elimina_primera),
+        ("Índice y nombre de hoja, una entrada", test_indice_y_nombre_misma_entrada),
+    ]
+
+    todas_pasaron = True
+    for nombre, prueba in pruebas:
+        try:
+            prueba()
+            print(f"  {nombre}: ✓ PASÓ")
+        except AssertionError:
+            print(f"  {nombre}: ✗ FALLÓ")
+            todas_pasaron = False
+
+    return 0 if todas_pasaron else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,216 @@
+#!/usr/bin/env python3
+"""
+Script de verificación: Libros Excel escritos en modo streaming
+
+Verificar, leyendo de nuevo los libros generados, que el archivo de pedido
+(OrderGenerator.generar_archivo_pedido) y el archivo de clasificación ABC+D
+(escribir_clasificacion_seccion), escritos en modo write-only, conservan las
+cabeceras, los valores, los formatos numéricos, los estilos, las anchuras,
+las columnas ocultas, las celdas combinadas, el bloque de métricas de
+resumen y el autofiltro.
+
+Autor: Sistema de Pedidos Vivero V2
+Fecha: 2026-03-02
+"""
+
+import sys
+import tempfile
+from pathlib import Path
+
+import pandas as pd
+from openpyxl import load_workbook
+from openpyxl.utils import get_column_letter
+
+# Añadir la raíz del proyecto al path
+sys.path.insert(0, str(Path(__file__).parent))
+
+import clasificacionABC
+from src.order_generator import OrderGenerator
+
+CABECERAS_PEDIDO = [
+    'Código artículo', 'Nombre Artículo', 'Talla', 'Color', 'Sección', 'Unidades Calculadas',
+    'PVP', 'Coste Pedido', 'Categoría', 'Acción Aplicada', 'Stock Mínimo Objetivo',
+    'Diferencia Stock', 'Ventas Objetivo', 'Beneficio Objetivo', 'Proveedor',
+    'Pedido Corregido Stock', 'Ventas Reales', 'Tendencia Consumo', 'Pedido Final'
+]
+
+
+def dimensiones_columnas(hoja) -> dict:
+    """Dimensiones de cada letra de columna (openpyxl agrupa las columnas contiguas iguales)."""
+    dimensiones = {}
+    for dimension in hoja.column_dimensions.values():
+        for indice in range(dimension.min, dimension.max + 1):
+            dimensiones[get_column_letter(indice)] = dimension
+    return dimensiones
+
+
+def pedidos_prueba() -> pd.DataFrame:
+    """Pedido de cuatro artículos, uno de ellos sin pedido corregido (se descarta)."""
+    return pd.DataFrame({
+        'Codigo_Articulo': ['1000000003', '1000000001', '1000000002', '1000000004'],
+        'Nombre_Articulo': ['Ficus', 'Pothos', 'Monstera', 'Calathea'],
+        'Talla': ['M', 'P', 'G', 'M'],
+        'Color': ['VERDE', '', 'VERDE', 'ROJO'],
+        'Seccion': ['interior'] * 4,
+        'Unidades_Finales': [4, 2, 6, 3],
+        'PVP': [12.456, 5.5, 30.0, 9.999],
+        'Coste_Pedido': [20.0, 4.4, 72.125, 12.0],
+        'Categoria': ['A', 'B', 'A', 'C'],
+        'Accion_Aplicada': ['Mantener', 'Reducir', 'Mantener', 'Mantener'],
+        'Stock_Minimo_Objetivo': [2, 1, 3, 1],
+        'Diferencia_Stock': [1, -1, 2, 0],
+        'Ventas_Objetivo': [49.824, 11.0, 180.0, 29.997],
+        'Beneficio_Objetivo': [29.824, 6.6, 107.875, 17.997],
+        'Proveedor': ['Viveros Sur', 'Flores Norte', 'Viveros Sur', 'Flores Norte'],
+        'Pedido_Corregido_Stock': [5, 1, 8, 0],
+        'Ventas_Reales': [3, 2, 5, 1],
+        'Tendencia_Consumo': [0, 0, 1, 0],
+        'Pedido_Final': [5, 1, 9, 0],
+    })
+
+
+def test_archivo_pedido():
+    """
+    Verificar el libro de pedido: cabeceras, formatos, celdas combinadas y resumen
+    """
+    with tempfile.TemporaryDirectory() as directorio:
+        generador = OrderGenerator({'rutas': {'directorio_salida': directorio}})
+        parametros = {'objetivos_semanales': {'12': 250}, 'objetivo_crecimiento': 0.05,
+                      'festivos': {'12': 0.1}, 'stock_minimo_porcentaje': 0.30}
+        ruta = generador.generar_archivo_pedido(pedidos_prueba(), 12, 'interior', parametros)
+        assert ruta is not None
+        hoja = load_workbook(ruta)['Semana_12']
+
+        # Solo los artículos con pedido, por proveedor y código
+        filas = 3
+        esperados = pedidos_prueba().iloc[[1, 2, 0]]
+        assert hoja.max_column == len(CABECERAS_PEDIDO)
+
+        assert [celda.value for celda in hoja[1]] == CABECERAS_PEDIDO
+        for celda in hoja[1]:
+            assert celda.font.bold and celda.font.color.rgb.endswith('FFFFFF')
+            assert celda.fill.fill_type == 'solid' and celda.fill.fgColor.rgb.endswith('008000')
+            assert celda.alignment.wrap_text and celda.border.left.style == 'thin'
+
+        columnas = {cabecera: indice for indice, cabecera in enumerate(CABECERAS_PEDIDO, start=1)}
+        for fila, (_, pedido) in enumerate(esperados.iterrows(), start=2):
+            assert hoja.cell(fila, columnas['Código artículo']).value == pedido['Codigo_Articulo']
+            assert hoja.cell(fila, columnas['PVP']).value == round(pedido['PVP'], 2)
+            assert hoja.cell(fila, columnas['Pedido Final']).value == pedido['Pedido_Final']
+            assert hoja.cell(fila, columnas['PVP']).number_format == '#,##0.00'
+            assert hoja.cell(fila, columnas['Ventas Objetivo']).number_format == '#,##0.00'
+            assert hoja.cell(fila, columnas['Unidades Calculadas']).number_format == '#,##0'
+            assert hoja.cell(fila, columnas['Diferencia Stock']).number_format == '#,##0'
+            assert hoja.cell(fila, columnas['Proveedor']).alignment.horizontal == 'left'
+            assert hoja.cell(fila, columnas['Nombre Artículo']).number_format == 'General'
+            assert all(hoja.cell(fila, c).border.bottom.style == 'thin' for c in columnas.values())
+
+        anchos = dimensiones_columnas(hoja)
+        assert anchos['A'].width == 11.25 and anchos['B'].width == 50 and anchos['O'].width == 27
+
+        # Fila en blanco, título combinado en B:C y métricas
+        fila_resumen = filas + 3
+        assert all(celda.value is None for celda in hoja[filas + 2])
+        assert [str(rango) for rango in hoja.merged_cells.ranges] == [f'B{fila_resumen}:C{fila_resumen}']
+        titulo = hoja.cell(fila_resumen, 2)
+        assert titulo.value == 'METRICAS DE RESUMEN'
+        assert titulo.font.bold and titulo.fill.fgColor.rgb.endswith('008000')
+
+        metricas = {hoja.cell(fila, 2).value: hoja.cell(fila, 3).value
+                    for fila in range(fila_resumen + 1, hoja.max_row + 1)}
+        assert metricas == {
+            'Total_Unidades:': 15, 'Total_Articulos:': 3, 'Total_Importe:': '240.82€',
+            'Objetivo_Semana:': '250€', 'Factor_Crecimiento:': '5%', 'Factor_Festivo:': '10%',
+            'Articulos_A:': 2, 'Articulos_B:': 1, 'Articulos_C:': 0, 'Stock_Minimo_%:': '30%',
+            'Stock_Minimo_Objetivo:': 6, 'Total_Ajuste_Stock:': 2,
+        }
+        etiqueta = hoja.cell(fila_resumen + 1, 2)
+        assert etiqueta.font.bold and etiqueta.border.left.style == 'thin'
+        assert hoja.cell(fila_resumen + 1, 3).alignment.horizontal == 'center'
+
+
+def clasificados_prueba() -> pd.DataFrame:
+    """Artículos clasificados con todos los niveles de riesgo y uno sin riesgo."""
+    riesgos = list(clasificacionABC.COLORES_RIESGO) + [None]
+    filas = []
+    for n, riesgo in enumerate(riesgos):
+        fila = {columna: n + 1 for columna in clasificacionABC.COLUMNAS_SALIDA}
+        fila.update({'Artículo': f'100000000{n}', 'Nombre artículo': f'Artículo {n}',
+                     'Talla': 'U', 'Color': None, 'Riesgo de Merma/ inmovilizado': riesgo,
+                     'Acción Sugerida': 'Mantener', 'Categoria ABC': 'A' if n < 4 else 'C'})
+        filas.append(fila)
+    return pd.DataFrame(filas)
+
+
+def test_hoja_clasificacion():
+    """
+    Verificar el libro de clasificación: rellenos de riesgo, columnas ocultas y autofiltro
+    """
+    df_clasificado = clasificados_prueba()
+    with tempfile.TemporaryDirectory() as directorio:
+        ruta = str(Path(directorio) / 'CLASIFICACION_ABC+D_INTERIOR_P1_2025.xlsx')
+        conteos = clasificacionABC.escribir_clasificacion_seccion(df_clasificado, ruta)
+        libro = load_workbook(ruta)
+
+    assert conteos == {'total_articulos': 6, 'categoria_a': 4, 'categoria_b': 0,
+                       'categoria_c': 2, 'categoria_d': 0}
+    assert libro.sheetnames == list(clasificacionABC.HOJAS_CATEGORIAS.values())
+
+    hoja = libro[clasificacionABC.HOJAS_CATEGORIAS['A']]
+    columnas = clasificacionABC.COLUMNAS_SALIDA
+    assert [celda.value for celda in hoja[1]] == columnas
+    assert hoja.max_row == 5
+    assert hoja.auto_filter.ref == f'A1:{get_column_letter(len(columnas))}5'
+    assert hoja.row_dimensions[1].height == 45
+    assert hoja.page_setup.orientation == 'landscape'
+    cabecera = hoja['A1']
+    assert cabecera.font.bold and cabecera.fill.fgColor.rgb.endswith(clasificacionABC.COLOR_CABECERA)
+
+    dimensiones = dimensiones_columnas(hoja)
+    ocultas = sorted(letra for letra, dimension in dimensiones.items() if dimension.hidden)
+    assert ocultas == sorted(clasificacionABC.COLUMNAS_OCULTAS_CLASIFICACION)
+    for letra, ancho in clasificacionABC.ANCHOS_COLUMNAS_CLASIFICACION.items():
+        assert dimensiones[letra].width == ancho
+
+    # Relleno del nivel de riesgo en la columna T; el resto de celdas sin relleno
+    riesgo = clasificacionABC.COLUMNA_RIESGO_CLASIFICACION
+    for fila in range(2, hoja.max_row + 1):
+        nivel = hoja[f'{riesgo}{fila}'].value
+        assert hoja[f'{riesgo}{fila}'].fill.fgColor.rgb.endswith(clasificacionABC.COLORES_RIESGO[nivel])
+        assert hoja[f'{riesgo}{fila}'].alignment.horizontal == 'center'
+        assert hoja[f'A{fila}'].fill.fill_type is None and hoja[f'A{fila}'].alignment.horizontal == 'left'
+        assert hoja[f'M{fila}'].alignment.horizontal == 'center'
+        assert hoja[f'D{fila}'].value is None and hoja[f'D{fila}'].border.left.style == 'thin'
+
+    # Artículo sin riesgo: celda vacía con el estilo normal de la columna
+    hoja_c = libro[clasificacionABC.HOJAS_CATEGORIAS['C']]
+    assert hoja_c['T3'].value is None and hoja_c['T3'].fill.fill_type is None
+    assert hoja_c['T3'].alignment.horizontal == 'center'
+
+    # Hoja sin artículos: solo la cabecera y el autofiltro sobre ella
+    hoja_b = libro[clasificacionABC.HOJAS_CATEGORIAS['B']]
+    assert hoja_b.max_row == 1
+    assert hoja_b.auto_filter.ref == f'A1:{get_column_letter(len(columnas))}1'
+
+
+def main():
+    """Ejecuta todas las pruebas."""
+    pruebas = [
+        ("Libro de pedido", test_archivo_pedido),
+        ("Libro de clasificación ABC+D", test_hoja_clasificacion),
+    ]
+
+    todas_pasaron = True
+    for nombre, prueba in pruebas:
+        try:
+            prueba()
+            print(f"  {nombre}: ✓ PASÓ")
+        except AssertionError:
+            print(f"  {nombre}: ✗ FALLÓ")
+            todas_pasaron = False
+
+    return 0 if todas_pasaron else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
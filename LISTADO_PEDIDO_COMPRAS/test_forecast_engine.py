@@ -0,0 +1,371 @@
+#!/usr/bin/env python3
+"""
+Script de verificación: Cálculos por columnas del ForecastEngine
+
+Verificar, con tablas pequeñas y fijas, que el pedido semanal calculado por
+columnas (calcular_pedido_semana) es igual al que se obtenía artículo a
+artículo, que los factores de compra resueltos con la expresión regular
+compilada coinciden con la cadena de comprobaciones original y que la
+reducción del exceso de ventas coincide con su recorrido artículo a
+artículo en los dos modos. Verificar también que el stock mínimo y las
+correcciones FASE 2 calculados por columnas (aplicar_stock_minimo) son
+iguales a los calculados fila a fila.
+
+Autor: Sistema de Pedidos Vivero V2
+Fecha: 2026-02-25
+"""
+
+import re
+import sys
+import json
+import pandas as pd
+import numpy as np
+from pathlib import Path
+
+# Añadir la raíz del proyecto al path
+sys.path.insert(0, str(Path(__file__).parent))
+
+from src.forecast_engine import ForecastEngine
+
+
+CONFIG_PRUEBA = {
+    'parametros': {'objetivo_crecimiento': 0.05, 'stock_minimo_porcentaje': 0.30},
+    'festivos': {'14': 0.25},
+    'secciones': {'vivero': {'objetivos_semanales': {'14': 180.0, '15': 40.0}}},
+}
+
+
+def datos_prueba():
+    """
+    Ventas de la semana, clasificación ABC+D y costes de seis artículos.
+
+    Incluye un artículo con dos líneas de venta, uno sin ABC+D, uno que solo
+    se encuentra por código, uno sin coste y uno con PVP a 0.
+
+    Returns:
+        Tuple: (datos_semana, abc_df, costes_df)
+    """
+    datos_semana = pd.DataFrame({
+        'Codigo': ['8000000001', '8000000001', '8000000002', '8000000003',
+                   '8000000004', '8000000005', '8000000006'],
+        'Nombre': ['Olivo', 'Olivo', 'Romero', 'Lavanda', 'Pino', 'Tomillo', 'Laurel'],
+        'Talla': ['G', 'G', 'U', 'M', 'U', 'U', 'P'],
+        'Color': ['VERDE', 'VERDE', 'VERDE', 'MORADO', 'VERDE', 'VERDE', 'VERDE'],
+        'Unidades': [2, 1, 6, 4, 3, 5, 8],
+        'Importe': [50.0, 25.0, 21.0, 26.0, 45.0, 12.5, 36.0],
+        'Semana': 14,
+    })
+    abc_df = pd.DataFrame({
+        'Artículo': ['8000000001', '8000000002', '8000000003', '8000000004', '8000000006'],
+        'Nombre artículo': ['Olivo', 'Romero', 'Lavanda', 'Pino', 'Laurel'],
+        'Talla': ['G', 'U', 'XL', 'U', 'P'],
+        'Color': ['VERDE', 'VERDE', 'MORADO', 'VERDE', 'VERDE'],
+        'Categoria': ['A', 'B', 'C', 'D', 'A'],
+        'Acción Sugerida': ['Aumentar compras 25%', 'Reducir compras 40% y revisar',
+                            'Mantener nivel de compras', 'Eliminar del catálogo', None],
+        'Descuento Sugerido (%)': [0, 10, 0, 30, 0],
+    })
+    costes_df = pd.DataFrame({
+        'Codigo': ['8000000001', '8000000002', '8000000003', '8000000004', '8000000006'],
+        'Talla': ['G', 'U', 'M', 'U', 'P'],
+        'Color': ['VERDE', 'VERDE', 'MORADO', 'VERDE', 'VERDE'],
+        'Tarifa10': [25.0, 3.5, 6.5, 0.0, 4.5],
+        'Coste': [10.0, 1.4, 2.6, 6.0, 1.8],
+        'Nombre proveedor': ['Arboles SL', 'Aromaticas SA', None, 'Arboles SL', 'Aromaticas SA'],
+    })
+    return datos_semana, abc_df, costes_df
+
+
+def pedido_fila_a_fila(engine, semana, datos_semana, abc_df, costes_df, seccion):
+    """Cálculo de referencia del pedido semanal, artículo a artículo."""
+    ventas_articulo = datos_semana.groupby(['Codigo', 'Nombre', 'Talla', 'Color']).agg({
+        'Unidades': 'sum', 'Importe': 'sum'}).reset_index()
+    ventas_articulo.columns = ['Codigo', 'Nombre', 'Talla', 'Color', 'Unidades_Base', 'Importe_Base']
+    info_articulos = engine._enriquecer_articulos(
+        ventas_articulo, engine._construir_indice_articulos(abc_df, costes_df))
+
+    pedidos = []
+    for idx, row in ventas_articulo.iterrows():
+        info = info_articulos.loc[idx]
+        factor = engine.calcular_factor_compra(info['accion_raw'])
+        if factor == 0:
+            accion = 'ELIMINAR'
+        elif factor < 1:
+            accion = f'REDUCIR {int((1 - factor) * 100)}%'
+        elif factor > 1:
+            accion = f'AUMENTAR {int((factor - 1) * 100)}%'
+        else:
+            accion = 'MANTENER'
+        pedidos.append({
+            'Codigo_Articulo': row['Codigo'], 'Nombre_Articulo': row['Nombre'],
+            'Talla': row['Talla'], 'Color': row['Color'], 'Seccion': seccion,
+            'Unidades_Base': row['Unidades_Base'], 'Unidades_ABC': row['Unidades_Base'] * factor,
+            'PVP': info['pvp'], 'Coste_Pedido': info['coste'], 'Proveedor': info['proveedor'],
+            'Categoria': info['categoria'], 'Accion_Aplicada': accion,
+            'Peso_Categoria': engine.pesos_categoria.get(info['categoria'], 0),
+        })
+    pedidos_df = pd.DataFrame(pedidos)
+
+    pedidos_df['Ventas_Preliminares'] = pedidos_df['Unidades_ABC'] * pedidos_df['PVP']
+    ventas_actuales = pedidos_df['Ventas_Preliminares'].sum()
+    objetivo = engine.obtener_objetivo_semana(seccion, semana)
+    festivo = engine.festivos.get(str(semana), 0.0)
+    factor_total = (1 + engine.parametros.get('objetivo_crecimiento', 0.05)) * (1 + festivo)
+    factor_escalado = (objetivo * factor_total) / ventas_actuales if ventas_actuales > 0 and objetivo > 0 else 1.0
+
+    pedidos_df['Unidades_Escaladas'] = pedidos_df['Unidades_ABC'] * factor_escalado
+    pedidos_df['Unidades_Finales'] = pedidos_df['Unidades_Escaladas'].apply(
+        lambda x: int(np.ceil(x)) if x > 0 else 0)
+    pedidos_df['Ventas_Preliminares'] = pedidos_df['Unidades_Finales'] * pedidos_df['PVP']
+    delta = pedidos_df['Ventas_Preliminares'].sum() - objetivo * factor_total
+
+    if delta > 0:
+        pedidos_df = pedidos_df.sort_values('PVP', ascending=True)
+        for idx in pedidos_df.index:
+            if delta <= 0:
+                break
+            if pedidos_df.at[idx, 'Unidades_Finales'] > 0 and pedidos_df.at[idx, 'PVP'] <= delta:
+                pedidos_df.at[idx, 'Unidades_Finales'] -= 1
+                delta -= pedidos_df.at[idx, 'PVP']
+
+    pedidos_df['Ventas_Objetivo'] = (pedidos_df['Unidades_Finales'] * pedidos_df['PVP']).round(2)
+    pedidos_df['Beneficio_Objetivo'] = (
+        pedidos_df['Ventas_Objetivo'] - pedidos_df['Unidades_Finales'] * pedidos_df['Coste_Pedido']).round(2)
+    return pedidos_df
+
+
+def factor_encadenado(engine, accion_texto):
+    """Factor de compra de referencia: patrones comprobados uno a uno, por grupos."""
+    if pd.isna(accion_texto):
+        return 1.0
+    accion = engine._normalizar(str(accion_texto).lower())
+    if 'eliminar del catalogo' in accion:
+        return 0.0
+    reducciones = {
+        'reducir compras 70%': 0.50, 'reducir compras 50%': 0.50, 'reducir compras 40%': 0.60,
+        'reducir compras 35%': 0.65, 'reducir compras 30%': 0.65, 'reducir compras 25%': 0.75,
+        'reducir compras 20%': 0.80, 'reducir compras 15%': 0.85, 'aplicar descuento 20%': 0.80,
+        'implementar promocion del 15%': 0.85,
+    }
+    for patron, factor in reducciones.items():
+        if patron in accion:
+            return factor
+    if 'aplicar descuento' in accion:
+        match = re.search(r'aplicar descuento\s*(\d+[.,]?\d*)%', accion)
+        if match:
+            return 1.0 - float(match.group(1).replace(',', '.')) / 100.0
+    for patron in ['mantener el nivel de compras actual', 'mantener nivel de compras',
+                   'mantener nivel de compras anterior']:
+        if patron in accion:
+            return 1.0
+    aumentos = {
+        'aumentar compras 50%': 1.50, 'aumentar compras 40%': 1.40, 'incrementar compras 30%': 1.30,
+        'aumentar compras 30%': 1.30, 'aumentar compras 25%': 1.25, 'incrementar compras 20%': 1.20,
+        'aumentar compras 15%': 1.15,
+    }
+    for patron, factor in aumentos.items():
+        if patron in accion:
+            return factor
+    return 1.0
+
+
+ACCIONES_PRUEBA = [
+    'Eliminar del catálogo', 'ELIMINAR DEL CATALOGO tras liquidar', 'Reducir compras 70%',
+    'Reducir compras 50%', 'Reducir compras 40% y revisar', 'Reducir compras 35%',
+    'Reducir compras 30%', 'Reducir compras 25%', 'Reducir compras 20%', 'Reducir compras 15%',
+    'Aplicar descuento 20%', 'Implementar promoción del 15%', 'Aplicar descuento 12,5% en tienda',
+    'Aplicar descuento 35%', 'Aplicar descuento sin porcentaje', 'Mantener el nivel de compras actual',
+    'Mantener nivel de compras', 'Mantener nivel de compras anterior', 'Aumentar compras 50%',
+    'Aumentar compras 40%', 'Incrementar compras 30%', 'Aumentar compras 30%', 'Aumentar compras 25%',
+    'Incrementar compras 20%', 'Aumentar compras 15%',
+    # Varios patrones en el mismo texto: gana el de mayor prioridad
+    'Aumentar compras 50% o reducir compras 15%', 'Aplicar descuento 30% y aplicar descuento 20%',
+    'Mantener nivel de compras; aplicar descuento 10%', 'Aumentar compras 25% y eliminar del catálogo',
+    # Sin patrón, vacíos y repetidos
+    'Revisar ubicación', '', None, np.nan, 'Reducir compras 40% y revisar', 'Aumentar compras 15%',
+]
+
+
+def test_factores_compra_igual_a_encadenado():
+    """calcular_factores_compra coincide con la cadena de comprobaciones original."""
+    engine = ForecastEngine(CONFIG_PRUEBA)
+    acciones = pd.Series(ACCIONES_PRUEBA, index=range(100, 100 + len(ACCIONES_PRUEBA)), dtype=object)
+
+    factores = engine.calcular_factores_compra(acciones)
+
+    esperado = pd.Series([factor_encadenado(engine, texto) for texto in ACCIONES_PRUEBA],
+                         index=acciones.index, dtype=float)
+    pd.testing.assert_series_equal(factores, esperado)
+    for texto in ACCIONES_PRUEBA:
+        assert engine.calcular_factor_compra(texto) == factor_encadenado(engine, texto)
+
+    # Misma resolución con la columna categórica que entrega el DataLoader
+    pd.testing.assert_series_equal(engine.calcular_factores_compra(acciones.astype('category')), esperado)
+
+
+def reducir_exceso_recorrido(unidades, pvp, delta, multiunidad=False):
+    """Reducción de referencia del exceso de ventas, recorriendo los artículos en orden."""
+    unidades = unidades.copy()
+    restante = delta
+    for i in range(len(unidades)):
+        if multiunidad:
+            if unidades[i] <= 0 or pvp[i] <= 0:
+                continue
+            importe = unidades[i] * pvp[i]
+            if importe <= restante:
+                unidades[i] = 0
+                restante -= importe
+                continue
+            retirar = int(np.floor(restante / pvp[i]))
+            if retirar * pvp[i] > restante:
+                retirar -= 1
+            unidades[i] -= max(retirar, 0)
+            break
+        else:
+            if restante <= 0:
+                break
+            if unidades[i] > 0 and pvp[i] <= restante:
+                unidades[i] -= 1
+                restante -= pvp[i]
+    return unidades
+
+
+CASOS_REDUCCION = [
+    # (unidades, pvp ordenado ascendente, delta)
+    ([3, 2, 5, 1], [1.5, 2.0, 4.0, 10.0], 6.0),
+    ([3, 0, 5, 1], [1.5, 2.0, 4.0, 10.0], 6.0),
+    ([1, 1, 1, 1], [2.5, 2.5, 2.5, 2.5], 7.5),
+    ([4, 4, 4], [0.1, 0.2, 0.3], 0.6),
+    ([2, 3, 1], [0.0, 1.0, 3.0], 2.5),
+    ([2, 3, 1], [-1.0, 1.0, 3.0], 1.5),
+    ([2, 1], [3.0, 5.0], 0.5),
+    ([2, 1], [3.0, 5.0], 100.0),
+    ([10, 7, 3, 2], [0.99, 1.49, 5.25, 12.0], 23.47),
+    ([0, 0], [1.0, 2.0], 5.0),
+]
+
+
+def test_reducir_exceso_igual_a_recorrido():
+    """La reducción vectorizada coincide con el recorrido en los dos modos."""
+    engine = ForecastEngine(CONFIG_PRUEBA)
+    rng = np.random.default_rng(7)
+    casos = [(np.array(u, dtype=np.int64), np.array(p, dtype=float), d) for u, p, d in CASOS_REDUCCION]
+    for _ in range(200):
+        n = int(rng.integers(1, 12))
+        pvp = np.sort(np.round(rng.choice([0.0, 0.5, 1.0, 2.5, 3.99, 7.5, 12.0], n), 2))
+        unidades = rng.integers(0, 6, n).astype(np.int64)
+        casos.append((unidades, pvp, float(np.round(rng.uniform(0, 40), 2))))
+
+    for unidades, pvp, delta in casos:
+        for multiunidad in (False, True):
+            original = unidades.copy()
+            resultado = engine._reducir_exceso_ventas(unidades, pvp, delta, multiunidad=multiunidad)
+            esperado = reducir_exceso_recorrido(unidades, pvp, delta, multiunidad=multiunidad)
+            assert np.array_equal(resultado, esperado), (unidades, pvp, delta, multiunidad)
+            assert np.array_equal(unidades, original)
+            assert (resultado >= 0).all()
+
+    # Modo por defecto: como máximo una unidad por artículo
+    resultado = engine._reducir_exceso_ventas(np.array([3, 2, 5, 1]), np.array([1.5, 2.0, 4.0, 10.0]), 6.0)
+    assert resultado.tolist() == [2, 1, 5, 1]
+    # Modo multiunidad: se vacía el más barato y se retiran del siguiente las que caben
+    resultado = engine._reducir_exceso_ventas(np.array([3, 2, 5, 1]), np.array([1.5, 2.0, 4.0, 10.0]), 6.0,
+                                              multiunidad=True)
+    assert resultado.tolist() == [0, 2, 5, 1]
+
+
+def stock_minimo_fila_a_fila(engine, pedidos_df, stock_acumulado, stock_real, ventas_reales, ventas_objetivo):
+    """Stock mínimo y correcciones FASE 2 de referencia, fila a fila."""
+    porcentaje = engine.parametros.get('stock_minimo_porcentaje', 0.30)
+    nuevo_stock, ajustes = {}, {}
+    for idx, row in pedidos_df.iterrows():
+        clave = f"{row['Codigo_Articulo']}|{row['Talla']}|{row['Color']}"
+        stock_minimo = int(np.ceil(row['Unidades_Finales'] * porcentaje))
+        diferencia = stock_minimo - stock_acumulado.get(clave, 0)
+        corregido = max(0, row['Unidades_Finales'] + (stock_minimo - stock_real.get(clave, 0)))
+        tendencia = max(0, ventas_reales.get(clave, 0) - ventas_objetivo.get(clave, 0))
+        pedidos_df.at[idx, 'Stock_Minimo_Objetivo'] = stock_minimo
+        pedidos_df.at[idx, 'Diferencia_Stock'] = diferencia
+        pedidos_df.at[idx, 'Pedido_Corregido_Stock'] = corregido
+        pedidos_df.at[idx, 'Ventas_Reales'] = ventas_reales.get(clave, 0)
+        pedidos_df.at[idx, 'Tendencia_Consumo'] = tendencia
+        pedidos_df.at[idx, 'Pedido_Final'] = corregido + tendencia
+        nuevo_stock[clave] = stock_minimo
+        ajustes[clave] = diferencia
+    return pedidos_df, nuevo_stock, ajustes
+
+
+def test_stock_minimo_igual_a_fila_a_fila():
+    """aplicar_stock_minimo por columnas coincide con el cálculo fila a fila."""
+    engine = ForecastEngine(CONFIG_PRUEBA)
+    # Índice desordenado, como tras ordenar por PVP en calcular_pedido_semana
+    pedidos = pd.DataFrame({
+        'Codigo_Articulo': ['8000000001', '8000000002', '8000000003', '8000000004', '8000000005'],
+        'Talla': ['G', 'U', 'M', 'U', ''],
+        'Color': ['VERDE', 'VERDE', 'MORADO', 'VERDE', ''],
+        'Unidades_Finales': np.array([10, 3, 0, 7, 1], dtype=np.int64),
+    }, index=[4, 0, 3, 1, 2])
+    stock_acumulado = {'8000000001|G|VERDE': 2, '8000000004|U|VERDE': 5, '9999999999|U|U': 4}
+    stock_real = {'8000000001|G|VERDE': 1, '8000000002|U|VERDE': 6, '8000000004|U|VERDE': 2}
+    ventas_reales = {'8000000001|G|VERDE': 9, '8000000003|M|MORADO': 2, '8000000005||': 4}
+    ventas_objetivo = {'8000000001|G|VERDE': 7.5, '8000000003|M|MORADO': 3.0, '8000000005||': 1.25}
+
+    casos = [({}, None, None, None), (stock_acumulado, None, None, None),
+             (stock_acumulado, stock_real, ventas_reales, ventas_objetivo)]
+    for acumulado, real, reales, objetivo in casos:
+        resultado, nuevo_stock, ajustes = engine.aplicar_stock_minimo(
+            pedidos.copy(), 14, acumulado, real, reales, objetivo)
+        esperado, nuevo_esperado, ajustes_esperados = stock_minimo_fila_a_fila(
+            engine, pedidos.copy(), acumulado, real or {}, reales or {}, objetivo or {})
+
+        pd.testing.assert_frame_equal(resultado, esperado, check_dtype=False)
+        assert nuevo_stock == nuevo_esperado and ajustes == ajustes_esperados
+        # El stock nuevo se guarda en el estado JSON
+        json.dumps(nuevo_stock)
+        json.dumps(ajustes)
+
+    assert nuevo_stock == {'8000000001|G|VERDE': 3, '8000000002|U|VERDE': 1, '8000000003|M|MORADO': 0,
+                           '8000000004|U|VERDE': 3, '8000000005||': 1}
+    assert resultado.loc[4, 'Pedido_Final'] == 10 + 3 - 1 + 1.5
+
+
+def test_pedido_semana_igual_a_fila_a_fila():
+    """El pedido por columnas es igual al calculado artículo a artículo."""
+    engine = ForecastEngine(CONFIG_PRUEBA)
+    datos_semana, abc_df, costes_df = datos_prueba()
+
+    for semana in (14, 15):
+        pedidos = engine.calcular_pedido_semana(semana, datos_semana.assign(Semana=semana),
+                                                abc_df, costes_df, 'vivero')
+        esperado = pedido_fila_a_fila(engine, semana, datos_semana, abc_df, costes_df, 'vivero')
+        pd.testing.assert_frame_equal(pedidos, esperado, check_dtype=False)
+
+    # Semana 15: objetivo bajo, hay exceso y se reducen unidades
+    assert (pedidos['Unidades_Finales'] < np.ceil(pedidos['Unidades_Escaladas'])).any()
+    assert pedidos.set_index('Codigo_Articulo').loc['8000000004', 'Accion_Aplicada'] == 'ELIMINAR'
+    assert pedidos.set_index('Codigo_Articulo').loc['8000000005', 'Categoria'] == 'C'
+
+
+def main():
+    """Ejecuta todas las pruebas."""
+    pruebas = [
+        ("Pedido semanal = cálculo fila a fila", test_pedido_semana_igual_a_fila_a_fila),
+        ("Factores de compra = comprobación encadenada", test_factores_compra_igual_a_encadenado),
+        ("Reducción del exceso = recorrido", test_reducir_exceso_igual_a_recorrido),
+        ("Stock mínimo = cálculo fila a fila", test_stock_minimo_igual_a_fila_a_fila),
+    ]
+
+    todas_pasaron = True
+    for nombre, prueba in pruebas:
+        try:
+            prueba()
+            print(f"  {nombre}: ✓ PASÓ")
+        except AssertionError:
+            print(f"  {nombre}: ✗ FALLÓ")
+            todas_pasaron = False
+
+    return 0 if todas_pasaron else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,386 @@
+#!/usr/bin/env python3
+"""
+Script de verificación: Procesamiento de semanas en main.py
+
+Verificar que los emails de una semana se envían solo después de guardar su
+estado: si la ejecución se interrumpe con una excepción o el guardado falla,
+no se envía ningún email y el estado no cambia. Verificar también que un
+rango de semanas encadena el stock igual que las semanas procesadas de una
+en una y que, si una semana falla, el rango se detiene y solo se envían los
+emails de las semanas guardadas. Verificar que calcular las secciones en
+varios procesos (workers > 1) genera los mismos libros y el mismo stock
+que en un solo proceso. Verificar que reprocesar una semana pasada no
+sustituye el stock acumulado del estado y que la primera semana de un año
+parte del stock final del histórico del año anterior.
+
+Autor: Sistema de Pedidos Vivero V2
+Fecha: 2026-02-25
+"""
+
+import os
+import sys
+import tempfile
+from datetime import date, timedelta
+from pathlib import Path
+from unittest import mock
+
+import pandas as pd
+
+# Añadir la raíz del proyecto al path
+sys.path.insert(0, str(Path(__file__).parent))
+
+import main as programa
+from src.state_manager import StateManager
+from src.historico_stock import HistoricoStock
+from src.scheduler_service import SchedulerService
+
+# Artículos de prueba: (código, nombre, talla, color, PVP, coste, proveedor).
+# Los códigos 7... son de 'maf' y los 8... de 'vivero'
+ARTICULOS_PRUEBA = [
+    ('7000000001', 'Petunia', 'M', 'ROJO', 2.5, 1.0, 'Viveros Sur'),
+    ('7000000002', 'Geranio', 'U', 'VARIOS', 4.0, 1.6, 'Viveros Sur'),
+    ('7000000003', 'Begonia', 'U', 'BLANCO', 6.0, 2.4, 'Flores Norte'),
+    ('8000000001', 'Olivo', 'U', 'VERDE', 25.0, 10.0, 'Arboles SL'),
+    ('8000000002', 'Romero', 'U', 'VERDE', 3.5, 1.4, 'Arboles SL'),
+]
+SEMANAS_PRUEBA = [10, 11, 12]
+
+
+def configuracion_estado(directorio: str) -> dict:
+    """Configuración mínima con el directorio de estado indicado."""
+    return {'rutas': {'directorio_estado': directorio, 'backend_estado': 'json'}}
+
+
+def crear_entradas_prueba(directorio: str) -> dict:
+    """
+    Crea las entradas de dos secciones (maf y vivero) para las semanas de prueba.
+
+    Args:
+        directorio (str): Directorio donde se crean entrada, salida y estado
+
+    Returns:
+        dict: Configuración que apunta a los archivos creados
+    """
+    entrada = os.path.join(directorio, 'input')
+    os.makedirs(entrada)
+    os.makedirs(os.path.join(directorio, 'estado'))
+
+    ventas = []
+    for semana in SEMANAS_PRUEBA:
+        lunes = date.fromisocalendar(2025, semana, 1)
+        for i, (codigo, nombre, talla, color, pvp, _, _) in enumerate(ARTICULOS_PRUEBA):
+            unidades = semana - 8 + i
+            ventas.append({'Artículo': codigo, 'Nombre artículo': nombre, 'Talla': talla, 'Color': color,
+                           'Fecha': pd.Timestamp(lunes + timedelta(days=i)),
+                           'Unidades': unidades, 'Importe': unidades * pvp})
+    pd.DataFrame(ventas).to_excel(os.path.join(entrada, 'SPA_ventas.xlsx'), index=False)
+
+    pd.DataFrame([
+        {'Artículo': codigo, 'Talla': talla, 'Color': color, 'Tarifa10': pvp, 'Coste': coste,
+         'Nombre proveedor': proveedor}
+        for codigo, _, talla, color, pvp, coste, proveedor in ARTICULOS_PRUEBA
+    ]).to_excel(os.path.join(entrada, 'SPA_coste.xlsx'), index=False)
+
+    for seccion, prefijo in (('maf', '7'), ('vivero', '8')):
+        articulos = [a for a in ARTICULOS_PRUEBA if a[0].startswith(prefijo)]
+        with pd.ExcelWriter(os.path.join(entrada, f'CLASIFICACION_ABC+D_{seccion}_P1_2025.xlsx')) as writer:
+            for posicion, categoria in enumerate(['A', 'B']):
+                pd.DataFrame([
+                    {'Artículo': codigo, 'Nombre artículo': nombre, 'Talla': talla, 'Color': color,
+                     'Acción Sugerida': 'Mantener', 'Descuento Sugerido (%)': 0}
+                    for codigo, nombre, talla, color, *_ in articulos[posicion::2]
+                ]).to_excel(writer, sheet_name=f'Categoria {categoria}', index=False)
+
+    return {
+        'secciones': {
+            'maf': {'objetivos_semanales': {'10': 40, '11': 60, '12': 80}},
+            'vivero': {'objetivos_semanales': {'10': 90, '11': 120, '12': 150}},
+        },
+        'parametros': {'objetivo_crecimiento': 0.05, 'stock_minimo_porcentaje': 0.30},
+        'festivos': {},
+        'secciones_activas': ['maf', 'vivero'],
+        'rutas': {
+            'directorio_base': directorio,
+            'directorio_entrada': 'input',
+            'directorio_salida': 'output',
+            'directorio_estado': os.path.join(directorio, 'estado'),
+            'directorio_historico_stock': os.path.join(directorio, 'historico'),
+        },
+        'archivos_entrada': {'ventas': 'SPA_ventas.xlsx', 'coste': 'SPA_coste.xlsx'},
+    }
+
+
+def leer_pedidos(archivos: list) -> dict:
+    """Contenido de los libros de pedido generados, por nombre de archivo."""
+    return {os.path.basename(archivo): pd.read_excel(archivo, sheet_name=None)
+            for archivo in archivos if 'Resumen' not in os.path.basename(archivo)}
+
+
+def historico_prueba(config: dict) -> HistoricoStock:
+    """Histórico semanal del stock del año de las semanas de prueba."""
+    return HistoricoStock(config, SchedulerService(config).calcular_año_semana(SEMANAS_PRUEBA[0]))
+
+
+def pedido_simulado(stock: dict, error: Exception = None):
+    """
+    Sustituto de procesar_pedido_semana que modifica el estado y genera un archivo.
+
+    Args:
+        stock (dict): Stock acumulado que guarda la semana
+        error (Exception): Excepción a lanzar tras modificar el estado
+
+    Returns:
+        Callable: Función con la misma firma que procesar_pedido_semana
+    """
+    def procesar(semana, config, state_manager, **kwargs):
+        assert kwargs['enviar_email'] is False
+        state_manager.actualizar_stock_acumulado(stock)
+        state_manager.registrar_ejecucion(semana=semana, archivo_generado='Pedido.xlsx',
+                                          articulos=1, importe=10.0, exitosa=True)
+        if error is not None:
+            raise error
+        return True, 'Pedido.xlsx', 1, 10.0, {}, {}, {}, ['Pedido.xlsx']
+    return procesar
+
+
+def test_emails_tras_guardar():
+    """Los emails se envían después de guardar el estado de la semana."""
+    with tempfile.TemporaryDirectory() as directorio:
+        config = configuracion_estado(directorio)
+        sm = StateManager(config)
+        stock_al_enviar = []
+
+        def enviar(semana, config, archivos):
+            stock_al_enviar.append(StateManager(config).obtener_stock_acumulado())
+            return {'exito': True}, {'enviado': True}
+
+        with mock.patch.object(programa, 'procesar_pedido_semana', pedido_simulado({'A|M|ROJO': 3})), \
+             mock.patch.object(programa, 'enviar_emails_semana', side_effect=enviar) as enviar_emails:
+            resultado = programa.procesar_semana_en_transaccion(12, config, sm)
+
+        assert resultado[0] is True
+        assert resultado[5] == {'exito': True} and resultado[6] == {'enviado': True}
+        enviar_emails.assert_called_once_with(12, config, ['Pedido.xlsx'])
+        # Al enviar, el stock de la semana ya estaba guardado en disco
+        assert stock_al_enviar == [{'A|M|ROJO': 3}]
+
+
+def test_sin_emails_si_hay_excepcion():
+    """Una excepción dentro de la transacción no envía emails ni guarda nada."""
+    with tempfile.TemporaryDirectory() as directorio:
+        config = configuracion_estado(directorio)
+        sm = StateManager(config)
+        sm.actualizar_stock_acumulado({'A|M|ROJO': 1})
+
+        with mock.patch.object(programa, 'procesar_pedido_semana',
+                               pedido_simulado({'A|M|ROJO': 3}, error=RuntimeError('fallo'))), \
+             mock.patch.object(programa, 'enviar_emails_semana') as enviar_emails:
+            try:
+                programa.procesar_semana_en_transaccion(12, config, sm)
+                assert False, "La excepción debería propagarse"
+            except RuntimeError:
+                pass
+
+        enviar_emails.assert_not_called()
+        assert sm.obtener_stock_acumulado() == {'A|M|ROJO': 1}
+        assert StateManager(config).obtener_stock_acumulado() == {'A|M|ROJO': 1}
+
+
+def test_sin_emails_si_no_se_guarda():
+    """Si el guardado del estado falla, la semana no tiene éxito y no se envían emails."""
+    with tempfile.TemporaryDirectory() as directorio:
+        config = configuracion_estado(directorio)
+        sm = StateManager(config)
+        sm.cargar_estado()
+
+        with mock.patch.object(programa, 'procesar_pedido_semana', pedido_simulado({'A|M|ROJO': 3})), \
+             mock.patch.object(programa, 'enviar_emails_semana') as enviar_emails, \
+             mock.patch.object(sm.diario, 'añadir', side_effect=OSError('disco lleno')):
+            resultado = programa.procesar_semana_en_transaccion(12, config, sm)
+
+        assert resultado[0] is False
+        assert not sm.transaccion_guardada
+        enviar_emails.assert_not_called()
+        assert StateManager(config).obtener_stock_acumulado() == {}
+
+
+def test_rango_encadena_stock():
+    """Un rango genera lo mismo que las semanas procesadas de una en una."""
+    with tempfile.TemporaryDirectory() as dir_rango, tempfile.TemporaryDirectory() as dir_semanas:
+        config_rango = crear_entradas_prueba(dir_rango)
+        sm_rango = StateManager(config_rango)
+        resultados = programa.procesar_rango_semanas(
+            SEMANAS_PRUEBA[0], SEMANAS_PRUEBA[-1], config_rango, sm_rango,
+            aplicar_correccion=False, enviar_email=False
+        )
+
+        config_semanas = crear_entradas_prueba(dir_semanas)
+        sm_semanas = StateManager(config_semanas)
+        archivos_semanas = {}
+        for semana in SEMANAS_PRUEBA:
+            resultado = programa.procesar_semana_en_transaccion(
+                semana, config_semanas, sm_semanas,
+                forzar=True, aplicar_correccion=False, enviar_email=False
+            )
+            assert resultado[0] is True
+            archivos_semanas[semana] = resultado[7]
+
+        assert list(resultados) == SEMANAS_PRUEBA
+        historico_rango = historico_prueba(config_rango)
+        historico_semanas = historico_prueba(config_semanas)
+        assert historico_rango.semanas_registradas() == SEMANAS_PRUEBA
+        for semana in SEMANAS_PRUEBA:
+            assert resultados[semana]['exito'] and resultados[semana]['guardada']
+            assert resultados[semana]['error'] is None
+            # Diferencia_Stock de cada semana depende del stock de la anterior
+            pedidos_rango = leer_pedidos(resultados[semana]['archivos'])
+            pedidos_semanas = leer_pedidos(archivos_semanas[semana])
+            assert pedidos_rango.keys() == pedidos_semanas.keys() and len(pedidos_rango) == 2
+            for nombre, hojas in pedidos_rango.items():
+                for hoja, df in hojas.items():
+                    pd.testing.assert_frame_equal(df, pedidos_semanas[nombre][hoja])
+            assert historico_rango.stock_hasta_semana(semana) == historico_semanas.stock_hasta_semana(semana)
+
+        assert StateManager(config_rango).obtener_stock_acumulado() == \
+            StateManager(config_semanas).obtener_stock_acumulado()
+
+
+def test_rango_se_detiene_tras_fallo():
+    """Si una semana falla, el rango se detiene y solo se envían los emails de las guardadas."""
+    with tempfile.TemporaryDirectory() as directorio:
+        config = crear_entradas_prueba(directorio)
+        sm = StateManager(config)
+        procesar_real = programa.procesar_pedido_semana
+
+        def procesar_con_fallo(semana, *args, **kwargs):
+            resultado = procesar_real(semana, *args, **kwargs)
+            if semana == SEMANAS_PRUEBA[1]:
+                raise RuntimeError('fallo en la semana')
+            return resultado
+
+        with mock.patch.object(programa, 'procesar_pedido_semana', side_effect=procesar_con_fallo), \
+             mock.patch.object(programa, 'enviar_emails_semana',
+                               return_value=({'exito': True}, {'enviado': True})) as enviar_emails:
+            resultados = programa.procesar_rango_semanas(
+                SEMANAS_PRUEBA[0], SEMANAS_PRUEBA[-1], config, sm,
+                aplicar_correccion=False, enviar_email=True
+            )
+
+        primera, fallida = SEMANAS_PRUEBA[0], SEMANAS_PRUEBA[1]
+        assert list(resultados) == [primera, fallida]
+        assert resultados[primera]['exito'] and resultados[primera]['guardada']
+        assert resultados[primera]['email'] == {'exito': True}
+        assert not resultados[fallida]['exito'] and not resultados[fallida]['guardada']
+        assert resultados[fallida]['error'] == 'fallo en la semana'
+        enviar_emails.assert_called_once_with(primera, config, resultados[primera]['archivos'])
+
+        # Solo queda guardada la primera semana, con su stock
+        historico = historico_prueba(config)
+        assert historico.semanas_registradas() == [primera]
+        estado = StateManager(config)
+        assert [e['semana'] for e in estado.cargar_estado()['historico_ejecuciones']] == [primera]
+        assert estado.obtener_stock_acumulado() == historico.stock_hasta_semana(primera)
+
+
+def test_workers_igual_a_un_proceso():
+    """Con workers=2 se generan los mismos libros y el mismo stock que con workers=1."""
+    with tempfile.TemporaryDirectory() as dir_uno, tempfile.TemporaryDirectory() as dir_varios:
+        resultados = {}
+        for directorio, workers in ((dir_uno, 1), (dir_varios, 2)):
+            config = crear_entradas_prueba(directorio)
+            sm = StateManager(config)
+            with mock.patch.object(programa, 'procesar_secciones_en_paralelo',
+                                   wraps=programa.procesar_secciones_en_paralelo) as en_paralelo:
+                archivos = {}
+                for semana in SEMANAS_PRUEBA[:2]:
+                    resultado = programa.procesar_semana_en_transaccion(
+                        semana, config, sm, forzar=True, aplicar_correccion=False,
+                        enviar_email=False, workers=workers
+                    )
+                    assert resultado[0] is True
+                    archivos[semana] = resultado[7]
+            assert en_paralelo.called == (workers > 1)
+            resultados[workers] = (config, archivos)
+
+        (config_uno, archivos_uno), (config_varios, archivos_varios) = resultados[1], resultados[2]
+        for semana in SEMANAS_PRUEBA[:2]:
+            pedidos_uno = leer_pedidos(archivos_uno[semana])
+            pedidos_varios = leer_pedidos(archivos_varios[semana])
+            assert pedidos_uno.keys() == pedidos_varios.keys() and len(pedidos_uno) == 2
+            for nombre, hojas in pedidos_uno.items():
+                assert hojas.keys() == pedidos_varios[nombre].keys()
+                for hoja, df in hojas.items():
+                    pd.testing.assert_frame_equal(df, pedidos_varios[nombre][hoja])
+            assert historico_prueba(config_uno).stock_hasta_semana(semana) == \
+                historico_prueba(config_varios).stock_hasta_semana(semana)
+
+        stock_uno = StateManager(config_uno).obtener_stock_acumulado()
+        assert stock_uno and stock_uno == StateManager(config_varios).obtener_stock_acumulado()
+
+
+def test_reproceso_no_cambia_stock_estado():
+    """Reprocesar una semana pasada no sustituye el stock acumulado del estado."""
+    with tempfile.TemporaryDirectory() as directorio:
+        config = crear_entradas_prueba(directorio)
+        sm = StateManager(config)
+        for semana in (SEMANAS_PRUEBA[0], SEMANAS_PRUEBA[1], SEMANAS_PRUEBA[0]):
+            resultado = programa.procesar_semana_en_transaccion(
+                semana, config, sm, forzar=True, aplicar_correccion=False, enviar_email=False
+            )
+            assert resultado[0] is True
+
+        historico = historico_prueba(config)
+        stock_estado = StateManager(config).obtener_stock_acumulado()
+        assert stock_estado and stock_estado == historico.stock_hasta_semana(SEMANAS_PRUEBA[1])
+        assert StateManager(config).obtener_semana_stock_acumulado() == (historico.año, SEMANAS_PRUEBA[1])
+
+
+def test_año_nuevo_parte_del_año_anterior():
+    """Sin histórico del año, se parte del stock final del año anterior y no del estado."""
+    with tempfile.TemporaryDirectory() as directorio:
+        config = configuracion_estado(directorio)
+        config['rutas']['directorio_historico_stock'] = directorio
+        sm = StateManager(config)
+        sm.cargar_estado()
+        # El estado quedó con el stock de una semana pasada reprocesada
+        sm.actualizar_stock_acumulado({'A|M|ROJO': 3})
+
+        anterior = HistoricoStock(config, año=2026)
+        anterior.guardar_semana(52, {}, {'A|M|ROJO': 5, 'B||': 2})
+        anterior.guardar_semana(53, anterior.stock_hasta_semana(52), {'A|M|ROJO': 5, 'B||': 1})
+
+        stock = programa.cargar_stock_semana_anterior(1, sm, HistoricoStock(config, año=2027))
+        assert stock == {'A|M|ROJO': 5, 'B||': 1}
+
+        # Sin histórico del año anterior se usa el stock acumulado del estado
+        stock = programa.cargar_stock_semana_anterior(1, sm, HistoricoStock(config, año=2026 + 5))
+        assert stock == {'A|M|ROJO': 3}
+
+
+def main():
+    """Ejecuta todas las pruebas."""
+    pruebas = [
+        ("Emails tras guardar el estado", test_emails_tras_guardar),
+        ("Sin emails si hay una excepción", test_sin_emails_si_hay_excepcion),
+        ("Sin emails si el estado no se guarda", test_sin_emails_si_no_se_guarda),
+        ("Rango encadena el stock entre semanas", test_rango_encadena_stock),
+        ("Rango detenido tras una semana fallida", test_rango_se_detiene_tras_fallo),
+        ("workers=2 igual que un proceso", test_workers_igual_a_un_proceso),
+        ("Reproceso sin cambiar el stock del estado", test_reproceso_no_cambia_stock_estado),
+        ("Año nuevo desde el stock del año anterior", test_año_nuevo_parte_del_año_anterior),
+    ]
+
+    todas_pasaron = True
+    for nombre, prueba in pruebas:
+        try:
+            prueba()
+            print(f"  {nombre}: ✓ PASÓ")
+        except AssertionError:
+            print(f"  {nombre}: ✗ FALLÓ")
+            todas_pasaron = False
+
+    return 0 if todas_pasaron else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
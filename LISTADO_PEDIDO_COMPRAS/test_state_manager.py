@@ -0,0 +1,393 @@
+#!/usr/bin/env python3
+"""
+Script de verificación: Persistencia del estado (StateManager)
+
+Verificar que el backend SQLite del StateManager migra un state.json
+existente sin pérdidas y que, tras una secuencia de cambios, guarda el
+mismo estado que el backend JSON; y que el diario del backend JSON
+reconstruye el estado tras una escritura interrumpida y se compacta, que
+una entrada que no llega al diario no consume su número de secuencia, y que
+un state.json ilegible detiene la carga sin sustituirse por otro estado.
+Verificar también que una transacción guarda sus cambios de una sola vez
+o los descarta si termina con una excepción, y que el histórico semanal del
+stock devuelve el stock de cualquier semana aunque se reprocese, que solo se
+escribe si la transacción se guarda, que no se sobrescribe si no se puede
+leer y que usa el año de la semana procesada.
+
+Autor: Sistema de Pedidos Vivero V2
+Fecha: 2026-02-25
+"""
+
+import sys
+import json
+import tempfile
+from datetime import date
+from pathlib import Path
+from unittest import mock
+
+# Añadir la raíz del proyecto al path
+sys.path.insert(0, str(Path(__file__).parent))
+
+from src.state_manager import StateManager
+from src.historico_stock import HistoricoStock
+from src.scheduler_service import SchedulerService
+
+
+def configuracion(directorio: str, backend: str) -> dict:
+    """Configuración mínima con el directorio de estado y el backend indicados."""
+    return {'rutas': {'directorio_estado': directorio, 'backend_estado': backend}}
+
+
+def aplicar_cambios_prueba(sm: StateManager) -> None:
+    """Aplica la secuencia de cambios de una ejecución semanal."""
+    stock = sm.obtener_stock_acumulado()
+    stock.update({'1000000001|M|ROJO': 4, '1000000002||': 2.5})
+    sm.actualizar_stock_acumulado(stock)
+    sm.registrar_ejecucion(semana=12, archivo_generado='Pedido_Semana_12.xlsx',
+                           articulos=2, importe=150.256, exitosa=True, notas='prueba')
+    sm.agregar_error({'tipo': 'lectura', 'mensaje': 'sin archivo', 'detalles': {'seccion': 'maf'}})
+    sm.actualizar_stock_acumulado({'1000000001|M|ROJO': 1})
+
+
+def sin_marcas_de_tiempo(estado: dict) -> dict:
+    """Copia del estado sin los campos que dependen de la hora de ejecución."""
+    estado = json.loads(json.dumps(estado))
+    estado.pop('informacion_sistema')
+    for registro in estado['historico_ejecuciones']:
+        registro.pop('fecha_ejecucion')
+    for error in estado['errores_pendientes']:
+        error.pop('timestamp')
+    return estado
+
+
+def test_migracion_desde_json():
+    """
+    Verificar que la primera carga con el backend SQLite migra state.json
+    """
+    with tempfile.TemporaryDirectory() as directorio:
+        sm_json = StateManager(configuracion(directorio, 'json'))
+        sm_json.cargar_estado()
+        aplicar_cambios_prueba(sm_json)
+
+        estado_json = StateManager(configuracion(directorio, 'json')).cargar_estado()
+        estado_sqlite = StateManager(configuracion(directorio, 'sqlite')).cargar_estado()
+
+        assert (Path(directorio) / 'state.sqlite').exists()
+        assert estado_sqlite == estado_json
+
+
+def test_cambios_igual_que_json():
+    """
+    Verificar que los mismos cambios dejan el mismo estado en ambos backends
+    """
+    with tempfile.TemporaryDirectory() as dir_json, tempfile.TemporaryDirectory() as dir_sqlite:
+        for directorio, backend in ((dir_json, 'json'), (dir_sqlite, 'sqlite')):
+            sm = StateManager(configuracion(directorio, backend))
+            sm.cargar_estado()
+            aplicar_cambios_prueba(sm)
+
+        estado_json = StateManager(configuracion(dir_json, 'json')).cargar_estado()
+        estado_sqlite = StateManager(configuracion(dir_sqlite, 'sqlite')).cargar_estado()
+
+        assert sin_marcas_de_tiempo(estado_sqlite) == sin_marcas_de_tiempo(estado_json)
+        assert estado_sqlite['stock_acumulado'] == {'1000000001|M|ROJO': 1, '1000000002||': 2.5}
+        assert estado_sqlite['informacion_sistema']['ultima_semana_procesada'] == 12
+
+
+def test_diario_con_escritura_interrumpida():
+    """
+    Verificar que una entrada del diario a medio escribir se descarta
+    """
+    with tempfile.TemporaryDirectory() as directorio:
+        sm = StateManager(configuracion(directorio, 'json'))
+        sm.cargar_estado()
+        aplicar_cambios_prueba(sm)
+        esperado = sm.estado
+
+        # El state.json solo contiene la instantánea inicial
+        with open(Path(directorio) / 'state.json', encoding='utf-8') as f:
+            assert json.load(f)['stock_acumulado'] == {}
+
+        # Interrupción a mitad de la escritura de una nueva entrada
+        with open(Path(directorio) / 'state.json.diario', 'a', encoding='utf-8') as f:
+            f.write('{"secuencia": 99, "cambios": [["stock", {"1000000001|M|R')
+
+        sm = StateManager(configuracion(directorio, 'json'))
+        assert sm.cargar_estado() == esperado
+
+        # Las entradas posteriores se siguen leyendo
+        sm.actualizar_stock_acumulado({'1000000003|L|AZUL': 6})
+        estado = StateManager(configuracion(directorio, 'json')).cargar_estado()
+        assert estado['stock_acumulado']['1000000003|L|AZUL'] == 6
+        assert estado['stock_acumulado']['1000000001|M|ROJO'] == 1
+
+
+def test_compactacion_diario():
+    """
+    Verificar que el diario se compacta en state.json al llegar al límite
+    """
+    with tempfile.TemporaryDirectory() as directorio:
+        config = configuracion(directorio, 'json')
+        config['rutas']['entradas_compactacion_diario'] = 3
+
+        sm = StateManager(config)
+        sm.cargar_estado()
+        aplicar_cambios_prueba(sm)
+
+        # Cuatro cambios: tres compactados en state.json y uno en el diario
+        with open(Path(directorio) / 'state.json', encoding='utf-8') as f:
+            instantanea = json.load(f)
+        assert len(instantanea['historico_ejecuciones']) == 1
+        assert instantanea['stock_acumulado']['1000000001|M|ROJO'] == 4
+        assert len(sm.diario.leer()) == 1
+
+        # Reaplicar el diario sobre una instantánea posterior no duplica cambios
+        instantanea_final = StateManager(config).cargar_estado()
+        with open(Path(directorio) / 'state.json', 'w', encoding='utf-8') as f:
+            json.dump(instantanea_final, f)
+        assert StateManager(config).cargar_estado() == instantanea_final
+
+
+def test_diario_sin_escribir_no_avanza_secuencia():
+    """
+    Verificar que una entrada que no llega al diario no consume su secuencia
+    """
+    with tempfile.TemporaryDirectory() as directorio:
+        sm = StateManager(configuracion(directorio, 'json'))
+        sm.cargar_estado()
+        sm.actualizar_stock_acumulado({'1000000001|M|ROJO': 4})
+        assert sm.estado['informacion_sistema']['secuencia_diario'] == 1
+
+        with mock.patch.object(sm.diario, 'añadir', side_effect=OSError("disco lleno")):
+            assert not sm.actualizar_stock_acumulado({'1000000002||': 2})
+        assert sm.estado['informacion_sistema']['secuencia_diario'] == 1
+
+        # La siguiente entrada usa la secuencia libre y se aplica al cargar
+        assert sm.actualizar_stock_acumulado({'1000000003|L|AZUL': 6})
+        assert [entrada['secuencia'] for entrada in sm.diario.leer()] == [1, 2]
+        estado = StateManager(configuracion(directorio, 'json')).cargar_estado()
+        assert estado['informacion_sistema']['secuencia_diario'] == 2
+        assert estado['stock_acumulado']['1000000003|L|AZUL'] == 6
+
+
+def test_estado_ilegible_no_se_sustituye():
+    """
+    Verificar que un estado ilegible lanza un error y no se modifica
+    """
+    with tempfile.TemporaryDirectory() as directorio:
+        sm = StateManager(configuracion(directorio, 'json'))
+        sm.cargar_estado()
+        aplicar_cambios_prueba(sm)
+
+        ruta = Path(directorio) / 'state.json'
+        ruta_diario = Path(directorio) / 'state.json.diario'
+        diario = ruta_diario.read_bytes()
+
+        # state.json dañado fuera del sistema, con un backup de una versión anterior
+        with open(Path(directorio) / 'state.json.backup', 'w', encoding='utf-8') as f:
+            json.dump({'stock_acumulado': {'1000000009||': 99}}, f)
+        with open(ruta, 'w', encoding='utf-8') as f:
+            f.write('{"stock_acumulado": {')
+
+        try:
+            StateManager(configuracion(directorio, 'json')).cargar_estado()
+            assert False, "Se esperaba un error al cargar un state.json ilegible"
+        except RuntimeError:
+            pass
+
+        assert ruta.read_text(encoding='utf-8') == '{"stock_acumulado": {'
+        assert ruta_diario.read_bytes() == diario
+        assert not (Path(directorio) / 'state.json.corrupto').exists()
+
+        # Una entrada del diario que no se puede aplicar también detiene la carga
+        with open(ruta, 'w', encoding='utf-8') as f:
+            json.dump(sm.estado, f)
+        contenido = ruta.read_bytes()
+        with open(ruta_diario, 'a', encoding='utf-8') as f:
+            f.write(json.dumps({'cambios': []}) + '\n')
+
+        try:
+            StateManager(configuracion(directorio, 'json')).cargar_estado()
+            assert False, "Se esperaba un error al aplicar una entrada del diario sin secuencia"
+        except RuntimeError:
+            pass
+
+        assert ruta.read_bytes() == contenido
+
+
+def test_transaccion_guarda_una_vez():
+    """
+    Verificar que los cambios de una transacción se guardan en una sola entrada
+    """
+    for backend in ('json', 'sqlite'):
+        with tempfile.TemporaryDirectory() as directorio:
+            sm = StateManager(configuracion(directorio, backend))
+            sm.cargar_estado()
+
+            with sm.transaccion():
+                aplicar_cambios_prueba(sm)
+                sm.establecer_ultima_semana_procesada(13)
+                # Nada se ha guardado todavía
+                estado_guardado = StateManager(configuracion(directorio, backend)).cargar_estado()
+                assert estado_guardado['stock_acumulado'] == {}
+
+            if backend == 'json':
+                assert len(sm.diario.leer()) == 1
+
+            estado = StateManager(configuracion(directorio, backend)).cargar_estado()
+            assert estado == sm.estado
+            assert estado['informacion_sistema']['ultima_semana_procesada'] == 13
+
+
+def test_transaccion_revertida():
+    """
+    Verificar que una excepción dentro de la transacción descarta sus cambios
+    """
+    with tempfile.TemporaryDirectory() as directorio:
+        sm = StateManager(configuracion(directorio, 'json'))
+        sm.cargar_estado()
+        aplicar_cambios_prueba(sm)
+        estado_previo = json.loads(json.dumps(sm.estado))
+
+        try:
+            with sm.transaccion():
+                sm.actualizar_stock_acumulado({'1000000001|M|ROJO': 50})
+                sm.registrar_ejecucion(semana=13, archivo_generado='Pedido_Semana_13.xlsx',
+                                       articulos=1, importe=10.0, exitosa=True)
+                raise RuntimeError("fallo simulado")
+        except RuntimeError:
+            pass
+
+        assert sm.estado == estado_previo
+        assert StateManager(configuracion(directorio, 'json')).cargar_estado() == estado_previo
+
+
+def test_historico_stock_por_semana():
+    """
+    Verificar el stock por semana del histórico, incluido el reproceso de una semana
+    """
+    with tempfile.TemporaryDirectory() as directorio:
+        config = {'rutas': {'directorio_historico_stock': directorio}}
+
+        inicial = {'A|M|ROJO': 1, 'B||': 2.5}
+        semana_10 = {**inicial, 'A|M|ROJO': 3, 'C|L|AZUL': 4}
+        semana_11 = {**semana_10, 'B||': 7}
+
+        historico = HistoricoStock(config, año=2026)
+        assert historico.guardar_semana(10, inicial, semana_10) == 2
+        assert historico.guardar_semana(11, historico.stock_hasta_semana(10), semana_11) == 1
+
+        historico = HistoricoStock(config, año=2026)
+        assert historico.semanas_registradas() == [10, 11]
+        assert historico.stock_hasta_semana(9) == inicial
+        assert historico.stock_hasta_semana(10) == semana_10
+        assert historico.stock_hasta_semana(11) == semana_11
+
+        # Reprocesar la semana 10 reemplaza solo sus cambios
+        historico.guardar_semana(10, historico.stock_hasta_semana(9), {**inicial, 'A|M|ROJO': 5})
+        assert historico.stock_hasta_semana(10) == {**inicial, 'A|M|ROJO': 5}
+        assert historico.stock_hasta_semana(11) == {**inicial, 'A|M|ROJO': 5, 'B||': 7}
+
+
+def test_historico_ilegible_no_se_sustituye():
+    """
+    Verificar que un histórico ilegible lanza un error y no se sobrescribe
+    """
+    with tempfile.TemporaryDirectory() as directorio:
+        config = {'rutas': {'directorio_historico_stock': directorio}}
+        historico = HistoricoStock(config, año=2026)
+        historico.guardar_semana(1, {}, {'a': 3})
+        historico.guardar_semana(2, historico.stock_hasta_semana(1), {'a': 3, 'b': 7})
+
+        archivos = list(Path(directorio).glob('stock_2026.*'))
+        assert len(archivos) == 1
+        archivos[0].write_bytes(archivos[0].read_bytes()[:20])
+        contenido = archivos[0].read_bytes()
+
+        for operacion in (lambda h: h.guardar_semana(3, {}, {'a': 9}),
+                          lambda h: h.stock_hasta_semana(2),
+                          lambda h: h.tiene_datos()):
+            try:
+                operacion(HistoricoStock(config, año=2026))
+                assert False, "Se esperaba un error con el histórico ilegible"
+            except RuntimeError:
+                pass
+
+        assert archivos[0].read_bytes() == contenido
+        assert [p.name for p in Path(directorio).iterdir()] == [archivos[0].name]
+
+
+def test_historico_solo_tras_confirmar():
+    """
+    Verificar que el histórico de una transacción revertida no se escribe
+    """
+    with tempfile.TemporaryDirectory() as directorio:
+        config = configuracion(directorio, 'json')
+        config['rutas']['directorio_historico_stock'] = directorio
+        sm = StateManager(config)
+        sm.cargar_estado()
+        historico = HistoricoStock(config, año=2026)
+
+        with sm.transaccion():
+            sm.actualizar_stock_acumulado({'A|M|ROJO': 3})
+            sm.al_confirmar(lambda: historico.guardar_semana(10, {}, {'A|M|ROJO': 3}))
+            assert not historico.tiene_datos()
+        assert historico.semanas_registradas() == [10]
+
+        try:
+            with sm.transaccion():
+                sm.actualizar_stock_acumulado({'A|M|ROJO': 8})
+                sm.al_confirmar(lambda: historico.guardar_semana(11, {'A|M|ROJO': 3}, {'A|M|ROJO': 8}))
+                raise RuntimeError("fallo simulado")
+        except RuntimeError:
+            pass
+
+        assert HistoricoStock(config, año=2026).semanas_registradas() == [10]
+
+
+def test_año_semana():
+    """
+    Verificar el año de la semana procesada en el cambio de año
+    """
+    scheduler = SchedulerService({})
+
+    assert scheduler.calcular_año_semana(15, date(2026, 10, 16)) == 2026
+    # Reprocesar la semana 52 a principios de enero
+    assert scheduler.calcular_año_semana(52, date(2027, 1, 5)) == 2026
+    # El pedido de la semana 1 se prepara en la última semana del año
+    assert scheduler.calcular_año_semana(1, date(2025, 12, 28)) == 2026
+    # 2026 tiene semana 53 y 2027 no
+    assert scheduler.calcular_año_semana(53, date(2027, 6, 1)) == 2026
+
+
+def main():
+    """Ejecuta todas las pruebas."""
+    pruebas = [
+        ("Migración desde state.json", test_migracion_desde_json),
+        ("Backend SQLite = backend JSON", test_cambios_igual_que_json),
+        ("Diario con escritura interrumpida", test_diario_con_escritura_interrumpida),
+        ("Compactación del diario", test_compactacion_diario),
+        ("Entrada sin escribir sin secuencia", test_diario_sin_escribir_no_avanza_secuencia),
+        ("Estado ilegible sin sustituir", test_estado_ilegible_no_se_sustituye),
+        ("Transacción con un solo guardado", test_transaccion_guarda_una_vez),
+        ("Transacción revertida", test_transaccion_revertida),
+        ("Histórico semanal del stock", test_historico_stock_por_semana),
+        ("Histórico ilegible sin sobrescribir", test_historico_ilegible_no_se_sustituye),
+        ("Histórico solo tras guardar el estado", test_historico_solo_tras_confirmar),
+        ("Año de la semana procesada", test_año_semana),
+    ]
+
+    todas_pasaron = True
+    for nombre, prueba in pruebas:
+        try:
+            prueba()
+            print(f"  {nombre}: ✓ PASÓ")
+        except AssertionError:
+            print(f"  {nombre}: ✗ FALLÓ")
+            todas_pasaron = False
+
+    return 0 if todas_pasaron else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())